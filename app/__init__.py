@@ -33,6 +33,8 @@ def create_app(config='development'):
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', app.config['SECRET_KEY'])
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024
+    # Detrás de Apache/nginx con X-Sendfile las evidencias las envía el servidor web
+    app.config['USE_X_SENDFILE'] = os.getenv('SST_X_SENDFILE', 'false').lower() == 'true'
     
     # ============ INICIALIZAR EXTENSIONES ============
     db.init_app(app)
@@ -53,7 +55,7 @@ def create_app(config='development'):
         # ============ REGISTRAR BLUEPRINTS ============
         from app.routes import (
             auth_bp, dashboard_bp, reportes_bp, ia_bp, 
-            juridico_bp, admin_bp, controles_bp
+            juridico_bp, admin_bp, controles_bp, trabajos_bp, busqueda_bp
         )
         
         app.register_blueprint(auth_bp)
@@ -63,6 +65,8 @@ def create_app(config='development'):
         app.register_blueprint(juridico_bp)      # ⭐ MÓDULO JURÍDICO
         app.register_blueprint(admin_bp)
         app.register_blueprint(controles_bp)
+        app.register_blueprint(trabajos_bp)
+        app.register_blueprint(busqueda_bp)
         
         logger.info("✅ Blueprints registrados:")
         logger.info("   ├── auth_bp")
@@ -71,7 +75,9 @@ def create_app(config='development'):
         logger.info("   ├── ia_bp")
         logger.info("   ├── juridico_bp ⭐")
         logger.info("   ├── admin_bp")
-        logger.info("   └── controles_bp")
+        logger.info("   ├── controles_bp")
+        logger.info("   ├── trabajos_bp")
+        logger.info("   └── busqueda_bp")
         
         # ============ RUTA RAÍZ ============
         @app.route('/')
@@ -88,16 +94,14 @@ def create_app(config='development'):
         logger.info("   ├── Tablas SST: OK")
         logger.info("   ├── Tablas Jurídicas: consultas_juridicas, documentos_legales ⭐")
         logger.info("   └── Tablas Configuración: OK")
-        
-        # ============ INICIAR SCHEDULER ============
-        try:
-            from app.tasks.scheduler import iniciar_scheduler
-            iniciar_scheduler(app)
-            logger.info("✅ Scheduler de tareas automáticas iniciado")
-        except ImportError:
-            logger.warning("⚠️ APScheduler no instalado. Las tareas automáticas no funcionarán.")
-            logger.info("   Instala con: pip install APScheduler")
-        except Exception as e:
-            logger.error(f"❌ Error iniciando scheduler: {str(e)}")
+
+        # ============ PLANTILLAS DE CORREO ============
+        # Se compilan una vez al arrancar; cada notificación solo paga el render
+        from app.services.plantillas_correo import plantillas_correo
+        plantillas_correo.precompilar()
+
+        # ============ TAREAS PERIÓDICAS ============
+        # Escalamientos y limpieza corren en el proceso sst-worker (worker.py),
+        # no en cada worker web, shell o test
     
     return app
\ No newline at end of file
@@ -22,9 +22,22 @@ from .matriz_riesgos import (
     MatrizRiesgos,
     GestorResponsabilidades,
     GestionReporte,
-    TareaGestion
+    TareaGestion,
+    HistorialGestion,
+    AccionProgramada
 )
 from .control import Control, SeguimientoControl, TipoControl, NivelControl, EstadoControl
+from .worker import BloqueoWorker
+from .notificacion import Notificacion
+from .analisis_ia import AnalisisIACache
+from .reanalisis import ReanalisisIA
+from .telemetria_ia import LlamadaIA
+from .trabajo import TrabajoFondo
+from .ingesta import IngestaReporte
+from .evidencia import ArchivoEvidencia
+from .busqueda import DocumentoBusqueda
+from .extraccion import TextoExtraido
+from .peligro import PeligroReporte
 
 
 __all__ = [
@@ -35,6 +48,8 @@ __all__ = [
     'TipoReporte', 'TipoEvidencia', 'MetodologiaInvestigacion',
     'NivelSeveridad', 'NivelProbabilidad', 'NivelRiesgo',
     'ReglasEscalonamiento', 'PasoEscalonamiento', 'MatrizRiesgos',
-    'GestorResponsabilidades', 'GestionReporte', 'TareaGestion',
-    'Control', 'SeguimientoControl', 'TipoControl', 'NivelControl', 'EstadoControl'  # Control solo aquí
+    'GestorResponsabilidades', 'GestionReporte', 'TareaGestion', 'HistorialGestion', 'AccionProgramada',
+    'Control', 'SeguimientoControl', 'TipoControl', 'NivelControl', 'EstadoControl',  # Control solo aquí
+    'BloqueoWorker', 'Notificacion', 'AnalisisIACache', 'ReanalisisIA', 'LlamadaIA', 'TrabajoFondo',
+    'IngestaReporte', 'ArchivoEvidencia', 'DocumentoBusqueda', 'TextoExtraido', 'PeligroReporte'
 ]
\ No newline at end of file
@@ -0,0 +1,23 @@
+from app import db
+from datetime import datetime
+
+class AnalisisIACache(db.Model):
+    """
+    Caché persistente de análisis de imágenes con IA
+
+    Direccionada por contenido: la misma foto (hash), con el mismo prompt
+    y el mismo modelo, da el mismo análisis sin volver a llamar al modelo
+    (app/services/cache_analisis_ia.py)
+    """
+    __tablename__ = 'analisis_ia_cache'
+    __table_args__ = (
+        db.UniqueConstraint('hash_imagen', 'version_prompt', 'modelo', name='uq_analisis_ia_clave'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    hash_imagen = db.Column(db.String(64), nullable=False)  # md5 del contenido (ImagenProcessor)
+    version_prompt = db.Column(db.String(32), nullable=False)  # Huella del prompt y la configuración IA
+    modelo = db.Column(db.String(100), nullable=False)
+
+    resultado = db.Column(db.JSON, nullable=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,66 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import DDL, event
+
+class DocumentoBusqueda(db.Model):
+    """
+    Texto indexado para la búsqueda de texto completo (una fila por entidad)
+
+    tipo/entidad_id apuntan a un reporte, una consulta jurídica o un
+    documento legal; titulo y texto son los campos que se buscan. Se
+    mantiene en la misma transacción que la entidad
+    (app/services/busqueda_service.py).
+
+    El índice depende del motor y se crea con la tabla:
+    - SQLite: tabla virtual FTS5 busqueda_fts (contenido externo) que los
+      triggers mantienen sincronizada con esta tabla
+    - PostgreSQL: columna tsvector generada (título peso A, texto peso B) con índice GIN
+    """
+    __tablename__ = 'busqueda_documentos'
+    __table_args__ = (
+        db.UniqueConstraint('tipo', 'entidad_id', name='uq_busqueda_documentos_entidad'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    tipo = db.Column(db.String(20), nullable=False)  # reporte, consulta, documento
+    entidad_id = db.Column(db.Integer, nullable=False)
+
+    titulo = db.Column(db.String(300))
+    texto = db.Column(db.Text)
+
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DocumentoBusqueda {self.tipo}:{self.entidad_id}>'
+
+
+# ============== ÍNDICE POR MOTOR ==============
+
+_DDL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_fts USING fts5("
+    "titulo, texto, content='busqueda_documentos', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS busqueda_documentos_ai AFTER INSERT ON busqueda_documentos BEGIN "
+    "INSERT INTO busqueda_fts(rowid, titulo, texto) VALUES (new.id, new.titulo, new.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS busqueda_documentos_ad AFTER DELETE ON busqueda_documentos BEGIN "
+    "INSERT INTO busqueda_fts(busqueda_fts, rowid, titulo, texto) VALUES ('delete', old.id, old.titulo, old.texto); END",
+    "CREATE TRIGGER IF NOT EXISTS busqueda_documentos_au AFTER UPDATE ON busqueda_documentos BEGIN "
+    "INSERT INTO busqueda_fts(busqueda_fts, rowid, titulo, texto) VALUES ('delete', old.id, old.titulo, old.texto); "
+    "INSERT INTO busqueda_fts(rowid, titulo, texto) VALUES (new.id, new.titulo, new.texto); END",
+]
+
+_DDL_POSTGRES = [
+    "ALTER TABLE busqueda_documentos ADD COLUMN IF NOT EXISTS vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('spanish', coalesce(titulo, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(texto, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_busqueda_documentos_vector ON busqueda_documentos USING gin (vector)",
+]
+
+for _sentencia in _DDL_SQLITE:
+    event.listen(DocumentoBusqueda.__table__, 'after_create', DDL(_sentencia).execute_if(dialect='sqlite'))
+for _sentencia in _DDL_POSTGRES:
+    event.listen(DocumentoBusqueda.__table__, 'after_create', DDL(_sentencia).execute_if(dialect='postgresql'))
+
+# Los triggers se van con la tabla; la tabla virtual no
+event.listen(DocumentoBusqueda.__table__, 'after_drop',
+             DDL("DROP TABLE IF EXISTS busqueda_fts").execute_if(dialect='sqlite'))
@@ -4,6 +4,11 @@ import uuid
 
 class CondicionInsegura(db.Model):
     __tablename__ = 'condiciones_inseguras'
+    __table_args__ = (
+        # Paginación keyset del listado: ORDER BY fecha_creacion DESC, id DESC
+        db.Index('ix_condiciones_fecha_id', 'fecha_creacion', 'id'),
+        db.Index('ix_condiciones_reportador', 'empleado_reportador_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     numero_reporte = db.Column(db.String(50), unique=True, nullable=False, index=True)
     titulo = db.Column(db.String(200), nullable=False)
@@ -16,7 +21,7 @@ class CondicionInsegura(db.Model):
     empleado_reportador_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     responsable_sst_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     estado = db.Column(db.String(30), default='Abierto')
-    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     fecha_cierre = db.Column(db.DateTime)
     observaciones_ia = db.Column(db.Text)
     autorizado_por_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class ConsultaJuridica(db.Model):
     __tablename__ = 'consultas_juridicas'
+    __table_args__ = (
+        # Paginación keyset del listado: ORDER BY fecha_creacion DESC, id DESC
+        db.Index('ix_consultas_fecha_id', 'fecha_creacion', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     numero_consulta = db.Column(db.String(50), unique=True, nullable=False, index=True)
     titulo = db.Column(db.String(200), nullable=False)
@@ -15,7 +19,7 @@ class ConsultaJuridica(db.Model):
     
     estado = db.Column(db.String(30), default='Abierta')  # Abierta, En revisión, Resuelta, Cerrada
     prioridad = db.Column(db.String(20), default='Normal')  # Baja, Normal, Alta, Crítica
-    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     fecha_asignacion = db.Column(db.DateTime)
     fecha_resolucion = db.Column(db.DateTime)
     fecha_cierre = db.Column(db.DateTime)
@@ -52,6 +56,13 @@ class DocumentoLegal(db.Model):
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
     creado_por_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
     
+    # Archivo adjunto (PDF, DOCX, XLSX) y su texto; ver app/tasks/extraccion_documentos.py
+    hash_documento = db.Column(db.String(64), index=True)  # SHA-256 del archivo
+    tamano_bytes = db.Column(db.Integer)
+    texto_extraido = db.Column(db.Text)
+    estado_extraccion = db.Column(db.String(20), index=True)  # Pendiente, Extraido, Fallido (None sin archivo)
+    fecha_extraccion = db.Column(db.DateTime)
+    
     creado_por = db.relationship('Usuario')
     
     def __repr__(self):
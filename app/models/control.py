@@ -57,6 +57,10 @@ class Control(db.Model):
     9. CANCELADO → No aplica
     """
     __tablename__ = 'controles'
+    __table_args__ = (
+        # Paginación keyset del listado: ORDER BY creado_en DESC, id DESC
+        db.Index('ix_controles_creado_id', 'creado_en', 'id'),
+    )
     
     # ========== IDENTIFICACIÓN ==========
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,30 @@
+from app import db
+from datetime import datetime
+
+class ArchivoEvidencia(db.Model):
+    """
+    Archivo de evidencia guardado por contenido (sha256)
+
+    La misma foto subida en varios reportes se guarda una sola vez;
+    referencias cuenta cuántos reportes la usan (app/services/almacen_evidencias.py).
+    Con referencias en 0 el archivo se purga tras un periodo de gracia.
+    """
+    __tablename__ = 'archivos_evidencia'
+    __table_args__ = (
+        # La purga solo consulta: referencias <= 0 AND fecha_ultimo_uso < límite
+        db.Index('ix_archivos_evidencia_purga', 'referencias', 'fecha_ultimo_uso'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    hash_sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    ruta = db.Column(db.String(300), nullable=False, unique=True)  # Valor de CondicionInsegura.imagen_url
+    formato = db.Column(db.String(10))  # jpeg, png, webp (por la firma, no la extensión)
+    tamano = db.Column(db.Integer)  # bytes
+
+    referencias = db.Column(db.Integer, default=0, nullable=False)
+
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_ultimo_uso = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivoEvidencia {self.hash_sha256[:12]} refs={self.referencias}>'
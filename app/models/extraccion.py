@@ -0,0 +1,29 @@
+from app import db
+from datetime import datetime
+
+class TextoExtraido(db.Model):
+    """
+    Texto extraído de un archivo legal, por contenido (hash_documento)
+
+    Dos versiones iguales de un documento, o el mismo archivo en varias
+    consultas, se extraen una sola vez. version es la del extractor
+    (app/utils/extraccion_texto.py): al subirla se vuelve a extraer.
+    """
+    __tablename__ = 'textos_extraidos'
+    id = db.Column(db.Integer, primary_key=True)
+
+    hash_documento = db.Column(db.String(64), nullable=False, unique=True)
+    version = db.Column(db.Integer, nullable=False)
+    formato = db.Column(db.String(10))  # pdf, docx, xlsx
+
+    texto = db.Column(db.Text)
+    paginas = db.Column(db.Integer)  # Páginas del PDF u hojas del XLSX
+    caracteres = db.Column(db.Integer)
+    truncado = db.Column(db.Boolean, default=False)
+    error = db.Column(db.Text)  # Con error el documento queda Fallido
+
+    duracion_ms = db.Column(db.Float)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TextoExtraido {self.hash_documento[:12]} {self.formato}>'
@@ -0,0 +1,34 @@
+from app import db
+from datetime import datetime
+
+class IngestaReporte(db.Model):
+    """
+    Cola de ingesta de reportes: una fila por reporte recién creado
+
+    Se escribe en la misma transacción que el reporte; la etapa de ingesta
+    del sst-worker (app/tasks/ingesta_reportes.py) hace en lote la
+    asignación, las tareas y las notificaciones.
+    """
+    __tablename__ = 'ingesta_reportes'
+    __table_args__ = (
+        # La etapa solo consulta: estado='Pendiente' ORDER BY proximo_intento
+        db.Index('ix_ingesta_reportes_estado_intento', 'estado', 'proximo_intento'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    reporte_id = db.Column(db.Integer, db.ForeignKey('condiciones_inseguras.id'), nullable=False, unique=True)
+
+    # Pendiente, Procesando, Asignado, Sin_asignar (sin gestor tras MAX_INTENTOS), Fallida
+    estado = db.Column(db.String(20), default='Pendiente', nullable=False)
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    proximo_intento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    tomada_hasta = db.Column(db.DateTime)  # Vence si el worker que la tomó se cae
+    ultimo_error = db.Column(db.Text)
+
+    gestion_reporte_id = db.Column(db.Integer, db.ForeignKey('gestion_reportes.id'))
+
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_proceso = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<IngestaReporte {self.reporte_id} {self.estado}>'
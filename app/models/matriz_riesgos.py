@@ -167,7 +167,7 @@ class GestionReporte(db.Model):
     reporte_id = db.Column(db.Integer, db.ForeignKey('condiciones_inseguras.id'), nullable=False)
     
     # Gestión actual
-    gestor_actual_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    gestor_actual_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), index=True)
     rol_gestor = db.Column(db.String(50))  # Ej: "Gestor_RRHH"
     
     # Responsabilidad configurada
@@ -188,8 +188,9 @@ class GestionReporte(db.Model):
     fecha_proximo_escalamiento = db.Column(db.DateTime)
     escalado_a_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))  # Gestor escalado
     
-    # Historial
-    historial_cambios = db.Column(db.JSON)  # Array de {fecha, usuario, accion, descripcion}
+    # Historial heredado (JSON). Los eventos nuevos van a historial_gestion;
+    # diferido para no cargar el documento en cada consulta de la gestión
+    historial_cambios = db.deferred(db.Column(db.JSON))  # Array de {fecha, usuario, accion, descripcion}
     
     # Notas
     notas_internas = db.Column(db.Text)
@@ -201,6 +202,8 @@ class GestionReporte(db.Model):
     gestor_actual = db.relationship('Usuario', foreign_keys=[gestor_actual_id])
     gestor_escalado = db.relationship('Usuario', foreign_keys=[escalado_a_id])
     gestor_responsabilidad = db.relationship('GestorResponsabilidades')
+    eventos = db.relationship('HistorialGestion', backref='gestion_reporte', lazy='dynamic',
+                              cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<GestionReporte {self.reporte_id} - {self.estado}>'
@@ -222,17 +225,21 @@ class GestionReporte(db.Model):
             return datetime.utcnow() > self.fecha_vencimiento_resolucion
         return False
     
-    def agregar_cambio(self, usuario_id, accion, descripcion):
-        """Agrega un evento al historial"""
-        if not self.historial_cambios:
-            self.historial_cambios = []
-        
-        self.historial_cambios.append({
-            'fecha': datetime.utcnow().isoformat(),
+    @staticmethod
+    def datos_evento(usuario_id, accion, descripcion):
+        """Columnas de un evento de historial (para inserts en lote)"""
+        return {
+            'fecha': datetime.utcnow(),
             'usuario_id': usuario_id,
             'accion': accion,
             'descripcion': descripcion
-        })
+        }
+    
+    def agregar_cambio(self, usuario_id, accion, descripcion):
+        """Agrega un evento al historial (una fila en historial_gestion)"""
+        evento = HistorialGestion(**GestionReporte.datos_evento(usuario_id, accion, descripcion))
+        self.eventos.append(evento)
+        return evento
 
 class TareaGestion(db.Model):
     """
@@ -264,4 +271,77 @@ class TareaGestion(db.Model):
     asignado_a = db.relationship('Usuario')
     
     def __repr__(self):
-        return f'<TareaGestion {self.titulo}>'
\ No newline at end of file
+        return f'<TareaGestion {self.titulo}>'
+
+class HistorialGestion(db.Model):
+    """
+    Historial de cambios de una gestión (solo inserciones)
+    Una fila por evento; reemplaza a GestionReporte.historial_cambios
+    """
+    __tablename__ = 'historial_gestion'
+    __table_args__ = (
+        # Línea de tiempo paginada: WHERE gestion_reporte_id = ? ORDER BY fecha DESC, id DESC
+        db.Index('ix_historial_gestion_fecha', 'gestion_reporte_id', 'fecha', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    
+    gestion_reporte_id = db.Column(db.Integer, db.ForeignKey('gestion_reportes.id'), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    accion = db.Column(db.String(40), nullable=False)  # ASIGNACION_AUTOMATICA, ESCALONAMIENTO, RESPUESTA...
+    descripcion = db.Column(db.Text)
+    
+    usuario = db.relationship('Usuario')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'usuario_id': self.usuario_id,
+            'accion': self.accion,
+            'descripcion': self.descripcion
+        }
+    
+    def __repr__(self):
+        return f'<HistorialGestion {self.accion} {self.fecha}>'
+
+class AccionProgramada(db.Model):
+    """
+    Línea de tiempo de escalamiento de una gestión
+    Cada paso de PasoEscalonamiento se calcula al asignar el reporte y queda
+    como una fila con su hora de ejecución (next_action_at)
+    """
+    __tablename__ = 'acciones_programadas'
+    __table_args__ = (
+        # El temporizador solo consulta: estado='Pendiente' ORDER BY next_action_at
+        db.Index('ix_acciones_estado_fecha', 'estado', 'next_action_at'),
+        # Próxima acción pendiente de cada gestión (fecha_proximo_escalamiento)
+        db.Index('ix_acciones_gestion_estado', 'gestion_reporte_id', 'estado', 'next_action_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    
+    gestion_reporte_id = db.Column(db.Integer, db.ForeignKey('gestion_reportes.id'), nullable=False)
+    paso_escalonamiento_id = db.Column(db.Integer, db.ForeignKey('pasos_escalonamiento.id'))
+    
+    # ESCALONAMIENTO, AVISO_CRITICO, VENCIMIENTO_RESOLUCION
+    tipo = db.Column(db.String(30), nullable=False)
+    numero_paso = db.Column(db.Integer)
+    rol_destino = db.Column(db.String(50))
+    
+    # Acciones del paso
+    enviar_notificacion = db.Column(db.Boolean, default=True)
+    crear_tarea = db.Column(db.Boolean, default=True)
+    
+    # Cuándo debe ejecutarse
+    next_action_at = db.Column(db.DateTime, nullable=False)
+    
+    estado = db.Column(db.String(20), default='Pendiente')  # Pendiente, Ejecutada, Cancelada
+    fecha_ejecucion = db.Column(db.DateTime)
+    resultado = db.Column(db.String(200))
+    
+    gestion_reporte = db.relationship('GestionReporte', backref=db.backref('acciones_programadas', lazy='dynamic'))
+    paso = db.relationship('PasoEscalonamiento')
+    
+    def __repr__(self):
+        return f'<AccionProgramada {self.tipo} {self.next_action_at}>'
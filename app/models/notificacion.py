@@ -0,0 +1,42 @@
+from app import db
+from datetime import datetime
+
+class Notificacion(db.Model):
+    """
+    Outbox de correos: cada notificación se escribe en la misma transacción
+    que el cambio de negocio y el sst-worker la envía después
+    (app/tasks/despachador_notificaciones.py)
+    """
+    __tablename__ = 'notificaciones_outbox'
+    __table_args__ = (
+        # El despachador solo consulta: estado='Pendiente' ORDER BY proximo_intento
+        db.Index('ix_notificaciones_estado_intento', 'estado', 'proximo_intento'),
+        # Deduplicación por (tipo, entidad, destinatario) dentro de la ventana
+        db.Index('ix_notificaciones_clave_fecha', 'clave_dedup', 'fecha_creacion'),
+        # Resumen: pendientes agrupables del mismo destinatario
+        db.Index('ix_notificaciones_destinatario_estado', 'destinatario', 'estado'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    tipo = db.Column(db.String(40))  # ASIGNACION, ESCALONAMIENTO, VENCIMIENTO_CRITICO, ...
+    destinatario = db.Column(db.String(150), nullable=False)
+    asunto = db.Column(db.String(300), nullable=False)
+    contenido_html = db.Column(db.Text, nullable=False)
+
+    # tipo:entidad:destinatario; la misma clave no se repite dentro de la ventana
+    clave_dedup = db.Column(db.String(200))
+    # Se puede fusionar con otras del mismo destinatario en un correo resumen
+    agrupable = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Pendiente, Enviando, Enviada, Fallida (dead letter: no se reintenta sola)
+    estado = db.Column(db.String(20), default='Pendiente', nullable=False)
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    proximo_intento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    tomada_hasta = db.Column(db.DateTime)  # Vence si el worker que la tomó se cae
+    ultimo_error = db.Column(db.Text)
+
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_envio = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Notificacion {self.tipo} {self.destinatario} {self.estado}>'
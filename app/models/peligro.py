@@ -0,0 +1,62 @@
+from app import db
+from datetime import datetime
+
+class PeligroReporte(db.Model):
+    """
+    Un peligro identificado por el análisis IA de un reporte
+
+    Normaliza CondicionInsegura.riesgos_identificados (JSON) para agrupar en
+    SQL por peligro × dependencia × mes sin cargar los reportes. codigo es
+    el de la taxonomía GTC 45 de PeligrosService; dependencia_id,
+    departamento y mes se copian del reporte. Se mantiene en la misma
+    transacción que el reporte (app/services/peligros_service.py).
+    """
+    __tablename__ = 'peligros_reporte'
+    __table_args__ = (
+        # ¿Qué dependencias tienen más peligros eléctricos este trimestre?
+        # WHERE codigo = ? AND mes BETWEEN ? AND ? GROUP BY dependencia_id (solo índice)
+        db.Index('ix_peligros_codigo_mes_dependencia', 'codigo', 'mes', 'dependencia_id'),
+        db.Index('ix_peligros_dependencia_mes_codigo', 'dependencia_id', 'mes', 'codigo'),
+        db.Index('ix_peligros_departamento_mes_codigo', 'departamento', 'mes', 'codigo'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    reporte_id = db.Column(db.Integer, db.ForeignKey('condiciones_inseguras.id'), nullable=False, index=True)
+    orden = db.Column(db.Integer, default=0)  # Posición en riesgos_identificados
+    descripcion = db.Column(db.String(300), nullable=False)
+
+    # Taxonomía
+    codigo = db.Column(db.String(20), nullable=False)  # CS-ELE, FIS, BIOM...
+    clase = db.Column(db.String(40), nullable=False)  # Clasificación GTC 45: Físico, Condiciones de seguridad...
+
+    # Valoración (la del peligro si el análisis la trae, si no la del reporte)
+    severidad = db.Column(db.Integer)
+    probabilidad = db.Column(db.Integer)
+    nivel_riesgo = db.Column(db.Integer)
+
+    # Dimensiones del reporte
+    dependencia_id = db.Column(db.Integer, db.ForeignKey('dependencias.id'))
+    departamento = db.Column(db.String(100))
+    fecha_reporte = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    mes = db.Column(db.String(7), nullable=False)  # AAAA-MM
+
+    reporte = db.relationship('CondicionInsegura')
+    dependencia = db.relationship('Dependencia')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'reporte_id': self.reporte_id,
+            'descripcion': self.descripcion,
+            'codigo': self.codigo,
+            'clase': self.clase,
+            'severidad': self.severidad,
+            'probabilidad': self.probabilidad,
+            'nivel_riesgo': self.nivel_riesgo,
+            'dependencia_id': self.dependencia_id,
+            'departamento': self.departamento,
+            'mes': self.mes
+        }
+
+    def __repr__(self):
+        return f'<PeligroReporte {self.codigo} reporte={self.reporte_id}>'
@@ -0,0 +1,44 @@
+from app import db
+from datetime import datetime
+
+class ReanalisisIA(db.Model):
+    """
+    Reanálisis masivo con IA de los reportes con imagen
+
+    Recorre condiciones_inseguras por id (keyset); ultimo_id es el punto de
+    control y se guarda en la misma transacción que los resultados de cada
+    lote, así que un worker que se cae retoma donde quedó el último commit
+    (app/tasks/reanalisis_ia.py)
+    """
+    __tablename__ = 'reanalisis_ia'
+    __table_args__ = (
+        db.Index('ix_reanalisis_estado_tomada', 'estado', 'tomada_hasta'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Pendiente, Ejecutando, Pausado, Completado, Cancelado, Fallido
+    estado = db.Column(db.String(20), default='Pendiente', nullable=False)
+    forzar = db.Column(db.Boolean, default=False, nullable=False)  # Ignora la caché de análisis
+    concurrencia = db.Column(db.Integer, default=2, nullable=False)
+    tamano_lote = db.Column(db.Integer, default=50, nullable=False)
+
+    # Progreso y punto de control
+    ultimo_id = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Integer, default=0, nullable=False)
+    procesados = db.Column(db.Integer, default=0, nullable=False)
+    exitosos = db.Column(db.Integer, default=0, nullable=False)
+    fallidos = db.Column(db.Integer, default=0, nullable=False)
+    segundos_ejecucion = db.Column(db.Float, default=0, nullable=False)  # Solo tiempo trabajando (para la ETA)
+    ultimo_error = db.Column(db.Text)
+
+    # Reserva del worker que lo ejecuta; vence si ese worker se cae
+    tomado_por = db.Column(db.String(120))
+    tomada_hasta = db.Column(db.DateTime)
+
+    creado_por_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ReanalisisIA {self.id} {self.estado} {self.procesados}/{self.total}>'
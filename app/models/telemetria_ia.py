@@ -0,0 +1,60 @@
+from app import db
+from datetime import datetime
+
+class LlamadaIA(db.Model):
+    """
+    Una llamada al modelo de IA a través de la pasarela
+
+    La escribe TelemetriaIA (app/services/telemetria_ia.py) al terminar cada
+    llamada, exitosa, fallida o rechazada. Los tokens son una estimación por
+    tamaño: google-generativeai 0.3 no informa el uso de la llamada.
+    """
+    __tablename__ = 'llamadas_ia'
+    __table_args__ = (
+        db.Index('ix_llamadas_ia_operacion_fecha', 'operacion', 'fecha'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # Quién llamó
+    operacion = db.Column(db.String(30), nullable=False)  # chat, chat_stream, analisis_imagen
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    reporte_id = db.Column(db.Integer, db.ForeignKey('condiciones_inseguras.id'))
+    departamento = db.Column(db.String(100), index=True)
+
+    # Resultado
+    modelo = db.Column(db.String(100), nullable=False)
+    estado = db.Column(db.String(30), nullable=False)  # ok, timeout, modelo, saturada, circuito_abierto, configuracion, cancelada
+    error_clase = db.Column(db.String(100))  # Excepción original (p. ej. DeadlineExceeded)
+    duracion_ms = db.Column(db.Float, nullable=False)
+    primer_fragmento_ms = db.Column(db.Float)  # Solo streaming
+
+    # Tamaño y costo
+    bytes_enviados = db.Column(db.Integer, default=0)
+    bytes_recibidos = db.Column(db.Integer, default=0)
+    tokens_entrada = db.Column(db.Integer, default=0)
+    tokens_salida = db.Column(db.Integer, default=0)
+    costo_usd = db.Column(db.Float, default=0.0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'operacion': self.operacion,
+            'usuario_id': self.usuario_id,
+            'reporte_id': self.reporte_id,
+            'departamento': self.departamento,
+            'modelo': self.modelo,
+            'estado': self.estado,
+            'error_clase': self.error_clase,
+            'duracion_ms': self.duracion_ms,
+            'primer_fragmento_ms': self.primer_fragmento_ms,
+            'bytes_enviados': self.bytes_enviados,
+            'bytes_recibidos': self.bytes_recibidos,
+            'tokens_entrada': self.tokens_entrada,
+            'tokens_salida': self.tokens_salida,
+            'costo_usd': self.costo_usd
+        }
+
+    def __repr__(self):
+        return f'<LlamadaIA {self.operacion} {self.estado} {self.duracion_ms:.0f}ms>'
@@ -0,0 +1,45 @@
+from app import db
+from datetime import datetime
+
+class TrabajoFondo(db.Model):
+    """
+    Trabajo en segundo plano (PDF, análisis IA, asignación de reportes, ...)
+
+    La petición web lo encola y responde de inmediato con su id; un hilo del
+    sst-worker lo reclama con un UPDATE condicional, ejecuta el manejador de
+    su tipo y guarda el resultado (JSON o archivo descargable) en la misma
+    fila (app/tasks/trabajos.py). El estado se consulta en /jobs/<id>.
+    """
+    __tablename__ = 'trabajos_fondo'
+    __table_args__ = (
+        # El ejecutor solo consulta: estado='Pendiente' ORDER BY prioridad, proximo_intento
+        db.Index('ix_trabajos_fondo_cola', 'estado', 'prioridad', 'proximo_intento'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    tipo = db.Column(db.String(50), nullable=False)  # Nombre del manejador registrado
+    parametros = db.Column(db.JSON)
+    prioridad = db.Column(db.Integer, default=5, nullable=False)  # 1 = más urgente
+
+    # Pendiente, Ejecutando, Completado, Fallido, Cancelado
+    estado = db.Column(db.String(20), default='Pendiente', nullable=False)
+    intentos = db.Column(db.Integer, default=0, nullable=False)
+    max_intentos = db.Column(db.Integer, default=3, nullable=False)
+    proximo_intento = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    tomado_por = db.Column(db.String(100))
+    tomada_hasta = db.Column(db.DateTime)  # Vence si el worker que lo tomó se cae
+    ultimo_error = db.Column(db.Text)
+
+    # Resultado: JSON y, si el manejador produjo un archivo, su ruta en disco
+    resultado = db.Column(db.JSON)
+    archivo_resultado = db.Column(db.String(500))
+    nombre_archivo = db.Column(db.String(255))
+    tipo_contenido = db.Column(db.String(100))
+
+    creado_por_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<TrabajoFondo {self.id} {self.tipo} {self.estado}>'
@@ -0,0 +1,16 @@
+from app import db
+from datetime import datetime
+
+class BloqueoWorker(db.Model):
+    """
+    Fila de bloqueo del worker líder (bases sin advisory locks, ej. SQLite)
+    Solo el propietario con expira_en vigente ejecuta las tareas periódicas
+    """
+    __tablename__ = 'bloqueos_worker'
+    nombre = db.Column(db.String(50), primary_key=True)  # Ej: "sst-worker"
+    propietario = db.Column(db.String(120), nullable=False)  # host:pid:token
+    expira_en = db.Column(db.DateTime, nullable=False)
+    adquirido_en = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<BloqueoWorker {self.nombre} {self.propietario}>'
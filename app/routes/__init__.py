@@ -7,7 +7,9 @@ reportes_bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 ia_bp = Blueprint('ia', __name__, url_prefix='/ia')
 juridico_bp = Blueprint('juridico', __name__, url_prefix='/juridico')
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+trabajos_bp = Blueprint('trabajos', __name__, url_prefix='/jobs')
+busqueda_bp = Blueprint('busqueda', __name__, url_prefix='/buscar')
 
-from app.routes import auth, dashboard, reportes, ia, juridico, admin
+from app.routes import auth, dashboard, reportes, ia, juridico, admin, trabajos, busqueda
 
-__all__ = ['auth_bp', 'dashboard_bp', 'reportes_bp', 'ia_bp', 'juridico_bp', 'admin_bp', 'controles_bp']
\ No newline at end of file
+__all__ = ['auth_bp', 'dashboard_bp', 'reportes_bp', 'ia_bp', 'juridico_bp', 'admin_bp', 'controles_bp', 'trabajos_bp', 'busqueda_bp']
\ No newline at end of file
@@ -7,6 +7,7 @@ from app.models import (
     NivelRiesgo, MatrizRiesgos, GestorResponsabilidades, 
     ReglasEscalonamiento, PasoEscalonamiento
 )
+from app.services.responsabilidades_service import ResponsabilidadesService
 from functools import wraps
 from app.routes import admin_bp
 
@@ -281,6 +282,7 @@ def crear_nivel_riesgo():
         )
         db.session.add(nivel)
         db.session.commit()
+        ResponsabilidadesService.reconstruir()
         flash('Nivel de riesgo creado', 'success')
         return redirect(url_for('admin.listar_niveles_riesgo'))
     
@@ -328,6 +330,7 @@ def editar_celda_matriz():
     celda.regla_escalonamiento_id = regla_id if regla_id else None
     
     db.session.commit()
+    ResponsabilidadesService.reconstruir()
     
     return jsonify({'success': True, 'mensaje': 'Celda actualizada'})
 
@@ -359,6 +362,7 @@ def crear_gestor_responsable():
         
         db.session.add(gestor)
         db.session.commit()
+        ResponsabilidadesService.reconstruir()
         flash('Gestor configurado', 'success')
         return redirect(url_for('admin.listar_gestores_responsables'))
     
@@ -382,6 +386,7 @@ def editar_gestor_responsable(id):
         gestor.rol_principal = request.form.get('rol_principal')
         gestor.rol_backup_1 = request.form.get('rol_backup_1') or None
         gestor.rol_backup_2 = request.form.get('rol_backup_2') or None
+        gestor.departamento = request.form.get('departamento') or None
         gestor.tiempo_respuesta_minutos = int(request.form.get('tiempo_respuesta_minutos', 30))
         gestor.tiempo_resolucion_minutos = int(request.form.get('tiempo_resolucion_minutos', 1440))
         
@@ -391,6 +396,7 @@ def editar_gestor_responsable(id):
         gestor.activo = request.form.get('activo') == 'on'
         
         db.session.commit()
+        ResponsabilidadesService.reconstruir()
         flash('Gestor actualizado', 'success')
         return redirect(url_for('admin.listar_gestores_responsables'))
     
@@ -0,0 +1,41 @@
+# app/routes/busqueda.py
+"""
+Búsqueda de texto completo (/buscar) en reportes, consultas y documentos legales
+"""
+from flask import render_template, request, jsonify
+from flask_login import login_required, current_user
+from app.routes import busqueda_bp
+from app.services.busqueda_service import BusquedaService
+
+def _tipos_desde_args(args):
+    """?tipo=reporte&tipo=consulta; sin tipo, todos"""
+    return [tipo for tipo in args.getlist('tipo') if tipo in BusquedaService.FUENTES] or None
+
+@busqueda_bp.route('/', methods=['GET'])
+@login_required
+def buscar():
+    """Página de resultados (?q=&tipo=)"""
+    texto = request.args.get('q', '').strip()
+    tipos = _tipos_desde_args(request.args)
+    resultados = BusquedaService.buscar(texto, current_user, tipos=tipos) if texto else []
+    return render_template('busqueda/resultados.html', texto=texto, tipos=tipos or [],
+                           resultados=resultados, fuentes=list(BusquedaService.FUENTES))
+
+@busqueda_bp.route('/api', methods=['GET'])
+@login_required
+def api_buscar():
+    """API: resultados por relevancia con resaltado HTML (?q=&tipo=&limite=&desde=)"""
+    texto = request.args.get('q', '').strip()
+    if not texto:
+        return jsonify({'error': 'Falta el parámetro q'}), 400
+    try:
+        resultados = BusquedaService.buscar(
+            texto, current_user, tipos=_tipos_desde_args(request.args),
+            limite=request.args.get('limite'), desplazamiento=request.args.get('desde', 0)
+        )
+    except ValueError:
+        return jsonify({'error': 'limite y desde deben ser números'}), 400
+    return jsonify({
+        'q': texto,
+        'resultados': [{**r, 'titulo': str(r['titulo']), 'fragmento': str(r['fragmento'])} for r in resultados]
+    }), 200
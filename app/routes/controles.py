@@ -13,6 +13,7 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import Control, SeguimientoControl, RiesgoMatriz, Usuario
 from app.models.control import TipoControl, NivelControl, EstadoControl
+from app.services.listado_service import ListadoService
 from datetime import datetime
 from functools import wraps
 import logging
@@ -43,34 +44,63 @@ def require_role(*roles):
 
 # ============== LISTAR CONTROLES ==============
 
+def _query_controles_visibles(filtro_estado='', filtro_riesgo=''):
+    """Controles activos visibles para el usuario actual, con filtros"""
+    query = ListadoService.visibilidad_controles(Control.query.filter_by(activo=True), current_user)
+    
+    if filtro_estado:
+        query = query.filter_by(estado=filtro_estado)
+    if filtro_riesgo:
+        query = query.filter_by(riesgo_id=filtro_riesgo)
+    
+    return query
+
+
+def _estadisticas_controles(query):
+    """Totales por estado y efectividad promedio en una sola consulta agrupada"""
+    filas = query.order_by(None).with_entities(
+        Control.estado,
+        db.func.count(Control.id),
+        db.func.avg(Control.efectividad_porcentaje)
+    ).group_by(Control.estado).all()
+    
+    total = sum(cantidad for _, cantidad, _ in filas)
+    suma_efectividad = sum((promedio or 0) * cantidad for _, cantidad, promedio in filas)
+    por_estado = {estado: cantidad for estado, cantidad, _ in filas}
+    
+    return {
+        'total': total,
+        'efectivos': por_estado.get(EstadoControl.EFECTIVO.value, 0),
+        'en_proceso': por_estado.get(EstadoControl.EN_PROCESO.value, 0),
+        'efectividad_promedio': int(suma_efectividad / total) if total else 0
+    }
+
+
 @controles_bp.route('/', methods=['GET'])
 @login_required
 def listar_controles():
-    """Lista controles según rol del usuario"""
+    """Lista controles según rol del usuario (paginado por cursor)"""
     
     user_role = current_user.rol if hasattr(current_user, 'rol') and current_user.rol else None
     filtro_estado = request.args.get('estado', '')
     filtro_riesgo = request.args.get('riesgo_id', '')
     
-    query = Control.query.filter_by(activo=True)
+    query = _query_controles_visibles(filtro_estado, filtro_riesgo)
+    limite = ListadoService.limite_desde_args(request.args)
     
-    # Filtrar según rol
-    if user_role not in ['Admin', 'Responsable SST', 'Abogado']:
-        # Responsable de Control solo ve los asignados a él
-        query = query.filter_by(responsable_id=current_user.id)
-    
-    # Aplicar filtros adicionales
-    if filtro_estado:
-        query = query.filter_by(estado=filtro_estado)
-    if filtro_riesgo:
-        query = query.filter_by(riesgo_id=filtro_riesgo)
+    try:
+        pagina = ListadoService.paginar(query, Control.creado_en, Control.id,
+                                        cursor=request.args.get('cursor'), limite=limite, contar=False)
+    except ValueError:
+        pagina = ListadoService.paginar(query, Control.creado_en, Control.id, limite=limite, contar=False)
     
-    controles = query.all()
     estados = [e.value for e in EstadoControl]
     riesgos = RiesgoMatriz.query.all()
     
     return render_template('controles/listar.html', 
-                         controles=controles, 
+                         controles=pagina.items, 
+                         pagina=pagina,
+                         stats=_estadisticas_controles(query),
                          estados=estados,
                          riesgos=riesgos,
                          filtro_estado=filtro_estado,
@@ -418,6 +448,31 @@ def eliminar_control(id):
 
 # ============== APIS ==============
 
+@controles_bp.route('/api/listado', methods=['GET'])
+@login_required
+def api_listado():
+    """API: listado paginado por cursor (?cursor=&limite=&estado=&riesgo_id=)"""
+    
+    query = _query_controles_visibles(request.args.get('estado', ''), request.args.get('riesgo_id', ''))
+    
+    try:
+        pagina = ListadoService.paginar(query, Control.creado_en, Control.id,
+                                        cursor=request.args.get('cursor'),
+                                        limite=ListadoService.limite_desde_args(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(pagina.to_dict(lambda c: {
+        'id': c.id,
+        'codigo': c.codigo,
+        'nombre': c.nombre,
+        'estado': c.estado,
+        'responsable_id': c.responsable_id,
+        'efectividad': c.efectividad_porcentaje or 0,
+        'creado_en': c.creado_en.isoformat() if c.creado_en else None
+    }))
+
+
 @controles_bp.route('/api/riesgo/<int:riesgo_id>', methods=['GET'])
 @login_required
 def api_controles_riesgo(riesgo_id):
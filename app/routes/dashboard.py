@@ -1,8 +1,13 @@
-from flask import render_template
+from flask import render_template, request, jsonify
 from flask_login import login_required, current_user
 from app.models import CondicionInsegura, Evento, ConsultaJuridica
+from app.services.peligros_service import PeligrosService
+from app.tasks.trabajos import EjecutorTrabajos
 from app.routes import dashboard_bp
 
+# Quienes ven la analítica de peligros de toda la empresa
+ROLES_ANALITICA = ('Admin', 'Responsable_SST')
+
 @dashboard_bp.route('/')
 @login_required
 def index():
@@ -24,3 +29,58 @@ def index():
     }
     
     return render_template('dashboard/index.html', **contexto)
+
+# ============ ANALÍTICA DE PELIGROS ============
+
+@dashboard_bp.route('/api/peligros', methods=['GET'])
+@login_required
+def api_peligros():
+    """
+    Peligros de los análisis IA agrupados (?agrupar=peligro,dependencia,mes por defecto;
+    también clase y departamento) entre ?desde= y ?hasta= (AAAA-MM), con filtros
+    ?codigo=CS-ELE,CS-LOC, ?dependencia_id= y ?departamento=
+    """
+    if current_user.rol not in ROLES_ANALITICA:
+        return jsonify({"error": "No autorizado"}), 403
+    
+    agrupar = [a for a in request.args.get('agrupar', 'peligro,dependencia,mes').split(',') if a]
+    codigos = [c for c in request.args.get('codigo', '').upper().split(',') if c]
+    try:
+        grupos = PeligrosService.resumen(
+            agrupar=agrupar,
+            desde=request.args.get('desde'),
+            hasta=request.args.get('hasta'),
+            codigos=codigos,
+            dependencia_id=request.args.get('dependencia_id', type=int),
+            departamento=request.args.get('departamento'),
+            limite=request.args.get('limite', type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "agrupar": agrupar,
+        "desde": request.args.get('desde'),
+        "hasta": request.args.get('hasta'),
+        "codigos": codigos,
+        "grupos": grupos
+    }), 200
+
+@dashboard_bp.route('/api/peligros/taxonomia', methods=['GET'])
+@login_required
+def api_taxonomia_peligros():
+    """Códigos de peligro (clasificación GTC 45) usados en /api/peligros"""
+    return jsonify(PeligrosService.taxonomia()), 200
+
+@dashboard_bp.route('/api/peligros/reconstruir', methods=['POST'])
+@login_required
+def reconstruir_peligros():
+    """Encola la reconstrucción de peligros_reporte desde riesgos_identificados (Admin)"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    trabajo = EjecutorTrabajos.encolar('reconstruir_peligros', {
+        'tamano_lote': data.get('tamano_lote', PeligrosService.TAMANO_LOTE)
+    }, creado_por_id=current_user.id)
+    return jsonify(EjecutorTrabajos.estado(trabajo)), 202
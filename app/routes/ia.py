@@ -1,27 +1,93 @@
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from app import db
-from app.models import ConfiguracionIA
+from app.models import ConfiguracionIA, AnalisisIACache, ReanalisisIA, LlamadaIA
 from app.services.gemini_service import GeminiService
+from app.services.cache_analisis_ia import cache_analisis_ia
+from app.services.cache_chat_ia import cache_chat_ia
+from app.services.pasarela_ia import pasarela_ia, ErrorIA
+from app.services.telemetria_ia import telemetria_ia, TelemetriaIA
+from app.tasks.reanalisis_ia import EjecutorReanalisis
 from app.routes import ia_bp
+from datetime import datetime, timedelta
+import hmac
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
 
 @ia_bp.route('/chat', methods=['POST'])
 @login_required
 def chat():
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     pregunta = data.get('pregunta', '')
     
     config_ia = ConfiguracionIA.query.filter_by(activo=True).first()
     if not config_ia:
         return jsonify({"error": "IA no configurada"}), 400
     
+    if _quiere_stream(data):
+        return _chat_stream(pregunta, config_ia, {'usuario_id': current_user.id})
+    
     try:
         gemini = GeminiService()
-        respuesta = gemini.chat_experto_sst(pregunta)
+        respuesta = gemini.chat_experto_sst(pregunta, config_ia, contexto={'usuario_id': current_user.id})
         return jsonify({"respuesta": respuesta}), 200
+    except ErrorIA as e:
+        # Modelo lento, saturado o con el circuito abierto: la petición no se queda colgada
+        return jsonify({"error": str(e), "codigo": e.codigo}), 504 if e.codigo == 'timeout' else 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _quiere_stream(data):
+    """Streaming con Accept: text/event-stream, ?stream=1 o {"stream": true}; si no, JSON"""
+    return ('text/event-stream' in request.headers.get('Accept', '')
+            or request.args.get('stream') == '1' or data.get('stream') is True)
+
+def _evento(nombre, datos):
+    return f"event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+def _chat_stream(pregunta, config_ia, contexto):
+    """
+    Server-Sent Events: un evento 'fragmento' por cada trozo de la respuesta,
+    'fin' con los tiempos (primer fragmento y total) o 'error'
+    
+    Si el cliente se desconecta, el servidor cierra el generador y la
+    pasarela deja de leer del modelo.
+    """
+    inicio = time.perf_counter()
+    # La conexión a la base no se retiene mientras dura la respuesta
+    db.session.close()
+    
+    def eventos():
+        primer_fragmento = None
+        try:
+            for fragmento in GeminiService().chat_experto_sst_stream(pregunta, config_ia, contexto=contexto):
+                if primer_fragmento is None:
+                    primer_fragmento = time.perf_counter() - inicio
+                yield _evento('fragmento', {"texto": fragmento})
+        except ErrorIA as e:
+            yield _evento('error', {"error": str(e), "codigo": e.codigo})
+            return
+        except Exception as e:
+            logger.error(f"❌ Error en chat IA (streaming): {str(e)}")
+            yield _evento('error', {"error": str(e), "codigo": 'interno'})
+            return
+        
+        total = time.perf_counter() - inicio
+        logger.info(f"💬 Chat IA en streaming: primer fragmento {primer_fragmento or total:.2f}s, total {total:.2f}s")
+        yield _evento('fin', {
+            "primer_fragmento_ms": round(1000 * (primer_fragmento or total)),
+            "duracion_ms": round(1000 * total)
+        })
+    
+    return Response(stream_with_context(eventos()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx: no acumular la respuesta
+    })
+
 @ia_bp.route('/config', methods=['GET', 'POST'])
 @login_required
 def config():
@@ -30,6 +96,11 @@ def config():
     
     if request.method == 'POST':
         config = ConfiguracionIA.query.first() or ConfiguracionIA()
+        # Nueva versión si cambia el comportamiento: los análisis en caché
+        # de la versión anterior dejan de usarse
+        if config.id and (config.nombre_modelo, config.prompt_sistema) != (
+                request.form.get('nombre_modelo'), request.form.get('prompt_sistema')):
+            config.version = (config.version or 1) + 1
         config.nombre_modelo = request.form.get('nombre_modelo')
         config.prompt_sistema = request.form.get('prompt_sistema')
         config.umbral_confianza = float(request.form.get('umbral_confianza', 0.75))
@@ -41,3 +112,137 @@ def config():
     
     config = ConfiguracionIA.query.first()
     return render_template('configuracion/ia.html', config=config)
+
+@ia_bp.route('/cache', methods=['GET'])
+@login_required
+def cache():
+    """Métricas de la caché de análisis de imágenes"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    metricas = cache_analisis_ia.metricas()
+    metricas['entradas_bd'] = AnalisisIACache.query.count()
+    return jsonify(metricas), 200
+
+@ia_bp.route('/chat/cache', methods=['GET'])
+@login_required
+def cache_chat():
+    """Métricas de la caché de respuestas del chat"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    return jsonify(cache_chat_ia.metricas()), 200
+
+@ia_bp.route('/chat/cache/invalidar', methods=['POST'])
+@login_required
+def invalidar_cache_chat():
+    """Descarta las respuestas guardadas (p. ej. tras actualizar la normativa)"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    return jsonify({"success": True, "descartadas": cache_chat_ia.invalidar()}), 200
+
+@ia_bp.route('/estado', methods=['GET'])
+@login_required
+def estado():
+    """Estado de la pasarela de IA: circuito, llamadas en curso y contadores"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    return jsonify(pasarela_ia.estado()), 200
+
+@ia_bp.route('/telemetria', methods=['GET'])
+@login_required
+def telemetria():
+    """
+    Uso del modelo agrupado (?agrupar=operacion|modelo|estado|departamento|usuario|dia)
+    entre ?desde= y ?hasta= (AAAA-MM-DD, por defecto los últimos 7 días)
+    """
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    agrupar = request.args.get('agrupar', 'operacion')
+    try:
+        hasta = datetime.strptime(request.args['hasta'], '%Y-%m-%d') + timedelta(days=1) \
+            if request.args.get('hasta') else datetime.utcnow()
+        desde = datetime.strptime(request.args['desde'], '%Y-%m-%d') \
+            if request.args.get('desde') else hasta - timedelta(days=7)
+        grupos = TelemetriaIA.resumen(desde, hasta, agrupar)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "agrupar": agrupar,
+        "grupos": grupos,
+        "latencia_proceso": telemetria_ia.histograma(),
+        "errores_recientes": [
+            llamada.to_dict() for llamada in LlamadaIA.query.filter(LlamadaIA.estado != 'ok')
+            .order_by(LlamadaIA.fecha.desc()).limit(20)
+        ]
+    }), 200
+
+@ia_bp.route('/metricas', methods=['GET'])
+def metricas():
+    """
+    Métricas de IA del proceso en formato Prometheus
+    
+    Para un Admin con sesión o con Authorization: Bearer <SST_METRICAS_TOKEN>
+    """
+    token = os.getenv('SST_METRICAS_TOKEN')
+    autorizado = bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    )
+    if not autorizado and not (current_user.is_authenticated and current_user.rol == 'Admin'):
+        return jsonify({"error": "No autorizado"}), 403
+    
+    return Response(telemetria_ia.exportar_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@ia_bp.route('/reanalisis', methods=['POST'])
+@login_required
+def crear_reanalisis():
+    """Encola un reanálisis de todos los reportes con imagen (lo ejecuta el sst-worker)"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    data = request.get_json(silent=True) or {}
+    activo = ReanalisisIA.query.filter(ReanalisisIA.estado.in_(['Pendiente', 'Ejecutando', 'Pausado'])).first()
+    if activo:
+        return jsonify({"error": "Ya hay un reanálisis en curso", "trabajo": EjecutorReanalisis.progreso(activo)}), 409
+    
+    try:
+        trabajo = EjecutorReanalisis.crear(
+            concurrencia=data.get('concurrencia', 2),
+            tamano_lote=data.get('tamano_lote', 50),
+            forzar=data.get('forzar', False),
+            creado_por_id=current_user.id
+        )
+    except (TypeError, ValueError):
+        return jsonify({"error": "concurrencia y tamano_lote deben ser números"}), 400
+    return jsonify(EjecutorReanalisis.progreso(trabajo)), 201
+
+@ia_bp.route('/reanalisis/<int:trabajo_id>', methods=['GET'])
+@login_required
+def progreso_reanalisis(trabajo_id):
+    """Avance y tiempo estimado restante de un reanálisis"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    
+    trabajo = ReanalisisIA.query.get_or_404(trabajo_id)
+    return jsonify(EjecutorReanalisis.progreso(trabajo)), 200
+
+@ia_bp.route('/reanalisis/<int:trabajo_id>/<accion>', methods=['POST'])
+@login_required
+def cambiar_reanalisis(trabajo_id, accion):
+    """pausar, reanudar o cancelar un reanálisis"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    if accion not in EjecutorReanalisis.ACCIONES:
+        return jsonify({"error": "Acción no válida"}), 400
+    
+    trabajo = ReanalisisIA.query.get_or_404(trabajo_id)
+    if not EjecutorReanalisis.cambiar_estado(trabajo.id, accion):
+        return jsonify({"error": f"No se puede {accion} un reanálisis en estado {trabajo.estado}"}), 409
+    db.session.refresh(trabajo)
+    return jsonify(EjecutorReanalisis.progreso(trabajo)), 200
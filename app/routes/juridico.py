@@ -6,8 +6,12 @@ Gestión de consultas jurídicas y normativa SST Colombia
 from flask import render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models import ConsultaJuridica, DocumentoLegal, Usuario, CondicionInsegura
+from app.models import ConsultaJuridica, DocumentoLegal, Usuario, CondicionInsegura, TrabajoFondo
 from app.services.notificaciones import NotificacionService
+from app.services.plantillas_correo import plantillas_correo
+from app.services.listado_service import ListadoService
+from app.tasks.trabajos import EjecutorTrabajos
+from app.tasks.extraccion_documentos import ExtraccionDocumentos
 from app.routes import juridico_bp
 from datetime import datetime, timedelta
 from functools import wraps
@@ -51,37 +55,20 @@ def listar():
     filtro_tipo = request.args.get('tipo', 'Todas')
     filtro_prioridad = request.args.get('prioridad', 'Todas')
     filtro_riesgo = request.args.get('riesgo', 'Todas')
-    pagina = request.args.get('pagina', 1, type=int)
     
-    # Query base
-    query = ConsultaJuridica.query
+    query = _query_consultas_visibles(filtro_estado, filtro_tipo, filtro_prioridad, filtro_riesgo)
     
-    # Aplicar filtros
-    if filtro_estado != 'Todas':
-        query = query.filter_by(estado=filtro_estado)
-    if filtro_tipo != 'Todas':
-        query = query.filter_by(tipo_consulta=filtro_tipo)
-    if filtro_prioridad != 'Todas':
-        query = query.filter_by(prioridad=filtro_prioridad)
-    if filtro_riesgo != 'Todas':
-        query = query.filter_by(riesgo_legal=filtro_riesgo)
-    
-    # Ordenar por fecha descendente
-    consultas = query.order_by(ConsultaJuridica.fecha_creacion.desc()).paginate(page=pagina, per_page=10)
-    
-    # Estadísticas
-    stats = {
-        'total': ConsultaJuridica.query.count(),
-        'abiertas': ConsultaJuridica.query.filter_by(estado='Abierta').count(),
-        'en_revision': ConsultaJuridica.query.filter_by(estado='En revisión').count(),
-        'resueltas': ConsultaJuridica.query.filter_by(estado='Resuelta').count(),
-        'cerradas': ConsultaJuridica.query.filter_by(estado='Cerrada').count(),
-        'riesgo_critico': ConsultaJuridica.query.filter_by(riesgo_legal='Crítico').count(),
-    }
+    # Paginación por cursor sobre (fecha_creacion, id)
+    try:
+        consultas = ListadoService.paginar(query, ConsultaJuridica.fecha_creacion, ConsultaJuridica.id,
+                                           cursor=request.args.get('cursor'), limite=10, contar=False)
+    except ValueError:
+        consultas = ListadoService.paginar(query, ConsultaJuridica.fecha_creacion, ConsultaJuridica.id,
+                                           limite=10, contar=False)
     
     contexto = {
         'consultas': consultas,
-        'stats': stats,
+        'stats': _estadisticas_consultas(),
         'filtro_estado': filtro_estado,
         'filtro_tipo': filtro_tipo,
         'filtro_prioridad': filtro_prioridad,
@@ -94,6 +81,46 @@ def listar():
     
     return render_template('juridico/listar.html', **contexto)
 
+def _query_consultas_visibles(filtro_estado='Todas', filtro_tipo='Todas',
+                              filtro_prioridad='Todas', filtro_riesgo='Todas'):
+    """Consultas visibles para el usuario actual con los filtros del listado"""
+    query = ListadoService.visibilidad_consultas(ConsultaJuridica.query, current_user)
+    
+    if filtro_estado != 'Todas':
+        query = query.filter_by(estado=filtro_estado)
+    if filtro_tipo != 'Todas':
+        query = query.filter_by(tipo_consulta=filtro_tipo)
+    if filtro_prioridad != 'Todas':
+        query = query.filter_by(prioridad=filtro_prioridad)
+    if filtro_riesgo != 'Todas':
+        query = query.filter_by(riesgo_legal=filtro_riesgo)
+    
+    return query
+
+def _estadisticas_consultas():
+    """Estadísticas del listado en una sola consulta agrupada"""
+    filas = db.session.query(
+        ConsultaJuridica.estado,
+        ConsultaJuridica.riesgo_legal,
+        db.func.count(ConsultaJuridica.id)
+    ).group_by(ConsultaJuridica.estado, ConsultaJuridica.riesgo_legal).all()
+    
+    por_estado = {}
+    riesgo_critico = 0
+    for estado, riesgo, cantidad in filas:
+        por_estado[estado] = por_estado.get(estado, 0) + cantidad
+        if riesgo == 'Crítico':
+            riesgo_critico += cantidad
+    
+    return {
+        'total': sum(por_estado.values()),
+        'abiertas': por_estado.get('Abierta', 0),
+        'en_revision': por_estado.get('En revisión', 0),
+        'resueltas': por_estado.get('Resuelta', 0),
+        'cerradas': por_estado.get('Cerrada', 0),
+        'riesgo_critico': riesgo_critico,
+    }
+
 # ============ CREAR CONSULTA ============
 
 @juridico_bp.route('/nueva', methods=['GET', 'POST'])
@@ -122,39 +149,26 @@ def crear():
             consulta.generar_numero_consulta()
             
             db.session.add(consulta)
-            db.session.commit()
-            
-            logger.info(f"✅ Consulta jurídica creada: {consulta.numero_consulta}")
+            db.session.flush()
             
-            # Enviar notificación a abogados usando método correcto
+            # Notificar a abogados: los correos quedan en el outbox y se
+            # guardan en la misma transacción que la consulta
             try:
                 abogados = Usuario.query.filter_by(rol='Abogado', activo=True).all()
-                for abogado in abogados:
-                    html = f"""
-                    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                        <div style="background-color: #6f42c1; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                            <h2 style="margin: 0;">⚖️ Nueva Consulta Jurídica</h2>
-                        </div>
-                        <div style="background-color: #f5f5f5; padding: 20px; border-radius: 0 0 5px 5px;">
-                            <p><strong>📋 Número:</strong> {consulta.numero_consulta}</p>
-                            <p><strong>📝 Título:</strong> {consulta.titulo}</p>
-                            <p><strong>🏷️ Tipo:</strong> {consulta.tipo_consulta}</p>
-                            <p><strong>⚠️ Prioridad:</strong> {consulta.prioridad}</p>
-                            <p><strong>⚡ Riesgo Legal:</strong> {consulta.riesgo_legal}</p>
-                            <p style="text-align: center; margin-top: 20px;">
-                                <a href="http://localhost:5000/juridico/{consulta.id}" style="background-color: #6f42c1; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Consulta</a>
-                            </p>
-                        </div>
-                    </div>
-                    """
-                    NotificacionService.enviar_email(
-                        abogado.email,
-                        f"[SST] Nueva Consulta Jurídica: {consulta.numero_consulta}",
-                        html
-                    )
-                logger.info(f"📧 Notificaciones enviadas a {len(abogados)} abogados")
+                html = plantillas_correo.renderizar('consulta_nueva.html', consulta=consulta)
+                NotificacionService.enviar_email_varios(
+                    [abogado.email for abogado in abogados],
+                    f"[SST] Nueva Consulta Jurídica: {consulta.numero_consulta}",
+                    html,
+                    'JURIDICO_NUEVA',
+                    f'consulta:{consulta.id}'
+                )
+                logger.info(f"📧 Notificaciones en cola para {len(abogados)} abogados")
             except Exception as e:
-                logger.warning(f"⚠️ Error al enviar notificaciones (no crítico): {str(e)}")
+                logger.warning(f"⚠️ Error al preparar notificaciones (no crítico): {str(e)}")
+            
+            db.session.commit()
+            logger.info(f"✅ Consulta jurídica creada: {consulta.numero_consulta}")
             
             flash(f'✅ Consulta jurídica creada: {consulta.numero_consulta}', 'success')
             return redirect(url_for('juridico.detalle', id=consulta.id))
@@ -205,12 +219,12 @@ def detalle(id):
                 consulta.estado = 'En revisión'
                 consulta.fecha_asignacion = datetime.utcnow()
                 
-                db.session.commit()
-                
-                # Usar método correcto de notificación
+                # La notificación va al outbox en la misma transacción
                 abogado = Usuario.query.get(abogado_id)
                 NotificacionService.enviar_asignacion_consulta(abogado, consulta)
                 
+                db.session.commit()
+                
                 logger.info(f"✅ Consulta {consulta.numero_consulta} asignada a {abogado.nombre_completo}")
                 flash(f'✅ Consulta asignada a {abogado.nombre_completo}', 'success')
             
@@ -220,33 +234,24 @@ def detalle(id):
                 consulta.estado = 'Resuelta'
                 consulta.fecha_resolucion = datetime.utcnow()
                 
-                db.session.commit()
-                
-                # Usar método correcto de notificación
+                # Notificaciones al outbox; se guardan con el commit de abajo
                 if consulta.empleado_afectado:
                     NotificacionService.enviar_resolucion_consulta(consulta.empleado_afectado, consulta)
                 
                 # Notificar también al creador
                 if consulta.responsable_creador and consulta.responsable_creador_id != consulta.empleado_afectado_id:
-                    html = f"""
-                    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                        <div style="background-color: #28a745; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                            <h2 style="margin: 0;">✅ Consulta Resuelta</h2>
-                        </div>
-                        <div style="background-color: #e8f5e9; padding: 20px; border-radius: 0 0 5px 5px;">
-                            <p>La consulta jurídica <strong>{consulta.numero_consulta}</strong> ha sido resuelta por {current_user.nombre_completo}.</p>
-                            <p style="text-align: center; margin-top: 20px;">
-                                <a href="http://localhost:5000/juridico/{consulta.id}" style="background-color: #28a745; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Resolución</a>
-                            </p>
-                        </div>
-                    </div>
-                    """
+                    html = plantillas_correo.renderizar(
+                        'consulta_resuelta_creador.html', consulta=consulta, resuelta_por=current_user.nombre_completo
+                    )
                     NotificacionService.enviar_email(
                         consulta.responsable_creador.email,
                         f"[SST] Consulta Resuelta: {consulta.numero_consulta}",
-                        html
+                        html,
+                        'JURIDICO_RESUELTA',
+                        f'consulta:{consulta.id}'
                     )
                 
+                db.session.commit()
                 logger.info(f"✅ Consulta {consulta.numero_consulta} marcada como resuelta")
                 flash('✅ Consulta marcada como resuelta', 'success')
             
@@ -322,7 +327,21 @@ def cargar_documento(id):
             creado_por_id=current_user.id
         )
         
+        # Archivo opcional: el texto se extrae en el sst-worker salvo que ese
+        # mismo archivo (por hash) ya se haya extraído antes
+        archivo = request.files.get('archivo')
+        if archivo and archivo.filename:
+            guardado = ExtraccionDocumentos.guardar_archivo(archivo)
+            documento.ruta_archivo = guardado.ruta
+            documento.hash_documento = guardado.hash_documento
+            documento.tamano_bytes = guardado.tamano
+            documento.estado_extraccion = 'Pendiente'
+        
         db.session.add(documento)
+        if documento.estado_extraccion == 'Pendiente' and not ExtraccionDocumentos.desde_cache(documento):
+            db.session.flush()
+            EjecutorTrabajos.encolar('extraer_texto_documentos', {'documento_ids': [documento.id]},
+                                     creado_por_id=current_user.id, commit=False)
         db.session.commit()
         
         logger.info(f"✅ Documento {nombre} cargado en consulta {consulta.numero_consulta}")
@@ -386,100 +405,67 @@ def normativa():
 @juridico_bp.route('/<int:id>/descargar')
 @juridico_required
 def descargar_reporte(id):
-    """Generar y descargar reporte de consulta en PDF"""
+    """
+    Encola la generación del PDF de la consulta (la hace el sst-worker)
+
+    JSON: responde 202 con el trabajo; el PDF se descarga en
+    /jobs/<id>/descargar cuando el estado es Completado. HTML: redirige a
+    /jobs/<id>/ver, que espera y muestra el enlace de descarga. Si ya hay
+    uno en curso para la misma consulta y usuario, devuelve ese.
+    """
     
     consulta = ConsultaJuridica.query.get_or_404(id)
     
-    try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        from io import BytesIO
-        import uuid
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor='#1e3a8a',
-            spaceAfter=30,
-            alignment=1
-        )
-        story.append(Paragraph("REPORTE CONSULTA JURÍDICA", title_style))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Información general
-        data = [
-            ['Campo', 'Valor'],
-            ['Número Consulta', consulta.numero_consulta],
-            ['Título', consulta.titulo],
-            ['Tipo', consulta.tipo_consulta],
-            ['Estado', consulta.estado],
-            ['Prioridad', consulta.prioridad],
-            ['Riesgo Legal', consulta.riesgo_legal],
-            ['Creado', str(consulta.fecha_creacion)],
-            ['Resuelto', str(consulta.fecha_resolucion) if consulta.fecha_resolucion else 'N/A'],
-        ]
-        
-        table = Table(data, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), '#e0e7ff'),
-            ('TEXTCOLOR', (0, 0), (-1, 0), '#1e3a8a'),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), '#f0f4ff'),
-            ('GRID', (0, 0), (-1, -1), 1, '#cccccc'),
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Descripción
-        story.append(Paragraph("<b>Descripción:</b>", styles['Heading3']))
-        story.append(Paragraph(consulta.descripcion or "N/A", styles['BodyText']))
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Resolución
-        if consulta.resolucion:
-            story.append(PageBreak())
-            story.append(Paragraph("<b>Resolución:</b>", styles['Heading3']))
-            story.append(Paragraph(consulta.resolucion, styles['BodyText']))
-        
-        # Footer
-        story.append(Spacer(1, 0.5*inch))
-        story.append(Paragraph(f"Generado el: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}", 
-                              ParagraphStyle('footer', parent=styles['Normal'], fontSize=8, alignment=2)))
-        
-        doc.build(story)
-        buffer.seek(0)
-        
-        from flask import send_file
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f"Consulta_{consulta.numero_consulta}_{datetime.utcnow().strftime('%Y%m%d')}.pdf"
-        )
-        
-    except ImportError:
-        flash('❌ ReportLab no está instalado. Instala con: pip install reportlab', 'error')
-        return redirect(url_for('juridico.detalle', id=id))
-    except Exception as e:
-        logger.error(f"❌ Error al generar reporte: {str(e)}", exc_info=True)
-        flash(f'❌ Error al generar reporte: {str(e)}', 'error')
-        return redirect(url_for('juridico.detalle', id=id))
+    en_curso = TrabajoFondo.query.filter(
+        TrabajoFondo.tipo == 'pdf_consulta_juridica',
+        TrabajoFondo.creado_por_id == current_user.id,
+        TrabajoFondo.estado.in_(['Pendiente', 'Ejecutando'])
+    ).order_by(TrabajoFondo.id.desc()).all()
+    trabajo = next((t for t in en_curso if (t.parametros or {}).get('consulta_id') == consulta.id), None)
+    if not trabajo:
+        trabajo = EjecutorTrabajos.encolar('pdf_consulta_juridica', {'consulta_id': consulta.id},
+                                           creado_por_id=current_user.id)
+    
+    if request.accept_mimetypes.best == 'application/json' or request.args.get('formato') == 'json':
+        respuesta = jsonify(EjecutorTrabajos.estado(trabajo))
+        respuesta.headers['Location'] = url_for('trabajos.estado', id=trabajo.id)
+        return respuesta, 202
+    
+    # HTML: página de espera que consulta el estado y muestra la descarga al terminar
+    return redirect(url_for('trabajos.ver', id=trabajo.id, volver=url_for('juridico.detalle', id=id)))
 
 # ============ API ENDPOINTS ============
 
+@juridico_bp.route('/api/listado')
+@juridico_required
+def api_listado():
+    """API: listado paginado por cursor (?cursor=&limite=&estado=&tipo=&prioridad=&riesgo=)"""
+    
+    query = _query_consultas_visibles(
+        request.args.get('estado', 'Todas'),
+        request.args.get('tipo', 'Todas'),
+        request.args.get('prioridad', 'Todas'),
+        request.args.get('riesgo', 'Todas')
+    )
+    
+    try:
+        pagina = ListadoService.paginar(query, ConsultaJuridica.fecha_creacion, ConsultaJuridica.id,
+                                        cursor=request.args.get('cursor'),
+                                        limite=ListadoService.limite_desde_args(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(pagina.to_dict(lambda c: {
+        'id': c.id,
+        'numero_consulta': c.numero_consulta,
+        'titulo': c.titulo,
+        'tipo_consulta': c.tipo_consulta,
+        'estado': c.estado,
+        'prioridad': c.prioridad,
+        'riesgo_legal': c.riesgo_legal,
+        'fecha_creacion': c.fecha_creacion.isoformat() if c.fecha_creacion else None
+    }))
+
 @juridico_bp.route('/api/estadisticas')
 @juridico_required
 def api_estadisticas():
@@ -1,22 +1,78 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, abort
 from flask_login import login_required, current_user
 from app import db
 from app.models import (
     CondicionInsegura, Usuario, Dependencia, TipoReporte, 
-    TipoEvidencia, CategoriaArea, GestionReporte
+    TipoEvidencia, CategoriaArea, GestionReporte, HistorialGestion
 )
 from datetime import datetime
 from app.routes import reportes_bp
-import os
-from werkzeug.utils import secure_filename
 from app.services.gestion_reportes_service import GestionReportesService
+from app.services.listado_service import ListadoService
+from app.services.almacen_evidencias import AlmacenEvidencias
+from app.services.derivados_imagen import cache_derivados
+from app.tasks.trabajos import EjecutorTrabajos
+from app.tasks.ingesta_reportes import PipelineIngesta
+import os
+
+# Roles que pueden pedir un análisis IA nuevo ignorando la caché (?forzar=true);
+# mismo criterio que el reanálisis masivo de /ia/reanalisis
+ROLES_FORZAR_ANALISIS = ('Admin', 'Responsable_SST')
+
+def _clasificacion_en_metadata(reporte):
+    """
+    Copia tipo de reporte, tipo de evidencia y ubicación del formulario a metadata_adicional
+
+    CondicionInsegura no tiene esas columnas: como atributos sueltos se pierden
+    al guardar, y la asignación del sst-worker recarga el reporte
+    (ResponsabilidadesService.contexto_reporte lee metadata_adicional).
+    La ubicación es una Dependencia y también queda como dependencia_id, la
+    dimensión de la analítica de peligros (PeligrosService): al cambiarla,
+    peligros_reporte se reconstruye en el mismo flush.
+    Solo cambia los campos que trae el formulario; vacío los quita.
+    """
+    original = reporte.metadata_adicional or {}
+    metadata = dict(original)
+    for campo in ('tipo_reporte_id', 'tipo_evidencia_id', 'ubicacion_id'):
+        if campo not in request.form:
+            continue
+        valor = request.form.get(campo, '').strip()
+        if valor.isdigit():
+            metadata[campo] = int(valor)
+        else:
+            metadata.pop(campo, None)
+    if 'ubicacion_id' in request.form:
+        if 'ubicacion_id' in metadata:
+            metadata['dependencia_id'] = metadata['ubicacion_id']
+        else:
+            metadata.pop('dependencia_id', None)
+    # Diccionario nuevo (la columna JSON no detecta cambios dentro del mismo
+    # objeto) y solo si cambió, para no reconstruir peligros sin motivo
+    if metadata != original:
+        reporte.metadata_adicional = metadata or None
+
+def _paginar_reportes(cursor, limite):
+    """Página de reportes visibles para el usuario actual"""
+    query = ListadoService.visibilidad_reportes(CondicionInsegura.query, current_user)
+    return ListadoService.paginar(
+        query,
+        CondicionInsegura.fecha_creacion,
+        CondicionInsegura.id,
+        cursor=cursor,
+        limite=limite
+    )
 
 @reportes_bp.route('/', methods=['GET'])
 @login_required
 def listar():
-    """Listar todos los reportes"""
-    reportes = CondicionInsegura.query.order_by(CondicionInsegura.fecha_creacion.desc()).all()
-    return render_template('reportes/listar.html', reportes=reportes)
+    """Listar reportes visibles para el usuario (paginado por cursor)"""
+    try:
+        pagina = _paginar_reportes(request.args.get('cursor'), ListadoService.limite_desde_args(request.args))
+    except ValueError:
+        # Cursor manipulado o caducado: volver a la primera página
+        pagina = _paginar_reportes(None, ListadoService.limite_desde_args(request.args))
+    
+    return render_template('reportes/listar.html', reportes=pagina.items, pagina=pagina)
 
 @reportes_bp.route('/nuevo', methods=['GET', 'POST'])
 @login_required
@@ -44,6 +100,8 @@ def nuevo():
             
             reporte.ubicacion_id = request.form.get('ubicacion_id')
             reporte.ubicacion_especifica = request.form.get('ubicacion_especifica', '')
+            # Tipo, evidencia y ubicación (dependencia) quedan en metadata_adicional
+            _clasificacion_en_metadata(reporte)
             
             # Descripción
             reporte.titulo = request.form.get('titulo')
@@ -53,27 +111,24 @@ def nuevo():
             if 'imagen' in request.files:
                 file = request.files['imagen']
                 if file and file.filename != '':
-                    filename = secure_filename(f"{reporte.numero_reporte}_{file.filename}")
-                    upload_dir = 'uploads/reportes'
-                    os.makedirs(upload_dir, exist_ok=True)
-                    filepath = os.path.join(upload_dir, filename)
-                    file.save(filepath)
-                    reporte.imagen_url = filepath
+                    # Se valida y guarda por contenido en una pasada; la misma
+                    # foto en varios reportes queda una sola vez en disco
+                    reporte.imagen_url = AlmacenEvidencias.guardar(file).ruta
             
             # Estado inicial
             reporte.estado = 'Reportado'
             reporte.fecha_creacion = datetime.utcnow()
             
             db.session.add(reporte)
-            db.session.commit()
+            db.session.flush()
             
             # ============ ASIGNACIÓN AUTOMÁTICA ============
-            gestion = GestionReportesService.asignar_reporte(reporte.id)
+            # La hace en lote la etapa de ingesta del sst-worker (asignación,
+            # tarea y correos); la fila de la cola se confirma con el reporte
+            PipelineIngesta.encolar(reporte.id)
+            db.session.commit()
             
-            if gestion:
-                flash(f'✅ Reporte {reporte.numero_reporte} creado y asignado automáticamente a {gestion.gestor_actual.nombre_completo}', 'success')
-            else:
-                flash(f'⚠️ Reporte {reporte.numero_reporte} creado pero NO se pudo asignar (falta configurar gestores)', 'warning')
+            flash(f'✅ Reporte {reporte.numero_reporte} creado; la asignación automática está en proceso', 'success')
             
             return redirect(url_for('reportes.ver', id=reporte.id))
         
@@ -105,18 +160,101 @@ def ver(id):
     # Obtener gestión del reporte
     gestion = GestionReporte.query.filter_by(reporte_id=id).first()
     
-    # Verificar permisos
-    puede_ver = (
+    if not _puede_ver_reporte(reporte, gestion):
+        flash('No tienes permiso para ver este reporte', 'error')
+        return redirect(url_for('reportes.listar'))
+    
+    return render_template('reportes/ver.html', reporte=reporte, gestion=gestion)
+
+def _puede_ver_reporte(reporte, gestion):
+    """Reportador, roles que ven todo o gestor actual"""
+    return (
         reporte.empleado_reportador_id == current_user.id or
-        current_user.rol in ['Admin', 'Responsable_SST', 'Gerente', 'Abogado'] or
+        current_user.rol in ListadoService.ROLES_VEN_TODOS_REPORTES or
         (gestion and gestion.gestor_actual_id == current_user.id)
     )
+
+@reportes_bp.route('/<int:id>/evidencia', defaults={'variante': 'original'}, methods=['GET'])
+@reportes_bp.route('/<int:id>/evidencia/<variante>', methods=['GET'])
+@login_required
+def evidencia(id, variante):
+    """Foto del reporte: original, media o miniatura (WebP generada al primer pedido)"""
+    reporte = CondicionInsegura.query.get_or_404(id)
+    gestion = GestionReporte.query.filter_by(reporte_id=id).first()
+    if not _puede_ver_reporte(reporte, gestion):
+        return jsonify({'error': 'No autorizado'}), 403
+    if variante != 'original' and variante not in cache_derivados.VARIANTES:
+        abort(404)
+    if not reporte.imagen_url or not os.path.isfile(reporte.imagen_url):
+        abort(404)
     
-    if not puede_ver:
-        flash('No tienes permiso para ver este reporte', 'error')
-        return redirect(url_for('reportes.listar'))
+    original = os.path.abspath(reporte.imagen_url)
+    clave = cache_derivados.clave(original)
+    ruta = cache_derivados.obtener(original, variante) if variante != 'original' else None
     
-    return render_template('reportes/ver.html', reporte=reporte, gestion=gestion)
+    # conditional: If-None-Match -> 304 y Range -> 206; el archivo va por
+    # wsgi.file_wrapper (sendfile) o X-Sendfile si USE_X_SENDFILE está activo
+    if ruta:
+        respuesta = send_file(ruta, mimetype='image/webp', conditional=True,
+                              etag=f'{clave}-{os.path.basename(ruta)}', max_age=3600)
+    else:
+        respuesta = send_file(original, conditional=True, etag=clave, max_age=3600)
+    respuesta.cache_control.public = False
+    respuesta.cache_control.private = True
+    return respuesta
+
+@reportes_bp.route('/<int:id>/analisis-ia', methods=['POST'])
+@login_required
+def analizar_ia(id):
+    """
+    Encola el análisis con IA de la imagen del reporte
+
+    ?forzar=true ignora la caché (otra llamada pagada al modelo): solo para
+    ROLES_FORZAR_ANALISIS; para los demás se usa siempre la caché
+    """
+    reporte = CondicionInsegura.query.get_or_404(id)
+    gestion = GestionReporte.query.filter_by(reporte_id=id).first()
+    
+    if not _puede_ver_reporte(reporte, gestion):
+        return jsonify({'error': 'No autorizado'}), 403
+    if not reporte.imagen_url:
+        return jsonify({'error': 'El reporte no tiene imagen'}), 400
+    
+    forzar = (request.args.get('forzar', 'false').lower() == 'true' and
+              current_user.rol in ROLES_FORZAR_ANALISIS)
+    trabajo = EjecutorTrabajos.encolar('analisis_ia', {
+        'reporte_id': reporte.id,
+        'usar_cache': not forzar
+    }, creado_por_id=current_user.id)
+    respuesta = jsonify(EjecutorTrabajos.estado(trabajo))
+    respuesta.headers['Location'] = url_for('trabajos.estado', id=trabajo.id)
+    return respuesta, 202
+
+@reportes_bp.route('/<int:id>/historial', methods=['GET'])
+@login_required
+def api_historial(id):
+    """API: línea de tiempo de la gestión del reporte, paginada por cursor (?cursor=&limite=)"""
+    reporte = CondicionInsegura.query.get_or_404(id)
+    gestion = GestionReporte.query.filter_by(reporte_id=id).first()
+    
+    if not _puede_ver_reporte(reporte, gestion):
+        return jsonify({'error': 'No tienes permiso para ver este reporte'}), 403
+    
+    gestiones = db.session.query(GestionReporte.id).filter(GestionReporte.reporte_id == id)
+    query = HistorialGestion.query.filter(HistorialGestion.gestion_reporte_id.in_(gestiones))
+    
+    try:
+        pagina = ListadoService.paginar(
+            query,
+            HistorialGestion.fecha,
+            HistorialGestion.id,
+            cursor=request.args.get('cursor'),
+            limite=ListadoService.limite_desde_args(request.args)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(pagina.to_dict(lambda evento: evento.to_dict()))
 
 @reportes_bp.route('/<int:id>/editar', methods=['GET', 'POST'])
 @login_required
@@ -136,6 +274,7 @@ def editar(id):
             reporte.ubicacion_id = request.form.get('ubicacion_id')
             reporte.tipo_reporte_id = request.form.get('tipo_reporte_id')
             reporte.tipo_evidencia_id = request.form.get('tipo_evidencia_id')
+            _clasificacion_en_metadata(reporte)
             
             db.session.commit()
             flash('✅ Reporte actualizado', 'success')
@@ -223,6 +362,32 @@ def cerrar(id):
 
 # ============== API ENDPOINTS ==============
 
+@reportes_bp.route('/api/listado', methods=['GET'])
+@login_required
+def api_listado():
+    """API: listado paginado por cursor (?cursor=&limite=)"""
+    try:
+        pagina = _paginar_reportes(request.args.get('cursor'), ListadoService.limite_desde_args(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(pagina.to_dict(lambda r: {
+        'id': r.id,
+        'numero_reporte': r.numero_reporte,
+        'titulo': r.titulo,
+        'estado': r.estado,
+        'fecha_creacion': r.fecha_creacion.isoformat() if r.fecha_creacion else None,
+        'miniatura_url': url_for('reportes.evidencia', id=r.id, variante='miniatura') if r.imagen_url else None
+    }))
+
+@reportes_bp.route('/api/ingesta', methods=['GET'])
+@login_required
+def api_ingesta():
+    """API: estado de la cola de ingesta (Admin)"""
+    if current_user.rol != 'Admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(PipelineIngesta.resumen()), 200
+
 @reportes_bp.route('/api/categorias/<int:categoria_id>/dependencias', methods=['GET'])
 @login_required
 def api_dependencias_por_categoria(categoria_id):
@@ -0,0 +1,81 @@
+# app/routes/trabajos.py
+"""
+Estado y descarga de los trabajos en segundo plano (/jobs)
+"""
+from flask import jsonify, send_file, render_template, request, abort
+from flask_login import login_required, current_user
+from app.models import TrabajoFondo
+from app.tasks.trabajos import EjecutorTrabajos
+from app.routes import trabajos_bp
+import os
+
+def _trabajo_visible(id):
+    """El trabajo si lo creó el usuario actual o es Admin; None si no"""
+    trabajo = TrabajoFondo.query.get_or_404(id)
+    if trabajo.creado_por_id != current_user.id and current_user.rol != 'Admin':
+        return None
+    return trabajo
+
+@trabajos_bp.route('/<int:id>', methods=['GET'])
+@login_required
+def estado(id):
+    """Estado, intentos y resultado de un trabajo"""
+    trabajo = _trabajo_visible(id)
+    if not trabajo:
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify(EjecutorTrabajos.estado(trabajo)), 200
+
+@trabajos_bp.route('/<int:id>/ver', methods=['GET'])
+@login_required
+def ver(id):
+    """Página de espera: consulta /jobs/<id> hasta que el archivo está listo (?volver=ruta)"""
+    trabajo = _trabajo_visible(id)
+    if not trabajo:
+        abort(403)
+    # Solo rutas locales para el enlace de regreso
+    volver = request.args.get('volver', '')
+    if not volver.startswith('/') or volver.startswith('//'):
+        volver = None
+    return render_template('trabajos/estado.html', trabajo=trabajo,
+                           datos=EjecutorTrabajos.estado(trabajo), volver=volver)
+
+@trabajos_bp.route('/<int:id>/descargar', methods=['GET'])
+@login_required
+def descargar(id):
+    """Archivo producido por un trabajo Completado"""
+    trabajo = _trabajo_visible(id)
+    if not trabajo:
+        return jsonify({"error": "No autorizado"}), 403
+    if trabajo.estado != 'Completado':
+        return jsonify({"error": f"El trabajo está {trabajo.estado}", "trabajo": EjecutorTrabajos.estado(trabajo)}), 409
+    if not trabajo.archivo_resultado or not os.path.exists(trabajo.archivo_resultado):
+        return jsonify({"error": "El trabajo no tiene archivo para descargar"}), 404
+
+    return send_file(
+        trabajo.archivo_resultado,
+        mimetype=trabajo.tipo_contenido,
+        as_attachment=True,
+        download_name=trabajo.nombre_archivo
+    )
+
+@trabajos_bp.route('/<int:id>/cancelar', methods=['POST'])
+@login_required
+def cancelar(id):
+    """Cancela un trabajo que aún no termina"""
+    trabajo = _trabajo_visible(id)
+    if not trabajo:
+        return jsonify({"error": "No autorizado"}), 403
+    if not EjecutorTrabajos.cancelar(trabajo.id):
+        return jsonify({"error": f"No se puede cancelar un trabajo en estado {trabajo.estado}"}), 409
+
+    from app import db
+    db.session.refresh(trabajo)
+    return jsonify(EjecutorTrabajos.estado(trabajo)), 200
+
+@trabajos_bp.route('/resumen', methods=['GET'])
+@login_required
+def resumen():
+    """Cantidad de trabajos por tipo y estado (Admin)"""
+    if current_user.rol != 'Admin':
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify(EjecutorTrabajos.resumen()), 200
@@ -0,0 +1,246 @@
+# app/services/almacen_evidencias.py
+"""
+Almacén de evidencias de reportes direccionado por contenido
+
+Una sola pasada por el archivo subido, en bloques de TAMANO_BLOQUE:
+- la firma (magic bytes) se valida con el primer bloque
+- el límite de tamaño se aplica mientras se lee: se corta al pasarlo
+- el sha256 se calcula a la vez que se escribe a un temporal en disco
+
+El archivo queda en SST_DIR_EVIDENCIAS/<2 primeros>/<sha256>.<formato>; la
+misma foto subida en varios reportes se guarda una vez. La memoria por
+subida es un bloque, sin importar el tamaño del archivo.
+
+ArchivoEvidencia.referencias cuenta los reportes que usan cada archivo:
+se ajusta en la misma transacción que el reporte (eventos de
+CondicionInsegura.imagen_url). Los archivos sin referencias se purgan tras
+GRACIA_SEGUNDOS (una subida cuyo reporte no llegó a guardarse también).
+"""
+
+from app import db
+from app.models import ArchivoEvidencia, CondicionInsegura
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, update, delete, inspect
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+EvidenciaGuardada = namedtuple('EvidenciaGuardada', ['ruta', 'hash_sha256', 'formato', 'tamano', 'nueva'])
+
+
+class ErrorEvidencia(ValueError):
+    """Archivo rechazado (formato o tamaño); el mensaje es para el usuario"""
+
+
+class AlmacenEvidencias:
+    """Guarda evidencias una vez por contenido y cuenta sus referencias"""
+
+    DIRECTORIO = os.getenv('SST_DIR_EVIDENCIAS', os.path.join('uploads', 'reportes', 'objetos'))
+    TAMANO_BLOQUE = 64 * 1024
+    MAX_BYTES = 10 * 1024 * 1024
+    EXTENSIONES = {'jpeg': 'jpg', 'png': 'png', 'webp': 'webp'}
+
+    # Un archivo sin referencias se conserva este tiempo antes de purgarlo
+    GRACIA_SEGUNDOS = 3600
+
+    # ============== SUBIDA ==============
+
+    @staticmethod
+    def _leer_cabecera(flujo, minimo=12):
+        """Primer bloque del flujo con al menos `minimo` bytes (si el archivo los tiene)"""
+        cabecera = flujo.read(AlmacenEvidencias.TAMANO_BLOQUE)
+        while cabecera and len(cabecera) < minimo:
+            resto = flujo.read(AlmacenEvidencias.TAMANO_BLOQUE)
+            if not resto:
+                break
+            cabecera += resto
+        return cabecera
+
+    @staticmethod
+    def _volcar(flujo, max_bytes):
+        """
+        Copia el flujo a un temporal validando la firma y el tamaño
+
+        Returns:
+            (ruta temporal, sha256, formato, tamaño)
+        """
+        from app.services.imagen_processor import ImagenProcessor
+
+        cabecera = AlmacenEvidencias._leer_cabecera(flujo)
+        formato = ImagenProcessor.detectar_formato(cabecera)
+        if formato is None:
+            raise ErrorEvidencia("El archivo no es una imagen JPG, PNG o WebP válida")
+
+        temporales = os.path.join(AlmacenEvidencias.DIRECTORIO, 'tmp')
+        os.makedirs(temporales, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=temporales, suffix='.parte')
+        sha256 = hashlib.sha256()
+        tamano = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as salida:
+                bloque = cabecera
+                while bloque:
+                    tamano += len(bloque)
+                    if tamano > max_bytes:
+                        raise ErrorEvidencia(f"Archivo demasiado grande (máx {max_bytes // (1024 * 1024)}MB)")
+                    sha256.update(bloque)
+                    salida.write(bloque)
+                    bloque = flujo.read(AlmacenEvidencias.TAMANO_BLOQUE)
+        except BaseException:
+            os.remove(temporal)
+            raise
+        return temporal, sha256.hexdigest(), formato, tamano
+
+    @staticmethod
+    def ruta_para(hash_sha256, formato):
+        return os.path.join(
+            AlmacenEvidencias.DIRECTORIO, hash_sha256[:2], f'{hash_sha256}.{AlmacenEvidencias.EXTENSIONES[formato]}'
+        )
+
+    @staticmethod
+    def _registrar(hash_sha256, ruta, formato, tamano):
+        """
+        Crea (o toca) la fila del archivo en su propia transacción, con 0 referencias nuevas
+
+        Las referencias las suma la transacción del reporte; si esta no se
+        confirma, el archivo queda sin referencias y se purga.
+
+        Returns:
+            True si el archivo es nuevo
+        """
+        ahora = datetime.utcnow()
+        try:
+            with db.engine.begin() as conexion:
+                conexion.execute(insert(ArchivoEvidencia).values(
+                    hash_sha256=hash_sha256, ruta=ruta, formato=formato, tamano=tamano,
+                    referencias=0, fecha_creacion=ahora, fecha_ultimo_uso=ahora
+                ))
+            return True
+        except IntegrityError:
+            with db.engine.begin() as conexion:
+                conexion.execute(update(ArchivoEvidencia).where(
+                    ArchivoEvidencia.hash_sha256 == hash_sha256
+                ).values(fecha_ultimo_uso=ahora))
+            return False
+
+    @staticmethod
+    def guardar(archivo, max_bytes=None):
+        """
+        Guarda una evidencia subida (FileStorage o flujo binario) sin cargarla en memoria
+
+        Raises:
+            ErrorEvidencia: si no es JPG/PNG/WebP o pasa de max_bytes
+
+        Returns:
+            EvidenciaGuardada; ruta es el valor para CondicionInsegura.imagen_url
+        """
+        flujo = getattr(archivo, 'stream', archivo)
+        temporal, hash_sha256, formato, tamano = AlmacenEvidencias._volcar(
+            flujo, max_bytes or AlmacenEvidencias.MAX_BYTES
+        )
+        ruta = AlmacenEvidencias.ruta_para(hash_sha256, formato)
+        try:
+            nueva = AlmacenEvidencias._registrar(hash_sha256, ruta, formato, tamano)
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            # Mismo contenido, mismo nombre: reemplazar es atómico y deja el
+            # archivo en su lugar aunque una purga concurrente lo haya movido
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+
+        if nueva:
+            logger.info(f"📎 Evidencia nueva {hash_sha256[:12]} ({tamano} bytes)")
+        else:
+            logger.info(f"📎 Evidencia repetida {hash_sha256[:12]}: se reutiliza el archivo guardado")
+        return EvidenciaGuardada(ruta, hash_sha256, formato, tamano, nueva)
+
+    # ============== REFERENCIAS ==============
+
+    @staticmethod
+    def ajustar_referencias(conexion, rutas_sumar=(), rutas_restar=()):
+        """Suma/resta referencias con la conexión de la transacción en curso"""
+        for rutas, delta in ((rutas_sumar, 1), (rutas_restar, -1)):
+            rutas = [ruta for ruta in rutas if ruta]
+            if rutas:
+                conexion.execute(update(ArchivoEvidencia).where(ArchivoEvidencia.ruta.in_(rutas)).values(
+                    referencias=ArchivoEvidencia.referencias + delta, fecha_ultimo_uso=datetime.utcnow()
+                ))
+
+    @staticmethod
+    def purgar(gracia_segundos=None):
+        """
+        Borra los archivos sin referencias que no se usan hace más de la gracia
+
+        Cada archivo se aparta (rename) antes de borrar su fila; si una subida
+        lo tocó en el intermedio, la fila no se borra y el archivo vuelve.
+
+        Returns:
+            Número de archivos borrados
+        """
+        limite = datetime.utcnow() - timedelta(seconds=AlmacenEvidencias.GRACIA_SEGUNDOS if gracia_segundos is None else gracia_segundos)
+        sin_uso = (ArchivoEvidencia.referencias <= 0, ArchivoEvidencia.fecha_ultimo_uso < limite)
+        candidatos = db.session.execute(
+            db.select(ArchivoEvidencia.id, ArchivoEvidencia.ruta).where(*sin_uso)
+        ).all()
+        db.session.rollback()
+
+        borrados = 0
+        for fila in candidatos:
+            apartado = f'{fila.ruta}.borrar'
+            movido = os.path.exists(fila.ruta)
+            if movido:
+                os.replace(fila.ruta, apartado)
+            with db.engine.begin() as conexion:
+                eliminado = conexion.execute(
+                    delete(ArchivoEvidencia).where(ArchivoEvidencia.id == fila.id, *sin_uso)
+                ).rowcount
+            if not movido:
+                borrados += eliminado
+            elif eliminado:
+                os.remove(apartado)
+                borrados += 1
+            else:
+                os.replace(apartado, fila.ruta)
+        if borrados:
+            logger.info(f"🧹 {borrados} evidencias sin referencias purgadas")
+        return borrados
+
+    @staticmethod
+    def resumen():
+        """Archivos, referencias y bytes guardados vs. bytes que ocuparían sin deduplicar"""
+        archivos, referencias, guardados, subidos = db.session.query(
+            db.func.count(ArchivoEvidencia.id),
+            db.func.coalesce(db.func.sum(ArchivoEvidencia.referencias), 0),
+            db.func.coalesce(db.func.sum(ArchivoEvidencia.tamano), 0),
+            db.func.coalesce(db.func.sum(ArchivoEvidencia.tamano * ArchivoEvidencia.referencias), 0),
+        ).one()
+        return {'archivos': archivos, 'referencias': referencias,
+                'bytes_guardados': guardados, 'bytes_sin_deduplicar': subidos}
+
+
+# ============== EVENTOS ==============
+
+@event.listens_for(CondicionInsegura.imagen_url, 'set', active_history=True)
+def _imagen_asignada(reporte, valor, anterior, iniciador):
+    """Sin efecto; active_history carga la ruta anterior para restarle la referencia"""
+
+
+@event.listens_for(CondicionInsegura, 'after_insert')
+@event.listens_for(CondicionInsegura, 'after_update')
+def _imagen_cambiada(mapper, connection, reporte):
+    historia = inspect(reporte).attrs.imagen_url.history
+    if historia.added or historia.deleted:
+        AlmacenEvidencias.ajustar_referencias(connection, historia.added, historia.deleted)
+
+
+@event.listens_for(CondicionInsegura, 'before_delete')
+def _reporte_eliminado(mapper, connection, reporte):
+    AlmacenEvidencias.ajustar_referencias(connection, rutas_restar=[reporte.imagen_url])
@@ -0,0 +1,183 @@
+# app/services/asignacion_service.py
+"""
+Asignación de gestores con índice en memoria de usuarios activos por rol
+
+Antes cada asignación hacía Usuario.query.filter_by(rol=..., activo=True).first():
+una consulta por reporte y siempre el mismo usuario. El índice se carga una
+vez (usuarios activos + tareas abiertas por usuario), se invalida cuando
+cambia un Usuario y reparte el trabajo por round-robin o por menor carga.
+"""
+
+from app import db
+from app.models import Usuario, TareaGestion
+from sqlalchemy import event, inspect
+from datetime import datetime, timedelta
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class IndiceGestores:
+    """Usuarios activos por rol y tareas abiertas por usuario (por proceso)"""
+
+    # Estados de TareaGestion que cuentan como carga del gestor
+    ESTADOS_ABIERTOS = ('Abierta', 'En_Progreso')
+
+    # Recarga completa aunque no haya invalidación local (cambios hechos por otros procesos)
+    TTL_SEGUNDOS = 300
+
+    # Columnas de Usuario que afectan al índice; ultimo_login no invalida
+    CAMPOS_INDEXADOS = ('rol', 'activo', 'nombre_completo')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._por_rol = {}       # rol -> [(usuario_id, nombre_completo), ...]
+        self._carga = {}         # usuario_id -> tareas abiertas
+        self._turno = {}         # rol -> posición del próximo round-robin
+        self._cargado_en = None
+
+    def invalidar(self):
+        with self._lock:
+            self._cargado_en = None
+
+    def vigente(self):
+        return (self._cargado_en is not None and
+                datetime.utcnow() - self._cargado_en < timedelta(seconds=self.TTL_SEGUNDOS))
+
+    def asegurar(self):
+        """Carga el índice si está invalidado o vencido (2 consultas)"""
+        if self.vigente():
+            return
+        with self._lock:
+            if self.vigente():
+                return
+
+            por_rol = {}
+            filas = db.session.query(Usuario.id, Usuario.rol, Usuario.nombre_completo).filter(
+                Usuario.activo == True
+            ).order_by(Usuario.id)
+            for usuario_id, rol, nombre in filas:
+                por_rol.setdefault(rol, []).append((usuario_id, nombre))
+
+            carga = dict(db.session.query(
+                TareaGestion.asignado_a_id, db.func.count(TareaGestion.id)
+            ).filter(
+                TareaGestion.estado.in_(self.ESTADOS_ABIERTOS)
+            ).group_by(TareaGestion.asignado_a_id).all())
+
+            self._por_rol = por_rol
+            self._carga = carga
+            self._turno = {rol: self._turno.get(rol, 0) for rol in por_rol}
+            self._cargado_en = datetime.utcnow()
+
+    def usuarios(self, rol):
+        self.asegurar()
+        return list(self._por_rol.get(rol, []))
+
+    def carga(self, usuario_id):
+        return self._carga.get(usuario_id, 0)
+
+    def seleccionar(self, rol, estrategia):
+        """
+        Elige un usuario activo del rol sin consultar la base
+
+        Returns:
+            (usuario_id, nombre_completo) o None si el rol no tiene usuarios
+        """
+        self.asegurar()
+        with self._lock:
+            candidatos = self._por_rol.get(rol)
+            if not candidatos:
+                return None
+
+            if estrategia == AsignacionService.ROUND_ROBIN:
+                posicion = self._turno.get(rol, 0) % len(candidatos)
+                self._turno[rol] = posicion + 1
+                return candidatos[posicion]
+
+            # Menor carga; empate -> el de menor id (orden de candidatos)
+            return min(candidatos, key=lambda c: self._carga.get(c[0], 0))
+
+    def sumar_carga(self, usuario_id, cantidad=1):
+        with self._lock:
+            self._carga[usuario_id] = max(self._carga.get(usuario_id, 0) + cantidad, 0)
+
+
+indice_gestores = IndiceGestores()
+
+
+class AsignacionService:
+    """Selección de gestor por rol (round-robin o menor carga)"""
+
+    ROUND_ROBIN = 'round_robin'
+    MENOR_CARGA = 'menor_carga'
+
+    ESTRATEGIA = os.getenv('SST_ESTRATEGIA_ASIGNACION', MENOR_CARGA)
+
+    @staticmethod
+    def seleccionar_gestor(rol, estrategia=None, registrar_tarea=True):
+        """
+        Gestor para un rol según la estrategia configurada
+
+        Args:
+            rol: rol buscado (ej. 'Gestor_RRHH')
+            estrategia: ROUND_ROBIN o MENOR_CARGA (por defecto SST_ESTRATEGIA_ASIGNACION)
+            registrar_tarea: suma de inmediato la tarea que se le va a crear, para
+                que asignaciones seguidas en el mismo lote no caigan en el mismo usuario
+
+        Returns:
+            (usuario_id, nombre_completo) o None
+        """
+        if not rol:
+            return None
+        seleccionado = indice_gestores.seleccionar(rol, estrategia or AsignacionService.ESTRATEGIA)
+        if seleccionado and registrar_tarea:
+            indice_gestores.sumar_carga(seleccionado[0])
+        return seleccionado
+
+    @staticmethod
+    def seleccionar_usuario(rol, estrategia=None, registrar_tarea=True):
+        """Igual que seleccionar_gestor pero devuelve el Usuario (get por id, sin filtrar por rol)"""
+        seleccionado = AsignacionService.seleccionar_gestor(rol, estrategia, registrar_tarea)
+        if not seleccionado:
+            return None
+        return db.session.get(Usuario, seleccionado[0])
+
+    @staticmethod
+    def carga_por_rol(rol):
+        """[(usuario_id, nombre_completo, tareas abiertas)] para paneles de administración"""
+        return [
+            (usuario_id, nombre, indice_gestores.carga(usuario_id))
+            for usuario_id, nombre in indice_gestores.usuarios(rol)
+        ]
+
+
+# ============== INVALIDACIÓN ==============
+
+@event.listens_for(Usuario, 'after_insert')
+@event.listens_for(Usuario, 'after_delete')
+def _usuario_creado_o_eliminado(mapper, connection, usuario):
+    indice_gestores.invalidar()
+
+
+@event.listens_for(Usuario, 'after_update')
+def _usuario_actualizado(mapper, connection, usuario):
+    estado = inspect(usuario)
+    if any(estado.attrs[campo].history.has_changes() for campo in IndiceGestores.CAMPOS_INDEXADOS):
+        indice_gestores.invalidar()
+
+
+@event.listens_for(TareaGestion, 'after_update')
+def _tarea_actualizada(mapper, connection, tarea):
+    """Descuenta la carga cuando una tarea sale de los estados abiertos"""
+    historial = inspect(tarea).attrs.estado.history
+    if not historial.has_changes() or not historial.deleted:
+        return
+    antes = historial.deleted[0]
+    ahora = tarea.estado
+    if antes in IndiceGestores.ESTADOS_ABIERTOS and ahora not in IndiceGestores.ESTADOS_ABIERTOS:
+        indice_gestores.sumar_carga(tarea.asignado_a_id, -1)
+    elif antes not in IndiceGestores.ESTADOS_ABIERTOS and ahora in IndiceGestores.ESTADOS_ABIERTOS:
+        indice_gestores.sumar_carga(tarea.asignado_a_id)
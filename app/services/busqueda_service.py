@@ -0,0 +1,294 @@
+# app/services/busqueda_service.py
+"""
+Búsqueda de texto completo en reportes, consultas jurídicas y documentos legales
+
+Qué se indexa (tabla busqueda_documentos, una fila por entidad):
+- reporte: CondicionInsegura.titulo / descripcion, observaciones_ia
+- consulta: ConsultaJuridica.titulo / descripcion, concepto_legal, resolucion
+- documento: DocumentoLegal.nombre / contenido
+
+El motor depende de la base (ver app/models/busqueda.py):
+- SQLite: FTS5, orden por bm25 y resaltado con highlight()/snippet()
+- PostgreSQL: tsvector con GIN, orden por ts_rank_cd y resaltado con ts_headline()
+
+La fila se escribe en el mismo flush que la entidad (eventos de mapper),
+así que un rollback no deja el índice adelantado. Los UPDATE masivos que
+no pasan por el ORM llaman a indexar_ids(). scripts/reindexar_busqueda.py
+reconstruye todo o un tipo.
+"""
+
+from app import db
+from app.models import CondicionInsegura, ConsultaJuridica, DocumentoLegal, DocumentoBusqueda
+from app.services.listado_service import ListadoService
+from app.utils.texto import tokenizar
+from datetime import datetime
+from markupsafe import Markup, escape
+from sqlalchemy import event, inspect, select, insert, update, delete, func, or_, and_, desc, literal_column, text
+from sqlalchemy.sql import table, column
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tabla virtual FTS5 (fuera de los modelos; ver app/models/busqueda.py)
+_TABLA_FTS = table('busqueda_fts', column('rowid'))
+
+
+class BusquedaService:
+    """Índice de texto completo y búsqueda con puntaje y resaltado"""
+
+    # tipo -> (modelo, campo de título, campos de texto)
+    FUENTES = {
+        'reporte': (CondicionInsegura, 'titulo', ('descripcion', 'observaciones_ia')),
+        'consulta': (ConsultaJuridica, 'titulo', ('descripcion', 'concepto_legal', 'resolucion')),
+        'documento': (DocumentoLegal, 'nombre', ('contenido', 'texto_extraido')),
+    }
+
+    # Los de juridico_required: ven consultas y documentos
+    ROLES_JURIDICO = ('Admin', 'Responsable_SST', 'Abogado')
+
+    LIMITE_DEFECTO = 20
+    LIMITE_MAXIMO = 100
+    TAMANO_LOTE = 500
+
+    # Marcas de resaltado que no aparecen en texto real; se cambian por <mark> tras escapar
+    _INICIO, _FIN = '\x02', '\x03'
+
+    # ============== ESCRITURA ==============
+
+    @staticmethod
+    def campos(tipo):
+        """(título, [campos de texto]) que existen en el modelo"""
+        modelo, titulo, textos = BusquedaService.FUENTES[tipo]
+        # concepto_legal no está en todas las versiones de ConsultaJuridica
+        return titulo, [campo for campo in textos if hasattr(modelo, campo)]
+
+    @staticmethod
+    def valores(tipo, fila):
+        """Columnas de busqueda_documentos para una entidad (objeto o fila con sus campos)"""
+        titulo, textos = BusquedaService.campos(tipo)
+        return {
+            'titulo': (getattr(fila, titulo) or '')[:300],
+            'texto': '\n\n'.join(valor for valor in (getattr(fila, campo) for campo in textos) if valor),
+            'fecha_actualizacion': datetime.utcnow(),
+        }
+
+    @staticmethod
+    def guardar(conexion, tipo, entidad_id, valores):
+        """Inserta o actualiza la fila de una entidad con la conexión de la transacción en curso"""
+        actualizadas = conexion.execute(update(DocumentoBusqueda).where(
+            DocumentoBusqueda.tipo == tipo, DocumentoBusqueda.entidad_id == entidad_id
+        ).values(**valores)).rowcount
+        if not actualizadas:
+            conexion.execute(insert(DocumentoBusqueda).values(tipo=tipo, entidad_id=entidad_id, **valores))
+
+    @staticmethod
+    def quitar(conexion, tipo, entidad_id):
+        conexion.execute(delete(DocumentoBusqueda).where(
+            DocumentoBusqueda.tipo == tipo, DocumentoBusqueda.entidad_id == entidad_id
+        ))
+
+    @staticmethod
+    def indexar_ids(tipo, ids):
+        """Reindexa entidades cambiadas con UPDATE masivo, en la transacción de la sesión (sin commit)"""
+        modelo, _, _ = BusquedaService.FUENTES[tipo]
+        titulo, textos = BusquedaService.campos(tipo)
+        columnas = [modelo.id] + [getattr(modelo, campo) for campo in [titulo] + textos]
+        conexion = db.session.connection()
+        for fila in db.session.execute(select(*columnas).where(modelo.id.in_(list(ids)))):
+            BusquedaService.guardar(conexion, tipo, fila.id, BusquedaService.valores(tipo, fila))
+
+    @staticmethod
+    def reindexar(tipos=None, tamano_lote=None):
+        """
+        Reconstruye el índice de los tipos dados (todos por defecto), un commit por tipo
+
+        Returns:
+            {tipo: entidades indexadas}
+        """
+        tamano_lote = tamano_lote or BusquedaService.TAMANO_LOTE
+        resultado = {}
+        for tipo in tipos or BusquedaService.FUENTES:
+            modelo, _, _ = BusquedaService.FUENTES[tipo]
+            titulo, textos = BusquedaService.campos(tipo)
+            columnas = [modelo.id] + [getattr(modelo, campo) for campo in [titulo] + textos]
+
+            db.session.execute(delete(DocumentoBusqueda).where(DocumentoBusqueda.tipo == tipo))
+            total = 0
+            ultimo_id = 0
+            while True:
+                # Keyset por id: lotes acotados sin OFFSET
+                filas = db.session.execute(
+                    select(*columnas).where(modelo.id > ultimo_id).order_by(modelo.id).limit(tamano_lote)
+                ).all()
+                if not filas:
+                    break
+                db.session.execute(insert(DocumentoBusqueda), [
+                    {'tipo': tipo, 'entidad_id': fila.id, **BusquedaService.valores(tipo, fila)} for fila in filas
+                ])
+                total += len(filas)
+                ultimo_id = filas[-1].id
+            db.session.commit()
+            resultado[tipo] = total
+            logger.info(f"🔎 Búsqueda: {total} {tipo}s indexados")
+
+        if db.engine.dialect.name == 'sqlite':
+            # Fusiona los segmentos que dejaron las inserciones por lote
+            db.session.execute(text("INSERT INTO busqueda_fts(busqueda_fts) VALUES ('optimize')"))
+            db.session.commit()
+        return resultado
+
+    # ============== CONSULTA ==============
+
+    @staticmethod
+    def consulta_fts5(texto):
+        """Palabras del usuario como consulta FTS5: todas deben estar; la última vale como prefijo"""
+        terminos = tokenizar(texto)
+        if not terminos:
+            return None
+        partes = [f'"{termino}"' for termino in terminos]
+        partes[-1] += '*'
+        return ' '.join(partes)
+
+    @staticmethod
+    def _visibles(usuario, tipos):
+        """Condición sobre busqueda_documentos con lo que el usuario puede ver"""
+        condiciones = []
+        if 'reporte' in tipos:
+            if usuario.rol in ListadoService.ROLES_VEN_TODOS_REPORTES:
+                condiciones.append(DocumentoBusqueda.tipo == 'reporte')
+            else:
+                reportes = ListadoService.visibilidad_reportes(db.session.query(CondicionInsegura.id), usuario)
+                condiciones.append(and_(DocumentoBusqueda.tipo == 'reporte',
+                                        DocumentoBusqueda.entidad_id.in_(reportes.subquery().select())))
+        juridicos = [tipo for tipo in ('consulta', 'documento') if tipo in tipos]
+        if juridicos and usuario.rol in BusquedaService.ROLES_JURIDICO:
+            condiciones.append(DocumentoBusqueda.tipo.in_(juridicos))
+        return or_(*condiciones) if condiciones else None
+
+    @staticmethod
+    def _sentencia(texto):
+        """SELECT tipo, entidad_id, puntaje, titulo, fragmento según el motor; None si no hay qué buscar"""
+        D = DocumentoBusqueda
+        inicio, fin = BusquedaService._INICIO, BusquedaService._FIN
+        motor = db.engine.dialect.name
+
+        if motor == 'sqlite':
+            consulta = BusquedaService.consulta_fts5(texto)
+            if consulta is None:
+                return None
+            fts = literal_column('busqueda_fts')
+            return select(
+                D.tipo, D.entidad_id,
+                # bm25 es menor cuanto mejor; el título pesa 10 veces el texto
+                (-func.bm25(fts, 10.0, 1.0)).label('puntaje'),
+                func.highlight(fts, 0, inicio, fin).label('titulo'),
+                func.snippet(fts, 1, inicio, fin, ' … ', 24).label('fragmento'),
+            ).select_from(D).join(
+                _TABLA_FTS, _TABLA_FTS.c.rowid == D.id
+            ).where(fts.op('MATCH')(consulta))
+
+        if motor == 'postgresql':
+            if not tokenizar(texto):
+                return None
+            consulta = func.websearch_to_tsquery('spanish', texto)
+            vector = literal_column('busqueda_documentos.vector')
+            return select(
+                D.tipo, D.entidad_id,
+                func.ts_rank_cd(vector, consulta).label('puntaje'),
+                func.ts_headline('spanish', D.titulo, consulta,
+                                 f'StartSel={inicio}, StopSel={fin}, HighlightAll=true').label('titulo'),
+                func.ts_headline('spanish', func.coalesce(D.texto, ''), consulta,
+                                 f'StartSel={inicio}, StopSel={fin}, MaxFragments=2, MaxWords=30, MinWords=12, '
+                                 f'FragmentDelimiter=" … "').label('fragmento'),
+            ).where(vector.op('@@')(consulta))
+
+        # Otros motores: todas las palabras con LIKE, sin puntaje ni resaltado
+        terminos = tokenizar(texto)
+        if not terminos:
+            return None
+        return select(
+            D.tipo, D.entidad_id, literal_column('0').label('puntaje'),
+            D.titulo.label('titulo'), func.substr(D.texto, 1, 200).label('fragmento'),
+        ).where(*[or_(D.titulo.ilike(f'%{t}%'), D.texto.ilike(f'%{t}%')) for t in terminos])
+
+    @staticmethod
+    def resaltar(texto):
+        """HTML seguro con las coincidencias entre <mark>"""
+        seguro = str(escape(texto or ''))
+        return Markup(seguro.replace(BusquedaService._INICIO, '<mark>').replace(BusquedaService._FIN, '</mark>'))
+
+    @staticmethod
+    def buscar(texto, usuario, tipos=None, limite=None, desplazamiento=0):
+        """
+        Resultados ordenados por relevancia entre lo que el usuario puede ver
+
+        Returns:
+            [{'tipo', 'id', 'titulo', 'fragmento', 'puntaje', 'url'}]; titulo y fragmento
+            son Markup con las coincidencias en <mark>
+        """
+        from flask import url_for
+
+        tipos = [tipo for tipo in (tipos or BusquedaService.FUENTES) if tipo in BusquedaService.FUENTES]
+        limite = max(1, min(int(limite or BusquedaService.LIMITE_DEFECTO), BusquedaService.LIMITE_MAXIMO))
+        sentencia = BusquedaService._sentencia(texto or '')
+        visibles = BusquedaService._visibles(usuario, tipos)
+        if sentencia is None or visibles is None:
+            return []
+
+        filas = db.session.execute(
+            sentencia.where(visibles).order_by(desc('puntaje'), DocumentoBusqueda.id)
+            .limit(limite).offset(max(0, int(desplazamiento or 0)))
+        ).all()
+
+        # Los documentos se abren en la página de su consulta
+        documentos = [fila.entidad_id for fila in filas if fila.tipo == 'documento']
+        consulta_de = dict(db.session.query(DocumentoLegal.id, DocumentoLegal.consulta_id).filter(
+            DocumentoLegal.id.in_(documentos)
+        ).all()) if documentos else {}
+
+        resultados = []
+        for fila in filas:
+            if fila.tipo == 'reporte':
+                url = url_for('reportes.ver', id=fila.entidad_id)
+            elif fila.tipo == 'consulta':
+                url = url_for('juridico.detalle', id=fila.entidad_id)
+            else:
+                url = url_for('juridico.detalle', id=consulta_de[fila.entidad_id]) if fila.entidad_id in consulta_de else None
+            resultados.append({
+                'tipo': fila.tipo,
+                'id': fila.entidad_id,
+                'titulo': BusquedaService.resaltar(fila.titulo),
+                'fragmento': BusquedaService.resaltar(fila.fragmento),
+                'puntaje': float(fila.puntaje or 0),
+                'url': url,
+            })
+        return resultados
+
+
+# ============== ACTUALIZACIÓN INCREMENTAL ==============
+
+_TIPO_POR_MODELO = {modelo: tipo for tipo, (modelo, _, _) in BusquedaService.FUENTES.items()}
+
+
+def _entidad_creada(mapper, connection, objetivo):
+    tipo = _TIPO_POR_MODELO[mapper.class_]
+    BusquedaService.guardar(connection, tipo, objetivo.id, BusquedaService.valores(tipo, objetivo))
+
+
+def _entidad_actualizada(mapper, connection, objetivo):
+    tipo = _TIPO_POR_MODELO[mapper.class_]
+    titulo, textos = BusquedaService.campos(tipo)
+    estado = inspect(objetivo)
+    # Cambios de estado, fechas, etc. no tocan el índice
+    if any(estado.attrs[campo].history.has_changes() for campo in [titulo] + textos):
+        BusquedaService.guardar(connection, tipo, objetivo.id, BusquedaService.valores(tipo, objetivo))
+
+
+def _entidad_eliminada(mapper, connection, objetivo):
+    BusquedaService.quitar(connection, _TIPO_POR_MODELO[mapper.class_], objetivo.id)
+
+
+for _modelo in _TIPO_POR_MODELO:
+    event.listen(_modelo, 'after_insert', _entidad_creada)
+    event.listen(_modelo, 'after_update', _entidad_actualizada)
+    event.listen(_modelo, 'after_delete', _entidad_eliminada)
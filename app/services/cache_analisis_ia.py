@@ -0,0 +1,196 @@
+# app/services/cache_analisis_ia.py
+"""
+Caché de análisis de imágenes con IA
+
+Clave: (hash del contenido de la imagen, versión del prompt, modelo). Una
+foto reenviada o un reanálisis sin cambios de prompt/configuración no
+vuelve a pagar la llamada al modelo.
+
+Dos niveles:
+- memoria: LRU por proceso (SST_CACHE_IA_MEMORIA entradas)
+- base de datos: tabla analisis_ia_cache, compartida entre procesos y
+  persistente entre reinicios
+
+Si dos hilos piden a la vez el mismo análisis que no está en caché, solo
+uno llama al modelo y el otro espera su resultado. Solo se guardan
+análisis exitosos (sin clave "error").
+
+SST_CACHE_IA=false desactiva la caché; usar_cache=False la omite en una
+llamada (reanálisis forzado) pero guarda el resultado nuevo.
+"""
+
+from app import db
+from app.models import AnalisisIACache
+from collections import OrderedDict
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class CacheAnalisisIA:
+    """LRU en memoria sobre la tabla analisis_ia_cache"""
+
+    MAX_MEMORIA = int(os.getenv('SST_CACHE_IA_MEMORIA', '256'))
+
+    def __init__(self, max_memoria=None):
+        self.max_memoria = max_memoria or self.MAX_MEMORIA
+        self.activa = os.getenv('SST_CACHE_IA', 'true').lower() != 'false'
+        self._memoria = OrderedDict()  # (hash, version, modelo) -> resultado
+        self._lock = threading.Lock()
+        self._calculando = {}          # clave -> Lock del hilo que llama al modelo
+        self._metricas = dict.fromkeys(
+            ('aciertos_memoria', 'aciertos_bd', 'fallos', 'omitidas', 'escrituras', 'desalojos', 'errores_bd'), 0
+        )
+
+    @staticmethod
+    def version_prompt(prompt, config_ia=None):
+        """Huella del prompt y de la versión de la configuración IA"""
+        version_config = getattr(config_ia, 'version', None) if config_ia else None
+        return hashlib.sha256(f'{prompt}|{version_config}'.encode('utf-8')).hexdigest()[:32]
+
+    def _contar(self, metrica):
+        with self._lock:
+            self._metricas[metrica] += 1
+
+    # ============== MEMORIA ==============
+
+    def _leer_memoria(self, clave):
+        with self._lock:
+            resultado = self._memoria.get(clave)
+            if resultado is not None:
+                self._memoria.move_to_end(clave)
+            return resultado
+
+    def _escribir_memoria(self, clave, resultado):
+        with self._lock:
+            self._memoria[clave] = resultado
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+                self._metricas['desalojos'] += 1
+
+    def limpiar_memoria(self):
+        with self._lock:
+            self._memoria.clear()
+
+    # ============== BASE DE DATOS ==============
+
+    def _leer_bd(self, clave):
+        hash_imagen, version, modelo = clave
+        try:
+            return db.session.execute(
+                select(AnalisisIACache.resultado).where(
+                    AnalisisIACache.hash_imagen == hash_imagen,
+                    AnalisisIACache.version_prompt == version,
+                    AnalisisIACache.modelo == modelo
+                )
+            ).scalar()
+        except Exception as e:
+            logger.warning(f"⚠️ Caché IA: no se pudo leer la base de datos: {str(e)}")
+            self._contar('errores_bd')
+            return None
+
+    def _escribir_bd(self, clave, resultado, reemplazar=False):
+        """En su propia transacción: no depende del commit de quien llama"""
+        hash_imagen, version, modelo = clave
+        condicion = (
+            (AnalisisIACache.hash_imagen == hash_imagen) &
+            (AnalisisIACache.version_prompt == version) &
+            (AnalisisIACache.modelo == modelo)
+        )
+        try:
+            with db.engine.begin() as conexion:
+                if reemplazar:
+                    conexion.execute(AnalisisIACache.__table__.delete().where(condicion))
+                conexion.execute(insert(AnalisisIACache).values(
+                    hash_imagen=hash_imagen, version_prompt=version, modelo=modelo, resultado=resultado
+                ))
+        except IntegrityError:
+            pass  # Otro proceso lo guardó primero: mismo contenido, mismo análisis
+        except Exception as e:
+            logger.warning(f"⚠️ Caché IA: no se pudo guardar en la base de datos: {str(e)}")
+            self._contar('errores_bd')
+
+    # ============== API ==============
+
+    def obtener(self, hash_imagen, version, modelo):
+        """Resultado en caché (memoria y luego base de datos) o None"""
+        clave = (hash_imagen, version, modelo)
+        resultado = self._leer_memoria(clave)
+        if resultado is not None:
+            self._contar('aciertos_memoria')
+            return resultado
+
+        resultado = self._leer_bd(clave)
+        if resultado is not None:
+            self._contar('aciertos_bd')
+            self._escribir_memoria(clave, resultado)
+            return resultado
+        return None
+
+    def guardar(self, hash_imagen, version, modelo, resultado, reemplazar=False):
+        clave = (hash_imagen, version, modelo)
+        self._escribir_memoria(clave, resultado)
+        self._escribir_bd(clave, resultado, reemplazar=reemplazar)
+        self._contar('escrituras')
+
+    def resolver(self, hash_imagen, version, modelo, calcular, usar_cache=True):
+        """
+        Resultado en caché o el de calcular() (la llamada al modelo)
+
+        Args:
+            calcular: función sin argumentos que devuelve el análisis
+            usar_cache: False ignora lo guardado y reemplaza la entrada
+        """
+        if not self.activa:
+            return calcular()
+        if not usar_cache:
+            self._contar('omitidas')
+            resultado = calcular()
+            if 'error' not in resultado:
+                self.guardar(hash_imagen, version, modelo, resultado, reemplazar=True)
+            return resultado
+
+        resultado = self.obtener(hash_imagen, version, modelo)
+        if resultado is not None:
+            return resultado
+
+        clave = (hash_imagen, version, modelo)
+        with self._lock:
+            candado = self._calculando.setdefault(clave, threading.Lock())
+        try:
+            with candado:
+                # Si otro hilo lo calculó mientras esperábamos, ya está en memoria
+                resultado = self._leer_memoria(clave)
+                if resultado is not None:
+                    self._contar('aciertos_memoria')
+                    return resultado
+
+                self._contar('fallos')
+                resultado = calcular()
+                if 'error' not in resultado:
+                    self.guardar(hash_imagen, version, modelo, resultado)
+                return resultado
+        finally:
+            with self._lock:
+                if self._calculando.get(clave) is candado:
+                    self._calculando.pop(clave, None)
+
+    def metricas(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas['entradas_memoria'] = len(self._memoria)
+        consultas = metricas['aciertos_memoria'] + metricas['aciertos_bd'] + metricas['fallos']
+        metricas['tasa_aciertos'] = round(
+            (metricas['aciertos_memoria'] + metricas['aciertos_bd']) / consultas, 4
+        ) if consultas else 0.0
+        metricas['activa'] = self.activa
+        return metricas
+
+
+cache_analisis_ia = CacheAnalisisIA()
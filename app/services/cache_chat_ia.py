@@ -0,0 +1,122 @@
+# app/services/cache_chat_ia.py
+"""
+Caché de respuestas del chat experto SST
+
+Clave: forma normalizada de la pregunta (minúsculas, sin tildes, sin
+signos, sin palabras vacías, espacios colapsados) y la versión del prompt.
+"¿Qué dice la Resolución 0312?" y "que dice   la resolucion 0312" comparten
+respuesta. "no", "sin", "ni" y los interrogativos (cómo, cuándo, dónde,
+quién, cuál, qué) se conservan porque cambian el sentido de la pregunta.
+
+LRU en memoria por proceso con caducidad (SST_CACHE_CHAT_TTL_SEG) y
+tamaño máximo (SST_CACHE_CHAT_MAX entradas). La versión del prompt incluye
+la versión de la configuración IA y la base de conocimientos: al cambiar
+la normativa cargada las respuestas anteriores dejan de usarse en todos
+los procesos. invalidar() vacía además la caché del proceso al momento.
+
+SST_CACHE_CHAT=false la desactiva.
+"""
+
+from app.utils.texto import tokenizar, PALABRAS_VACIAS_PREGUNTA
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CacheChatIA:
+    """LRU con caducidad para chat_experto_sst"""
+
+    MAX_ENTRADAS = int(os.getenv('SST_CACHE_CHAT_MAX', '512'))
+    TTL_SEG = float(os.getenv('SST_CACHE_CHAT_TTL_SEG', '86400'))
+
+    def __init__(self, max_entradas=None, ttl_seg=None):
+        self.max_entradas = max_entradas or self.MAX_ENTRADAS
+        self.ttl_seg = ttl_seg or self.TTL_SEG
+        self.activa = os.getenv('SST_CACHE_CHAT', 'true').lower() != 'false'
+        self._entradas = OrderedDict()  # (pregunta normalizada, version) -> (respuesta, expira)
+        self._lock = threading.Lock()
+        self._metricas = dict.fromkeys(
+            ('aciertos', 'fallos', 'escrituras', 'desalojos', 'expiradas', 'invalidaciones'), 0
+        )
+
+    @staticmethod
+    def normalizar(pregunta):
+        """Pregunta en forma canónica para usarla como clave"""
+        return ' '.join(tokenizar(pregunta, PALABRAS_VACIAS_PREGUNTA))
+
+    @staticmethod
+    def version_prompt(prompt, modelo, config_ia=None):
+        """Huella de la plantilla del prompt, el modelo y la normativa configurada"""
+        version_config = getattr(config_ia, 'version', None) if config_ia else None
+        conocimientos = getattr(config_ia, 'base_conocimientos', None) if config_ia else None
+        return hashlib.sha256(
+            f'{prompt}|{modelo}|{version_config}|{conocimientos or ""}'.encode('utf-8')
+        ).hexdigest()[:32]
+
+    # ============== API ==============
+
+    def obtener(self, pregunta, version):
+        """Respuesta vigente o None"""
+        if not self.activa:
+            return None
+        clave = (self.normalizar(pregunta), version)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[1] <= time.monotonic():
+                del self._entradas[clave]
+                self._metricas['expiradas'] += 1
+                entrada = None
+            if entrada is None:
+                self._metricas['fallos'] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._metricas['aciertos'] += 1
+            return entrada[0]
+
+    def guardar(self, pregunta, version, respuesta):
+        normalizada = self.normalizar(pregunta)
+        if not self.activa or not normalizada or not respuesta:
+            return
+        with self._lock:
+            clave = (normalizada, version)
+            self._entradas[clave] = (respuesta, time.monotonic() + self.ttl_seg)
+            self._entradas.move_to_end(clave)
+            self._metricas['escrituras'] += 1
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._metricas['desalojos'] += 1
+
+    def resolver(self, pregunta, version, calcular):
+        """Respuesta en caché o la de calcular() (la llamada al modelo)"""
+        respuesta = self.obtener(pregunta, version)
+        if respuesta is not None:
+            return respuesta
+        respuesta = calcular()
+        self.guardar(pregunta, version, respuesta)
+        return respuesta
+
+    def invalidar(self):
+        """Vacía la caché (p. ej. al actualizar la normativa); devuelve cuántas entradas había"""
+        with self._lock:
+            entradas = len(self._entradas)
+            self._entradas.clear()
+            self._metricas['invalidaciones'] += 1
+        logger.info(f"🧹 Caché del chat IA invalidada ({entradas} respuestas)")
+        return entradas
+
+    def metricas(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas['entradas'] = len(self._entradas)
+        consultas = metricas['aciertos'] + metricas['fallos']
+        metricas['tasa_aciertos'] = round(metricas['aciertos'] / consultas, 4) if consultas else 0.0
+        metricas.update(activa=self.activa, max_entradas=self.max_entradas, ttl_seg=self.ttl_seg)
+        return metricas
+
+
+cache_chat_ia = CacheChatIA()
@@ -0,0 +1,215 @@
+# app/services/derivados_imagen.py
+"""
+Derivados de las evidencias fotográficas (miniatura y tamaño medio en WebP)
+
+Se generan la primera vez que alguien los pide y quedan en disco en
+SST_DIR_DERIVADOS/<2 primeros>/<clave>-<variante><lado>q<calidad>.webp:
+- la clave es el sha256 del nombre en el almacén de evidencias, o una
+  huella de ruta/tamaño/fecha para las imágenes anteriores
+- el lado y la calidad van en el nombre: cambiarlos no sirve derivados viejos
+
+La caché está acotada a SST_DERIVADOS_MAX_MB: al pasarse se borran los
+derivados usados hace más tiempo (cada uso actualiza la fecha del archivo,
+a lo sumo una vez por minuto). Sin Pillow, o si la imagen no se puede
+decodificar, obtener() devuelve None y se sirve el original.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CacheDerivados:
+    """Genera y guarda en disco las variantes reducidas de las evidencias (por proceso)"""
+
+    DIRECTORIO = os.getenv('SST_DIR_DERIVADOS', os.path.join('uploads', 'reportes', 'derivados'))
+    MAX_BYTES = int(float(os.getenv('SST_DERIVADOS_MAX_MB', '512')) * 1024 * 1024)
+
+    # Variante -> (lado mayor en px, calidad WebP)
+    VARIANTES = {
+        'miniatura': (320, 70),
+        'media': (1280, 80),
+    }
+
+    # Al pasarse de MAX_BYTES se recorta hasta esta fracción
+    FRACCION_RECORTE = 0.9
+
+    # Segundos mínimos entre dos actualizaciones de la fecha de uso de un derivado
+    INTERVALO_TOQUE = 60
+
+    def __init__(self, directorio=None, max_bytes=None):
+        self.directorio = directorio or self.DIRECTORIO
+        self.max_bytes = max_bytes or self.MAX_BYTES
+        self._lock = threading.Lock()
+        self._generando = {}   # ruta del derivado -> Lock (evita generar dos veces a la vez)
+        self._bytes = None     # tamaño de la caché; se mide al primer uso
+        self._metricas = dict.fromkeys(('aciertos', 'generados', 'fallidos', 'desalojos'), 0)
+
+    # ============== API ==============
+
+    def clave(self, original):
+        """sha256 del contenido si el nombre lo trae; si no, huella de ruta, tamaño y fecha"""
+        nombre = os.path.basename(original)
+        coincidencia = re.match(r'^([0-9a-f]{64})\.\w+$', nombre)
+        if coincidencia:
+            return coincidencia.group(1)
+        estado = os.stat(original)
+        return hashlib.sha256(
+            f'{os.path.abspath(original)}|{estado.st_size}|{estado.st_mtime_ns}'.encode('utf-8')
+        ).hexdigest()
+
+    def ruta(self, original, variante):
+        lado, calidad = self.VARIANTES[variante]
+        clave = self.clave(original)
+        return os.path.join(self.directorio, clave[:2], f'{clave}-{variante}{lado}q{calidad}.webp')
+
+    def obtener(self, original, variante):
+        """
+        Ruta del derivado, generándolo si aún no existe
+
+        Raises:
+            KeyError: variante desconocida
+            FileNotFoundError: no existe el original
+
+        Returns:
+            Ruta del .webp, o None si no se pudo generar (se sirve el original)
+        """
+        destino = self.ruta(original, variante)
+        if self._usar(destino):
+            return destino
+
+        with self._lock:
+            lock = self._generando.setdefault(destino, threading.Lock())
+        try:
+            with lock:
+                # Otro hilo pudo generarlo mientras se esperaba
+                if self._usar(destino):
+                    return destino
+                tamano = self._generar(original, destino, *self.VARIANTES[variante])
+        finally:
+            with self._lock:
+                self._generando.pop(destino, None)
+
+        if tamano is None:
+            self._contar('fallidos')
+            return None
+        self._contar('generados')
+        self._sumar(tamano)
+        return destino
+
+    def metricas(self):
+        with self._lock:
+            return {**self._metricas, 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+    def vaciar(self):
+        """Borra todos los derivados (se regeneran al pedirlos)"""
+        with self._lock:
+            for ruta, _, _ in self._archivos():
+                os.remove(ruta)
+            self._bytes = 0
+
+    # ============== INTERNOS ==============
+
+    def _usar(self, destino):
+        """True si el derivado existe; actualiza su fecha de uso para el desalojo"""
+        try:
+            modificado = os.stat(destino).st_mtime
+        except FileNotFoundError:
+            return False
+        if time.time() - modificado > self.INTERVALO_TOQUE:
+            try:
+                os.utime(destino)
+            except FileNotFoundError:
+                return False
+        self._contar('aciertos')
+        return True
+
+    def _contar(self, metrica):
+        with self._lock:
+            self._metricas[metrica] += 1
+
+    def _generar(self, original, destino, lado, calidad):
+        """Reduce y recodifica a WebP sin metadatos; escribe por temporal + rename"""
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            return None
+
+        try:
+            with Image.open(original) as imagen:
+                if imagen.format == 'JPEG':
+                    # Decodifica directamente a una escala reducida (1/2, 1/4, 1/8)
+                    imagen.draft('RGB', (lado, lado))
+                imagen = ImageOps.exif_transpose(imagen)
+                if imagen.mode not in ('RGB', 'RGBA'):
+                    imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() or imagen.mode == 'P' else 'RGB')
+                imagen.thumbnail((lado, lado), Image.LANCZOS)
+
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.parte')
+                try:
+                    with os.fdopen(descriptor, 'wb') as salida:
+                        imagen.save(salida, 'WEBP', quality=calidad, method=4)
+                    os.replace(temporal, destino)
+                except BaseException:
+                    os.remove(temporal)
+                    raise
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo generar el derivado de {original}: {str(e)}")
+            return None
+        return os.path.getsize(destino)
+
+    def _archivos(self):
+        """[(ruta, tamaño, fecha de uso)] de los derivados en disco"""
+        archivos = []
+        for raiz, _, nombres in os.walk(self.directorio):
+            for nombre in nombres:
+                if not nombre.endswith('.webp'):
+                    continue
+                ruta = os.path.join(raiz, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                archivos.append((ruta, estado.st_size, estado.st_mtime))
+        return archivos
+
+    def _sumar(self, tamano):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(t for _, t, _ in self._archivos())
+            else:
+                self._bytes += tamano
+            if self._bytes > self.max_bytes:
+                self._recortar()
+
+    def _recortar(self):
+        """Borra los menos usados hasta quedar en FRACCION_RECORTE del máximo (con el lock tomado)"""
+        archivos = sorted(self._archivos(), key=lambda archivo: archivo[2])
+        total = sum(t for _, t, _ in archivos)
+        objetivo = self.max_bytes * self.FRACCION_RECORTE
+        desalojados = 0
+        for ruta, tamano, _ in archivos:
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tamano
+            desalojados += 1
+        self._bytes = total
+        self._metricas['desalojos'] += desalojados
+        if desalojados:
+            logger.info(f"🧹 Derivados: {desalojados} desalojados, caché en {total // 1024} KB")
+
+
+cache_derivados = CacheDerivados()
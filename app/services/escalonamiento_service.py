@@ -0,0 +1,554 @@
+# app/services/escalonamiento_service.py
+"""
+Línea de tiempo de escalamiento basada en PasoEscalonamiento
+
+Al asignar un reporte se calculan de una vez todas las fechas de los pasos
+configurados y se guardan en acciones_programadas. El temporizador
+(app/tasks/temporizador.py) despierta exactamente a la hora de la próxima
+acción en lugar de recorrer gestion_reportes cada 5 minutos.
+"""
+
+from app import db
+from app.models import (
+    AccionProgramada, GestionReporte, ReglasEscalonamiento, PasoEscalonamiento,
+    TareaGestion, HistorialGestion, Notificacion, Usuario
+)
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+from sqlalchemy.orm import selectinload
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EscalonamientoService:
+    """Programa y ejecuta las acciones de escalamiento de cada gestión"""
+
+    # Aviso de vencimiento crítico: minutos antes del vencimiento de resolución
+    MINUTOS_AVISO_CRITICO = 30
+
+    TIPO_ESCALONAMIENTO = 'ESCALONAMIENTO'
+    TIPO_AVISO_CRITICO = 'AVISO_CRITICO'
+    TIPO_VENCIMIENTO_RESOLUCION = 'VENCIMIENTO_RESOLUCION'
+
+    # Acciones por transacción en el escalamiento masivo
+    TAMANO_LOTE = 1000
+
+    # ============== PROGRAMACIÓN ==============
+
+    @staticmethod
+    def resolver_regla(reporte, reglas=None):
+        """
+        Regla de escalamiento que aplica al reporte según su nivel de riesgo
+        (severidad_calculada dentro de nivel_riesgo_minimo..nivel_riesgo_maximo)
+
+        Args:
+            reglas: reglas activas ya cargadas (asignación en lote)
+        """
+        if reglas is None:
+            reglas = EscalonamientoService.reglas_activas()
+        valor = getattr(reporte, 'severidad_calculada', None)
+
+        generica = None
+        for regla in reglas:
+            sin_rango = regla.nivel_riesgo_minimo is None and regla.nivel_riesgo_maximo is None
+            if sin_rango:
+                generica = generica or regla
+                continue
+            if valor is None:
+                continue
+            if regla.nivel_riesgo_minimo is not None and valor < regla.nivel_riesgo_minimo:
+                continue
+            if regla.nivel_riesgo_maximo is not None and valor > regla.nivel_riesgo_maximo:
+                continue
+            return regla
+
+        return generica
+
+    @staticmethod
+    def reglas_activas():
+        return ReglasEscalonamiento.query.filter_by(activo=True).order_by(ReglasEscalonamiento.id).all()
+
+    @staticmethod
+    def pasos_regla(regla):
+        """Pasos activos de una regla en orden"""
+        if not regla:
+            return []
+        return regla.escalamientos.filter_by(activo=True).order_by(PasoEscalonamiento.numero_paso).all()
+
+    @staticmethod
+    def calcular_linea_tiempo(gestion, regla=None, pasos=None):
+        """
+        Calcula (sin guardar) las acciones programadas de una gestión
+
+        Los minutos_delay de cada paso son relativos al paso anterior, así que
+        las fechas se acumulan desde la fecha de asignación.
+
+        Args:
+            pasos: pasos de la regla ya cargados (asignación en lote)
+        """
+        base = gestion.fecha_asignacion or datetime.utcnow()
+        acciones = []
+
+        if pasos is None:
+            pasos = EscalonamientoService.pasos_regla(regla)
+
+        if pasos:
+            fecha = base
+            for paso in pasos:
+                fecha = fecha + timedelta(minutes=paso.minutos_delay or 0)
+                acciones.append(AccionProgramada(
+                    gestion_reporte_id=gestion.id,
+                    paso_escalonamiento_id=paso.id,
+                    tipo=EscalonamientoService.TIPO_ESCALONAMIENTO,
+                    numero_paso=paso.numero_paso,
+                    rol_destino=paso.rol_destino,
+                    enviar_notificacion=paso.enviar_notificacion,
+                    crear_tarea=paso.crear_tarea,
+                    next_action_at=fecha
+                ))
+        elif gestion.fecha_vencimiento_respuesta:
+            # Sin pasos configurados: un escalamiento al vencer la respuesta
+            # (rol según rol_backup_1 / rol_backup_2 de GestorResponsabilidades)
+            acciones.append(AccionProgramada(
+                gestion_reporte_id=gestion.id,
+                tipo=EscalonamientoService.TIPO_ESCALONAMIENTO,
+                numero_paso=1,
+                next_action_at=gestion.fecha_vencimiento_respuesta
+            ))
+
+        if gestion.fecha_vencimiento_resolucion:
+            aviso = gestion.fecha_vencimiento_resolucion - timedelta(minutes=EscalonamientoService.MINUTOS_AVISO_CRITICO)
+            acciones.append(AccionProgramada(
+                gestion_reporte_id=gestion.id,
+                tipo=EscalonamientoService.TIPO_AVISO_CRITICO,
+                next_action_at=max(aviso, base)
+            ))
+            acciones.append(AccionProgramada(
+                gestion_reporte_id=gestion.id,
+                tipo=EscalonamientoService.TIPO_VENCIMIENTO_RESOLUCION,
+                next_action_at=gestion.fecha_vencimiento_resolucion
+            ))
+
+        return acciones
+
+    @staticmethod
+    def programar_linea_tiempo(gestion, reporte=None, commit=True):
+        """
+        Guarda la línea de tiempo de una gestión recién asignada y avisa al temporizador
+
+        Returns:
+            Lista de AccionProgramada creadas
+        """
+        reporte = reporte or gestion.reporte
+        regla = EscalonamientoService.resolver_regla(reporte) if reporte else None
+        acciones = EscalonamientoService.calcular_linea_tiempo(gestion, regla)
+
+        if not acciones:
+            return []
+
+        db.session.add_all(acciones)
+        gestion.fecha_proximo_escalamiento = min(a.next_action_at for a in acciones)
+
+        if commit:
+            db.session.commit()
+            EscalonamientoService._avisar_temporizador(acciones)
+
+        return acciones
+
+    @staticmethod
+    def cancelar_pendientes(gestion_id, tipos=None, commit=True):
+        """Cancela las acciones pendientes de una gestión (todas o de ciertos tipos)"""
+        query = AccionProgramada.query.filter(
+            AccionProgramada.gestion_reporte_id == gestion_id,
+            AccionProgramada.estado == 'Pendiente'
+        )
+        if tipos:
+            query = query.filter(AccionProgramada.tipo.in_(tipos))
+
+        canceladas = query.update({
+            'estado': 'Cancelada',
+            'fecha_ejecucion': datetime.utcnow()
+        }, synchronize_session=False)
+
+        EscalonamientoService.actualizar_proximo(gestion_id)
+
+        if commit:
+            db.session.commit()
+        return canceladas
+
+    @staticmethod
+    def actualizar_proximo(gestion_id):
+        """Sincroniza GestionReporte.fecha_proximo_escalamiento con la próxima acción pendiente"""
+        proxima = db.session.query(db.func.min(AccionProgramada.next_action_at)).filter(
+            AccionProgramada.gestion_reporte_id == gestion_id,
+            AccionProgramada.estado == 'Pendiente'
+        ).scalar()
+
+        GestionReporte.query.filter_by(id=gestion_id).update(
+            {'fecha_proximo_escalamiento': proxima}, synchronize_session=False
+        )
+        return proxima
+
+    @staticmethod
+    def _avisar_temporizador(acciones):
+        """Empuja las acciones nuevas al temporizador en memoria (si corre en este proceso)"""
+        try:
+            from app.tasks.temporizador import temporizador
+            for accion in acciones:
+                temporizador.programar(accion.id, accion.next_action_at)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo avisar al temporizador: {str(e)}")
+
+    # ============== EJECUCIÓN ==============
+
+    @staticmethod
+    def proximas_pendientes(hasta, limite=500):
+        """(id, next_action_at) de acciones pendientes hasta una fecha, vía índice"""
+        return db.session.query(AccionProgramada.id, AccionProgramada.next_action_at).filter(
+            AccionProgramada.estado == 'Pendiente',
+            AccionProgramada.next_action_at <= hasta
+        ).order_by(AccionProgramada.next_action_at).limit(limite).all()
+
+    @staticmethod
+    def _reclamar(accion_id):
+        """
+        Marca la acción como ejecutada solo si sigue pendiente
+        Evita que dos procesos ejecuten la misma acción
+        """
+        reclamadas = AccionProgramada.query.filter_by(id=accion_id, estado='Pendiente').update({
+            'estado': 'Ejecutada',
+            'fecha_ejecucion': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return reclamadas == 1
+
+    @staticmethod
+    def ejecutar_accion(accion_id):
+        """
+        Ejecuta una sola acción programada vencida (commit por acción)
+        El temporizador y verificar_vencimientos usan ejecutar_lote
+
+        Returns:
+            True si escaló o notificó, False si la acción ya no aplicaba
+        """
+        from app.services.gestion_reportes_service import GestionReportesService
+        from app.services.notificaciones import NotificacionService
+
+        if not EscalonamientoService._reclamar(accion_id):
+            return False
+
+        accion = db.session.get(AccionProgramada, accion_id)
+        gestion = accion.gestion_reporte
+        resultado = False
+
+        if not gestion or not gestion.activo or gestion.fecha_resolucion:
+            accion.resultado = 'Gestión resuelta o inactiva'
+
+        elif accion.tipo == EscalonamientoService.TIPO_ESCALONAMIENTO:
+            if gestion.fecha_respuesta:
+                accion.resultado = 'Gestor ya respondió'
+            else:
+                resultado = GestionReportesService.escalonar_automatico(
+                    gestion.id,
+                    rol_destino=accion.rol_destino,
+                    crear_tarea=accion.crear_tarea,
+                    enviar_notificacion=accion.enviar_notificacion
+                )
+                accion.resultado = 'Escalado' if resultado else 'Sin gestor para escalar'
+
+        elif accion.tipo == EscalonamientoService.TIPO_AVISO_CRITICO:
+            resultado = NotificacionService.enviar_vencimiento_critico(gestion)
+            accion.resultado = 'Aviso enviado' if resultado else 'Aviso no enviado'
+
+        elif accion.tipo == EscalonamientoService.TIPO_VENCIMIENTO_RESOLUCION:
+            resultado = GestionReportesService.escalonar_automatico(gestion.id)
+            accion.resultado = 'Escalado' if resultado else 'Sin gestor para escalar'
+
+        if gestion:
+            EscalonamientoService.actualizar_proximo(gestion.id)
+        db.session.commit()
+
+        return bool(resultado)
+
+    @staticmethod
+    def ejecutar_vencidas(limite=None):
+        """
+        Ejecuta en lote todas las acciones cuya hora ya pasó
+        Consulta por índice (estado, next_action_at): no recorre gestion_reportes
+
+        Args:
+            limite: máximo de acciones a procesar en esta pasada (None = todas)
+
+        Returns:
+            Número de acciones que escalaron o notificaron
+        """
+        ahora = datetime.utcnow()
+        ejecutadas = 0
+        procesadas = 0
+
+        while limite is None or procesadas < limite:
+            tamano = EscalonamientoService.TAMANO_LOTE
+            if limite is not None:
+                tamano = min(tamano, limite - procesadas)
+
+            ids = [accion_id for accion_id, _ in EscalonamientoService.proximas_pendientes(ahora, tamano)]
+            if not ids:
+                break
+            procesadas += len(ids)
+
+            try:
+                ejecutadas += EscalonamientoService.ejecutar_lote(ids)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"❌ Error ejecutando lote de {len(ids)} acciones: {str(e)}", exc_info=True)
+                break
+
+        return ejecutadas
+
+    @staticmethod
+    def _reclamar_lote(accion_ids):
+        """
+        Marca como ejecutadas las acciones que sigan pendientes (sin commit)
+        Con RETURNING solo se devuelven las que este proceso reclamó
+        """
+        ahora = datetime.utcnow()
+        stmt = update(AccionProgramada).where(
+            AccionProgramada.id.in_(accion_ids),
+            AccionProgramada.estado == 'Pendiente'
+        ).values(estado='Ejecutada', fecha_ejecucion=ahora).execution_options(synchronize_session=False)
+
+        if db.engine.dialect.update_returning:
+            return list(db.session.execute(stmt.returning(AccionProgramada.id)).scalars())
+
+        pendientes = list(db.session.execute(
+            db.select(AccionProgramada.id).where(
+                AccionProgramada.id.in_(accion_ids),
+                AccionProgramada.estado == 'Pendiente'
+            ).with_for_update()
+        ).scalars())
+        db.session.execute(stmt)
+        return pendientes
+
+    @staticmethod
+    def _actualizar_proximos(gestion_ids):
+        """fecha_proximo_escalamiento de varias gestiones en un solo UPDATE"""
+        proxima = db.select(db.func.min(AccionProgramada.next_action_at)).where(
+            AccionProgramada.gestion_reporte_id == GestionReporte.id,
+            AccionProgramada.estado == 'Pendiente'
+        ).scalar_subquery()
+
+        db.session.execute(
+            update(GestionReporte).where(GestionReporte.id.in_(gestion_ids))
+            .values(fecha_proximo_escalamiento=proxima)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _datos_notificaciones(avisos, escalamientos):
+        """
+        Filas del outbox para los avisos críticos y escalamientos de un lote
+
+        Args:
+            avisos, escalamientos: listas de (gestion, usuario_id destino)
+        """
+        from app.services.notificaciones import NotificacionService
+
+        usuario_ids = {usuario_id for _, usuario_id in avisos + escalamientos if usuario_id}
+        if not usuario_ids:
+            return []
+        emails = dict(db.session.query(Usuario.id, Usuario.email).filter(Usuario.id.in_(usuario_ids)))
+
+        candidatas = []
+        for pendientes, contenidos, tipo, entidad in (
+            (avisos, NotificacionService.contenidos_vencimiento_critico, 'VENCIMIENTO_CRITICO',
+             lambda gestion: f'gestion:{gestion.id}'),
+            (escalamientos, NotificacionService.contenidos_escalonamiento, 'ESCALONAMIENTO',
+             NotificacionService.entidad_escalonamiento),
+        ):
+            pendientes = [(gestion, emails[usuario_id]) for gestion, usuario_id in pendientes if emails.get(usuario_id)]
+            if not pendientes:
+                continue
+            try:
+                # Un solo render en lote con la plantilla compilada
+                armadas = contenidos([gestion for gestion, _ in pendientes])
+            except Exception:
+                # Una gestión con datos rotos no debe tumbar al resto: una por una
+                armadas = []
+                for gestion, _ in pendientes:
+                    try:
+                        armadas.extend(contenidos([gestion]))
+                    except Exception as e:
+                        logger.error(f"❌ Error armando notificación {tipo} de gestión {gestion.id}: {str(e)}")
+                        armadas.append(None)
+            for (gestion, email), armada in zip(pendientes, armadas):
+                if armada is None:
+                    continue
+                asunto, html = armada
+                candidatas.append(NotificacionService.datos_notificacion(
+                    email, asunto, html, tipo, entidad(gestion)
+                ))
+
+        # Deduplicación: una consulta para todo el lote y un set para las repetidas dentro de él
+        vistas = NotificacionService.claves_recientes(fila['clave_dedup'] for fila in candidatas)
+        filas = []
+        for fila in candidatas:
+            if fila['clave_dedup']:
+                if fila['clave_dedup'] in vistas:
+                    continue
+                vistas.add(fila['clave_dedup'])
+            filas.append(fila)
+        return filas
+
+    @staticmethod
+    def ejecutar_lote(accion_ids):
+        """
+        Ejecuta un lote de acciones vencidas en una sola transacción
+
+        - Reclama las acciones con un UPDATE condicional
+        - Carga gestiones y reportes en una consulta (selectinload)
+        - Resuelve usuarios destino con el índice de AsignacionService (sin consultar por gestión)
+        - Inserta las TareaGestion, los eventos de historial y las
+          notificaciones del outbox en lote, en la misma transacción
+
+        Returns:
+            Número de acciones que escalaron o notificaron
+        """
+        from app.services.asignacion_service import AsignacionService
+        from app.services.gestion_reportes_service import GestionReportesService
+
+        if not accion_ids:
+            return 0
+
+        reclamadas = EscalonamientoService._reclamar_lote(accion_ids)
+        if not reclamadas:
+            db.session.commit()
+            return 0
+
+        acciones = db.session.query(
+            AccionProgramada.id, AccionProgramada.gestion_reporte_id, AccionProgramada.tipo,
+            AccionProgramada.rol_destino, AccionProgramada.crear_tarea, AccionProgramada.enviar_notificacion
+        ).filter(
+            AccionProgramada.id.in_(reclamadas)
+        ).order_by(AccionProgramada.next_action_at, AccionProgramada.id).all()
+
+        gestion_ids = {accion.gestion_reporte_id for accion in acciones}
+        gestiones = {
+            gestion.id: gestion
+            for gestion in GestionReporte.query.options(
+                selectinload(GestionReporte.reporte),
+                selectinload(GestionReporte.gestor_responsabilidad)
+            ).filter(GestionReporte.id.in_(gestion_ids))
+        }
+
+        resultados = defaultdict(list)
+        escaladas = {}
+        tareas = []
+        eventos = []
+        avisos = []
+        escalamientos = []
+        ejecutadas = 0
+
+        for accion in acciones:
+            gestion = gestiones.get(accion.gestion_reporte_id)
+
+            if not gestion or not gestion.activo or gestion.fecha_resolucion:
+                resultados['Gestión resuelta o inactiva'].append(accion.id)
+                continue
+
+            if accion.tipo == EscalonamientoService.TIPO_AVISO_CRITICO:
+                avisos.append((gestion, gestion.gestor_actual_id))
+                resultados['Aviso en cola'].append(accion.id)
+                ejecutadas += 1
+                continue
+
+            if accion.tipo == EscalonamientoService.TIPO_ESCALONAMIENTO:
+                if gestion.fecha_respuesta:
+                    resultados['Gestor ya respondió'].append(accion.id)
+                    continue
+                rol_destino = GestionReportesService.rol_escalamiento(gestion, accion.rol_destino)
+            else:
+                rol_destino = GestionReportesService.rol_escalamiento(gestion)
+
+            destino = AsignacionService.seleccionar_gestor(
+                rol_destino, registrar_tarea=accion.crear_tarea is not False
+            )
+            if not destino:
+                resultados['Sin gestor para escalar'].append(accion.id)
+                continue
+
+            usuario_id, nombre = destino
+            GestionReportesService.aplicar_escalamiento(gestion, usuario_id, nombre, rol_destino, eventos)
+            escaladas[gestion.id] = gestion
+            resultados['Escalado'].append(accion.id)
+            ejecutadas += 1
+
+            if accion.crear_tarea is not False:
+                tareas.append(GestionReportesService.datos_tarea(gestion, usuario_id, gestion.reporte))
+            if accion.enviar_notificacion is not False:
+                escalamientos.append((gestion, usuario_id))
+
+        # Correos al outbox: un solo SELECT de emails y el HTML se arma con las
+        # gestiones ya cargadas (después de aplicar el escalamiento)
+        notificaciones = EscalonamientoService._datos_notificaciones(avisos, escalamientos)
+
+        # Escritura en lote: UPDATE por clave primaria (executemany) en lugar
+        # del flush objeto por objeto de la sesión
+        cambios = [
+            {
+                'id': gestion.id,
+                'numero_escalamiento': gestion.numero_escalamiento,
+                'gestor_actual_id': gestion.gestor_actual_id,
+                'rol_gestor': gestion.rol_gestor,
+                'escalado_a_id': gestion.escalado_a_id,
+                'estado': gestion.estado
+            }
+            for gestion in escaladas.values()
+        ]
+        for gestion in gestiones.values():
+            db.session.expunge(gestion)
+
+        if cambios:
+            db.session.execute(update(GestionReporte), cambios)
+        for resultado, ids in resultados.items():
+            db.session.execute(
+                update(AccionProgramada).where(AccionProgramada.id.in_(ids))
+                .values(resultado=resultado).execution_options(synchronize_session=False)
+            )
+        if tareas:
+            db.session.execute(insert(TareaGestion), tareas)
+        if eventos:
+            db.session.execute(insert(HistorialGestion), eventos)
+        if notificaciones:
+            db.session.execute(insert(Notificacion), notificaciones)
+        EscalonamientoService._actualizar_proximos(gestion_ids)
+        db.session.commit()
+
+        if ejecutadas:
+            logger.info(f"✅ Lote de escalamiento: {ejecutadas}/{len(acciones)} acciones, "
+                        f"{len(tareas)} tareas, {len(notificaciones)} notificaciones en cola")
+        return ejecutadas
+
+    @staticmethod
+    def programar_gestiones_sin_linea_tiempo(desde_id=0, limite=1000):
+        """
+        Backfill: programa la línea de tiempo de gestiones activas creadas
+        antes de que existieran las acciones programadas
+
+        Returns:
+            (gestiones revisadas, último id) para continuar desde ahí
+        """
+        con_acciones = db.session.query(AccionProgramada.gestion_reporte_id)
+        gestiones = GestionReporte.query.filter(
+            GestionReporte.id > desde_id,
+            GestionReporte.activo == True,
+            GestionReporte.fecha_resolucion == None,
+            ~GestionReporte.id.in_(con_acciones)
+        ).order_by(GestionReporte.id).limit(limite).all()
+
+        for gestion in gestiones:
+            EscalonamientoService.programar_linea_tiempo(gestion, commit=False)
+        db.session.commit()
+
+        return len(gestiones), (gestiones[-1].id if gestiones else desde_id)
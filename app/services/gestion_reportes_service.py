@@ -1,11 +1,18 @@
 from app import db
 from app.models import (
     GestionReporte, GestorResponsabilidades, TareaGestion, Usuario,
-    CondicionInsegura, NivelRiesgo, MatrizRiesgos
+    CondicionInsegura, NivelRiesgo, MatrizRiesgos, HistorialGestion, Notificacion
 )
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, insert
 from app.services.notificaciones import NotificacionService
+from app.services.plantillas_correo import plantillas_correo
+from app.services.escalonamiento_service import EscalonamientoService
+from app.services.asignacion_service import AsignacionService
+from app.services.responsabilidades_service import ResponsabilidadesService
+import logging
+
+logger = logging.getLogger(__name__)
 
 class GestionReportesService:
     """Servicio para gestionar automáticamente los reportes SST"""
@@ -16,51 +23,30 @@ class GestionReportesService:
         Asigna automáticamente un reporte al gestor correcto basado en:
         1. Tipo de reporte
         2. Nivel de riesgo (probabilidad x severidad)
-        3. GestorResponsabilidades configurado
+        3. Departamento
+        según la regla de GestorResponsabilidades más específica
         """
         reporte = CondicionInsegura.query.get(reporte_id)
         if not reporte:
             return None
         
-        # Obtener tipo de reporte e información
-        tipo_reporte = reporte.tipo_reporte_obj
-        tipo_evidencia = reporte.tipo_evidencia_obj
-        
-        # Buscar configuración de gestor responsable
-        gestor_config = GestorResponsabilidades.query.filter_by(
-            tipo_reporte_id=reporte.tipo_reporte_id,
-            activo=True
-        ).first()
-        
-        if not gestor_config:
-            # Fallback: buscar por nivel de riesgo si existe
-            gestor_config = GestorResponsabilidades.query.filter(
-                GestorResponsabilidades.tipo_reporte_id == None,
-                GestorResponsabilidades.activo == True
-            ).first()
+        # Regla más específica por tipo de reporte, nivel de riesgo y departamento
+        # (tabla compilada en memoria, ver ResponsabilidadesService)
+        gestor_config = ResponsabilidadesService.resolver_reporte(reporte)
         
         if not gestor_config:
             return None  # No hay configuración
         
-        # Buscar usuario con rol principal
-        gestor_principal = Usuario.query.filter_by(
-            rol=gestor_config.rol_principal,
-            activo=True
-        ).first()
+        # Buscar usuario con rol principal (índice en memoria, reparte la carga)
+        gestor_principal = AsignacionService.seleccionar_usuario(gestor_config.rol_principal)
         
         if not gestor_principal:
             # Si no hay, usar backup
-            gestor_principal = Usuario.query.filter_by(
-                rol=gestor_config.rol_backup_1,
-                activo=True
-            ).first()
+            gestor_principal = AsignacionService.seleccionar_usuario(gestor_config.rol_backup_1)
         
         if not gestor_principal:
             # Último recurso: cualquier admin
-            gestor_principal = Usuario.query.filter_by(
-                rol='Admin',
-                activo=True
-            ).first()
+            gestor_principal = AsignacionService.seleccionar_usuario('Admin')
         
         if not gestor_principal:
             return None  # No hay gestor disponible
@@ -89,46 +75,204 @@ class GestionReportesService:
         )
         
         db.session.add(gestion)
-        db.session.commit()
+        db.session.flush()
         
-        # Crear tarea
-        GestionReportesService.crear_tarea(gestion, gestor_principal)
-        
-        # Enviar notificación
+        # Notificaciones al outbox: se guardan en la misma transacción que la
+        # gestión y el sst-worker las envía después
         NotificacionService.enviar_asignacion_reporte(gestion, gestor_principal)
         
         # Notificar a roles adicionales si aplica
         if gestor_config.notificar_roles:
             NotificacionService.notificar_cc_roles(gestion, gestor_config.notificar_roles)
         
+        # Programar la línea de tiempo de escalamiento (PasoEscalonamiento)
+        acciones = EscalonamientoService.programar_linea_tiempo(gestion, reporte, commit=False)
+        
+        # Crear tarea
+        GestionReportesService.crear_tarea(gestion, gestor_principal, commit=False)
+        
+        # Un solo commit: gestión, outbox, línea de tiempo y tarea, o nada
+        db.session.commit()
+        EscalonamientoService._avisar_temporizador(acciones)
+        
         return gestion
+
+    @staticmethod
+    def asignar_lote(reporte_ids):
+        """
+        Asignación automática de un lote de reportes en una sola transacción
+        (sin commit; la usa la etapa de ingesta, app/tasks/ingesta_reportes.py)
+
+        Mismas reglas que asignar_reporte, pero:
+        - reportes, departamentos, reglas de escalamiento y emails se cargan
+          una vez por lote
+        - gestiones y acciones programadas se insertan juntas; tareas, eventos
+          de historial y notificaciones del outbox en lote
+        - un reporte que ya tiene gestión no se vuelve a asignar
+
+        Returns:
+            ({reporte_id: gestion_id o None si no hay gestor}, acciones programadas)
+            Los reportes que no existen no aparecen en el diccionario
+        """
+        if not reporte_ids:
+            return {}, []
+
+        reportes = CondicionInsegura.query.filter(CondicionInsegura.id.in_(reporte_ids)).order_by(CondicionInsegura.id).all()
+        resultados = dict(db.session.query(GestionReporte.reporte_id, db.func.min(GestionReporte.id)).filter(
+            GestionReporte.reporte_id.in_(reporte_ids)
+        ).group_by(GestionReporte.reporte_id).all())
+        reportes = [reporte for reporte in reportes if reporte.id not in resultados]
+
+        departamentos = ResponsabilidadesService.departamentos_reportadores(reportes)
+        reglas = EscalonamientoService.reglas_activas()
+        pasos = {}
+
+        nuevas = []  # (reporte, gestion, config, usuario_id, nombre, acciones)
+        for reporte in reportes:
+            gestor_config = ResponsabilidadesService.resolver_reporte(reporte, departamentos)
+            destino = None
+            if gestor_config:
+                destino = (AsignacionService.seleccionar_gestor(gestor_config.rol_principal) or
+                           AsignacionService.seleccionar_gestor(gestor_config.rol_backup_1) or
+                           AsignacionService.seleccionar_gestor('Admin'))
+            if not destino:
+                resultados[reporte.id] = None
+                continue
+
+            usuario_id, nombre = destino
+            gestion = GestionReporte(
+                reporte_id=reporte.id,
+                gestor_actual_id=usuario_id,
+                rol_gestor=gestor_config.rol_principal,
+                gestor_responsabilidad_id=gestor_config.id,
+                estado='Asignado',
+                fecha_asignacion=datetime.utcnow()
+            )
+            gestion.calcular_vencimientos(
+                gestor_config.tiempo_respuesta_minutos,
+                gestor_config.tiempo_resolucion_minutos
+            )
+
+            regla = EscalonamientoService.resolver_regla(reporte, reglas)
+            if regla and regla.id not in pasos:
+                pasos[regla.id] = EscalonamientoService.pasos_regla(regla)
+            acciones = EscalonamientoService.calcular_linea_tiempo(
+                gestion, regla, pasos.get(regla.id) if regla else []
+            )
+            if acciones:
+                gestion.fecha_proximo_escalamiento = min(a.next_action_at for a in acciones)
+            nuevas.append((reporte, gestion, gestor_config, usuario_id, nombre, acciones))
+
+        if not nuevas:
+            return resultados, []
+
+        # Un INSERT por tabla para todo el lote (con RETURNING de los ids)
+        db.session.add_all([gestion for _, gestion, _, _, _, _ in nuevas])
+        db.session.flush()
+        programadas = []
+        for _, gestion, _, _, _, acciones in nuevas:
+            for accion in acciones:
+                accion.gestion_reporte_id = gestion.id
+            programadas.extend(acciones)
+        db.session.add_all(programadas)
+        db.session.flush()
+
+        eventos = []
+        tareas = []
+        for reporte, gestion, _, usuario_id, nombre, _ in nuevas:
+            evento = GestionReporte.datos_evento(
+                usuario_id, 'ASIGNACION_AUTOMATICA', f'Asignado automáticamente a {nombre}'
+            )
+            evento['gestion_reporte_id'] = gestion.id
+            eventos.append(evento)
+            tareas.append(GestionReportesService.datos_tarea(gestion, usuario_id, reporte))
+            resultados[reporte.id] = gestion.id
+
+        db.session.execute(insert(HistorialGestion), eventos)
+        db.session.execute(insert(TareaGestion), tareas)
+        notificaciones = GestionReportesService._datos_notificaciones_asignacion(nuevas)
+        if notificaciones:
+            db.session.execute(insert(Notificacion), notificaciones)
+
+        return resultados, programadas
+
+    @staticmethod
+    def _datos_notificaciones_asignacion(nuevas):
+        """Filas del outbox (gestor asignado y roles en copia) de un lote de asignaciones"""
+        usuario_ids = {usuario_id for _, _, _, usuario_id, _, _ in nuevas}
+        roles_cc = {rol for _, _, config, _, _, _ in nuevas for rol in (config.notificar_roles or [])}
+        emails = dict(db.session.query(Usuario.id, Usuario.email).filter(Usuario.id.in_(usuario_ids)))
+        por_rol = {}
+        if roles_cc:
+            for rol, email in db.session.query(Usuario.rol, Usuario.email).filter(
+                Usuario.rol.in_(roles_cc), Usuario.activo == True
+            ):
+                por_rol.setdefault(rol, []).append(email)
+
+        candidatas = []
+        for reporte, gestion, config, usuario_id, _, _ in nuevas:
+            try:
+                contexto = NotificacionService.contexto_gestion(gestion)
+                if emails.get(usuario_id):
+                    candidatas.append(NotificacionService.datos_notificacion(
+                        emails[usuario_id],
+                        f"[SST-ASIGNADO] {reporte.numero_reporte} - {reporte.titulo}",
+                        plantillas_correo.renderizar('reporte_asignado.html', **contexto),
+                        'ASIGNACION', f'gestion:{gestion.id}'
+                    ))
+                destinatarios = {email.lower(): email for rol in (config.notificar_roles or [])
+                                 for email in por_rol.get(rol, []) if email}
+                if destinatarios:
+                    asunto = f"[SST-CC] {reporte.numero_reporte} - Notificación de seguimiento"
+                    html = plantillas_correo.renderizar('cc_seguimiento.html', **contexto)
+                    candidatas.extend(
+                        NotificacionService.datos_notificacion(email, asunto, html, 'CC', f'gestion:{gestion.id}:{gestion.estado}')
+                        for email in destinatarios.values()
+                    )
+            except Exception as e:
+                # Una gestión con datos rotos no debe dejar sin asignar al resto del lote
+                logger.error(f"❌ Error armando notificaciones de la gestión {gestion.id}: {str(e)}")
+
+        vistas = NotificacionService.claves_recientes(fila['clave_dedup'] for fila in candidatas)
+        return [fila for fila in candidatas if fila['clave_dedup'] not in vistas]
+
+    @staticmethod
+    def crear_tarea(gestion, usuario, commit=True):
+        """Crea una tarea para el gestor (commit=False la deja en la transacción del llamador)"""
+        tarea = TareaGestion(**GestionReportesService.datos_tarea(gestion, usuario.id))
+        
+        db.session.add(tarea)
+        if commit:
+            db.session.commit()
+        
+        return tarea
     
     @staticmethod
-    def crear_tarea(gestion, usuario):
-        """Crea una tarea para el gestor"""
-        reporte = gestion.reporte
-        
-        tarea = TareaGestion(
-            gestion_reporte_id=gestion.id,
-            asignado_a_id=usuario.id,
-            titulo=f"Gestionar incidente: {reporte.titulo}",
-            descripcion=f"""
+    def datos_tarea(gestion, usuario_id, reporte=None):
+        """
+        Columnas de la TareaGestion de una gestión
+        Separado de crear_tarea para que el escalamiento masivo inserte en lote
+        """
+        reporte = reporte or gestion.reporte
+        tipo_reporte = getattr(reporte, 'tipo_reporte_obj', None)
+        ubicacion = getattr(reporte, 'ubicacion_incidente', None)
+        
+        return {
+            'gestion_reporte_id': gestion.id,
+            'asignado_a_id': usuario_id,
+            'titulo': f"Gestionar incidente: {reporte.titulo}",
+            'descripcion': f"""
             Reporte: {reporte.numero_reporte}
-            Tipo: {reporte.tipo_reporte_obj.nombre if reporte.tipo_reporte_obj else 'N/A'}
-            Ubicación: {reporte.ubicacion_incidente.nombre if reporte.ubicacion_incidente else 'N/A'}
-            Descripción: {reporte.descripcion[:200]}...
+            Tipo: {tipo_reporte.nombre if tipo_reporte else 'N/A'}
+            Ubicación: {ubicacion.nombre if ubicacion else 'N/A'}
+            Descripción: {(reporte.descripcion or '')[:200]}...
             
             Vencimiento de respuesta: {gestion.fecha_vencimiento_respuesta}
             Vencimiento de resolución: {gestion.fecha_vencimiento_resolucion}
             """,
-            prioridad=GestionReportesService.calcular_prioridad(reporte),
-            fecha_vencimiento=gestion.fecha_vencimiento_resolucion
-        )
-        
-        db.session.add(tarea)
-        db.session.commit()
-        
-        return tarea
+            'prioridad': GestionReportesService.calcular_prioridad(reporte),
+            'fecha_vencimiento': gestion.fecha_vencimiento_resolucion
+        }
     
     @staticmethod
     def calcular_prioridad(reporte):
@@ -153,109 +297,96 @@ class GestionReportesService:
             return 3
     
     @staticmethod
-    def escalonar_automatico(gestion_id):
+    def escalonar_automatico(gestion_id, rol_destino=None, crear_tarea=True, enviar_notificacion=True):
         """
         Escalona automáticamente un reporte si:
         1. Se venció tiempo de respuesta
         2. Se venció tiempo de resolución
+        
+        rol_destino viene del PasoEscalonamiento programado; si es None se usa
+        rol_backup_1 / rol_backup_2 de GestorResponsabilidades
         """
         gestion = GestionReporte.query.get(gestion_id)
         if not gestion or not gestion.activo:
             return False
         
-        gestor_config = gestion.gestor_responsabilidad
-        if not gestor_config:
-            return False
-        
-        # Determinar a quién escalona
-        if gestion.numero_escalamiento == 0:
-            rol_destino = gestor_config.rol_backup_1
-        elif gestion.numero_escalamiento == 1:
-            rol_destino = gestor_config.rol_backup_2
-        else:
-            # Ya escaló todo, notificar a Dirección
-            rol_destino = 'Admin'
-        
+        rol_destino = GestionReportesService.rol_escalamiento(gestion, rol_destino)
         if not rol_destino:
             return False
         
         # Buscar usuario con ese rol
-        gestor_escalado = Usuario.query.filter_by(
-            rol=rol_destino,
-            activo=True
-        ).first()
+        gestor_escalado = AsignacionService.seleccionar_usuario(rol_destino, registrar_tarea=crear_tarea)
         
         if not gestor_escalado:
             return False
         
-        # Actualizar gestión
-        gestion.numero_escalamiento += 1
-        gestion.gestor_actual_id = gestor_escalado.id
-        gestion.rol_gestor = rol_destino
-        gestion.escalado_a_id = gestor_escalado.id
-        gestion.estado = 'Escalado'
-        
-        gestion.agregar_cambio(
-            gestor_escalado.id,
-            'ESCALONAMIENTO',
-            f'Escalado automáticamente a {gestor_escalado.nombre_completo} (Paso {gestion.numero_escalamiento})'
+        GestionReportesService.aplicar_escalamiento(
+            gestion, gestor_escalado.id, gestor_escalado.nombre_completo, rol_destino
         )
         
+        # Notificar escalamiento por email (outbox, misma transacción)
+        if enviar_notificacion:
+            NotificacionService.enviar_escalonamiento(gestion, gestor_escalado)
+        
         db.session.commit()
         
         # Crear nueva tarea
-        GestionReportesService.crear_tarea(gestion, gestor_escalado)
-        
-        # Notificar escalamiento por email
-        NotificacionService.enviar_escalonamiento(gestion, gestor_escalado)
+        if crear_tarea:
+            GestionReportesService.crear_tarea(gestion, gestor_escalado)
         
         return True
     
     @staticmethod
-    def verificar_vencimientos():
+    def rol_escalamiento(gestion, rol_destino=None):
         """
-        Verifica todos los reportes en gestión y escalona si es necesario
-        Se ejecuta periódicamente (via Celery, APScheduler, etc)
+        Rol al que se escala: el del paso programado o, si no hay,
+        rol_backup_1 / rol_backup_2 de GestorResponsabilidades y luego Admin
         """
-        escalados = 0
-        
-        # Reportes vencidos en respuesta
-        gestiones_vencidas_respuesta = GestionReporte.query.filter(
-            GestionReporte.estado.in_(['Asignado', 'En_Espera']),
-            GestionReporte.fecha_respuesta == None,
-            GestionReporte.fecha_vencimiento_respuesta < datetime.utcnow(),
-            GestionReporte.activo == True
-        ).all()
-        
-        for gestion in gestiones_vencidas_respuesta:
-            if GestionReportesService.escalonar_automatico(gestion.id):
-                escalados += 1
-        
-        # Reportes vencidos en resolución
-        gestiones_vencidas_resolucion = GestionReporte.query.filter(
-            GestionReporte.estado.in_(['En_Proceso']),
-            GestionReporte.fecha_resolucion == None,
-            GestionReporte.fecha_vencimiento_resolucion < datetime.utcnow(),
-            GestionReporte.activo == True
-        ).all()
-        
-        for gestion in gestiones_vencidas_resolucion:
-            if GestionReportesService.escalonar_automatico(gestion.id):
-                escalados += 1
-        
-        # Notificar sobre vencimientos críticos (dentro de 30 min)
-        gestiones_criticas = GestionReporte.query.filter(
-            GestionReporte.estado.in_(['Asignado', 'En_Proceso']),
-            GestionReporte.fecha_resolucion == None,
-            GestionReporte.fecha_vencimiento_resolucion < datetime.utcnow() + timedelta(minutes=30),
-            GestionReporte.fecha_vencimiento_resolucion > datetime.utcnow(),
-            GestionReporte.activo == True
-        ).all()
-        
-        for gestion in gestiones_criticas:
-            NotificacionService.enviar_vencimiento_critico(gestion)
-        
-        return escalados
+        if rol_destino:
+            return rol_destino
+        
+        gestor_config = gestion.gestor_responsabilidad
+        if not gestor_config:
+            return None
+        
+        if gestion.numero_escalamiento == 0:
+            return gestor_config.rol_backup_1
+        elif gestion.numero_escalamiento == 1:
+            return gestor_config.rol_backup_2
+        # Ya escaló todo, notificar a Dirección
+        return 'Admin'
+    
+    @staticmethod
+    def aplicar_escalamiento(gestion, usuario_id, nombre_usuario, rol_destino, eventos=None):
+        """
+        Actualiza la gestión en memoria (sin commit) para escalarla a otro gestor
+        
+        Si se pasa la lista eventos, el evento de historial se agrega ahí como
+        dict para insertarlo en lote en lugar de crearlo en la sesión
+        """
+        gestion.numero_escalamiento = (gestion.numero_escalamiento or 0) + 1
+        gestion.gestor_actual_id = usuario_id
+        gestion.rol_gestor = rol_destino
+        gestion.escalado_a_id = usuario_id
+        gestion.estado = 'Escalado'
+        
+        descripcion = f'Escalado automáticamente a {nombre_usuario} (Paso {gestion.numero_escalamiento})'
+        if eventos is None:
+            gestion.agregar_cambio(usuario_id, 'ESCALONAMIENTO', descripcion)
+        else:
+            evento = GestionReporte.datos_evento(usuario_id, 'ESCALONAMIENTO', descripcion)
+            evento['gestion_reporte_id'] = gestion.id
+            eventos.append(evento)
+    
+    @staticmethod
+    def verificar_vencimientos(limite=None):
+        """
+        Ejecuta en lote todas las acciones de escalamiento cuya hora ya pasó
+        Normalmente las dispara el temporizador (app/tasks/temporizador.py);
+        esta pasada consulta solo el índice de acciones_programadas y escala
+        por lotes (una transacción por lote, notificaciones en cola)
+        """
+        return EscalonamientoService.ejecutar_vencidas(limite=limite)
     
     @staticmethod
     def marcar_respondido(gestion_id, usuario_id):
@@ -266,6 +397,11 @@ class GestionReportesService:
             gestion.estado = 'En_Proceso'
             gestion.agregar_cambio(usuario_id, 'RESPUESTA', 'Gestor respondió')
             
+            # Ya respondió: los pasos de escalamiento por falta de respuesta no aplican
+            EscalonamientoService.cancelar_pendientes(
+                gestion.id, tipos=[EscalonamientoService.TIPO_ESCALONAMIENTO], commit=False
+            )
+            
             db.session.commit()
             
             # Notificar al reportador que está siendo procesado
@@ -281,12 +417,13 @@ class GestionReportesService:
             gestion.estado = 'Resuelto'
             gestion.notas_internas = resolucion
             gestion.agregar_cambio(usuario_id, 'RESOLUCION', 'Gestor resolvió: ' + resolucion)
+            EscalonamientoService.cancelar_pendientes(gestion.id, commit=False)
             
-            db.session.commit()
-            
-            # Notificar al reportador que fue resuelto
+            # Notificar al reportador que fue resuelto (outbox, misma transacción)
             NotificacionService.enviar_reporte_resuelto(gestion, resolucion)
             
+            db.session.commit()
+            
             return True
         return False
     
@@ -298,6 +435,7 @@ class GestionReportesService:
             gestion.estado = 'Cerrado'
             gestion.agregar_cambio(usuario_id, 'CIERRE', 'Reporte cerrado')
             gestion.activo = False
+            EscalonamientoService.cancelar_pendientes(gestion.id, commit=False)
             
             db.session.commit()
             return True
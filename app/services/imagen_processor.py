@@ -1,14 +1,23 @@
 from app import db
 from app.models import CondicionInsegura, ConfiguracionIA
 from app.services.gemini_service import GeminiService
+from app.services.almacen_evidencias import AlmacenEvidencias
 import os
-from datetime import datetime
+import io
+import re
+import logging
 import hashlib
 
+logger = logging.getLogger(__name__)
+
 class ImagenProcessor:
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}
     MAX_FILE_SIZE = 10 * 1024 * 1024
     
+    # Preproceso antes de enviar al modelo: lado mayor máximo y calidad JPEG
+    MAX_LADO_IA = int(os.getenv('SST_IA_MAX_LADO', '1536'))
+    CALIDAD_JPEG_IA = int(os.getenv('SST_IA_CALIDAD_JPEG', '85'))
+    
     @staticmethod
     def es_imagen_valida(archivo):
         if not archivo or archivo.filename == '':
@@ -19,48 +28,159 @@ class ImagenProcessor:
         if ext not in ImagenProcessor.ALLOWED_EXTENSIONS:
             return False, f"Formato no permitido"
         
-        if len(archivo.read()) > ImagenProcessor.MAX_FILE_SIZE:
+        # Solo la cabecera y el tamaño: el archivo no se carga en memoria
+        flujo = archivo.stream
+        flujo.seek(0, os.SEEK_END)
+        tamano = flujo.tell()
+        flujo.seek(0)
+        if tamano > ImagenProcessor.MAX_FILE_SIZE:
             return False, "Archivo demasiado grande (máx 10MB)"
         
-        archivo.seek(0)
+        # La extensión la pone el usuario; el contenido tiene que ser una imagen de verdad
+        cabecera = flujo.read(12)
+        flujo.seek(0)
+        if ImagenProcessor.detectar_formato(cabecera) is None:
+            return False, "El archivo no es una imagen JPG, PNG o WebP válida"
+        
         return True, "OK"
     
+    # ============== PREPROCESO PARA IA ==============
+    
     @staticmethod
-    def guardar_imagen(archivo, reporte_id):
-        año = datetime.utcnow().year
-        mes = datetime.utcnow().month
-        ruta_base = f"uploads/reportes/{año}/{mes:02d}"
+    def detectar_formato(contenido):
+        """Formato real por la firma del archivo: 'jpeg', 'png', 'webp' o None"""
+        if contenido[:3] == b'\xff\xd8\xff':
+            return 'jpeg'
+        if contenido[:8] == b'\x89PNG\r\n\x1a\n':
+            return 'png'
+        if contenido[:4] == b'RIFF' and contenido[8:12] == b'WEBP':
+            return 'webp'
+        return None
+    
+    @staticmethod
+    def version_preproceso():
+        """Parámetros del preproceso: si cambian, el modelo ve otra imagen"""
+        return f'jpeg:{ImagenProcessor.MAX_LADO_IA}:{ImagenProcessor.CALIDAD_JPEG_IA}'
+    
+    @staticmethod
+    def preparar_para_ia(contenido):
+        """
+        Bytes y mime type que se envían al modelo
         
-        os.makedirs(ruta_base, exist_ok=True)
+        Corrige la orientación, quita EXIF (GPS, cámara), reduce el lado mayor
+        a MAX_LADO_IA y recodifica a JPEG. Sin Pillow solo se quitan los
+        segmentos EXIF de los JPEG y se envía el mime type real.
         
-        contenido = archivo.read()
-        hash_archivo = hashlib.md5(contenido).hexdigest()
-        ext = archivo.filename.rsplit('.', 1)[1].lower()
-        nombre_archivo = f"{reporte_id}_{hash_archivo}.{ext}"
+        Returns:
+            (bytes, mime_type)
+        """
+        formato = ImagenProcessor.detectar_formato(contenido)
+        if formato is None:
+            raise ValueError("El archivo no es una imagen JPG, PNG o WebP válida")
         
-        ruta_completa = os.path.join(ruta_base, nombre_archivo)
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            if formato == 'jpeg':
+                return ImagenProcessor._quitar_exif_jpeg(contenido), 'image/jpeg'
+            return contenido, f'image/{formato}'
         
-        with open(ruta_completa, 'wb') as f:
-            f.write(contenido)
+        maximo = ImagenProcessor.MAX_LADO_IA
+        with Image.open(io.BytesIO(contenido)) as imagen:
+            if formato == 'jpeg':
+                # Decodifica directamente a una escala reducida (1/2, 1/4, 1/8)
+                imagen.draft('RGB', (maximo, maximo))
+            imagen = ImageOps.exif_transpose(imagen)
+            if imagen.mode in ('RGBA', 'LA', 'P'):
+                fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+                imagen = imagen.convert('RGBA')
+                fondo.paste(imagen, mask=imagen.getchannel('A'))
+                imagen = fondo
+            elif imagen.mode != 'RGB':
+                imagen = imagen.convert('RGB')
+            imagen.thumbnail((maximo, maximo), Image.LANCZOS)
+            
+            salida = io.BytesIO()
+            # Sin exif=...: los metadatos no se copian
+            imagen.save(salida, 'JPEG', quality=ImagenProcessor.CALIDAD_JPEG_IA, optimize=True)
+        return salida.getvalue(), 'image/jpeg'
+    
+    @staticmethod
+    def _quitar_exif_jpeg(contenido):
+        """Quita los segmentos APP1 (EXIF/XMP) de un JPEG sin decodificarlo"""
+        partes = [contenido[:2]]
+        i = 2
+        while i + 4 <= len(contenido) and contenido[i] == 0xFF:
+            marcador = contenido[i + 1]
+            if marcador == 0xDA:  # Inicio de los datos de imagen: el resto va tal cual
+                break
+            largo = int.from_bytes(contenido[i + 2:i + 4], 'big')
+            if marcador != 0xE1:
+                partes.append(contenido[i:i + 2 + largo])
+            i += 2 + largo
+        partes.append(contenido[i:])
+        return b''.join(partes)
+    
+    @staticmethod
+    def guardar_imagen(archivo, reporte_id=None):
+        """Guarda la imagen en el almacén por contenido (AlmacenEvidencias) y devuelve su ruta"""
+        return AlmacenEvidencias.guardar(archivo).ruta
+    
+    @staticmethod
+    def hash_desde_ruta(ruta):
+        """
+        Hash del contenido tomado del nombre del archivo, o calculado
         
-        return ruta_completa
+        El almacén de evidencias nombra por sha256 (<hash>.<ext>); las
+        imágenes anteriores llevan el md5 en el nombre (<reporte>_<md5>.<ext>).
+        """
+        nombre = os.path.basename(ruta or '')
+        coincidencia = (re.match(r'^([0-9a-f]{64})\.\w+$', nombre)
+                        or re.match(r'^\d+_([0-9a-f]{32})\.\w+$', nombre))
+        if coincidencia:
+            return coincidencia.group(1)
+        md5 = hashlib.md5()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(AlmacenEvidencias.TAMANO_BLOQUE), b''):
+                md5.update(bloque)
+        return md5.hexdigest()
+    
+    @staticmethod
+    def campos_analisis(resultado):
+        """Columnas de CondicionInsegura que se actualizan con un análisis exitoso"""
+        severidad = resultado.get("severidad", 0)
+        return {
+            'imagen_procesada_json': resultado,
+            'observaciones_ia': resultado.get("observaciones", ""),
+            'riesgos_identificados': resultado.get("peligros", []),
+            'severidad_calculada': severidad,
+            'cumple_norma': severidad <= 2
+        }
     
     @staticmethod
-    def procesar_con_ia(reporte_id):
+    def procesar_con_ia(reporte_id, usar_cache=True):
+        """Analiza la imagen del reporte; usar_cache=False fuerza un nuevo análisis"""
         reporte = CondicionInsegura.query.get(reporte_id)
         if not reporte or not reporte.imagen_url:
             return {"error": "Reporte o imagen no encontrada"}
         
         try:
             gemini_service = GeminiService()
-            resultado = gemini_service.analizar_imagen_sst(reporte.imagen_url)
+            resultado = gemini_service.analizar_imagen_sst(
+                reporte.imagen_url,
+                config_ia=ConfiguracionIA.query.filter_by(activo=True).first(),
+                hash_imagen=ImagenProcessor.hash_desde_ruta(reporte.imagen_url),
+                usar_cache=usar_cache,
+                contexto={
+                    'reporte_id': reporte.id,
+                    'usuario_id': reporte.empleado_reportador_id,
+                    'departamento': (reporte.metadata_adicional or {}).get('departamento')
+                }
+            )
             
             if "error" not in resultado:
-                reporte.imagen_procesada_json = resultado
-                reporte.observaciones_ia = resultado.get("observaciones", "")
-                reporte.riesgos_identificados = resultado.get("peligros", [])
-                reporte.severidad_calculada = resultado.get("severidad", 0)
-                reporte.cumple_norma = reporte.severidad_calculada <= 2
+                for campo, valor in ImagenProcessor.campos_analisis(resultado).items():
+                    setattr(reporte, campo, valor)
                 
                 db.session.commit()
                 return resultado
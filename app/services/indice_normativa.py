@@ -0,0 +1,270 @@
+# app/services/indice_normativa.py
+"""
+Índice BM25 en memoria sobre la normativa para el chat experto SST
+
+Fuentes:
+- DocumentoLegal.contenido (incluye la normativa cargada por
+  scripts/seed_data.py) y el texto extraído de su archivo
+  (app/tasks/extraccion_documentos.py)
+- ConsultaJuridica.normativa_aplicable y resolucion
+
+Cada documento se parte en pasajes de ~PALABRAS_PASAJE palabras; una
+consulta devuelve los k pasajes con mejor puntaje BM25 y el chat los pone
+en el prompt en lugar de pedir al modelo que recuerde la norma.
+
+El índice se construye en la primera búsqueda y se mantiene al día:
+- en este proceso, con los cambios confirmados (after_commit) de
+  DocumentoLegal y ConsultaJuridica, documento por documento
+- para los cambios de otros procesos, se reconstruye si tiene más de
+  SST_INDICE_NORMATIVA_REFRESCO_SEG segundos
+"""
+
+from app import db
+from app.models import DocumentoLegal, ConsultaJuridica
+from app.utils.texto import tokenizar
+from collections import Counter
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session, object_session
+import hashlib
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IndiceNormativa:
+    """Índice invertido con puntaje BM25, actualizable por documento"""
+
+    PALABRAS_PASAJE = 120
+    REFRESCO_SEG = float(os.getenv('SST_INDICE_NORMATIVA_REFRESCO_SEG', '600'))
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Vacía el índice; la próxima búsqueda lo reconstruye desde la base"""
+        with self._lock:
+            self._invertido = {}       # termino -> {pasaje_id: frecuencia}
+            self._pasajes = {}         # pasaje_id -> (clave, titulo, texto, longitud, terminos)
+            self._por_documento = {}   # clave -> [pasaje_id]
+            self._huellas = {}         # clave -> md5 del texto indexado
+            self._huella = None
+            self._longitud_total = 0
+            self._siguiente_id = 0
+            self._construido_en = None
+
+    # ============== DOCUMENTOS ==============
+
+    @staticmethod
+    def texto_documento(documento):
+        """(clave, titulo, texto) de un DocumentoLegal o ConsultaJuridica; texto None si no se indexa"""
+        if isinstance(documento, DocumentoLegal):
+            return ('documento', documento.id), documento.nombre, IndiceNormativa._texto_legal(
+                documento.contenido, documento.texto_extraido)
+        partes = IndiceNormativa._aplanar(documento.normativa_aplicable)
+        if documento.resolucion:
+            partes.append(documento.resolucion)
+        return ('consulta', documento.id), documento.titulo, '\n'.join(partes) or None
+
+    @staticmethod
+    def _texto_legal(contenido, texto_extraido):
+        return '\n'.join(parte for parte in (contenido, texto_extraido) if parte) or None
+
+    @staticmethod
+    def _aplanar(valor):
+        """Textos de un campo JSON (lista de normas o diccionario con la ficha de la norma)"""
+        if isinstance(valor, dict):
+            return [f'{k}: {v}' for k, v in valor.items() if v and k != 'url']
+        if isinstance(valor, (list, tuple)):
+            return [str(v) for v in valor if v]
+        return [str(valor)] if valor else []
+
+    def _partir(self, texto):
+        """Pasajes de hasta PALABRAS_PASAJE palabras (los párrafos cortos se agrupan)"""
+        pasajes, actual = [], []
+        for parrafo in texto.split('\n'):
+            palabras = parrafo.split()
+            while palabras:
+                espacio = self.PALABRAS_PASAJE - len(actual)
+                if espacio <= 0:
+                    pasajes.append(' '.join(actual))
+                    actual, espacio = [], self.PALABRAS_PASAJE
+                actual.extend(palabras[:espacio])
+                palabras = palabras[espacio:]
+        if actual:
+            pasajes.append(' '.join(actual))
+        return pasajes
+
+    def actualizar(self, clave, titulo, texto):
+        """Indexa (o reindexa) un documento; texto vacío lo quita"""
+        with self._lock:
+            self._quitar(clave)
+            if not texto:
+                return
+            for fragmento in self._partir(texto):
+                terminos = Counter(tokenizar(f'{titulo} {fragmento}'))
+                if not terminos:
+                    continue
+                pasaje_id = self._siguiente_id
+                self._siguiente_id += 1
+                longitud = sum(terminos.values())
+                self._pasajes[pasaje_id] = (clave, titulo, fragmento, longitud, tuple(terminos))
+                self._por_documento.setdefault(clave, []).append(pasaje_id)
+                self._longitud_total += longitud
+                for termino, frecuencia in terminos.items():
+                    self._invertido.setdefault(termino, {})[pasaje_id] = frecuencia
+            self._huellas[clave] = hashlib.md5(f'{titulo}|{texto}'.encode('utf-8')).hexdigest()
+            self._huella = None
+
+    def eliminar(self, clave):
+        with self._lock:
+            self._quitar(clave)
+
+    def _quitar(self, clave):
+        for pasaje_id in self._por_documento.pop(clave, []):
+            _, _, _, longitud, terminos = self._pasajes.pop(pasaje_id)
+            self._longitud_total -= longitud
+            for termino in terminos:
+                publicaciones = self._invertido[termino]
+                publicaciones.pop(pasaje_id, None)
+                if not publicaciones:
+                    del self._invertido[termino]
+        if self._huellas.pop(clave, None):
+            self._huella = None
+
+    # ============== CONSTRUCCIÓN ==============
+
+    def construir(self, documentos=None):
+        """
+        Reconstruye el índice
+
+        Args:
+            documentos: iterable de (clave, titulo, texto); por defecto, desde la base de datos
+        """
+        inicio = time.perf_counter()
+        if documentos is None:
+            documentos = self._cargar()
+        with self._lock:
+            self.reiniciar()
+            for clave, titulo, texto in documentos:
+                self.actualizar(clave, titulo, texto)
+            self._construido_en = time.monotonic()
+            logger.info(f"📚 Índice de normativa: {len(self._por_documento)} documentos, "
+                        f"{len(self._pasajes)} pasajes en {time.perf_counter() - inicio:.2f}s")
+
+    @staticmethod
+    def _cargar():
+        documentos = db.session.execute(
+            select(DocumentoLegal.id, DocumentoLegal.nombre, DocumentoLegal.contenido, DocumentoLegal.texto_extraido)
+            .where(or_(DocumentoLegal.contenido.isnot(None), DocumentoLegal.texto_extraido.isnot(None)))
+        ).all()
+        consultas = db.session.execute(
+            select(ConsultaJuridica).where(or_(
+                ConsultaJuridica.normativa_aplicable.isnot(None), ConsultaJuridica.resolucion.isnot(None)
+            ))
+        ).scalars().all()
+
+        cargados = [(('documento', id_), nombre, IndiceNormativa._texto_legal(contenido, extraido))
+                    for id_, nombre, contenido, extraido in documentos]
+        cargados.extend(IndiceNormativa.texto_documento(consulta) for consulta in consultas)
+        return cargados
+
+    def _asegurar_construido(self):
+        if self._construido_en is None or time.monotonic() - self._construido_en > self.REFRESCO_SEG:
+            with self._lock:
+                if self._construido_en is None or time.monotonic() - self._construido_en > self.REFRESCO_SEG:
+                    self.construir()
+
+    @property
+    def construido(self):
+        return self._construido_en is not None
+
+    # ============== BÚSQUEDA ==============
+
+    def buscar(self, consulta, k=4):
+        """Los k pasajes más relevantes: [{'clave', 'titulo', 'texto', 'puntaje'}]"""
+        self._asegurar_construido()
+        terminos = set(tokenizar(consulta))
+        with self._lock:
+            total = len(self._pasajes)
+            if not total or not terminos:
+                return []
+            promedio = self._longitud_total / total
+            puntajes = {}
+            for termino in terminos:
+                publicaciones = self._invertido.get(termino)
+                if not publicaciones:
+                    continue
+                idf = math.log(1 + (total - len(publicaciones) + 0.5) / (len(publicaciones) + 0.5))
+                for pasaje_id, frecuencia in publicaciones.items():
+                    longitud = self._pasajes[pasaje_id][3]
+                    puntajes[pasaje_id] = puntajes.get(pasaje_id, 0.0) + idf * frecuencia * (self.K1 + 1) / (
+                        frecuencia + self.K1 * (1 - self.B + self.B * longitud / promedio)
+                    )
+            mejores = heapq.nlargest(k, puntajes.items(), key=lambda item: item[1])
+            return [
+                {'clave': self._pasajes[pid][0], 'titulo': self._pasajes[pid][1],
+                 'texto': self._pasajes[pid][2], 'puntaje': round(puntaje, 4)}
+                for pid, puntaje in mejores
+            ]
+
+    def huella(self):
+        """Cambia cuando cambia el contenido indexado (para la versión de la caché del chat)"""
+        self._asegurar_construido()
+        with self._lock:
+            if self._huella is None:
+                self._huella = hashlib.md5(
+                    '|'.join(f'{c[0]}:{c[1]}:{h}' for c, h in sorted(self._huellas.items())).encode('utf-8')
+                ).hexdigest()[:16]
+            return self._huella
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'documentos': len(self._por_documento),
+                'pasajes': len(self._pasajes),
+                'terminos': len(self._invertido),
+                'construido': self.construido,
+            }
+
+
+indice_normativa = IndiceNormativa()
+
+
+# ============== ACTUALIZACIÓN INCREMENTAL ==============
+
+def _registrar_cambio(mapper, connection, objetivo, eliminado=False):
+    sesion = object_session(objetivo)
+    if sesion is None or not indice_normativa.construido:
+        return
+    clave, titulo, texto = IndiceNormativa.texto_documento(objetivo)
+    sesion.info.setdefault('indice_normativa', {})[clave] = (titulo, None if eliminado else texto)
+
+
+def _registrar_eliminado(mapper, connection, objetivo):
+    _registrar_cambio(mapper, connection, objetivo, eliminado=True)
+
+
+for _modelo in (DocumentoLegal, ConsultaJuridica):
+    event.listen(_modelo, 'after_insert', _registrar_cambio)
+    event.listen(_modelo, 'after_update', _registrar_cambio)
+    event.listen(_modelo, 'after_delete', _registrar_eliminado)
+
+
+@event.listens_for(Session, 'after_commit')
+def _aplicar_cambios(sesion):
+    """Solo lo confirmado llega al índice"""
+    for clave, (titulo, texto) in sesion.info.pop('indice_normativa', {}).items():
+        indice_normativa.actualizar(clave, titulo, texto)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_cambios(sesion, transaccion_previa):
+    sesion.info.pop('indice_normativa', None)
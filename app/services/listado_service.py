@@ -0,0 +1,196 @@
+# app/services/listado_service.py
+"""
+Motor de listados con paginación por cursor (keyset)
+Usado por reportes, controles y jurídico
+
+- Ordena por (fecha, id) descendente sobre índices compuestos
+- La visibilidad por rol se aplica en SQL, antes de traer filas
+- Los totales son aproximados: se cuenta hasta un tope
+"""
+
+from app import db
+from sqlalchemy import or_, inspect, tuple_
+from datetime import datetime
+import base64
+import json
+
+
+class PaginaKeyset:
+    """Resultado de una página de listado"""
+
+    def __init__(self, items, next_cursor, total_aproximado, total_exacto, limite):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total_aproximado = total_aproximado
+        self.total_exacto = total_exacto
+        self.limite = limite
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def total_texto(self):
+        """Total para mostrar en pantalla: '1.234' o '10.000+'"""
+        if self.total_aproximado is None:
+            return ''
+        texto = f"{self.total_aproximado:,}".replace(',', '.')
+        return texto if self.total_exacto else f"{texto}+"
+
+    def to_dict(self, serializar_item):
+        """Convierte la página a diccionario para API"""
+        return {
+            'items': [serializar_item(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'total_aproximado': self.total_aproximado,
+            'total_exacto': self.total_exacto,
+            'limite': self.limite
+        }
+
+
+class ListadoService:
+    """Paginación keyset y visibilidad por rol para los listados"""
+
+    LIMITE_POR_DEFECTO = 25
+    LIMITE_MAXIMO = 100
+    TOPE_CONTEO = 10000
+
+    # Roles que ven todos los reportes (mismo criterio que reportes.ver)
+    ROLES_VEN_TODOS_REPORTES = ['Admin', 'Responsable_SST', 'Gerente', 'Abogado']
+
+    # Roles que ven todos los controles (mismo criterio que controles.listar_controles)
+    ROLES_VEN_TODOS_CONTROLES = ['Admin', 'Responsable SST', 'Abogado']
+
+    # ============== CURSOR ==============
+
+    @staticmethod
+    def codificar_cursor(fecha, id):
+        """Codifica la última fila de la página como cursor opaco"""
+        payload = json.dumps([fecha.isoformat() if fecha else None, id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def decodificar_cursor(cursor):
+        """
+        Decodifica un cursor generado por codificar_cursor
+        Lanza ValueError si el cursor no es válido
+        """
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            fecha_iso, id = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+            fecha = datetime.fromisoformat(fecha_iso) if fecha_iso else None
+            return fecha, int(id)
+        except Exception:
+            raise ValueError('Cursor inválido')
+
+    @staticmethod
+    def limite_desde_args(args):
+        """Lee ?limite= del request, acotado a LIMITE_MAXIMO"""
+        limite = args.get('limite', ListadoService.LIMITE_POR_DEFECTO, type=int)
+        return max(1, min(limite or ListadoService.LIMITE_POR_DEFECTO, ListadoService.LIMITE_MAXIMO))
+
+    # ============== PAGINACIÓN ==============
+
+    @staticmethod
+    def paginar(query, columna_fecha, columna_id, cursor=None, limite=None, contar=True):
+        """
+        Pagina un query por (columna_fecha, columna_id) descendente
+
+        Args:
+            query: Query ya filtrado (incluida la visibilidad por rol)
+            columna_fecha: Columna indexada NOT NULL de orden (ej: CondicionInsegura.fecha_creacion)
+            columna_id: Clave primaria, desempata filas con la misma fecha
+            cursor: Cursor devuelto por la página anterior (None = primera página)
+            limite: Filas por página
+            contar: Si se calcula el total aproximado
+
+        Returns:
+            PaginaKeyset
+        """
+        limite = limite or ListadoService.LIMITE_POR_DEFECTO
+
+        total, exacto = (None, False)
+        if contar:
+            total, exacto = ListadoService.contar_aproximado(query)
+
+        if cursor:
+            fecha, ultimo_id = ListadoService.decodificar_cursor(cursor)
+            if fecha is None:
+                raise ValueError('Cursor inválido')
+            # (fecha, id) < (?, ?) es un rango del índice compuesto; las columnas
+            # de fecha son NOT NULL, así que no hace falta rama para NULL
+            query = query.filter(tuple_(columna_fecha, columna_id) < tuple_(fecha, ultimo_id))
+
+        # Se pide una fila extra para saber si hay página siguiente sin contar.
+        # DESC, DESC recorre el índice (fecha, id) hacia atrás, sin ordenar
+        filas = query.order_by(
+            columna_fecha.desc(), columna_id.desc()
+        ).limit(limite + 1).all()
+
+        next_cursor = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            ultima = filas[-1]
+            next_cursor = ListadoService.codificar_cursor(
+                getattr(ultima, columna_fecha.key),
+                getattr(ultima, columna_id.key)
+            )
+
+        return PaginaKeyset(filas, next_cursor, total, exacto, limite)
+
+    @staticmethod
+    def contar_aproximado(query, tope=None):
+        """
+        Cuenta filas hasta un tope en lugar de un COUNT(*) completo
+
+        Returns:
+            (total, exacto): exacto=False si se alcanzó el tope
+        """
+        tope = tope or ListadoService.TOPE_CONTEO
+        # Solo la clave primaria: el conteo se resuelve sobre el índice
+        entidad = query.column_descriptions[0]['entity']
+        clave = inspect(entidad).primary_key[0]
+        subconsulta = query.order_by(None).with_entities(clave).limit(tope + 1).subquery()
+        total = db.session.query(db.func.count()).select_from(subconsulta).scalar() or 0
+
+        if total > tope:
+            return tope, False
+        return total, True
+
+    # ============== VISIBILIDAD POR ROL ==============
+
+    @staticmethod
+    def visibilidad_reportes(query, usuario):
+        """
+        Restringe reportes a los que el usuario puede ver:
+        reportador, gestor actual o rol con visibilidad total
+        """
+        from app.models import CondicionInsegura, GestionReporte
+
+        if usuario.rol in ListadoService.ROLES_VEN_TODOS_REPORTES:
+            return query
+
+        gestionados = db.session.query(GestionReporte.reporte_id).filter(
+            GestionReporte.gestor_actual_id == usuario.id
+        )
+        return query.filter(or_(
+            CondicionInsegura.empleado_reportador_id == usuario.id,
+            CondicionInsegura.id.in_(gestionados)
+        ))
+
+    @staticmethod
+    def visibilidad_controles(query, usuario):
+        """Responsable de Control solo ve los controles asignados a él"""
+        from app.models import Control
+
+        if usuario.rol in ListadoService.ROLES_VEN_TODOS_CONTROLES:
+            return query
+        return query.filter(Control.responsable_id == usuario.id)
+
+    @staticmethod
+    def visibilidad_consultas(query, usuario):
+        """
+        Las consultas jurídicas son visibles para todos los roles con acceso
+        al módulo (juridico_required ya filtró el rol)
+        """
+        return query
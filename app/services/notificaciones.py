@@ -1,6 +1,8 @@
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+from datetime import datetime, timedelta
+from app import db
+from app.models import Notificacion
+from app.services.plantillas_correo import plantillas_correo
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,60 +11,137 @@ class NotificacionService:
     SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
     SENDER_EMAIL = os.getenv('SENDER_EMAIL', 'noreply@sst-system.com')
     
+    # Una misma (tipo, entidad, destinatario) no se repite dentro de esta ventana
+    VENTANA_DEDUP_MINUTOS = int(os.getenv('SST_VENTANA_NOTIFICACIONES_MIN', '60'))
+    
+    # Los tipos agrupables esperan este tiempo en el outbox para que las
+    # ráfagas al mismo destinatario salgan en un solo correo resumen
+    ESPERA_RESUMEN_SEGUNDOS = int(os.getenv('SST_ESPERA_RESUMEN_SEG', '120'))
+    TIPOS_AGRUPABLES = {'ESCALONAMIENTO', 'VENCIMIENTO_CRITICO', 'CC'}
+    
     @staticmethod
-    def enviar_email(destinatario, asunto, contenido_html):
-        try:
-            sg = SendGridAPIClient(NotificacionService.SENDGRID_API_KEY)
-            
-            message = Mail(
-                from_email=NotificacionService.SENDER_EMAIL,
-                to_emails=destinatario,
-                subject=asunto,
-                html_content=contenido_html
+    def clave_dedup(tipo, entidad, destinatario):
+        """Clave de deduplicación; sin entidad la notificación no se deduplica"""
+        if not entidad:
+            return None
+        return f"{tipo}:{entidad}:{destinatario.lower()}"[:200]
+    
+    @staticmethod
+    def claves_recientes(claves):
+        """Claves que ya están en el outbox dentro de la ventana (pendientes o enviadas)"""
+        claves = {clave for clave in claves if clave}
+        if not claves:
+            return set()
+        
+        desde = datetime.utcnow() - timedelta(minutes=NotificacionService.VENTANA_DEDUP_MINUTOS)
+        return set(db.session.execute(
+            db.select(Notificacion.clave_dedup).where(
+                Notificacion.clave_dedup.in_(claves),
+                Notificacion.fecha_creacion >= desde,
+                Notificacion.estado != 'Fallida'
             )
-            
-            response = sg.send(message)
-            logger.info(f"Email enviado a {destinatario}")
-            return True
-        except Exception as e:
-            logger.error(f"Error enviando email: {str(e)}")
+        ).scalars())
+    
+    @staticmethod
+    def datos_notificacion(destinatario, asunto, contenido_html, tipo=None, entidad=None):
+        """Columnas de una fila del outbox (para insertar en lote)"""
+        ahora = datetime.utcnow()
+        agrupable = tipo in NotificacionService.TIPOS_AGRUPABLES
+        return {
+            'tipo': tipo,
+            'destinatario': destinatario,
+            'asunto': asunto[:300],
+            'contenido_html': contenido_html,
+            'clave_dedup': NotificacionService.clave_dedup(tipo, entidad, destinatario),
+            'agrupable': agrupable,
+            'estado': 'Pendiente',
+            'intentos': 0,
+            'proximo_intento': ahora + timedelta(
+                seconds=NotificacionService.ESPERA_RESUMEN_SEGUNDOS if agrupable else 0
+            ),
+            'fecha_creacion': ahora
+        }
+    
+    @staticmethod
+    def enviar_email(destinatario, asunto, contenido_html, tipo=None, entidad=None):
+        """
+        Deja el correo en el outbox (notificaciones_outbox) sin hacer commit
+        
+        La fila se guarda con la transacción del llamador: si el cambio de
+        negocio hace rollback, el correo tampoco sale. El sst-worker lo envía
+        después (app/tasks/despachador_notificaciones.py).
+        
+        Con entidad (ej. 'gestion:15') se suprime si el mismo destinatario ya
+        tiene esa notificación dentro de VENTANA_DEDUP_MINUTOS.
+        """
+        if not destinatario:
+            logger.warning(f"⚠️ Notificación sin destinatario: {asunto}")
             return False
+        
+        datos = NotificacionService.datos_notificacion(destinatario, asunto, contenido_html, tipo, entidad)
+        if datos['clave_dedup'] and NotificacionService.claves_recientes([datos['clave_dedup']]):
+            logger.info(f"🔕 Notificación repetida suprimida: {datos['clave_dedup']}")
+            return True
+        
+        db.session.add(Notificacion(**datos))
+        logger.info(f"📧 Email en cola para {destinatario}")
+        return True
+    
+    @staticmethod
+    def enviar_email_varios(destinatarios, asunto, contenido_html, tipo=None, entidad=None):
+        """
+        Mismo correo para varios destinatarios: una fila por destinatario (estado
+        y deduplicación propios) y una sola consulta de deduplicación
+        
+        Returns:
+            Número de notificaciones nuevas en el outbox
+        """
+        filas = {}
+        for destinatario in destinatarios:
+            if destinatario and destinatario.lower() not in filas:
+                filas[destinatario.lower()] = NotificacionService.datos_notificacion(
+                    destinatario, asunto, contenido_html, tipo, entidad
+                )
+        
+        recientes = NotificacionService.claves_recientes(fila['clave_dedup'] for fila in filas.values())
+        nuevas = [Notificacion(**fila) for fila in filas.values() if fila['clave_dedup'] not in recientes]
+        db.session.add_all(nuevas)
+        
+        if len(nuevas) < len(filas):
+            logger.info(f"🔕 {len(filas) - len(nuevas)} notificaciones repetidas suprimidas ({tipo})")
+        return len(nuevas)
+    
+    @staticmethod
+    def contenido_resumen(asuntos_y_contenidos):
+        """Asunto y HTML de un correo resumen con varias notificaciones del mismo destinatario"""
+        asunto = f"[SST-RESUMEN] {len(asuntos_y_contenidos)} notificaciones que requieren tu atención"
+        return asunto, plantillas_correo.renderizar('resumen.html', items=asuntos_y_contenidos)
     
     # ============== GESTIÓN DE REPORTES ==============
     
+    @staticmethod
+    def contexto_gestion(gestion, **extra):
+        """Variables comunes de las plantillas de reportes (app/templates/emails)"""
+        reporte = gestion.reporte
+        contexto = {
+            'gestion': gestion,
+            'reporte': reporte,
+            # CondicionInsegura no tiene estas relaciones; otros reportes sí
+            'tipo_reporte': getattr(reporte, 'tipo_reporte_obj', None),
+            'ubicacion': getattr(reporte, 'ubicacion_incidente', None)
+        }
+        contexto.update(extra)
+        return contexto
+    
     @staticmethod
     def enviar_asignacion_reporte(gestion, gestor):
         """Notifica al gestor que un reporte fue asignado"""
         try:
             reporte = gestion.reporte
             asunto = f"[SST-ASIGNADO] {reporte.numero_reporte} - {reporte.titulo}"
+            html = plantillas_correo.renderizar('reporte_asignado.html', **NotificacionService.contexto_gestion(gestion))
             
-            html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background-color: #007bff; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                    <h2 style="margin: 0;">🔔 Nuevo Reporte Asignado</h2>
-                </div>
-                
-                <div style="background-color: #f5f5f5; padding: 20px; border-radius: 0 0 5px 5px;">
-                    <p>Se te ha asignado un nuevo reporte que requiere tu atención.</p>
-                    
-                    <div style="background-color: white; padding: 15px; border-left: 4px solid #007bff; margin: 20px 0;">
-                        <p><strong>📋 Número Reporte:</strong> {reporte.numero_reporte}</p>
-                        <p><strong>📝 Título:</strong> {reporte.titulo}</p>
-                        <p><strong>🏷️ Tipo:</strong> {reporte.tipo_reporte_obj.nombre if reporte.tipo_reporte_obj else 'N/A'}</p>
-                        <p><strong>📍 Ubicación:</strong> {reporte.ubicacion_incidente.nombre if reporte.ubicacion_incidente else 'No especificada'}</p>
-                        <p><strong>⏰ Vencimiento Respuesta:</strong> {gestion.fecha_vencimiento_respuesta.strftime('%d/%m/%Y %H:%M')}</p>
-                        <p><strong>⏳ Vencimiento Resolución:</strong> {gestion.fecha_vencimiento_resolucion.strftime('%d/%m/%Y %H:%M')}</p>
-                    </div>
-                    
-                    <p style="text-align: center; margin-top: 20px;">
-                        <a href="http://localhost:5000/reportes/{reporte.id}" style="background-color: #007bff; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Reporte</a>
-                    </p>
-                </div>
-            </div>
-            """
-            
-            return NotificacionService.enviar_email(gestor.email, asunto, html)
+            return NotificacionService.enviar_email(gestor.email, asunto, html, 'ASIGNACION', f'gestion:{gestion.id}')
         except Exception as e:
             logger.error(f"Error enviando notificación de asignación: {str(e)}")
             return False
@@ -71,78 +150,64 @@ class NotificacionService:
     def enviar_escalonamiento(gestion, gestor_escalado):
         """Notifica que el reporte fue escalado a otro gestor"""
         try:
-            reporte = gestion.reporte
-            asunto = f"[SST-ESCALADO] {reporte.numero_reporte} - ⚠️ Se requiere tu atención inmediata"
-            
-            html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background-color: #dc3545; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                    <h2 style="margin: 0;">⚠️ Reporte Escalado</h2>
-                </div>
-                
-                <div style="background-color: #fff3cd; padding: 20px; border-radius: 0 0 5px 5px; border-left: 4px solid #ffc107;">
-                    <p><strong style="color: #dc3545;">Un reporte fue escalado a ti por falta de respuesta.</strong></p>
-                    
-                    <div style="background-color: white; padding: 15px; border-left: 4px solid #dc3545; margin: 20px 0;">
-                        <p><strong>📋 Número Reporte:</strong> {reporte.numero_reporte}</p>
-                        <p><strong>📝 Título:</strong> {reporte.titulo}</p>
-                        <p><strong>🏷️ Tipo:</strong> {reporte.tipo_reporte_obj.nombre if reporte.tipo_reporte_obj else 'N/A'}</p>
-                        <p><strong>🔄 Paso de Escalonamiento:</strong> {gestion.numero_escalamiento}</p>
-                        <p><strong style="color: red;">⏰ Vencimiento Respuesta:</strong> {gestion.fecha_vencimiento_respuesta.strftime('%d/%m/%Y %H:%M')}</p>
-                    </div>
-                    
-                    <p style="text-align: center; margin-top: 20px; color: red; font-weight: bold;">
-                        ⏰ ACCIÓN REQUERIDA INMEDIATAMENTE
-                    </p>
-                    <p style="text-align: center;">
-                        <a href="http://localhost:5000/reportes/{reporte.id}" style="background-color: #dc3545; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">Ver Reporte Ahora</a>
-                    </p>
-                </div>
-            </div>
-            """
-            
-            return NotificacionService.enviar_email(gestor_escalado.email, asunto, html)
+            asunto, html = NotificacionService.contenido_escalonamiento(gestion)
+            return NotificacionService.enviar_email(
+                gestor_escalado.email, asunto, html, 'ESCALONAMIENTO',
+                NotificacionService.entidad_escalonamiento(gestion)
+            )
         except Exception as e:
             logger.error(f"Error enviando notificación de escalamiento: {str(e)}")
             return False
     
+    @staticmethod
+    def entidad_escalonamiento(gestion):
+        """Cada paso de escalamiento es una notificación distinta; el mismo paso no se repite"""
+        return f'gestion:{gestion.id}:paso:{gestion.numero_escalamiento}'
+    
+    @staticmethod
+    def contenido_escalonamiento(gestion):
+        """Asunto y HTML del aviso de escalamiento"""
+        return NotificacionService.contenidos_escalonamiento([gestion])[0]
+    
+    @staticmethod
+    def contenidos_escalonamiento(gestiones):
+        """(asunto, html) de varios avisos de escalamiento con un solo render en lote"""
+        htmls = plantillas_correo.renderizar_lote(
+            'reporte_escalado.html', [NotificacionService.contexto_gestion(gestion) for gestion in gestiones]
+        )
+        return [
+            (f"[SST-ESCALADO] {gestion.reporte.numero_reporte} - ⚠️ Se requiere tu atención inmediata", html)
+            for gestion, html in zip(gestiones, htmls)
+        ]
+    
     @staticmethod
     def enviar_vencimiento_critico(gestion):
         """Notifica cuando un reporte está a punto de vencer"""
         try:
-            reporte = gestion.reporte
-            gestor = gestion.gestor_actual
-            
-            asunto = f"[SST-CRÍTICO] {reporte.numero_reporte} - 🚨 Vencimiento Inminente"
-            
-            html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background-color: #ff0000; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                    <h2 style="margin: 0;">🚨 CRÍTICO: Reporte a Punto de Vencer</h2>
-                </div>
-                
-                <div style="background-color: #ffe5e5; padding: 20px; border-radius: 0 0 5px 5px; border-left: 4px solid #ff0000;">
-                    <p style="color: red; font-weight: bold; font-size: 16px;">El siguiente reporte está a punto de vencer y requiere ACCIÓN INMEDIATA.</p>
-                    
-                    <div style="background-color: white; padding: 15px; border-left: 4px solid #ff0000; margin: 20px 0;">
-                        <p><strong>📋 Número Reporte:</strong> {reporte.numero_reporte}</p>
-                        <p><strong>📝 Título:</strong> {reporte.titulo}</p>
-                        <p><strong style="color: red; font-size: 18px;">⏰ Vencimiento:</strong> <span style="font-size: 18px; color: red;">{gestion.fecha_vencimiento_resolucion.strftime('%d/%m/%Y %H:%M')}</span></p>
-                        <p><strong>Estado Actual:</strong> {gestion.estado}</p>
-                    </div>
-                    
-                    <p style="text-align: center; margin-top: 20px;">
-                        <a href="http://localhost:5000/reportes/{reporte.id}" style="background-color: #ff0000; color: white; padding: 14px 28px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold; font-size: 16px;">⚡ RESOLVER URGENTEMENTE</a>
-                    </p>
-                </div>
-            </div>
-            """
-            
-            return NotificacionService.enviar_email(gestor.email, asunto, html)
+            asunto, html = NotificacionService.contenido_vencimiento_critico(gestion)
+            return NotificacionService.enviar_email(
+                gestion.gestor_actual.email, asunto, html, 'VENCIMIENTO_CRITICO', f'gestion:{gestion.id}'
+            )
         except Exception as e:
             logger.error(f"Error enviando notificación crítica: {str(e)}")
             return False
     
+    @staticmethod
+    def contenido_vencimiento_critico(gestion):
+        """Asunto y HTML del aviso de vencimiento inminente"""
+        return NotificacionService.contenidos_vencimiento_critico([gestion])[0]
+    
+    @staticmethod
+    def contenidos_vencimiento_critico(gestiones):
+        """(asunto, html) de varios avisos de vencimiento con un solo render en lote"""
+        htmls = plantillas_correo.renderizar_lote(
+            'vencimiento_critico.html', [NotificacionService.contexto_gestion(gestion) for gestion in gestiones]
+        )
+        return [
+            (f"[SST-CRÍTICO] {gestion.reporte.numero_reporte} - 🚨 Vencimiento Inminente", html)
+            for gestion, html in zip(gestiones, htmls)
+        ]
+    
     @staticmethod
     def enviar_reporte_resuelto(gestion, resolucion):
         """Notifica al reportador que su reporte fue resuelto"""
@@ -151,32 +216,11 @@ class NotificacionService:
             reportador = reporte.reportador
             
             asunto = f"[SST-RESUELTO] {reporte.numero_reporte} - ✅ Tu reporte ha sido atendido"
+            html = plantillas_correo.renderizar(
+                'reporte_resuelto.html', **NotificacionService.contexto_gestion(gestion, resolucion=resolucion)
+            )
             
-            html = f"""
-            <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background-color: #28a745; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                    <h2 style="margin: 0;">✅ Reporte Resuelto</h2>
-                </div>
-                
-                <div style="background-color: #e8f5e9; padding: 20px; border-radius: 0 0 5px 5px; border-left: 4px solid #28a745;">
-                    <p>Tu reporte ha sido revisado y resuelto por el equipo de SST.</p>
-                    
-                    <div style="background-color: white; padding: 15px; border-left: 4px solid #28a745; margin: 20px 0;">
-                        <p><strong>📋 Número Reporte:</strong> {reporte.numero_reporte}</p>
-                        <p><strong>📝 Título:</strong> {reporte.titulo}</p>
-                        <p><strong>📅 Fecha Resolución:</strong> {gestion.fecha_resolucion.strftime('%d/%m/%Y %H:%M')}</p>
-                        <p><strong>📄 Resolución:</strong></p>
-                        <p style="background-color: #f9f9f9; padding: 10px; border-radius: 3px;">{resolucion[:300]}</p>
-                    </div>
-                    
-                    <p style="text-align: center; margin-top: 20px;">
-                        <a href="http://localhost:5000/reportes/{reporte.id}" style="background-color: #28a745; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Detalles Completos</a>
-                    </p>
-                </div>
-            </div>
-            """
-            
-            return NotificacionService.enviar_email(reportador.email, asunto, html)
+            return NotificacionService.enviar_email(reportador.email, asunto, html, 'RESOLUCION', f'gestion:{gestion.id}')
         except Exception as e:
             logger.error(f"Error enviando notificación de resolución: {str(e)}")
             return False
@@ -190,32 +234,14 @@ class NotificacionService:
             
             usuarios = Usuario.query.filter(Usuario.rol.in_(roles_notificacion), Usuario.activo == True).all()
             
-            for usuario in usuarios:
-                asunto = f"[SST-CC] {reporte.numero_reporte} - Notificación de seguimiento"
-                html = f"""
-                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                    <div style="background-color: #17a2b8; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                        <h2 style="margin: 0;">📢 Notificación de Seguimiento</h2>
-                    </div>
-                    
-                    <div style="background-color: #f5f5f5; padding: 20px; border-radius: 0 0 5px 5px;">
-                        <p>Se te envía una copia de la siguiente gestión para tu conocimiento y seguimiento.</p>
-                        
-                        <div style="background-color: white; padding: 15px; border-left: 4px solid #17a2b8; margin: 20px 0;">
-                            <p><strong>📋 Número Reporte:</strong> {reporte.numero_reporte}</p>
-                            <p><strong>📝 Título:</strong> {reporte.titulo}</p>
-                            <p><strong>🏷️ Tipo:</strong> {reporte.tipo_reporte_obj.nombre if reporte.tipo_reporte_obj else 'N/A'}</p>
-                            <p><strong>📊 Estado:</strong> {gestion.estado}</p>
-                        </div>
-                        
-                        <p style="text-align: center; margin-top: 20px;">
-                            <a href="http://localhost:5000/reportes/{reporte.id}" style="background-color: #17a2b8; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Reporte</a>
-                        </p>
-                    </div>
-                </div>
-                """
-                
-                NotificacionService.enviar_email(usuario.email, asunto, html)
+            asunto = f"[SST-CC] {reporte.numero_reporte} - Notificación de seguimiento"
+            html = plantillas_correo.renderizar('cc_seguimiento.html', **NotificacionService.contexto_gestion(gestion))
+            
+            # Mismo contenido para todos: el despachador lo envía en una sola
+            # llamada al proveedor (una personalización por destinatario)
+            NotificacionService.enviar_email_varios(
+                [usuario.email for usuario in usuarios], asunto, html, 'CC', f'gestion:{gestion.id}:{gestion.estado}'
+            )
         except Exception as e:
             logger.error(f"Error enviando notificaciones CC: {str(e)}")
     
@@ -224,93 +250,43 @@ class NotificacionService:
     @staticmethod
     def enviar_asignacion_consulta(abogado, consulta):
         """Notifica al abogado sobre nueva consulta asignada"""
-        html = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background-color: #6f42c1; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                <h2 style="margin: 0;">⚖️ Nueva Consulta Jurídica Asignada</h2>
-            </div>
-            
-            <div style="background-color: #f5f5f5; padding: 20px; border-radius: 0 0 5px 5px;">
-                <div style="background-color: white; padding: 15px; border-left: 4px solid #6f42c1; margin: 20px 0;">
-                    <p><strong>📋 Número:</strong> {consulta.numero_consulta}</p>
-                    <p><strong>📝 Título:</strong> {consulta.titulo}</p>
-                    <p><strong>🏷️ Tipo:</strong> {consulta.tipo_consulta}</p>
-                    <p><strong>⚠️ Prioridad:</strong> {consulta.prioridad}</p>
-                    <p><strong>⚡ Riesgo Legal:</strong> {consulta.riesgo_legal}</p>
-                    <p><strong>📄 Descripción:</strong> {consulta.descripcion[:200]}</p>
-                </div>
-                
-                <p style="text-align: center; margin-top: 20px;">
-                    <a href="http://localhost:5000/juridico/{consulta.id}" style="background-color: #6f42c1; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Consulta</a>
-                </p>
-            </div>
-        </div>
-        """
+        html = plantillas_correo.renderizar('consulta_asignada.html', consulta=consulta)
         
         return NotificacionService.enviar_email(
             abogado.email,
             f"[SST] Nueva Consulta Jurídica: {consulta.numero_consulta}",
-            html
+            html,
+            'JURIDICO_ASIGNACION',
+            f'consulta:{consulta.id}:{abogado.id}'
         )
     
     @staticmethod
     def enviar_resolucion_consulta(empleado, consulta):
         """Notifica al empleado cuando su consulta es resuelta"""
-        html = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background-color: #28a745; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                <h2 style="margin: 0;">✅ Consulta Jurídica Resuelta</h2>
-            </div>
-            
-            <div style="background-color: #e8f5e9; padding: 20px; border-radius: 0 0 5px 5px;">
-                <div style="background-color: white; padding: 15px; border-left: 4px solid #28a745; margin: 20px 0;">
-                    <p><strong>📋 Número:</strong> {consulta.numero_consulta}</p>
-                    <p><strong>📝 Título:</strong> {consulta.titulo}</p>
-                    <p><strong>✅ Resolución:</strong></p>
-                    <p style="background-color: #f9f9f9; padding: 10px; border-radius: 3px;">{consulta.resolucion[:300]}</p>
-                    <p><strong>💡 Recomendaciones:</strong></p>
-                    <p style="background-color: #f9f9f9; padding: 10px; border-radius: 3px;">{consulta.recomendaciones[:300]}</p>
-                </div>
-                
-                <p style="text-align: center; margin-top: 20px;">
-                    <a href="http://localhost:5000/juridico/{consulta.id}" style="background-color: #28a745; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Detalle Completo</a>
-                </p>
-            </div>
-        </div>
-        """
+        html = plantillas_correo.renderizar('consulta_resuelta.html', consulta=consulta)
         
         return NotificacionService.enviar_email(
             empleado.email,
             f"[SST] Consulta Resuelta: {consulta.numero_consulta}",
-            html
+            html,
+            'JURIDICO_RESOLUCION',
+            f'consulta:{consulta.id}'
         )
     
     @staticmethod
     def enviar_notificacion_reporte(responsable, reporte):
         """Notifica nuevo reporte SST"""
-        html = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background-color: #fd7e14; color: white; padding: 20px; text-align: center; border-radius: 5px 5px 0 0;">
-                <h2 style="margin: 0;">🔔 Nuevo Reporte de Condición Insegura</h2>
-            </div>
-            
-            <div style="background-color: #fff3cd; padding: 20px; border-radius: 0 0 5px 5px;">
-                <div style="background-color: white; padding: 15px; border-left: 4px solid #fd7e14; margin: 20px 0;">
-                    <p><strong>📋 Número:</strong> {reporte.numero_reporte}</p>
-                    <p><strong>📝 Título:</strong> {reporte.titulo}</p>
-                    <p><strong>📍 Ubicación:</strong> {reporte.ubicacion_incidente.nombre if reporte.ubicacion_incidente else 'No especificada'}</p>
-                    <p><strong>⚠️ Severidad:</strong> {reporte.tipo_evidencia_obj.nombre if reporte.tipo_evidencia_obj else 'N/A'}</p>
-                </div>
-                
-                <p style="text-align: center; margin-top: 20px;">
-                    <a href="http://localhost:5000/reportes/{reporte.id}" style="background-color: #fd7e14; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">Ver Reporte</a>
-                </p>
-            </div>
-        </div>
-        """
+        html = plantillas_correo.renderizar(
+            'nuevo_reporte.html',
+            reporte=reporte,
+            ubicacion=getattr(reporte, 'ubicacion_incidente', None),
+            tipo_evidencia=getattr(reporte, 'tipo_evidencia_obj', None)
+        )
         
         return NotificacionService.enviar_email(
             responsable.email,
             f"[SST] Nuevo Reporte: {reporte.numero_reporte}",
-            html
-        )
\ No newline at end of file
+            html,
+            'NUEVO_REPORTE',
+            f'reporte:{reporte.id}'
+        )
@@ -0,0 +1,410 @@
+# app/services/pasarela_ia.py
+"""
+Pasarela de IA: único punto de salida hacia el modelo en cada proceso
+
+- cliente configurado una sola vez (genai.configure y un GenerativeModel
+  por nombre de modelo, reutilizados por todos los hilos)
+- límite de llamadas simultáneas (SST_IA_MAX_CONCURRENTES); quien no
+  consigue turno en SST_IA_ESPERA_SEG recibe ErrorIA en vez de quedarse
+  esperando
+- plazo por llamada (SST_IA_TIMEOUT_SEG): la petición web se libera al
+  vencer aunque el modelo siga sin responder
+- circuito: tras UMBRAL_FALLOS fallos seguidos se deja de llamar al
+  modelo durante ENFRIAMIENTO_SEG; luego una llamada de prueba decide si
+  se cierra o vuelve a abrirse
+
+generar_stream() entrega la respuesta por fragmentos (chat en streaming)
+con los mismos límites.
+
+SST_IA_BACKEND=falso usa BackendFalso (sin red ni API key) para probar
+carga y flujos completos fuera de línea.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TimeoutFuturo
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_FIN = object()  # Marca de fin de un streaming en la cola interna
+
+
+class ErrorIA(Exception):
+    """
+    La pasarela no pudo obtener respuesta del modelo
+
+    codigo: 'circuito_abierto', 'saturada', 'timeout', 'modelo' o 'configuracion'
+    """
+
+    def __init__(self, mensaje, codigo='modelo'):
+        super().__init__(mensaje)
+        self.codigo = codigo
+
+
+# ============== BACKENDS ==============
+
+class BackendGemini:
+    """google-generativeai configurado una vez por proceso"""
+
+    def __init__(self, api_key=None):
+        api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            logger.error("❌ GEMINI_API_KEY no está configurada: la IA no está disponible "
+                         "(SST_IA_BACKEND=falso para trabajar sin modelo)")
+            raise ErrorIA('El servicio de IA no está configurado', 'configuracion')
+
+        import google.generativeai as genai
+
+        self._genai = genai
+        genai.configure(api_key=api_key)
+        self._modelos = {}
+        self._lock = threading.Lock()
+
+    def _modelo(self, nombre):
+        modelo = self._modelos.get(nombre)
+        if modelo is None:
+            with self._lock:
+                modelo = self._modelos.setdefault(nombre, self._genai.GenerativeModel(nombre))
+        return modelo
+
+    def generar(self, modelo, contenido):
+        return self._modelo(modelo).generate_content(contenido).text
+
+    def generar_stream(self, modelo, contenido):
+        for fragmento in self._modelo(modelo).generate_content(contenido, stream=True):
+            yield fragmento.text
+
+
+class BackendFalso:
+    """
+    Respuestas fijas con latencia y tasa de fallos configurables
+
+    Un contenido con imagen devuelve un análisis JSON; un texto, una respuesta de chat.
+    """
+
+    ANALISIS = {
+        "peligros": ["Superficie resbaladiza", "Obstáculo en zona de tránsito"],
+        "severidad": 2, "probabilidad": 3, "nivel_riesgo": 6,
+        "controles_recomendados": ["Señalizar el área", "Limpieza inmediata"],
+        "normativa_aplicable": ["Resolución 0312/2019"], "confianza_analisis": 0.9
+    }
+
+    def __init__(self, latencia_ms=None, tasa_fallos=None, token_ms=None):
+        self.latencia_ms = float(os.getenv('SST_IA_FALSO_LATENCIA_MS', '200') if latencia_ms is None else latencia_ms)
+        self.tasa_fallos = float(os.getenv('SST_IA_FALSO_FALLOS', '0') if tasa_fallos is None else tasa_fallos)
+        # En streaming: latencia_ms hasta el primer fragmento y token_ms entre fragmentos
+        self.token_ms = float(os.getenv('SST_IA_FALSO_TOKEN_MS', '20') if token_ms is None else token_ms)
+        self.llamadas = 0
+
+    def _responder(self, contenido):
+        self.llamadas += 1
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        if self.tasa_fallos and random.random() < self.tasa_fallos:
+            raise RuntimeError('Fallo simulado del backend falso')
+        if isinstance(contenido, list) and any(isinstance(parte, dict) for parte in contenido):
+            return json.dumps(self.ANALISIS)
+        return 'Respuesta simulada: consulte el Decreto 1072 de 2015 y la Resolución 0312 de 2019.'
+
+    def generar(self, modelo, contenido):
+        return self._responder(contenido)
+
+    def generar_stream(self, modelo, contenido):
+        for i, palabra in enumerate(self._responder(contenido).split(' ')):
+            if i and self.token_ms:
+                time.sleep(self.token_ms / 1000)
+            yield palabra if i == 0 else ' ' + palabra
+
+
+def crear_backend():
+    """Backend según SST_IA_BACKEND (gemini o falso)"""
+    tipo = os.getenv('SST_IA_BACKEND', 'gemini').lower()
+    if tipo == 'falso':
+        return BackendFalso()
+    if tipo != 'gemini':
+        logger.warning(f"⚠️ SST_IA_BACKEND desconocido ({tipo}), se usa gemini")
+    return BackendGemini()
+
+
+# ============== PASARELA ==============
+
+class PasarelaIA:
+    """Cliente compartido + semáforo + plazo por llamada + circuito"""
+
+    MAX_CONCURRENTES = int(os.getenv('SST_IA_MAX_CONCURRENTES', '8'))
+    ESPERA_SEG = float(os.getenv('SST_IA_ESPERA_SEG', '5'))
+    TIMEOUT_SEG = float(os.getenv('SST_IA_TIMEOUT_SEG', '60'))
+
+    # Circuito: fallos seguidos para abrir y segundos antes de la llamada de prueba
+    UMBRAL_FALLOS = 5
+    ENFRIAMIENTO_SEG = 30
+
+    def __init__(self, backend=None, max_concurrentes=None, telemetria=None):
+        self._backend = backend
+        self._telemetria = telemetria
+        self.max_concurrentes = max_concurrentes or self.MAX_CONCURRENTES
+        self._semaforo = threading.BoundedSemaphore(self.max_concurrentes)
+        self._ejecutor = None
+        self._lock = threading.Lock()
+
+        self._fallos_seguidos = 0
+        self._abierto_hasta = None   # None: circuito cerrado
+        self._probando = False       # Semiabierto: hay una llamada de prueba en curso
+        self._en_curso = 0
+        self._metricas = dict.fromkeys(
+            ('llamadas', 'exitosas', 'fallidas', 'timeouts', 'canceladas',
+             'rechazadas_circuito', 'rechazadas_saturada'), 0
+        )
+        # Tiempo hasta el primer fragmento en streaming
+        self._primer_fragmento_total = 0.0
+        self._primer_fragmento_n = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = crear_backend()
+                    logger.info(f"✅ Pasarela IA con backend {type(self._backend).__name__}")
+        return self._backend
+
+    def usar_backend(self, backend):
+        """Cambia el backend (pruebas de carga, tests) y reinicia el circuito"""
+        with self._lock:
+            self._backend = backend
+            self._fallos_seguidos = 0
+            self._abierto_hasta = None
+            self._probando = False
+
+    @property
+    def telemetria(self):
+        """Registro de cada llamada (app/services/telemetria_ia.py)"""
+        if self._telemetria is None:
+            from app.services.telemetria_ia import telemetria_ia
+            self._telemetria = telemetria_ia
+        return self._telemetria
+
+    @property
+    def ejecutor(self):
+        if self._ejecutor is None:
+            with self._lock:
+                if self._ejecutor is None:
+                    self._ejecutor = ThreadPoolExecutor(
+                        max_workers=self.max_concurrentes, thread_name_prefix='pasarela-ia'
+                    )
+        return self._ejecutor
+
+    def _contar(self, metrica):
+        with self._lock:
+            self._metricas[metrica] += 1
+
+    # ============== CIRCUITO ==============
+
+    @property
+    def circuito(self):
+        if self._abierto_hasta is None:
+            return 'cerrado'
+        return 'abierto' if time.monotonic() < self._abierto_hasta else 'semiabierto'
+
+    def _permitir(self):
+        """False si el circuito está abierto (o ya hay una llamada de prueba)"""
+        with self._lock:
+            if self._abierto_hasta is None:
+                return True
+            if time.monotonic() < self._abierto_hasta or self._probando:
+                return False
+            self._probando = True
+            return True
+
+    def _registrar(self, exito):
+        with self._lock:
+            self._probando = False
+            if exito:
+                if self._abierto_hasta is not None:
+                    logger.info("✅ Pasarela IA: circuito cerrado, el modelo responde de nuevo")
+                self._fallos_seguidos = 0
+                self._abierto_hasta = None
+                return
+            self._fallos_seguidos += 1
+            if self._abierto_hasta is not None or self._fallos_seguidos >= self.UMBRAL_FALLOS:
+                self._abierto_hasta = time.monotonic() + self.ENFRIAMIENTO_SEG
+                logger.error(
+                    f"🔌 Pasarela IA: circuito abierto {self.ENFRIAMIENTO_SEG}s "
+                    f"tras {self._fallos_seguidos} fallos seguidos"
+                )
+
+    # ============== LLAMADAS ==============
+
+    def generar(self, contenido, modelo, timeout=None, contexto=None):
+        """
+        Texto de la respuesta del modelo
+
+        Args:
+            contexto: quién llama, para la telemetría ({'operacion', 'usuario_id', 'reporte_id', 'departamento'})
+
+        Raises:
+            ErrorIA: circuito abierto, pasarela saturada, plazo vencido o error del modelo
+        """
+        inicio = time.perf_counter()
+        try:
+            futuro = self._lanzar(self.backend.generar, modelo, contenido)
+        except ErrorIA as e:
+            self._medir(contexto, modelo, contenido, inicio, e.codigo)
+            raise
+        try:
+            texto = futuro.result(timeout=timeout or self.TIMEOUT_SEG)
+        except TimeoutFuturo as e:
+            self._contar('timeouts')
+            self._registrar(False)
+            self._medir(contexto, modelo, contenido, inicio, 'timeout', error=e)
+            raise ErrorIA(f'El modelo no respondió en {timeout or self.TIMEOUT_SEG:.0f}s', 'timeout')
+        except Exception as e:
+            self._contar('fallidas')
+            self._registrar(False)
+            self._medir(contexto, modelo, contenido, inicio, 'modelo', error=e)
+            raise ErrorIA(f'Error del modelo: {str(e)}', 'modelo')
+
+        self._contar('exitosas')
+        self._registrar(True)
+        self._medir(contexto, modelo, contenido, inicio, 'ok', respuesta=texto)
+        return texto
+
+    def generar_stream(self, contenido, modelo, timeout=None, contexto=None):
+        """
+        Fragmentos de texto a medida que el modelo los produce (generador)
+
+        El plazo aplica al primer fragmento y a cada espera entre fragmentos.
+        Si quien consume cierra el generador (el cliente se desconectó), se
+        deja de leer del modelo y el turno se libera.
+
+        Raises:
+            ErrorIA: igual que generar(), al pedir el primer fragmento o a mitad de la respuesta
+        """
+        plazo = timeout or self.TIMEOUT_SEG
+        cola = queue.Queue()
+        cancelado = threading.Event()
+
+        def producir(backend):
+            try:
+                for fragmento in backend.generar_stream(modelo, contenido):
+                    if cancelado.is_set():
+                        return
+                    if fragmento:
+                        cola.put(fragmento)
+                cola.put(_FIN)
+            except Exception as e:
+                cola.put(e)
+
+        inicio = time.perf_counter()
+        try:
+            self._lanzar(producir, self.backend)
+        except ErrorIA as e:
+            self._medir(contexto, modelo, contenido, inicio, e.codigo)
+            raise
+        primer_fragmento = None
+        fragmentos = []
+        estado, error = 'cancelada', None
+        try:
+            while True:
+                try:
+                    elemento = cola.get(timeout=plazo)
+                except queue.Empty as e:
+                    estado, error = 'timeout', e
+                    self._contar('timeouts')
+                    self._registrar(False)
+                    raise ErrorIA(f'El modelo no respondió en {plazo:.0f}s', 'timeout')
+                if elemento is _FIN:
+                    estado = 'ok'
+                    break
+                if isinstance(elemento, Exception):
+                    estado, error = 'modelo', elemento
+                    self._contar('fallidas')
+                    self._registrar(False)
+                    raise ErrorIA(f'Error del modelo: {str(elemento)}', 'modelo')
+                if primer_fragmento is None:
+                    primer_fragmento = time.perf_counter() - inicio
+                    self._registrar_primer_fragmento(primer_fragmento)
+                fragmentos.append(elemento)
+                yield elemento
+        except GeneratorExit:
+            self._contar('canceladas')
+            # Cancelar no es éxito ni fallo, pero si era la llamada de prueba
+            # del circuito otra debe poder intentarlo
+            self._soltar_prueba()
+            raise
+        finally:
+            cancelado.set()
+            self._medir(contexto, modelo, contenido, inicio, estado, respuesta=''.join(fragmentos),
+                        error=error, primer_fragmento=primer_fragmento)
+
+        self._contar('exitosas')
+        self._registrar(True)
+
+    def _medir(self, contexto, modelo, contenido, inicio, estado, respuesta=None, error=None, primer_fragmento=None):
+        self.telemetria.registrar(contexto, modelo, contenido, estado, time.perf_counter() - inicio,
+                                  respuesta=respuesta, error=error, primer_fragmento=primer_fragmento)
+
+    def _lanzar(self, funcion, *args):
+        """Circuito + turno del semáforo; ejecuta funcion en el grupo de hilos"""
+        if not self._permitir():
+            self._contar('rechazadas_circuito')
+            raise ErrorIA('El servicio de IA no está disponible temporalmente', 'circuito_abierto')
+
+        if not self._semaforo.acquire(timeout=self.ESPERA_SEG):
+            self._registrar_rechazo_saturada()
+            raise ErrorIA('El servicio de IA está ocupado, intente de nuevo en unos segundos', 'saturada')
+
+        with self._lock:
+            self._metricas['llamadas'] += 1
+            self._en_curso += 1
+        try:
+            futuro = self.ejecutor.submit(funcion, *args)
+        except Exception:
+            self._liberar()
+            raise
+        # El turno se libera cuando la llamada termina de verdad, no cuando
+        # vence el plazo: una llamada colgada sigue contando como en curso
+        futuro.add_done_callback(lambda _: self._liberar())
+        return futuro
+
+    def _registrar_primer_fragmento(self, segundos):
+        with self._lock:
+            self._primer_fragmento_total += segundos
+            self._primer_fragmento_n += 1
+
+    def _liberar(self):
+        with self._lock:
+            self._en_curso -= 1
+        self._semaforo.release()
+
+    def _registrar_rechazo_saturada(self):
+        self._contar('rechazadas_saturada')
+        # Si era la llamada de prueba del circuito, otra podrá intentarlo
+        self._soltar_prueba()
+
+    def _soltar_prueba(self):
+        with self._lock:
+            self._probando = False
+
+    def estado(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas['fallos_seguidos'] = self._fallos_seguidos
+            metricas['primer_fragmento_ms_promedio'] = round(
+                1000 * self._primer_fragmento_total / self._primer_fragmento_n, 1
+            ) if self._primer_fragmento_n else None
+        metricas.update({
+            'backend': type(self._backend).__name__ if self._backend else None,
+            'circuito': self.circuito,
+            'max_concurrentes': self.max_concurrentes,
+            'en_curso': self._en_curso
+        })
+        return metricas
+
+
+pasarela_ia = PasarelaIA()
@@ -0,0 +1,371 @@
+# app/services/peligros_service.py
+"""
+Peligros de los análisis IA normalizados en peligros_reporte
+
+El análisis de imagen deja los peligros en CondicionInsegura.riesgos_identificados
+como JSON (una lista de textos o de objetos con descripción, clasificación,
+severidad y probabilidad). Aquí cada peligro pasa a una fila con:
+- codigo/clase de la taxonomía GTC 45 (TAXONOMIA), por palabras clave
+- severidad/probabilidad del peligro, o las del análisis del reporte
+- dependencia (metadata_adicional['dependencia_id']), departamento y mes del reporte
+
+Las filas se reemplazan en el mismo flush que el reporte (eventos de
+mapper); los UPDATE masivos llaman a sincronizar_ids(). El trabajo
+'reconstruir_peligros' y scripts/reconstruir_peligros.py llenan la tabla
+con los reportes anteriores.
+"""
+
+from app import db
+from app.models import CondicionInsegura, Dependencia, Empleado, PeligroReporte
+from app.utils.texto import sin_tildes
+from datetime import datetime
+from sqlalchemy import event, inspect, select, insert, delete, func, distinct
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def _patron(*palabras):
+    """Coincide con cualquiera de las palabras al inicio de una palabra del texto (sin tildes)"""
+    return re.compile(r'\b(?:' + '|'.join(re.escape(p) for p in palabras) + ')')
+
+
+class PeligrosService:
+    """Normalización de peligros y analítica agrupada"""
+
+    # (código, clase GTC 45, nombre, patrón). El orden importa: gana la
+    # primera coincidencia ("caída de altura" es alturas antes que locativo)
+    TAXONOMIA = (
+        ('CS-ALT', 'Condiciones de seguridad', 'Trabajo en alturas',
+         _patron('altura', 'andamio', 'arnes', 'escalera de mano', 'techo', 'cubierta', 'linea de vida',
+                 'distinto nivel')),
+        ('CS-CON', 'Condiciones de seguridad', 'Espacios confinados',
+         _patron('espacio confinado', 'espacios confinados', 'tanque', 'pozo', 'alcantarilla')),
+        ('CS-ELE', 'Condiciones de seguridad', 'Eléctrico',
+         _patron('electric', 'cable', 'tablero', 'tomacorriente', 'toma corriente', 'enchufe', 'voltaje',
+                 'alta tension', 'baja tension', 'cortocircuito', 'corto circuito', 'energizad', 'extension')),
+        ('CS-TEC', 'Condiciones de seguridad', 'Tecnológico',
+         _patron('tecnologico', 'incendio', 'explosi', 'fuga', 'extintor', 'inflamable', 'cilindro')),
+        ('CS-MEC', 'Condiciones de seguridad', 'Mecánico',
+         _patron('mecanico', 'maquina', 'herramienta', 'corte', 'cortante', 'atrapamiento', 'atrapa',
+                 'proyeccion', 'engranaje', 'banda transportadora', 'punzante', 'guarda')),
+        ('CS-TRA', 'Condiciones de seguridad', 'Accidentes de tránsito',
+         _patron('accidente de transito', 'accidentes de transito', 'vehiculo', 'montacarga', 'atropell',
+                 'via publica', 'trafico')),
+        ('CS-PUB', 'Condiciones de seguridad', 'Públicos',
+         _patron('publico', 'robo', 'atraco', 'asalto', 'orden publico', 'vandalismo')),
+        ('NAT', 'Fenómenos naturales', 'Fenómenos naturales',
+         _patron('fenomeno natural', 'fenomenos naturales', 'sismo', 'terremoto', 'inundacion', 'tormenta',
+                 'vendaval', 'deslizamiento', 'precipitacion')),
+        ('QUI', 'Químico', 'Químico',
+         _patron('quimic', 'polvo', 'gas', 'vapor', 'humo', 'sustancia', 'solvente', 'acido', 'toxic',
+                 'material particulado', 'niebla', 'aerosol')),
+        ('FIS', 'Físico', 'Físico',
+         _patron('fisico', 'ruido', 'iluminacion', 'luz', 'vibracion', 'temperatura', 'calor', 'frio',
+                 'radiacion')),
+        ('BIO', 'Biológico', 'Biológico',
+         _patron('biologic', 'virus', 'bacteria', 'hongo', 'fluido', 'sangre', 'plaga', 'roedor', 'mordedura',
+                 'picadura')),
+        ('PSI', 'Psicosocial', 'Psicosocial',
+         _patron('psicosocial', 'estres', 'acoso', 'jornada', 'fatiga', 'carga mental', 'monotonia')),
+        ('BIOM', 'Biomecánico', 'Biomecánico',
+         _patron('biomecanico', 'postura', 'ergonom', 'carga', 'levantamiento', 'manipulacion',
+                 'movimiento repetitivo', 'repetitiv', 'esfuerzo', 'sobreesfuerzo')),
+        ('CS-LOC', 'Condiciones de seguridad', 'Locativo',
+         _patron('locativo', 'piso', 'superficie', 'resbal', 'escalera', 'obstaculo', 'desorden', 'orden y aseo',
+                 'almacenamiento', 'estanteria', 'caida', 'tropiezo', 'pasillo', 'hueco', 'derrame', 'baranda')),
+    )
+    SIN_CLASIFICAR = ('OTR', 'Sin clasificar', 'Sin clasificar')
+
+    NOMBRES = {codigo: nombre for codigo, _, nombre, _ in TAXONOMIA}
+    NOMBRES[SIN_CLASIFICAR[0]] = SIN_CLASIFICAR[2]
+
+    AGRUPACIONES = {
+        'peligro': PeligroReporte.codigo,
+        'clase': PeligroReporte.clase,
+        'dependencia': PeligroReporte.dependencia_id,
+        'departamento': PeligroReporte.departamento,
+        'mes': PeligroReporte.mes,
+    }
+
+    # Campos del reporte de los que salen las filas
+    CAMPOS = ('riesgos_identificados', 'imagen_procesada_json', 'severidad_calculada', 'metadata_adicional',
+              'fecha_creacion', 'empleado_reportador_id')
+
+    TAMANO_LOTE = 500
+    LIMITE_GRUPOS = 1000
+
+    _MES = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+    # ============== NORMALIZACIÓN ==============
+
+    @staticmethod
+    def clasificar(texto):
+        """(codigo, clase) de la taxonomía para el texto de un peligro"""
+        normalizado = sin_tildes(texto)
+        for codigo, clase, _, patron in PeligrosService.TAXONOMIA:
+            if patron.search(normalizado):
+                return codigo, clase
+        return PeligrosService.SIN_CLASIFICAR[:2]
+
+    @staticmethod
+    def _entero(valor):
+        try:
+            return int(valor) if valor is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _peligro(peligro):
+        """(descripción, clasificación declarada, severidad, probabilidad) de un elemento del JSON"""
+        if isinstance(peligro, dict):
+            descripcion = next((str(peligro[c]) for c in ('descripcion', 'peligro', 'nombre', 'detalle')
+                                if peligro.get(c)), '')
+            clasificacion = ' '.join(str(peligro[c]) for c in ('codigo', 'clasificacion', 'clase', 'tipo', 'categoria')
+                                     if peligro.get(c))
+            return (descripcion or clasificacion, clasificacion,
+                    PeligrosService._entero(peligro.get('severidad')),
+                    PeligrosService._entero(peligro.get('probabilidad')))
+        return str(peligro or ''), '', None, None
+
+    @staticmethod
+    def filas(reporte, departamento=None):
+        """
+        Filas de peligros_reporte de un reporte (objeto o fila con CAMPOS e id)
+
+        Args:
+            departamento: el del Empleado que reportó, si metadata_adicional no lo trae
+        """
+        riesgos = reporte.riesgos_identificados
+        if isinstance(riesgos, (str, dict)):
+            riesgos = [riesgos]
+        if not riesgos:
+            return []
+
+        analisis = reporte.imagen_procesada_json if isinstance(reporte.imagen_procesada_json, dict) else {}
+        metadata = reporte.metadata_adicional if isinstance(reporte.metadata_adicional, dict) else {}
+        severidad_reporte = PeligrosService._entero(reporte.severidad_calculada) or \
+            PeligrosService._entero(analisis.get('severidad'))
+        probabilidad_reporte = PeligrosService._entero(analisis.get('probabilidad'))
+        fecha = reporte.fecha_creacion or datetime.utcnow()
+
+        filas = []
+        codigos = {codigo for codigo, _, _, _ in PeligrosService.TAXONOMIA}
+        for orden, peligro in enumerate(riesgos):
+            descripcion, clasificacion, severidad, probabilidad = PeligrosService._peligro(peligro)
+            descripcion = descripcion.strip()
+            if not descripcion:
+                continue
+            declarado = clasificacion.split()[0].upper() if clasificacion else None
+            if declarado in codigos:
+                codigo, clase = declarado, next(c[1] for c in PeligrosService.TAXONOMIA if c[0] == declarado)
+            else:
+                codigo, clase = PeligrosService.clasificar(clasificacion) if clasificacion else (None, None)
+                if codigo in (None, PeligrosService.SIN_CLASIFICAR[0]):
+                    codigo, clase = PeligrosService.clasificar(descripcion)
+            severidad = severidad or severidad_reporte
+            probabilidad = probabilidad or probabilidad_reporte
+            filas.append({
+                'reporte_id': reporte.id,
+                'orden': orden,
+                'descripcion': descripcion[:300],
+                'codigo': codigo,
+                'clase': clase,
+                'severidad': severidad,
+                'probabilidad': probabilidad,
+                'nivel_riesgo': severidad * probabilidad if severidad and probabilidad
+                else PeligrosService._entero(analisis.get('nivel_riesgo')),
+                'dependencia_id': PeligrosService._entero(metadata.get('dependencia_id')),
+                'departamento': (metadata.get('departamento') or departamento or None),
+                'fecha_reporte': fecha,
+                'mes': fecha.strftime('%Y-%m'),
+            })
+        return filas
+
+    # ============== ESCRITURA ==============
+
+    @staticmethod
+    def reemplazar(conexion, reporte_ids, filas):
+        """Cambia los peligros de los reportes dados por `filas` con la conexión de la transacción en curso"""
+        conexion.execute(delete(PeligroReporte).where(PeligroReporte.reporte_id.in_(list(reporte_ids))))
+        if filas:
+            conexion.execute(insert(PeligroReporte), filas)
+
+    @staticmethod
+    def _columnas():
+        return [CondicionInsegura.id] + [getattr(CondicionInsegura, campo) for campo in PeligrosService.CAMPOS]
+
+    @staticmethod
+    def _departamentos(conexion, usuario_ids):
+        usuario_ids = {u for u in usuario_ids if u}
+        if not usuario_ids:
+            return {}
+        return dict(conexion.execute(
+            select(Empleado.usuario_id, Empleado.departamento).where(Empleado.usuario_id.in_(usuario_ids))
+        ).all())
+
+    @staticmethod
+    def _reemplazar_lote(conexion, reportes):
+        departamentos = PeligrosService._departamentos(conexion, (r.empleado_reportador_id for r in reportes))
+        filas = [fila for reporte in reportes
+                 for fila in PeligrosService.filas(reporte, departamentos.get(reporte.empleado_reportador_id))]
+        PeligrosService.reemplazar(conexion, [r.id for r in reportes], filas)
+        return len(filas)
+
+    @staticmethod
+    def sincronizar_ids(reporte_ids):
+        """Rehace los peligros de reportes cambiados con UPDATE masivo, en la transacción de la sesión (sin commit)"""
+        conexion = db.session.connection()
+        reportes = db.session.execute(
+            select(*PeligrosService._columnas()).where(CondicionInsegura.id.in_(list(reporte_ids)))
+        ).all()
+        return PeligrosService._reemplazar_lote(conexion, reportes) if reportes else 0
+
+    @staticmethod
+    def reconstruir(tamano_lote=None, desde_id=0):
+        """
+        Rehace peligros_reporte de todos los reportes, un commit por lote
+
+        Returns:
+            {'reportes', 'peligros', 'ultimo_id'}
+        """
+        tamano_lote = tamano_lote or PeligrosService.TAMANO_LOTE
+        resultado = {'reportes': 0, 'peligros': 0, 'ultimo_id': desde_id}
+        while True:
+            # Keyset por id: lotes acotados sin OFFSET
+            reportes = db.session.execute(
+                select(*PeligrosService._columnas()).where(CondicionInsegura.id > resultado['ultimo_id'])
+                .order_by(CondicionInsegura.id).limit(tamano_lote)
+            ).all()
+            if not reportes:
+                break
+            resultado['peligros'] += PeligrosService._reemplazar_lote(db.session.connection(), reportes)
+            resultado['reportes'] += len(reportes)
+            resultado['ultimo_id'] = reportes[-1].id
+            db.session.commit()
+        logger.info(f"🧭 Peligros: {resultado['peligros']} peligros de {resultado['reportes']} reportes")
+        return resultado
+
+    # ============== ANALÍTICA ==============
+
+    @staticmethod
+    def taxonomia():
+        return [{'codigo': codigo, 'clase': clase, 'nombre': nombre}
+                for codigo, clase, nombre, _ in PeligrosService.TAXONOMIA] + \
+            [dict(zip(('codigo', 'clase', 'nombre'), PeligrosService.SIN_CLASIFICAR))]
+
+    @staticmethod
+    def consulta_resumen(agrupar=('peligro', 'dependencia', 'mes'), desde=None, hasta=None, codigos=None,
+                         dependencia_id=None, departamento=None, limite=None):
+        """
+        SELECT ... GROUP BY de resumen() (una sola consulta, filtrada por los índices de peligros_reporte)
+
+        Args:
+            desde, hasta: meses AAAA-MM (inclusive)
+            codigos: códigos de la taxonomía a incluir
+
+        Raises:
+            ValueError: agrupación, mes o código desconocido
+        """
+        agrupar = list(dict.fromkeys(agrupar or ()))
+        if not agrupar or any(a not in PeligrosService.AGRUPACIONES for a in agrupar):
+            raise ValueError(f"agrupar debe ser una combinación de: {', '.join(PeligrosService.AGRUPACIONES)}")
+        for mes in (desde, hasta):
+            if mes and not PeligrosService._MES.match(mes):
+                raise ValueError('desde y hasta deben tener la forma AAAA-MM')
+        codigos = list(codigos or [])
+        if any(codigo not in PeligrosService.NOMBRES for codigo in codigos):
+            raise ValueError(f"codigo debe ser uno de: {', '.join(PeligrosService.NOMBRES)}")
+        limite = min(limite or PeligrosService.LIMITE_GRUPOS, PeligrosService.LIMITE_GRUPOS)
+
+        grupos = [PeligrosService.AGRUPACIONES[a].label(a) for a in agrupar]
+        total = func.count(PeligroReporte.id)
+        consulta = select(
+            *grupos,
+            total.label('peligros'),
+            func.count(distinct(PeligroReporte.reporte_id)).label('reportes'),
+            func.avg(PeligroReporte.nivel_riesgo).label('nivel_riesgo_promedio'),
+            func.max(PeligroReporte.nivel_riesgo).label('nivel_riesgo_max'),
+        )
+        claves = [PeligrosService.AGRUPACIONES[a] for a in agrupar]
+        if 'dependencia' in agrupar:
+            consulta = consulta.add_columns(Dependencia.nombre.label('dependencia_nombre')).outerjoin(
+                Dependencia, Dependencia.id == PeligroReporte.dependencia_id)
+            claves.append(Dependencia.nombre)
+
+        if desde:
+            consulta = consulta.where(PeligroReporte.mes >= desde)
+        if hasta:
+            consulta = consulta.where(PeligroReporte.mes <= hasta)
+        if codigos:
+            consulta = consulta.where(PeligroReporte.codigo.in_(codigos))
+        if dependencia_id is not None:
+            consulta = consulta.where(PeligroReporte.dependencia_id == dependencia_id)
+        if departamento:
+            consulta = consulta.where(PeligroReporte.departamento == departamento)
+
+        return consulta.group_by(*claves).order_by(total.desc(), *claves).limit(limite)
+
+    @staticmethod
+    def resumen(agrupar=('peligro', 'dependencia', 'mes'), **filtros):
+        """
+        Peligros agrupados por cualquier combinación de AGRUPACIONES
+
+        Returns:
+            [{<agrupaciones>, 'peligros', 'reportes', 'nivel_riesgo_promedio', 'nivel_riesgo_max'}]
+            de mayor a menor cantidad de peligros
+        """
+        agrupar = list(dict.fromkeys(agrupar or ()))
+        consulta = PeligrosService.consulta_resumen(agrupar, **filtros)
+
+        resultado = []
+        for fila in db.session.execute(consulta).mappings():
+            grupo = {a: fila[a] for a in agrupar}
+            if 'peligro' in agrupar:
+                grupo['peligro_nombre'] = PeligrosService.NOMBRES.get(fila['peligro'])
+            if 'dependencia' in agrupar:
+                grupo['dependencia_nombre'] = fila['dependencia_nombre']
+            grupo.update({
+                'peligros': fila['peligros'],
+                'reportes': fila['reportes'],
+                'nivel_riesgo_promedio': round(float(fila['nivel_riesgo_promedio']), 2)
+                if fila['nivel_riesgo_promedio'] is not None else None,
+                'nivel_riesgo_max': fila['nivel_riesgo_max'],
+            })
+            resultado.append(grupo)
+        return resultado
+
+
+# ============== ACTUALIZACIÓN INCREMENTAL ==============
+
+def _departamento(connection, reporte):
+    if not reporte.empleado_reportador_id:
+        return None
+    return connection.execute(
+        select(Empleado.departamento).where(Empleado.usuario_id == reporte.empleado_reportador_id)
+    ).scalar()
+
+
+def _reporte_creado(mapper, connection, reporte):
+    if reporte.riesgos_identificados:
+        PeligrosService.reemplazar(connection, [reporte.id],
+                                   PeligrosService.filas(reporte, _departamento(connection, reporte)))
+
+
+def _reporte_actualizado(mapper, connection, reporte):
+    estado = inspect(reporte)
+    # Cambios de estado, responsables, etc. no tocan los peligros
+    if any(estado.attrs[campo].history.has_changes() for campo in PeligrosService.CAMPOS):
+        PeligrosService.reemplazar(connection, [reporte.id],
+                                   PeligrosService.filas(reporte, _departamento(connection, reporte)))
+
+
+def _reporte_eliminado(mapper, connection, reporte):
+    PeligrosService.reemplazar(connection, [reporte.id], [])
+
+
+event.listen(CondicionInsegura, 'after_insert', _reporte_creado)
+event.listen(CondicionInsegura, 'after_update', _reporte_actualizado)
+# Antes del DELETE del reporte: la llave foránea de peligros_reporte no lo impide
+event.listen(CondicionInsegura, 'before_delete', _reporte_eliminado)
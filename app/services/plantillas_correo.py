@@ -0,0 +1,89 @@
+# app/services/plantillas_correo.py
+"""
+Motor de plantillas de correo (app/templates/emails)
+
+Entorno Jinja2 propio, independiente del de Flask, para poder renderizar
+desde los hilos del sst-worker sin contexto de aplicación:
+- autoescape activado: los datos de reportes y consultas nunca se inyectan
+  como HTML
+- todas las plantillas se compilan una vez (precompilar) y quedan en la
+  caché del entorno; auto_reload apagado, así que no se revisa el disco
+- renderizar_lote reutiliza la plantilla compilada para miles de cuerpos
+  personalizados (resúmenes y envíos masivos)
+
+Las plantillas que empiezan con '_' son layouts y macros, no correos.
+"""
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_PLANTILLAS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'emails'
+)
+
+
+def _fecha(valor, formato='%d/%m/%Y %H:%M'):
+    """Filtro |fecha: datetime con formato, 'N/A' si no hay fecha"""
+    return valor.strftime(formato) if valor else 'N/A'
+
+
+class PlantillasCorreo:
+    """Entorno Jinja2 compilado una sola vez y compartido por todos los hilos"""
+
+    def __init__(self, directorio=DIRECTORIO_PLANTILLAS):
+        self.directorio = directorio
+        self._entorno = None
+        self._lock = threading.Lock()
+
+    @property
+    def entorno(self):
+        if self._entorno is None:
+            with self._lock:
+                if self._entorno is None:
+                    entorno = Environment(
+                        loader=FileSystemLoader(self.directorio),
+                        autoescape=select_autoescape(['html']),
+                        cache_size=-1,  # Sin límite: son pocas y se usan todas
+                        auto_reload=False,
+                        trim_blocks=True,
+                        lstrip_blocks=True
+                    )
+                    entorno.filters['fecha'] = _fecha
+                    entorno.globals['url_base'] = os.getenv('SST_URL_BASE', 'http://localhost:5000').rstrip('/')
+                    self._entorno = entorno
+        return self._entorno
+
+    def nombres(self):
+        """Plantillas de correo (sin layouts ni macros)"""
+        return [
+            nombre for nombre in self.entorno.list_templates(extensions=['html'])
+            if not os.path.basename(nombre).startswith('_')
+        ]
+
+    def precompilar(self):
+        """Compila todas las plantillas (al arrancar); devuelve cuántas quedaron en caché"""
+        nombres = self.nombres()
+        for nombre in nombres:
+            self.entorno.get_template(nombre)
+        logger.info(f"✅ {len(nombres)} plantillas de correo compiladas")
+        return len(nombres)
+
+    def renderizar(self, nombre, **contexto):
+        """HTML de una plantilla con el contexto dado"""
+        return self.entorno.get_template(nombre).render(contexto)
+
+    def renderizar_lote(self, nombre, contextos):
+        """
+        HTML de la misma plantilla para muchos contextos
+
+        La plantilla se busca una sola vez; cada cuerpo solo paga el render.
+        """
+        render = self.entorno.get_template(nombre).render
+        return [render(contexto) for contexto in contextos]
+
+
+plantillas_correo = PlantillasCorreo()
@@ -0,0 +1,207 @@
+# app/services/responsabilidades_service.py
+"""
+Motor de reglas de GestorResponsabilidades
+
+Todas las reglas activas se compilan en una tabla en memoria indexada por
+(tipo_reporte_id, nivel_riesgo_id, departamento). Una dimensión vacía en la
+regla es comodín. Resolver un reporte son como mucho 8 búsquedas en diccionario,
+de la combinación más específica a la más general; no hay consultas.
+
+La tabla se reconstruye cuando el admin crea o edita una regla (también
+cuando cambian niveles de riesgo o celdas de la matriz) y cada TTL_SEGUNDOS
+para recoger cambios hechos por otros procesos.
+"""
+
+from app import db
+from app.models import GestorResponsabilidades, NivelRiesgo, MatrizRiesgos, Empleado
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import product
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+# Copia de solo lectura de una regla: la tabla no guarda objetos de la sesión
+ReglaCompilada = namedtuple('ReglaCompilada', [
+    'id', 'tipo_reporte_id', 'nivel_riesgo_id', 'departamento',
+    'rol_principal', 'rol_backup_1', 'rol_backup_2', 'notificar_roles',
+    'tiempo_respuesta_minutos', 'tiempo_resolucion_minutos'
+])
+
+
+def _normalizar_departamento(valor):
+    valor = (valor or '').strip().lower()
+    return valor or None
+
+
+class TablaResponsabilidades:
+    """Reglas compiladas + tablas de la matriz de riesgos para calcular el nivel"""
+
+    TTL_SEGUNDOS = 300
+
+    # Orden de búsqueda: primero las 3 dimensiones, al final la regla sin condiciones.
+    # A igual número de dimensiones pesa más tipo_reporte, luego nivel, luego departamento
+    PATRONES = sorted(
+        product((True, False), repeat=3),
+        key=lambda patron: (-sum(patron), [not usa for usa in patron])
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reglas = {}        # (tipo, nivel, departamento) -> ReglaCompilada
+        self._celdas = {}        # (probabilidad, severidad) -> nivel_riesgo_id
+        self._rangos = []        # [(rango_minimo, rango_maximo, nivel_riesgo_id)]
+        self._compilada_en = None
+
+    @property
+    def total_reglas(self):
+        return len(self._reglas)
+
+    def invalidar(self):
+        with self._lock:
+            self._compilada_en = None
+
+    def vigente(self):
+        return (self._compilada_en is not None and
+                datetime.utcnow() - self._compilada_en < timedelta(seconds=self.TTL_SEGUNDOS))
+
+    def asegurar(self):
+        if not self.vigente():
+            self.compilar()
+
+    def compilar(self):
+        """Carga reglas activas, celdas de la matriz y rangos de nivel (3 consultas)"""
+        reglas = {}
+        columnas = [getattr(GestorResponsabilidades, campo) for campo in ReglaCompilada._fields]
+        filas = db.session.query(*columnas).filter(
+            GestorResponsabilidades.activo == True
+        ).order_by(GestorResponsabilidades.id)
+        for fila in filas:
+            regla = ReglaCompilada(*fila)
+            clave = (regla.tipo_reporte_id, regla.nivel_riesgo_id, _normalizar_departamento(regla.departamento))
+            # Dos reglas con las mismas condiciones: gana la más antigua
+            reglas.setdefault(clave, regla)
+
+        celdas = {
+            (p, s): nivel_id
+            for p, s, nivel_id in db.session.query(
+                MatrizRiesgos.probabilidad, MatrizRiesgos.severidad, MatrizRiesgos.nivel_riesgo_id
+            ).filter(MatrizRiesgos.activa == True, MatrizRiesgos.nivel_riesgo_id != None)
+        }
+
+        rangos = sorted(
+            (minimo, maximo, nivel_id)
+            for nivel_id, minimo, maximo in db.session.query(
+                NivelRiesgo.id, NivelRiesgo.rango_minimo, NivelRiesgo.rango_maximo
+            ).filter(NivelRiesgo.activo == True, NivelRiesgo.rango_minimo != None)
+        )
+
+        with self._lock:
+            self._reglas = reglas
+            self._celdas = celdas
+            self._rangos = rangos
+            self._compilada_en = datetime.utcnow()
+
+        logger.info(f"✅ Reglas de responsabilidad compiladas: {len(reglas)}")
+
+    def nivel_riesgo(self, probabilidad, severidad):
+        """nivel_riesgo_id por celda de la matriz o, si no hay celda, por rango del valor"""
+        if severidad is None:
+            return None
+        if probabilidad is not None:
+            nivel_id = self._celdas.get((probabilidad, severidad))
+            if nivel_id:
+                return nivel_id
+        valor = severidad * probabilidad if probabilidad is not None else severidad
+        for minimo, maximo, nivel_id in self._rangos:
+            if minimo <= valor and (maximo is None or valor <= maximo):
+                return nivel_id
+        return None
+
+    def buscar(self, tipo_reporte_id, nivel_riesgo_id, departamento):
+        """Regla más específica que aplica; None si ninguna"""
+        valores = (tipo_reporte_id, nivel_riesgo_id, _normalizar_departamento(departamento))
+        reglas = self._reglas
+        for patron in self.PATRONES:
+            # Una dimensión sin valor en el reporte solo puede casar con comodín
+            if any(usa and valor is None for usa, valor in zip(patron, valores)):
+                continue
+            clave = tuple(valor if usa else None for usa, valor in zip(patron, valores))
+            regla = reglas.get(clave)
+            if regla is not None:
+                return regla
+        return None
+
+
+tabla_responsabilidades = TablaResponsabilidades()
+
+
+class ResponsabilidadesService:
+    """Resuelve qué GestorResponsabilidades aplica a un reporte"""
+
+    @staticmethod
+    def contexto_reporte(reporte, departamentos=None):
+        """
+        Dimensiones de ruteo de un reporte:
+        tipo_reporte_id, nivel_riesgo_id y departamento
+
+        CondicionInsegura no siempre trae tipo_reporte_id ni departamento como
+        columnas; se toman de metadata_adicional o del Empleado que reportó
+
+        Args:
+            departamentos: {usuario_id: departamento} ya cargado (asignación en lote)
+        """
+        metadata = reporte.metadata_adicional or {}
+
+        tipo_reporte_id = getattr(reporte, 'tipo_reporte_id', None) or metadata.get('tipo_reporte_id')
+        if tipo_reporte_id is not None:
+            tipo_reporte_id = int(tipo_reporte_id)
+
+        departamento = metadata.get('departamento')
+        if not departamento and departamentos is not None:
+            departamento = departamentos.get(reporte.empleado_reportador_id)
+        elif not departamento and reporte.empleado_reportador_id:
+            departamento = db.session.query(Empleado.departamento).filter_by(
+                usuario_id=reporte.empleado_reportador_id
+            ).scalar()
+
+        probabilidad = metadata.get('probabilidad')
+        if probabilidad is not None:
+            probabilidad = int(probabilidad)
+
+        tabla_responsabilidades.asegurar()
+        nivel_riesgo_id = tabla_responsabilidades.nivel_riesgo(probabilidad, reporte.severidad_calculada)
+
+        return tipo_reporte_id, nivel_riesgo_id, departamento
+
+    @staticmethod
+    def resolver(tipo_reporte_id=None, nivel_riesgo_id=None, departamento=None):
+        """Regla más específica para las dimensiones dadas (sin consultas)"""
+        tabla_responsabilidades.asegurar()
+        return tabla_responsabilidades.buscar(tipo_reporte_id, nivel_riesgo_id, departamento)
+
+    @staticmethod
+    def resolver_reporte(reporte, departamentos=None):
+        """ReglaCompilada (campos de GestorResponsabilidades) que aplica al reporte, o None"""
+        return ResponsabilidadesService.resolver(*ResponsabilidadesService.contexto_reporte(reporte, departamentos))
+
+    @staticmethod
+    def departamentos_reportadores(reportes):
+        """{usuario_id: departamento} de los reportadores de un lote, en una consulta"""
+        usuario_ids = {r.empleado_reportador_id for r in reportes if r.empleado_reportador_id}
+        if not usuario_ids:
+            return {}
+        return dict(db.session.query(Empleado.usuario_id, Empleado.departamento).filter(
+            Empleado.usuario_id.in_(usuario_ids)
+        ))
+
+    @staticmethod
+    def reconstruir():
+        """Recompila la tabla; lo llaman las vistas de admin después de guardar"""
+        try:
+            tabla_responsabilidades.compilar()
+        except Exception as e:
+            tabla_responsabilidades.invalidar()
+            logger.error(f"❌ Error compilando reglas de responsabilidad: {str(e)}", exc_info=True)
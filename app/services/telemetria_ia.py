@@ -0,0 +1,281 @@
+# app/services/telemetria_ia.py
+"""
+Telemetría de las llamadas a la IA
+
+La pasarela (app/services/pasarela_ia.py) registra aquí cada llamada al
+terminar: quién llamó (operación, usuario, reporte, departamento), modelo,
+estado y clase de error, duración, bytes enviados/recibidos, tokens y costo.
+
+Dos destinos:
+- memoria del proceso: histograma de latencias y contadores, exportables en
+  formato Prometheus (/ia/metricas)
+- tabla llamadas_ia: una fila por llamada, para consultar y agrupar por
+  operación, modelo, departamento, usuario o día (/ia/telemetria)
+
+Los tokens se estiman por tamaño (google-generativeai 0.3 no informa el uso):
+~4 caracteres por token de texto y TOKENS_IMAGEN por imagen. Los precios por
+millón de tokens salen de SST_IA_PRECIO_ENTRADA_MTOK / SST_IA_PRECIO_SALIDA_MTOK.
+
+La telemetría nunca hace fallar una llamada: los errores al registrar se
+cuentan y se registran en el log. SST_TELEMETRIA_IA=false deja solo la parte
+en memoria.
+"""
+
+from app import db
+from app.models import LlamadaIA, Empleado, CondicionInsegura
+from flask import has_app_context
+from sqlalchemy import case, func, insert, select
+import logging
+import math
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetriaIA:
+    """Histogramas en memoria + registro por llamada en llamadas_ia"""
+
+    # Límites superiores (segundos) del histograma de latencias
+    BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, math.inf)
+    CARACTERES_POR_TOKEN = 4
+    TOKENS_IMAGEN = 258
+    PRECIO_ENTRADA_MTOK = float(os.getenv('SST_IA_PRECIO_ENTRADA_MTOK', '3.5'))
+    PRECIO_SALIDA_MTOK = float(os.getenv('SST_IA_PRECIO_SALIDA_MTOK', '10.5'))
+
+    AGRUPACIONES = {
+        'operacion': LlamadaIA.operacion,
+        'modelo': LlamadaIA.modelo,
+        'estado': LlamadaIA.estado,
+        'departamento': LlamadaIA.departamento,
+        'usuario': LlamadaIA.usuario_id,
+        'dia': func.date(LlamadaIA.fecha),
+    }
+
+    def __init__(self):
+        self.persistir = os.getenv('SST_TELEMETRIA_IA', 'true').lower() != 'false'
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (operacion, modelo) -> [conteos por bucket, suma, n]
+        self._llamadas = {}     # (operacion, modelo, estado) -> n
+        self._totales = {}      # (operacion, modelo) -> {bytes/tokens/costo}
+        self.errores_registro = 0
+
+    # ============== MEDICIÓN ==============
+
+    @classmethod
+    def medir(cls, contenido):
+        """(bytes, tokens estimados) de un prompt, respuesta o lista de partes"""
+        partes = contenido if isinstance(contenido, (list, tuple)) else [contenido]
+        total_bytes, tokens = 0, 0
+        for parte in partes:
+            if isinstance(parte, dict):
+                total_bytes += len(parte.get('data') or b'')
+                tokens += cls.TOKENS_IMAGEN
+            elif parte:
+                texto = str(parte)
+                total_bytes += len(texto.encode('utf-8'))
+                tokens += math.ceil(len(texto) / cls.CARACTERES_POR_TOKEN)
+        return total_bytes, tokens
+
+    @classmethod
+    def costo(cls, tokens_entrada, tokens_salida):
+        return round((tokens_entrada * cls.PRECIO_ENTRADA_MTOK + tokens_salida * cls.PRECIO_SALIDA_MTOK) / 1e6, 8)
+
+    # ============== REGISTRO ==============
+
+    def registrar(self, contexto, modelo, contenido, estado, duracion, respuesta=None,
+                  error=None, primer_fragmento=None):
+        """
+        Registra una llamada terminada
+
+        Args:
+            contexto: {'operacion', 'usuario_id', 'reporte_id', 'departamento'} de quien llamó
+            estado: 'ok' o el código del error (ErrorIA.codigo, 'cancelada')
+            duracion / primer_fragmento: segundos
+        """
+        try:
+            contexto = contexto or {}
+            bytes_enviados, tokens_entrada = self.medir(contenido)
+            bytes_recibidos, tokens_salida = self.medir(respuesta) if respuesta else (0, 0)
+            datos = {
+                'operacion': contexto.get('operacion') or 'desconocida',
+                'usuario_id': contexto.get('usuario_id'),
+                'reporte_id': contexto.get('reporte_id'),
+                'departamento': contexto.get('departamento'),
+                'modelo': modelo,
+                'estado': estado,
+                'error_clase': type(error).__name__ if error is not None else None,
+                'duracion_ms': round(duracion * 1000, 1),
+                'primer_fragmento_ms': round(primer_fragmento * 1000, 1) if primer_fragmento is not None else None,
+                'bytes_enviados': bytes_enviados,
+                'bytes_recibidos': bytes_recibidos,
+                'tokens_entrada': tokens_entrada,
+                'tokens_salida': tokens_salida,
+                'costo_usd': self.costo(tokens_entrada, tokens_salida),
+            }
+            self._acumular(datos, duracion)
+            if self.persistir and has_app_context():
+                self._guardar(datos)
+        except Exception as e:
+            with self._lock:
+                self.errores_registro += 1
+            logger.warning(f"⚠️ Telemetría IA: no se pudo registrar la llamada: {str(e)}")
+
+    def _acumular(self, datos, duracion):
+        clave = (datos['operacion'], datos['modelo'])
+        with self._lock:
+            histograma = self._histogramas.setdefault(clave, [[0] * len(self.BUCKETS), 0.0, 0])
+            for i, limite in enumerate(self.BUCKETS):
+                if duracion <= limite:
+                    histograma[0][i] += 1
+                    break
+            histograma[1] += duracion
+            histograma[2] += 1
+
+            clave_estado = clave + (datos['estado'],)
+            self._llamadas[clave_estado] = self._llamadas.get(clave_estado, 0) + 1
+
+            totales = self._totales.setdefault(clave, dict.fromkeys(
+                ('bytes_enviados', 'bytes_recibidos', 'tokens_entrada', 'tokens_salida', 'costo_usd'), 0
+            ))
+            for campo in totales:
+                totales[campo] += datos[campo]
+
+    @staticmethod
+    def _guardar(datos):
+        """En su propia transacción: no depende del commit de quien llama"""
+        with db.engine.begin() as conexion:
+            if not datos['departamento'] and not datos['usuario_id'] and datos['reporte_id']:
+                datos['usuario_id'] = conexion.execute(
+                    select(CondicionInsegura.empleado_reportador_id).where(CondicionInsegura.id == datos['reporte_id'])
+                ).scalar()
+            if not datos['departamento'] and datos['usuario_id']:
+                datos['departamento'] = conexion.execute(
+                    select(Empleado.departamento).where(Empleado.usuario_id == datos['usuario_id'])
+                ).scalar()
+            conexion.execute(insert(LlamadaIA).values(**datos))
+
+    # ============== CONSULTA ==============
+
+    def histograma(self):
+        """Por operación y modelo: llamadas, latencia promedio y percentiles (límite del bucket)"""
+        with self._lock:
+            copia = {clave: (list(conteos), suma, n) for clave, (conteos, suma, n) in self._histogramas.items()}
+
+        resultado = []
+        for (operacion, modelo), (conteos, suma, n) in sorted(copia.items()):
+            resultado.append({
+                'operacion': operacion,
+                'modelo': modelo,
+                'llamadas': n,
+                'latencia_ms_promedio': round(1000 * suma / n, 1) if n else None,
+                'latencia_ms_p50': self._percentil(conteos, n, 0.5),
+                'latencia_ms_p95': self._percentil(conteos, n, 0.95),
+                'buckets': {self._etiqueta(limite): conteo for limite, conteo in zip(self.BUCKETS, conteos)},
+            })
+        return resultado
+
+    def _percentil(self, conteos, n, q):
+        acumulado = 0
+        for limite, conteo in zip(self.BUCKETS, conteos):
+            acumulado += conteo
+            if n and acumulado >= q * n:
+                return None if limite == math.inf else limite * 1000
+        return None
+
+    @staticmethod
+    def _etiqueta(limite):
+        return '+Inf' if limite == math.inf else f'{limite:g}'
+
+    @classmethod
+    def resumen(cls, desde=None, hasta=None, agrupar='operacion'):
+        """
+        Totales de llamadas_ia agrupados (operacion, modelo, estado, departamento, usuario o dia)
+
+        Raises:
+            ValueError: agrupación desconocida
+        """
+        if agrupar not in cls.AGRUPACIONES:
+            raise ValueError(f"agrupar debe ser uno de: {', '.join(cls.AGRUPACIONES)}")
+        grupo = cls.AGRUPACIONES[agrupar]
+
+        consulta = select(
+            grupo.label('grupo'),
+            func.count(LlamadaIA.id),
+            func.sum(case((LlamadaIA.estado != 'ok', 1), else_=0)),
+            func.avg(LlamadaIA.duracion_ms),
+            func.max(LlamadaIA.duracion_ms),
+            func.sum(LlamadaIA.bytes_enviados),
+            func.sum(LlamadaIA.bytes_recibidos),
+            func.sum(LlamadaIA.tokens_entrada),
+            func.sum(LlamadaIA.tokens_salida),
+            func.sum(LlamadaIA.costo_usd),
+        ).group_by(grupo).order_by(func.count(LlamadaIA.id).desc())
+        if desde:
+            consulta = consulta.where(LlamadaIA.fecha >= desde)
+        if hasta:
+            consulta = consulta.where(LlamadaIA.fecha < hasta)
+
+        return [
+            {
+                agrupar: valor if valor is None or isinstance(valor, (int, str)) else str(valor),
+                'llamadas': llamadas,
+                'errores': int(errores or 0),
+                'latencia_ms_promedio': round(promedio, 1) if promedio is not None else None,
+                'latencia_ms_max': maximo,
+                'bytes_enviados': int(enviados or 0),
+                'bytes_recibidos': int(recibidos or 0),
+                'tokens_entrada': int(entrada or 0),
+                'tokens_salida': int(salida or 0),
+                'costo_usd': round(costo or 0, 6),
+            }
+            for valor, llamadas, errores, promedio, maximo, enviados, recibidos, entrada, salida, costo
+            in db.session.execute(consulta).all()
+        ]
+
+    # ============== EXPORTACIÓN ==============
+
+    def exportar_prometheus(self):
+        """Métricas del proceso en formato de texto de Prometheus"""
+        with self._lock:
+            histogramas = {clave: (list(c), s, n) for clave, (c, s, n) in self._histogramas.items()}
+            llamadas = dict(self._llamadas)
+            totales = {clave: dict(valores) for clave, valores in self._totales.items()}
+
+        lineas = [
+            '# HELP sst_ia_latencia_segundos Duración de las llamadas a la IA',
+            '# TYPE sst_ia_latencia_segundos histogram',
+        ]
+        for (operacion, modelo), (conteos, suma, n) in sorted(histogramas.items()):
+            etiquetas = f'operacion="{operacion}",modelo="{modelo}"'
+            acumulado = 0
+            for limite, conteo in zip(self.BUCKETS, conteos):
+                acumulado += conteo
+                lineas.append(f'sst_ia_latencia_segundos_bucket{{{etiquetas},le="{self._etiqueta(limite)}"}} {acumulado}')
+            lineas.append(f'sst_ia_latencia_segundos_sum{{{etiquetas}}} {suma:.6f}')
+            lineas.append(f'sst_ia_latencia_segundos_count{{{etiquetas}}} {n}')
+
+        lineas += ['# HELP sst_ia_llamadas_total Llamadas a la IA por estado', '# TYPE sst_ia_llamadas_total counter']
+        for (operacion, modelo, estado), n in sorted(llamadas.items()):
+            lineas.append(f'sst_ia_llamadas_total{{operacion="{operacion}",modelo="{modelo}",estado="{estado}"}} {n}')
+
+        for campo, ayuda in (
+            ('bytes_enviados', 'Bytes enviados al modelo'),
+            ('bytes_recibidos', 'Bytes recibidos del modelo'),
+            ('tokens_entrada', 'Tokens de entrada (estimados)'),
+            ('tokens_salida', 'Tokens de salida (estimados)'),
+            ('costo_usd', 'Costo estimado en USD'),
+        ):
+            lineas += [f'# HELP sst_ia_{campo}_total {ayuda}', f'# TYPE sst_ia_{campo}_total counter']
+            for (operacion, modelo), valores in sorted(totales.items()):
+                lineas.append(f'sst_ia_{campo}_total{{operacion="{operacion}",modelo="{modelo}"}} {valores[campo]:g}')
+
+        lineas += [
+            '# HELP sst_ia_errores_registro_total Llamadas que no se pudieron registrar',
+            '# TYPE sst_ia_errores_registro_total counter',
+            f'sst_ia_errores_registro_total {self.errores_registro}',
+        ]
+        return '\n'.join(lineas) + '\n'
+
+
+telemetria_ia = TelemetriaIA()
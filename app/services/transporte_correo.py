@@ -0,0 +1,230 @@
+# app/services/transporte_correo.py
+"""
+Transportes de correo usados por el despachador del outbox
+
+- sendgrid: API v3 de SendGrid con una sola requests.Session (conexiones
+  keep-alive reutilizadas por todos los hilos de envío)
+- smtp: servidor SMTP (ej. un sink local como MailHog o aiosmtpd), una
+  conexión por hilo que se reabre si el servidor la cierra
+- archivo: escribe cada correo como .eml en un directorio (pruebas y
+  desarrollo sin red)
+
+Se elige con SST_TRANSPORTE_CORREO; por defecto sendgrid si hay
+SENDGRID_API_KEY y archivo si no.
+
+enviar() recibe una lista de destinatarios: el mismo correo a varias
+personas sale en una sola llamada al proveedor y ningún destinatario ve
+a los demás.
+"""
+
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+import logging
+import os
+import smtplib
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorTransporte(Exception):
+    """
+    Fallo al entregar un correo
+
+    permanente=True indica que reintentar no sirve (destinatario o payload
+    inválido): la notificación va directo a Fallida
+    """
+
+    def __init__(self, mensaje, permanente=False):
+        super().__init__(mensaje)
+        self.permanente = permanente
+
+
+def _mensaje(remitente, destinatarios, asunto, contenido_html):
+    mensaje = EmailMessage()
+    mensaje['From'] = remitente
+    # Con varios destinatarios van solo en el sobre SMTP (como copia oculta)
+    mensaje['To'] = destinatarios[0] if len(destinatarios) == 1 else 'undisclosed-recipients:;'
+    mensaje['Subject'] = asunto
+    mensaje['Date'] = formatdate(localtime=True)
+    mensaje['Message-ID'] = make_msgid(domain='sst-system')
+    mensaje.set_content('Este mensaje requiere un cliente de correo con soporte HTML.')
+    mensaje.add_alternative(contenido_html, subtype='html')
+    return mensaje
+
+
+# ============== SENDGRID ==============
+
+class TransporteSendGrid:
+    """POST /v3/mail/send sobre una sesión HTTP compartida"""
+
+    URL = 'https://api.sendgrid.com/v3/mail/send'
+    TIMEOUT = (5, 20)  # conexión, lectura (segundos)
+
+    # Límite de personalizations por llamada de la API v3
+    MAX_DESTINATARIOS = 1000
+
+    def __init__(self, api_key, remitente, conexiones=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.remitente = remitente
+        self._sesion = requests.Session()
+        self._sesion.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self._sesion.mount('https://', adaptador)
+
+    def enviar(self, destinatarios, asunto, contenido_html):
+        import requests
+
+        # Una personalization por destinatario: cada uno recibe su propio correo
+        payload = {
+            'personalizations': [{'to': [{'email': destinatario}]} for destinatario in destinatarios],
+            'from': {'email': self.remitente},
+            'subject': asunto,
+            'content': [{'type': 'text/html', 'value': contenido_html}]
+        }
+        try:
+            respuesta = self._sesion.post(self.URL, json=payload, timeout=self.TIMEOUT)
+        except requests.RequestException as e:
+            raise ErrorTransporte(f'SendGrid no respondió: {str(e)}')
+
+        if respuesta.status_code < 300:
+            return
+        # 429 y 5xx son transitorios; el resto de 4xx no mejora reintentando
+        permanente = 400 <= respuesta.status_code < 500 and respuesta.status_code != 429
+        raise ErrorTransporte(f'SendGrid {respuesta.status_code}: {respuesta.text[:300]}', permanente=permanente)
+
+    def cerrar(self):
+        self._sesion.close()
+
+
+# ============== SMTP ==============
+
+class TransporteSMTP:
+    """Servidor SMTP con una conexión persistente por hilo"""
+
+    MAX_DESTINATARIOS = 100  # RCPT TO por mensaje
+
+    def __init__(self, host, puerto, remitente, usuario=None, clave=None, starttls=False):
+        self.host = host
+        self.puerto = puerto
+        self.remitente = remitente
+        self.usuario = usuario
+        self.clave = clave
+        self.starttls = starttls
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = smtplib.SMTP(self.host, self.puerto, timeout=20)
+            if self.starttls:
+                conexion.starttls()
+            if self.usuario:
+                conexion.login(self.usuario, self.clave)
+            self._local.conexion = conexion
+            with self._lock:
+                self._conexiones.append(conexion)
+        return conexion
+
+    def _descartar(self):
+        conexion = getattr(self._local, 'conexion', None)
+        self._local.conexion = None
+        if conexion is not None:
+            with self._lock:
+                if conexion in self._conexiones:
+                    self._conexiones.remove(conexion)
+            try:
+                conexion.close()
+            except Exception:
+                pass
+
+    def enviar(self, destinatarios, asunto, contenido_html):
+        mensaje = _mensaje(self.remitente, destinatarios, asunto, contenido_html)
+        for intento in range(2):
+            try:
+                rechazados = self._conexion().send_message(mensaje, to_addrs=destinatarios)
+                if rechazados:
+                    logger.warning(f"⚠️ SMTP rechazó {len(rechazados)} destinatarios: {list(rechazados)}")
+                return
+            except smtplib.SMTPRecipientsRefused as e:
+                raise ErrorTransporte(f'Destinatario rechazado: {e.recipients}', permanente=True)
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # El servidor cerró la conexión ociosa: se reabre una vez
+                self._descartar()
+                if intento:
+                    raise ErrorTransporte(f'SMTP {self.host}:{self.puerto} no disponible: {str(e)}')
+            except smtplib.SMTPException as e:
+                self._descartar()
+                raise ErrorTransporte(f'SMTP: {str(e)}')
+            except OSError as e:
+                self._descartar()
+                raise ErrorTransporte(f'SMTP {self.host}:{self.puerto} no disponible: {str(e)}')
+
+    def cerrar(self):
+        with self._lock:
+            conexiones, self._conexiones = self._conexiones, []
+        for conexion in conexiones:
+            try:
+                conexion.quit()
+            except Exception:
+                pass
+
+
+# ============== ARCHIVO ==============
+
+class TransporteArchivo:
+    """Escribe cada correo como .eml (sin red)"""
+
+    MAX_DESTINATARIOS = 1000
+
+    def __init__(self, directorio, remitente):
+        self.directorio = directorio
+        self.remitente = remitente
+        os.makedirs(directorio, exist_ok=True)
+
+    def enviar(self, destinatarios, asunto, contenido_html):
+        mensaje = _mensaje(self.remitente, destinatarios, asunto, contenido_html)
+        if len(destinatarios) > 1:
+            mensaje['Bcc'] = ', '.join(destinatarios)
+        ruta = os.path.join(self.directorio, f'{uuid.uuid4().hex}.eml')
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(mensaje.as_bytes())
+        os.replace(temporal, ruta)
+
+    def cerrar(self):
+        pass
+
+
+def crear_transporte(app, conexiones=10):
+    """Transporte según SST_TRANSPORTE_CORREO (sendgrid, smtp o archivo)"""
+    from app.services.notificaciones import NotificacionService
+
+    remitente = NotificacionService.SENDER_EMAIL
+    api_key = NotificacionService.SENDGRID_API_KEY
+    tipo = os.getenv('SST_TRANSPORTE_CORREO', 'sendgrid' if api_key else 'archivo').lower()
+
+    if tipo == 'sendgrid':
+        return TransporteSendGrid(api_key, remitente, conexiones=conexiones)
+    if tipo == 'smtp':
+        return TransporteSMTP(
+            os.getenv('SMTP_HOST', 'localhost'),
+            int(os.getenv('SMTP_PORT', '1025')),
+            remitente,
+            usuario=os.getenv('SMTP_USER'),
+            clave=os.getenv('SMTP_PASSWORD'),
+            starttls=os.getenv('SMTP_STARTTLS', 'false').lower() == 'true'
+        )
+    if tipo != 'archivo':
+        logger.warning(f"⚠️ SST_TRANSPORTE_CORREO desconocido ({tipo}), se usa archivo")
+
+    directorio = os.getenv('SST_CORREOS_DIR', os.path.join(app.instance_path, 'correos'))
+    return TransporteArchivo(directorio, remitente)
@@ -0,0 +1,326 @@
+# app/tasks/despachador_notificaciones.py
+"""
+Despachador del outbox de notificaciones (notificaciones_outbox)
+
+Corre en el sst-worker con un grupo de hilos. Cada hilo reclama un lote de
+filas pendientes con un UPDATE condicional (dos workers nunca envían la misma
+fila), las entrega con un transporte compartido (app/services/transporte_correo.py)
+y guarda el resultado en lote:
+- enviada: estado Enviada
+- error transitorio: vuelve a Pendiente con backoff exponencial
+- error permanente o MAX_INTENTOS agotados: estado Fallida (dead letter)
+
+Antes de enviar, el lote se agrupa (ver agrupar): las notificaciones
+agrupables de un mismo destinatario salen en un correo resumen y un mismo
+contenido para varios destinatarios sale en una sola llamada al proveedor.
+
+Si un worker muere con filas tomadas, otro las recupera cuando vence tomada_hasta.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+import logging
+import os
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DespachadorNotificaciones:
+    """Grupo de hilos que vacía el outbox de notificaciones"""
+
+    HILOS = int(os.getenv('SST_HILOS_CORREO', '4'))
+    TAMANO_LOTE = 20
+
+    # Segundos de espera cuando no hay pendientes
+    INTERVALO = 2
+
+    # Reintentos: 30s, 1m, 2m, 4m, ... hasta MAX_BACKOFF; luego dead letter
+    MAX_INTENTOS = 6
+    BACKOFF_BASE = 30  # segundos
+    MAX_BACKOFF = 3600
+
+    # Tiempo que una fila queda reservada para el hilo que la tomó
+    RESERVA_SEGUNDOS = 300
+
+    def __init__(self):
+        self._hilos = []
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self.transporte = None
+        self.app = None
+
+    @property
+    def corriendo(self):
+        return any(hilo.is_alive() for hilo in self._hilos)
+
+    def iniciar(self, app, hilos=None, transporte=None):
+        """Arranca los hilos de envío (idempotente)"""
+        from app.services.transporte_correo import crear_transporte
+
+        with self._lock:
+            if self.corriendo:
+                return
+            hilos = hilos or self.HILOS
+            self.app = app
+            self.transporte = transporte or crear_transporte(app, conexiones=hilos)
+            self._detener.clear()
+            self._hilos = [
+                threading.Thread(target=self._bucle, name=f'despachador-notificaciones-{i}', daemon=True)
+                for i in range(hilos)
+            ]
+            for hilo in self._hilos:
+                hilo.start()
+        logger.info(f"✅ Despachador de notificaciones iniciado ({hilos} hilos, {type(self.transporte).__name__})")
+
+    def detener(self):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=10)
+        self._hilos = []
+        if self.transporte:
+            self.transporte.cerrar()
+
+    # ============== HILOS ==============
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                with self.app.app_context():
+                    procesadas = self.procesar_lote(self.transporte)
+                    from app import db
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"❌ Error en el despachador de notificaciones: {str(e)}", exc_info=True)
+                procesadas = 0
+
+            if not procesadas:
+                self._detener.wait(self.INTERVALO)
+
+    # ============== OUTBOX ==============
+
+    @staticmethod
+    def _tomar(condicion, ahora):
+        """UPDATE condicional a Enviando; devuelve los ids que este proceso tomó"""
+        from app import db
+        from app.models import Notificacion
+
+        stmt = update(Notificacion).where(condicion).values(
+            estado='Enviando', tomada_hasta=ahora + timedelta(seconds=DespachadorNotificaciones.RESERVA_SEGUNDOS)
+        ).execution_options(synchronize_session=False)
+
+        if db.engine.dialect.update_returning:
+            return list(db.session.execute(stmt.returning(Notificacion.id)).scalars())
+
+        tomadas = list(db.session.execute(
+            db.select(Notificacion.id).where(condicion).with_for_update()
+        ).scalars())
+        db.session.execute(stmt)
+        return tomadas
+
+    @staticmethod
+    def reclamar(limite, ahora=None):
+        """
+        Toma hasta `limite` notificaciones listas para enviar y hace commit
+
+        Por cada destinatario con notificaciones agrupables en el lote, toma
+        también sus otras agrupables pendientes (aunque su espera no haya
+        terminado) para que salgan en el mismo resumen.
+
+        Devuelve las filas (id, destinatario, asunto, contenido_html, intentos, agrupable)
+        """
+        from app import db
+        from app.models import Notificacion
+
+        ahora = ahora or datetime.utcnow()
+        disponible = or_(
+            and_(Notificacion.estado == 'Pendiente', Notificacion.proximo_intento <= ahora),
+            and_(Notificacion.estado == 'Enviando', Notificacion.tomada_hasta < ahora)
+        )
+        candidatas = list(db.session.execute(
+            db.select(Notificacion.id).where(disponible)
+            .order_by(Notificacion.proximo_intento, Notificacion.id).limit(limite)
+        ).scalars())
+        if not candidatas:
+            db.session.rollback()
+            return []
+
+        tomadas = DespachadorNotificaciones._tomar(and_(Notificacion.id.in_(candidatas), disponible), ahora)
+
+        destinatarios = list(db.session.execute(
+            db.select(Notificacion.destinatario).distinct().where(
+                Notificacion.id.in_(tomadas), Notificacion.agrupable == True
+            )
+        ).scalars()) if tomadas else []
+        if destinatarios:
+            tomadas += DespachadorNotificaciones._tomar(and_(
+                Notificacion.destinatario.in_(destinatarios),
+                Notificacion.agrupable == True,
+                Notificacion.estado == 'Pendiente',
+                Notificacion.intentos == 0
+            ), ahora)
+        db.session.commit()
+
+        if not tomadas:
+            return []
+        return db.session.query(
+            Notificacion.id, Notificacion.destinatario, Notificacion.asunto,
+            Notificacion.contenido_html, Notificacion.intentos, Notificacion.agrupable
+        ).filter(Notificacion.id.in_(tomadas)).order_by(Notificacion.id).all()
+
+    @staticmethod
+    def agrupar(filas, max_destinatarios=1000):
+        """
+        Convierte las filas reclamadas en envíos (filas, destinatarios, asunto, html)
+
+        - Varias agrupables del mismo destinatario: un correo resumen
+        - Mismo asunto y contenido para varios destinatarios: una sola llamada
+          al proveedor (una personalización por destinatario)
+        """
+        from app.services.notificaciones import NotificacionService
+
+        envios = []
+        sueltas = []
+
+        por_destinatario = {}
+        for fila in filas:
+            if fila.agrupable:
+                por_destinatario.setdefault(fila.destinatario.lower(), []).append(fila)
+            else:
+                sueltas.append(fila)
+        for grupo in por_destinatario.values():
+            if len(grupo) == 1:
+                sueltas.append(grupo[0])
+                continue
+            asunto, html = NotificacionService.contenido_resumen([(f.asunto, f.contenido_html) for f in grupo])
+            envios.append((grupo, [grupo[0].destinatario], asunto, html))
+
+        por_contenido = {}
+        for fila in sueltas:
+            por_contenido.setdefault((fila.asunto, fila.contenido_html), []).append(fila)
+        for (asunto, html), grupo in por_contenido.items():
+            for i in range(0, len(grupo), max_destinatarios):
+                parte = grupo[i:i + max_destinatarios]
+                envios.append((parte, [fila.destinatario for fila in parte], asunto, html))
+
+        return envios
+
+    @staticmethod
+    def backoff(intentos):
+        """Segundos hasta el siguiente intento (exponencial con jitter de ±10%)"""
+        base = min(DespachadorNotificaciones.BACKOFF_BASE * 2 ** (intentos - 1), DespachadorNotificaciones.MAX_BACKOFF)
+        return base * random.uniform(0.9, 1.1)
+
+    @staticmethod
+    def _entregar(transporte, destinatarios, asunto, html):
+        """Devuelve (error, permanente); error None si se entregó"""
+        from app.services.transporte_correo import ErrorTransporte
+
+        try:
+            transporte.enviar(destinatarios, asunto, html)
+            return None, False
+        except ErrorTransporte as e:
+            return str(e), e.permanente
+        except Exception as e:
+            return f'{type(e).__name__}: {str(e)}', False
+
+    @staticmethod
+    def procesar_lote(transporte, limite=TAMANO_LOTE):
+        """
+        Reclama un lote, lo envía agrupado y guarda los resultados en lote
+
+        Returns:
+            Número de notificaciones procesadas (enviadas o no)
+        """
+        from app import db
+        from app.models import Notificacion
+
+        filas = DespachadorNotificaciones.reclamar(limite)
+        if not filas:
+            return 0
+
+        resultados = []  # (fila, error, permanente)
+        llamadas = 0
+        envios = DespachadorNotificaciones.agrupar(
+            filas, getattr(transporte, 'MAX_DESTINATARIOS', 1000)
+        )
+        for grupo, destinatarios, asunto, html in envios:
+            error, permanente = DespachadorNotificaciones._entregar(transporte, destinatarios, asunto, html)
+            llamadas += 1
+
+            if error and permanente and len(grupo) > 1:
+                # Un destinatario inválido no debe descartar a los demás:
+                # se reintenta cada fila por separado con su propio contenido
+                for fila in grupo:
+                    error, permanente = DespachadorNotificaciones._entregar(
+                        transporte, [fila.destinatario], fila.asunto, fila.contenido_html
+                    )
+                    llamadas += 1
+                    resultados.append((fila, error, permanente))
+                continue
+            resultados.extend((fila, error, permanente) for fila in grupo)
+
+        cambios = []
+        enviadas = 0
+        for fila, error, permanente in resultados:
+            intentos = fila.intentos + 1
+            if not error:
+                cambios.append({
+                    'id': fila.id, 'estado': 'Enviada', 'intentos': intentos,
+                    'fecha_envio': datetime.utcnow(), 'tomada_hasta': None, 'ultimo_error': None
+                })
+                enviadas += 1
+            elif permanente or intentos >= DespachadorNotificaciones.MAX_INTENTOS:
+                logger.error(f"❌ Notificación {fila.id} a {fila.destinatario} descartada tras {intentos} intentos: {error}")
+                cambios.append({
+                    'id': fila.id, 'estado': 'Fallida', 'intentos': intentos,
+                    'tomada_hasta': None, 'ultimo_error': error
+                })
+            else:
+                espera = DespachadorNotificaciones.backoff(intentos)
+                logger.warning(f"⚠️ Notificación {fila.id} falló (intento {intentos}), reintento en {espera:.0f}s: {error}")
+                cambios.append({
+                    'id': fila.id, 'estado': 'Pendiente', 'intentos': intentos,
+                    'proximo_intento': datetime.utcnow() + timedelta(seconds=espera),
+                    'tomada_hasta': None, 'ultimo_error': error
+                })
+
+        # Filas con las mismas columnas por grupo: executemany por clave primaria
+        grupos = {}
+        for cambio in cambios:
+            grupos.setdefault(tuple(sorted(cambio)), []).append(cambio)
+        for grupo in grupos.values():
+            db.session.execute(update(Notificacion), grupo)
+        db.session.commit()
+
+        if enviadas:
+            logger.info(f"📧 {enviadas}/{len(filas)} notificaciones enviadas en {llamadas} llamadas al proveedor")
+        return len(filas)
+
+    @staticmethod
+    def reintentar_fallidas(ids=None):
+        """Devuelve notificaciones Fallida a Pendiente (tras corregir la causa)"""
+        from app import db
+        from app.models import Notificacion
+
+        query = Notificacion.query.filter(Notificacion.estado == 'Fallida')
+        if ids:
+            query = query.filter(Notificacion.id.in_(ids))
+        reintentadas = query.update({
+            'estado': 'Pendiente', 'intentos': 0, 'proximo_intento': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return reintentadas
+
+    @staticmethod
+    def resumen():
+        """Cantidad de notificaciones por estado"""
+        from app import db
+        from app.models import Notificacion
+
+        return dict(db.session.query(Notificacion.estado, db.func.count(Notificacion.id))
+                    .group_by(Notificacion.estado).all())
+
+
+despachador_notificaciones = DespachadorNotificaciones()
@@ -0,0 +1,300 @@
+# app/tasks/extraccion_documentos.py
+"""
+Extracción del texto de los archivos de documentos legales (PDF, DOCX, XLSX)
+
+juridico.cargar_documento guarda el archivo por contenido
+(SST_DIR_JURIDICO/<2 primeros>/<sha256>.<formato>) y deja el documento
+Pendiente. Si ya hay texto extraído para ese hash_documento (misma versión
+del extractor) se usa en la misma petición; si no, se encola el trabajo
+'extraer_texto_documentos' y el sst-worker lo resuelve aquí:
+
+- se toman los documentos Pendientes (sin transacción abierta mientras se extrae)
+- cada hash se extrae una vez, en un pool de SST_PROCESOS_EXTRACCION
+  procesos (spawn): el análisis de PDF/XLSX es CPU y no debe competir por
+  el GIL con los hilos del worker
+- el resultado se guarda en textos_extraidos y en
+  DocumentoLegal.texto_extraido por el ORM, así la búsqueda y el índice de
+  normativa del chat lo toman con sus eventos
+
+Un archivo que tarda más de TIEMPO_MAXIMO segundos queda Fallido y el pool
+se recrea para no dejar un proceso ocupado. Los Fallidos no se reintentan
+solos: reintentar_fallidos() los devuelve a Pendiente (p. ej. tras instalar
+pypdf), ver scripts/extraer_documentos_legales.py.
+"""
+
+from app.utils import extraccion_texto
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TiempoAgotado
+from datetime import datetime
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+ArchivoLegal = namedtuple('ArchivoLegal', ['ruta', 'hash_documento', 'tamano', 'formato'])
+
+
+class ExtraccionDocumentos:
+    """Pool de procesos para extraer texto, con caché por hash_documento"""
+
+    PROCESOS = int(os.getenv('SST_PROCESOS_EXTRACCION', str(min(4, os.cpu_count() or 1))))
+    DIRECTORIO = os.getenv('SST_DIR_JURIDICO', os.path.join('uploads', 'juridico'))
+    TIEMPO_MAXIMO = int(os.getenv('SST_EXTRACCION_TIEMPO_MAX', '120'))  # segundos por archivo
+    TAMANO_LOTE = 200
+
+    # El pool se recrea entre lotes tras este número de archivos por proceso (memoria
+    # de los parsers). No se usa max_tasks_per_child: en 3.11 puede colgar el pool
+    TAREAS_POR_PROCESO = 500
+
+    TAMANO_BLOQUE = 64 * 1024
+
+    def __init__(self, procesos=None):
+        self.procesos = procesos or self.PROCESOS
+        self._pool = None
+        self._tareas = 0
+        self._lock = threading.Lock()
+
+    # ============== POOL ==============
+
+    def _obtener_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.procesos,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                self._tareas = 0
+                logger.info(f"✅ Pool de extracción de texto iniciado ({self.procesos} procesos)")
+            return self._pool
+
+    def cerrar(self, esperar=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=esperar, cancel_futures=True)
+
+    def extraer_archivos(self, archivos):
+        """
+        Extrae en paralelo {hash: (ruta, formato)}
+
+        Returns:
+            {hash: resultado de extraccion_texto.extraer}
+        """
+        if not archivos:
+            return {}
+        pool = self._obtener_pool()
+        futuros = {
+            hash_documento: pool.submit(extraccion_texto.extraer, ruta, formato)
+            for hash_documento, (ruta, formato) in archivos.items()
+        }
+        resultados = {}
+        limite = time.monotonic() + self.TIEMPO_MAXIMO * max(1, len(archivos) / self.procesos)
+        agotado = False
+        for hash_documento, futuro in futuros.items():
+            try:
+                resultados[hash_documento] = futuro.result(timeout=max(0, limite - time.monotonic()))
+            except TiempoAgotado:
+                agotado = True
+                resultados[hash_documento] = {'texto': None, 'paginas': None, 'caracteres': 0, 'truncado': False,
+                                              'error': f'Tiempo agotado (más de {self.TIEMPO_MAXIMO} s)',
+                                              'duracion_ms': None}
+            except Exception as e:
+                # Proceso del pool caído (BrokenProcessPool) u otro error fuera del extractor
+                agotado = True
+                resultados[hash_documento] = {'texto': None, 'paginas': None, 'caracteres': 0, 'truncado': False,
+                                              'error': f'{type(e).__name__}: {str(e)}'[:1000], 'duracion_ms': None}
+        self._tareas += len(archivos)
+        if agotado:
+            self.cerrar(esperar=False)
+        elif self._tareas >= self.TAREAS_POR_PROCESO * self.procesos:
+            self.cerrar()
+        return resultados
+
+    # ============== ARCHIVOS ==============
+
+    @staticmethod
+    def guardar_archivo(archivo):
+        """
+        Guarda un archivo subido por su sha256 leyendo por bloques
+
+        Raises:
+            ValueError: si no es PDF, DOCX o XLSX
+
+        Returns:
+            ArchivoLegal
+        """
+        flujo = getattr(archivo, 'stream', archivo)
+        cabecera = flujo.read(ExtraccionDocumentos.TAMANO_BLOQUE)
+        formato = extraccion_texto.detectar_formato(cabecera, getattr(archivo, 'filename', '') or '')
+        if formato is None:
+            raise ValueError('El archivo debe ser PDF, DOCX o XLSX')
+
+        temporales = os.path.join(ExtraccionDocumentos.DIRECTORIO, 'tmp')
+        os.makedirs(temporales, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=temporales, suffix='.parte')
+        sha256 = hashlib.sha256()
+        tamano = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as salida:
+                bloque = cabecera
+                while bloque:
+                    sha256.update(bloque)
+                    salida.write(bloque)
+                    tamano += len(bloque)
+                    bloque = flujo.read(ExtraccionDocumentos.TAMANO_BLOQUE)
+            hash_documento = sha256.hexdigest()
+            ruta = os.path.join(ExtraccionDocumentos.DIRECTORIO, hash_documento[:2], f'{hash_documento}.{formato}')
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return ArchivoLegal(ruta, hash_documento, tamano, formato)
+
+    # ============== DOCUMENTOS ==============
+
+    @staticmethod
+    def _aplicar(documento, extraido, ahora):
+        """Pasa el texto de la caché al documento (por el ORM: dispara los índices)"""
+        documento.texto_extraido = extraido.texto
+        documento.estado_extraccion = 'Fallido' if extraido.error else 'Extraido'
+        documento.fecha_extraccion = ahora
+
+    @staticmethod
+    def desde_cache(documento):
+        """Completa el documento con el texto ya extraído de su hash (sin commit); True si lo había"""
+        from app.models import TextoExtraido
+
+        extraido = TextoExtraido.query.filter_by(
+            hash_documento=documento.hash_documento, version=extraccion_texto.VERSION
+        ).first()
+        if extraido is None or extraido.error:
+            return False
+        ExtraccionDocumentos._aplicar(documento, extraido, datetime.utcnow())
+        return True
+
+    @staticmethod
+    def _guardar_extraidos(archivos, resultados):
+        """Inserta o reemplaza las filas de textos_extraidos de los hashes extraídos"""
+        from app import db
+        from app.models import TextoExtraido
+        from sqlalchemy import delete, insert
+
+        db.session.execute(delete(TextoExtraido).where(TextoExtraido.hash_documento.in_(list(resultados))))
+        db.session.execute(insert(TextoExtraido), [{
+            'hash_documento': hash_documento,
+            'version': extraccion_texto.VERSION,
+            'formato': archivos[hash_documento][1],
+            'texto': resultado['texto'],
+            'paginas': resultado['paginas'],
+            'caracteres': resultado['caracteres'],
+            'truncado': resultado['truncado'],
+            'error': resultado['error'],
+            'duracion_ms': resultado['duracion_ms'],
+            'fecha_creacion': datetime.utcnow(),
+        } for hash_documento, resultado in resultados.items()])
+
+    def procesar(self, documento_ids=None, limite=None):
+        """
+        Extrae el texto de un lote de documentos Pendientes y hace commit
+
+        Returns:
+            {'documentos', 'archivos' (leídos del disco), 'desde_cache', 'extraidos', 'fallidos'}
+        """
+        from app import db
+        from app.models import DocumentoLegal, TextoExtraido
+
+        query = db.session.query(
+            DocumentoLegal.id, DocumentoLegal.hash_documento, DocumentoLegal.ruta_archivo
+        ).filter(DocumentoLegal.estado_extraccion == 'Pendiente', DocumentoLegal.hash_documento.isnot(None))
+        if documento_ids:
+            query = query.filter(DocumentoLegal.id.in_(documento_ids))
+        pendientes = query.order_by(DocumentoLegal.id).limit(limite or self.TAMANO_LOTE).all()
+        resumen = {'documentos': len(pendientes), 'archivos': 0, 'desde_cache': 0, 'extraidos': 0, 'fallidos': 0}
+        if not pendientes:
+            db.session.rollback()
+            return resumen
+
+        hashes = {fila.hash_documento for fila in pendientes}
+        # Un error en caché no se reutiliza: el documento que vuelve a Pendiente
+        # (reintentar_fallidos) se lee otra vez; los buenos no
+        en_cache = {fila.hash_documento for fila in db.session.query(TextoExtraido.hash_documento).filter(
+            TextoExtraido.hash_documento.in_(hashes), TextoExtraido.version == extraccion_texto.VERSION,
+            TextoExtraido.error.is_(None)
+        )}
+        archivos = {}
+        for fila in pendientes:
+            if fila.hash_documento not in en_cache and fila.hash_documento not in archivos:
+                formato = os.path.splitext(fila.ruta_archivo or '')[1].lstrip('.').lower()
+                archivos[fila.hash_documento] = (fila.ruta_archivo, formato)
+        # Sin transacción abierta mientras los procesos trabajan
+        db.session.rollback()
+
+        resultados = self.extraer_archivos(archivos)
+        resumen['archivos'] = len(resultados)
+        if resultados:
+            self._guardar_extraidos(archivos, resultados)
+
+        extraidos = {fila.hash_documento: fila for fila in TextoExtraido.query.filter(
+            TextoExtraido.hash_documento.in_(hashes), TextoExtraido.version == extraccion_texto.VERSION
+        )}
+        ahora = datetime.utcnow()
+        for documento in DocumentoLegal.query.filter(
+            DocumentoLegal.id.in_([fila.id for fila in pendientes]), DocumentoLegal.estado_extraccion == 'Pendiente'
+        ):
+            extraido = extraidos.get(documento.hash_documento)
+            if extraido is None:
+                continue
+            ExtraccionDocumentos._aplicar(documento, extraido, ahora)
+            if extraido.error:
+                resumen['fallidos'] += 1
+                logger.warning(f"⚠️ Documento legal {documento.id} sin texto: {extraido.error}")
+            elif documento.hash_documento in resultados:
+                resumen['extraidos'] += 1
+            else:
+                resumen['desde_cache'] += 1
+        db.session.commit()
+
+        logger.info(f"📄 Extracción de texto: {resumen['archivos']} archivos leídos, {resumen['extraidos']} extraídos, "
+                    f"{resumen['desde_cache']} de caché, "
+                    f"{resumen['fallidos']} fallidos")
+        return resumen
+
+    @staticmethod
+    def reintentar_fallidos(documento_ids=None):
+        """Devuelve a Pendiente los documentos Fallidos (todos o los indicados) y hace commit; cuántos"""
+        from app import db
+        from app.models import DocumentoLegal
+
+        query = db.session.query(DocumentoLegal).filter(
+            DocumentoLegal.estado_extraccion == 'Fallido', DocumentoLegal.hash_documento.isnot(None)
+        )
+        if documento_ids:
+            query = query.filter(DocumentoLegal.id.in_(documento_ids))
+        cambiados = query.update({'estado_extraccion': 'Pendiente'}, synchronize_session=False)
+        db.session.commit()
+        if cambiados:
+            logger.info(f"🔁 {cambiados} documentos legales Fallidos vuelven a Pendiente")
+        return cambiados
+
+    def procesar_pendientes(self, limite=None):
+        """Procesa lotes hasta que no queden Pendientes; devuelve el resumen acumulado"""
+        total = {'documentos': 0, 'archivos': 0, 'desde_cache': 0, 'extraidos': 0, 'fallidos': 0}
+        while True:
+            resumen = self.procesar(limite=limite)
+            if not resumen['documentos']:
+                return total
+            for clave, valor in resumen.items():
+                total[clave] += valor
+            if not resumen['desde_cache'] + resumen['extraidos'] + resumen['fallidos']:
+                return total
+
+
+extraccion_documentos = ExtraccionDocumentos()
@@ -0,0 +1,278 @@
+# app/tasks/ingesta_reportes.py
+"""
+Etapa de ingesta de reportes (tabla ingesta_reportes)
+
+reportes.nuevo solo guarda el reporte y su fila de ingesta en la misma
+transacción y responde. Esta etapa corre en el sst-worker con un grupo de
+hilos; cada hilo reclama un lote de filas con un UPDATE condicional y hace
+en una sola transacción (GestionReportesService.asignar_lote):
+- la asignación (gestión, línea de tiempo de escalamiento, historial)
+- las tareas del gestor
+- las notificaciones en el outbox (las envía el despachador)
+
+Si el lote falla, se reintenta reporte por reporte para que uno con datos
+rotos no bloquee a los demás. Un reporte sin gestor disponible (faltan
+reglas o usuarios) se reintenta con backoff exponencial y, tras
+MAX_INTENTOS, queda Sin_asignar para revisión manual.
+
+Si un worker muere con filas tomadas, otro las recupera cuando vence tomada_hasta.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+import logging
+import os
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineIngesta:
+    """Grupo de hilos que asigna en lote los reportes recién creados"""
+
+    HILOS = int(os.getenv('SST_HILOS_INGESTA', '2'))
+    TAMANO_LOTE = int(os.getenv('SST_INGESTA_LOTE', '50'))
+
+    # Segundos de espera cuando no hay pendientes
+    INTERVALO = 1
+
+    # Reintentos sin gestor: 1m, 2m, 4m, ... hasta MAX_BACKOFF; luego Sin_asignar
+    MAX_INTENTOS = 8
+    BACKOFF_BASE = 60  # segundos
+    MAX_BACKOFF = 3600
+
+    # Tiempo que una fila queda reservada para el hilo que la tomó
+    RESERVA_SEGUNDOS = 300
+
+    def __init__(self):
+        self._hilos = []
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self.app = None
+
+    @property
+    def corriendo(self):
+        return any(hilo.is_alive() for hilo in self._hilos)
+
+    def iniciar(self, app, hilos=None):
+        """Arranca los hilos de la etapa (idempotente)"""
+        with self._lock:
+            if self.corriendo:
+                return
+            hilos = hilos or self.HILOS
+            self.app = app
+            self._detener.clear()
+            self._hilos = [
+                threading.Thread(target=self._bucle, name=f'ingesta-reportes-{i}', daemon=True)
+                for i in range(hilos)
+            ]
+            for hilo in self._hilos:
+                hilo.start()
+        logger.info(f"✅ Ingesta de reportes iniciada ({hilos} hilos, lotes de {self.TAMANO_LOTE})")
+
+    def detener(self):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=10)
+        self._hilos = []
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                with self.app.app_context():
+                    procesadas = self.procesar_lote()
+                    from app import db
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"❌ Error en la ingesta de reportes: {str(e)}", exc_info=True)
+                procesadas = 0
+
+            if not procesadas:
+                self._detener.wait(self.INTERVALO)
+
+    # ============== COLA ==============
+
+    @staticmethod
+    def encolar(reporte_id):
+        """Agrega el reporte a la cola de ingesta sin hacer commit (va con la transacción del reporte)"""
+        from app import db
+        from app.models import IngestaReporte
+
+        fila = IngestaReporte(reporte_id=reporte_id, proximo_intento=datetime.utcnow())
+        db.session.add(fila)
+        return fila
+
+    @staticmethod
+    def reclamar(limite, ahora=None):
+        """
+        Toma hasta `limite` filas listas (o abandonadas) y hace commit
+
+        Returns:
+            [(id, reporte_id, intentos)] en orden de llegada
+        """
+        from app import db
+        from app.models import IngestaReporte
+
+        ahora = ahora or datetime.utcnow()
+        disponible = or_(
+            and_(IngestaReporte.estado == 'Pendiente', IngestaReporte.proximo_intento <= ahora),
+            and_(IngestaReporte.estado == 'Procesando', IngestaReporte.tomada_hasta < ahora)
+        )
+        candidatas = list(db.session.execute(
+            db.select(IngestaReporte.id).where(disponible)
+            .order_by(IngestaReporte.proximo_intento, IngestaReporte.id).limit(limite)
+        ).scalars())
+        if not candidatas:
+            db.session.rollback()
+            return []
+
+        stmt = update(IngestaReporte).where(IngestaReporte.id.in_(candidatas), disponible).values(
+            estado='Procesando', tomada_hasta=ahora + timedelta(seconds=PipelineIngesta.RESERVA_SEGUNDOS)
+        ).execution_options(synchronize_session=False)
+        if db.engine.dialect.update_returning:
+            tomadas = list(db.session.execute(stmt.returning(IngestaReporte.id)).scalars())
+        else:
+            tomadas = list(db.session.execute(
+                db.select(IngestaReporte.id).where(IngestaReporte.id.in_(candidatas), disponible).with_for_update()
+            ).scalars())
+            db.session.execute(stmt)
+        db.session.commit()
+
+        if not tomadas:
+            return []
+        return db.session.query(
+            IngestaReporte.id, IngestaReporte.reporte_id, IngestaReporte.intentos
+        ).filter(IngestaReporte.id.in_(tomadas)).order_by(IngestaReporte.id).all()
+
+    @staticmethod
+    def backoff(intentos):
+        """Segundos hasta el siguiente intento (exponencial con jitter de ±10%)"""
+        base = min(PipelineIngesta.BACKOFF_BASE * 2 ** (intentos - 1), PipelineIngesta.MAX_BACKOFF)
+        return base * random.uniform(0.9, 1.1)
+
+    @staticmethod
+    def _cambio(fila, gestion_id=None, error=None, permanente=False):
+        """Columnas con que queda una fila tras procesarla"""
+        intentos = fila.intentos + 1
+        ahora = datetime.utcnow()
+        if gestion_id:
+            return {'id': fila.id, 'estado': 'Asignado', 'intentos': intentos, 'gestion_reporte_id': gestion_id,
+                    'tomada_hasta': None, 'fecha_proceso': ahora, 'ultimo_error': None}
+        if permanente:
+            return {'id': fila.id, 'estado': 'Fallida', 'intentos': intentos,
+                    'tomada_hasta': None, 'fecha_proceso': ahora, 'ultimo_error': error}
+        if intentos >= PipelineIngesta.MAX_INTENTOS:
+            logger.error(f"❌ Reporte {fila.reporte_id} sin asignar tras {intentos} intentos: {error}")
+            return {'id': fila.id, 'estado': 'Sin_asignar', 'intentos': intentos,
+                    'tomada_hasta': None, 'fecha_proceso': ahora, 'ultimo_error': error}
+        return {'id': fila.id, 'estado': 'Pendiente', 'intentos': intentos,
+                'proximo_intento': ahora + timedelta(seconds=PipelineIngesta.backoff(intentos)),
+                'tomada_hasta': None, 'ultimo_error': error}
+
+    @staticmethod
+    def _asignar(filas):
+        """
+        Asigna las filas en una transacción y guarda su estado en la misma
+
+        Returns:
+            (asignados, acciones programadas) ya confirmados
+        """
+        from app import db
+        from app.models import IngestaReporte
+        from app.services.gestion_reportes_service import GestionReportesService
+
+        resultados, acciones = GestionReportesService.asignar_lote([fila.reporte_id for fila in filas])
+
+        cambios = []
+        for fila in filas:
+            if fila.reporte_id not in resultados:
+                cambios.append(PipelineIngesta._cambio(fila, error='Reporte no encontrado', permanente=True))
+            elif resultados[fila.reporte_id] is None:
+                cambios.append(PipelineIngesta._cambio(fila, error='No hay gestor disponible para el reporte'))
+            else:
+                cambios.append(PipelineIngesta._cambio(fila, gestion_id=resultados[fila.reporte_id]))
+
+        # Filas con las mismas columnas por grupo: executemany por clave primaria
+        grupos = {}
+        for cambio in cambios:
+            grupos.setdefault(tuple(sorted(cambio)), []).append(cambio)
+        for grupo in grupos.values():
+            db.session.execute(update(IngestaReporte), grupo)
+        db.session.commit()
+
+        return sum(1 for cambio in cambios if cambio['estado'] == 'Asignado'), acciones
+
+    @staticmethod
+    def procesar_lote(limite=None):
+        """
+        Reclama un lote y lo asigna; si el lote falla, reporte por reporte
+
+        Returns:
+            Número de filas procesadas (asignadas o no)
+        """
+        from app import db
+        from app.models import IngestaReporte
+        from app.services.escalonamiento_service import EscalonamientoService
+
+        filas = PipelineIngesta.reclamar(limite or PipelineIngesta.TAMANO_LOTE)
+        if not filas:
+            return 0
+
+        try:
+            asignados, acciones = PipelineIngesta._asignar(filas)
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️ Lote de ingesta de {len(filas)} reportes falló, se procesa uno por uno: {str(e)}")
+            asignados, acciones = 0, []
+            for fila in filas:
+                try:
+                    asignado, programadas = PipelineIngesta._asignar([fila])
+                    asignados += asignado
+                    acciones.extend(programadas)
+                except Exception as error:
+                    db.session.rollback()
+                    logger.error(f"❌ Error asignando el reporte {fila.reporte_id}: {str(error)}")
+                    db.session.execute(update(IngestaReporte), [
+                        PipelineIngesta._cambio(fila, error=f'{type(error).__name__}: {str(error)}'[:2000])
+                    ])
+                    db.session.commit()
+
+        EscalonamientoService._avisar_temporizador(acciones)
+        if asignados:
+            logger.info(f"📥 Ingesta: {asignados}/{len(filas)} reportes asignados en lote")
+        return len(filas)
+
+    @staticmethod
+    def resumen():
+        """Filas por estado y antigüedad (segundos) de la pendiente más vieja"""
+        from app import db
+        from app.models import IngestaReporte
+
+        estados = dict(db.session.query(IngestaReporte.estado, db.func.count(IngestaReporte.id))
+                       .group_by(IngestaReporte.estado).all())
+        mas_vieja = db.session.query(db.func.min(IngestaReporte.fecha_creacion)).filter(
+            IngestaReporte.estado.in_(['Pendiente', 'Procesando'])
+        ).scalar()
+        return {
+            'estados': estados,
+            'retraso_segundos': round((datetime.utcnow() - mas_vieja).total_seconds(), 1) if mas_vieja else 0.0,
+        }
+
+    @staticmethod
+    def reintentar_sin_asignar(ids=None):
+        """Devuelve filas Sin_asignar a Pendiente (tras configurar gestores)"""
+        from app import db
+        from app.models import IngestaReporte
+
+        query = IngestaReporte.query.filter(IngestaReporte.estado == 'Sin_asignar')
+        if ids:
+            query = query.filter(IngestaReporte.id.in_(ids))
+        reintentadas = query.update({
+            'estado': 'Pendiente', 'intentos': 0, 'proximo_intento': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return reintentadas
+
+
+pipeline_ingesta = PipelineIngesta()
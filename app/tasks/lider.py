@@ -0,0 +1,143 @@
+# app/tasks/lider.py
+"""
+Bloqueo de líder para el worker de tareas periódicas
+
+Solo un proceso en todo el cluster ejecuta escalamientos y limpiezas:
+- PostgreSQL: pg_try_advisory_lock en una conexión dedicada; el bloqueo vive
+  mientras la conexión siga abierta.
+- Otras bases (SQLite en desarrollo): fila en bloqueos_worker con expira_en,
+  renovada por el líder. Si el líder muere, otro la toma al vencer.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import text, update, or_
+from sqlalchemy.exc import IntegrityError
+import logging
+import os
+import socket
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class BloqueoLider:
+    """Bloqueo exclusivo del worker (advisory lock o fila con vencimiento)"""
+
+    NOMBRE = 'sst-worker'
+
+    # Clave del advisory lock de PostgreSQL (entero fijo de 64 bits)
+    CLAVE_ADVISORY = 0x5353545F574B  # "SST_WK"
+
+    # Vigencia de la fila de bloqueo; el líder renueva cada RENOVACION_SEGUNDOS
+    TTL_SEGUNDOS = 60
+    RENOVACION_SEGUNDOS = 20
+
+    def __init__(self, app, nombre=NOMBRE):
+        from app import db
+
+        self.app = app
+        self.nombre = nombre
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._conexion = None
+
+        with app.app_context():
+            self.usa_advisory = db.engine.dialect.name == 'postgresql'
+
+    def adquirir(self):
+        """
+        Toma o renueva el bloqueo
+
+        Returns:
+            True si este proceso es el líder
+        """
+        try:
+            if self.usa_advisory:
+                return self._adquirir_advisory()
+            return self._adquirir_fila()
+        except Exception as e:
+            logger.error(f"❌ Error adquiriendo bloqueo {self.nombre}: {str(e)}")
+            self._cerrar_conexion()
+            return False
+
+    def liberar(self):
+        try:
+            if self._conexion is not None:
+                self._conexion.execute(text('SELECT pg_advisory_unlock(:clave)'), {'clave': self.CLAVE_ADVISORY})
+                self._cerrar_conexion()
+            elif not self.usa_advisory:
+                self._liberar_fila()
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo liberar el bloqueo {self.nombre}: {str(e)}")
+
+    # ============== POSTGRESQL ==============
+
+    def _adquirir_advisory(self):
+        from app import db
+
+        if self._conexion is not None:
+            # Ya lo tenemos: basta con que la conexión siga viva
+            self._conexion.execute(text('SELECT 1'))
+            return True
+
+        with self.app.app_context():
+            conexion = db.engine.connect()
+        conexion = conexion.execution_options(isolation_level='AUTOCOMMIT')
+        tomado = conexion.execute(
+            text('SELECT pg_try_advisory_lock(:clave)'), {'clave': self.CLAVE_ADVISORY}
+        ).scalar()
+
+        if tomado:
+            self._conexion = conexion
+            return True
+        conexion.close()
+        return False
+
+    def _cerrar_conexion(self):
+        if self._conexion is not None:
+            try:
+                self._conexion.close()
+            except Exception:
+                pass
+            self._conexion = None
+
+    # ============== FILA DE BLOQUEO ==============
+
+    def _adquirir_fila(self):
+        from app import db
+        from app.models import BloqueoWorker
+
+        with self.app.app_context():
+            ahora = datetime.utcnow()
+            expira = ahora + timedelta(seconds=self.TTL_SEGUNDOS)
+
+            # Renueva si es nuestro, o lo toma si el anterior líder dejó vencer la fila
+            tomadas = db.session.execute(
+                update(BloqueoWorker).where(
+                    BloqueoWorker.nombre == self.nombre,
+                    or_(BloqueoWorker.propietario == self.propietario, BloqueoWorker.expira_en < ahora)
+                ).values(propietario=self.propietario, expira_en=expira)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if tomadas:
+                return True
+
+            try:
+                db.session.add(BloqueoWorker(
+                    nombre=self.nombre, propietario=self.propietario,
+                    expira_en=expira, adquirido_en=ahora
+                ))
+                db.session.commit()
+                return True
+            except IntegrityError:
+                # Otro proceso tiene la fila vigente
+                db.session.rollback()
+                return False
+
+    def _liberar_fila(self):
+        from app import db
+        from app.models import BloqueoWorker
+
+        with self.app.app_context():
+            BloqueoWorker.query.filter_by(nombre=self.nombre, propietario=self.propietario).delete()
+            db.session.commit()
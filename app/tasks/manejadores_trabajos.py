@@ -0,0 +1,152 @@
+# app/tasks/manejadores_trabajos.py
+"""
+Manejadores de los trabajos en segundo plano (ver app/tasks/trabajos.py)
+
+Cada función recibe el diccionario de parámetros con que se encoló el
+trabajo, corre dentro del contexto de la aplicación en un hilo del
+sst-worker y devuelve un diccionario o un ArchivoResultado.
+"""
+
+from app import db
+from app.tasks.trabajos import manejador, ArchivoResultado, ErrorTrabajo
+from datetime import datetime
+from io import BytesIO
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# ============== JURÍDICO ==============
+
+def generar_pdf_consulta(consulta):
+    """PDF del reporte de una consulta jurídica (bytes)"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Título
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor='#1e3a8a',
+        spaceAfter=30,
+        alignment=1
+    )
+    story.append(Paragraph("REPORTE CONSULTA JURÍDICA", title_style))
+    story.append(Spacer(1, 0.3*inch))
+
+    # Información general
+    data = [
+        ['Campo', 'Valor'],
+        ['Número Consulta', consulta.numero_consulta],
+        ['Título', consulta.titulo],
+        ['Tipo', consulta.tipo_consulta],
+        ['Estado', consulta.estado],
+        ['Prioridad', consulta.prioridad],
+        ['Riesgo Legal', consulta.riesgo_legal],
+        ['Creado', str(consulta.fecha_creacion)],
+        ['Resuelto', str(consulta.fecha_resolucion) if consulta.fecha_resolucion else 'N/A'],
+    ]
+
+    table = Table(data, colWidths=[2*inch, 4*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), '#e0e7ff'),
+        ('TEXTCOLOR', (0, 0), (-1, 0), '#1e3a8a'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), '#f0f4ff'),
+        ('GRID', (0, 0), (-1, -1), 1, '#cccccc'),
+    ]))
+
+    story.append(table)
+    story.append(Spacer(1, 0.3*inch))
+
+    # Descripción
+    story.append(Paragraph("<b>Descripción:</b>", styles['Heading3']))
+    story.append(Paragraph(consulta.descripcion or "N/A", styles['BodyText']))
+    story.append(Spacer(1, 0.2*inch))
+
+    # Resolución
+    if consulta.resolucion:
+        story.append(PageBreak())
+        story.append(Paragraph("<b>Resolución:</b>", styles['Heading3']))
+        story.append(Paragraph(consulta.resolucion, styles['BodyText']))
+
+    # Footer
+    story.append(Spacer(1, 0.5*inch))
+    story.append(Paragraph(f"Generado el: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
+                          ParagraphStyle('footer', parent=styles['Normal'], fontSize=8, alignment=2)))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+@manejador('pdf_consulta_juridica', max_intentos=3, prioridad=3)
+def pdf_consulta_juridica(parametros):
+    """PDF descargable de una consulta jurídica ({'consulta_id'})"""
+    from app.models import ConsultaJuridica
+
+    consulta = db.session.get(ConsultaJuridica, parametros.get('consulta_id'))
+    if not consulta:
+        raise ErrorTrabajo('Consulta jurídica no encontrada', reintentar=False)
+    try:
+        contenido = generar_pdf_consulta(consulta)
+    except ImportError:
+        raise ErrorTrabajo('ReportLab no está instalado. Instala con: pip install reportlab', reintentar=False)
+
+    return ArchivoResultado(
+        contenido,
+        f"Consulta_{consulta.numero_consulta}_{datetime.utcnow().strftime('%Y%m%d')}.pdf",
+        'application/pdf',
+        resultado={'consulta_id': consulta.id, 'bytes': len(contenido)}
+    )
+
+
+@manejador('extraer_texto_documentos', max_intentos=3, prioridad=8)
+def extraer_texto_documentos(parametros):
+    """
+    Texto de los archivos de documentos legales Pendientes
+    ({'documento_ids'} opcional; 'reintentar_fallidos': True devuelve antes los Fallidos a Pendiente)
+    """
+    from app.tasks.extraccion_documentos import extraccion_documentos
+
+    documento_ids = parametros.get('documento_ids')
+    if parametros.get('reintentar_fallidos'):
+        extraccion_documentos.reintentar_fallidos(documento_ids)
+    if documento_ids:
+        return extraccion_documentos.procesar(documento_ids=documento_ids)
+    return extraccion_documentos.procesar_pendientes()
+
+
+# ============== REPORTES ==============
+
+@manejador('reconstruir_peligros', max_intentos=3, prioridad=9)
+def reconstruir_peligros(parametros):
+    """peligros_reporte desde riesgos_identificados de todos los reportes ({'tamano_lote'})"""
+    from app.services.peligros_service import PeligrosService
+
+    try:
+        tamano_lote = int(parametros.get('tamano_lote') or PeligrosService.TAMANO_LOTE)
+    except (TypeError, ValueError):
+        raise ErrorTrabajo('tamano_lote debe ser un número', reintentar=False)
+    return PeligrosService.reconstruir(tamano_lote=tamano_lote)
+
+
+@manejador('analisis_ia', max_intentos=3, prioridad=7)
+def analisis_ia(parametros):
+    """Análisis con IA de la imagen de un reporte ({'reporte_id', 'usar_cache'})"""
+    from app.services.imagen_processor import ImagenProcessor
+
+    resultado = ImagenProcessor.procesar_con_ia(parametros.get('reporte_id'), parametros.get('usar_cache', True))
+    if 'error' in resultado:
+        raise ErrorTrabajo(resultado['error'], reintentar=resultado['error'] != 'Reporte o imagen no encontrada')
+    return resultado
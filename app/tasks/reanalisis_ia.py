@@ -0,0 +1,343 @@
+# app/tasks/reanalisis_ia.py
+"""
+Reanálisis masivo con IA de los reportes con imagen (tabla reanalisis_ia)
+
+Corre en el sst-worker. Un trabajo se reclama con un UPDATE condicional y
+queda reservado (tomado_por / tomada_hasta) para un solo worker. Por cada
+lote:
+- lee el siguiente tramo de condiciones_inseguras por id (keyset, sin OFFSET)
+- analiza las imágenes con `concurrencia` hilos (además del límite de la
+  pasarela de IA del proceso)
+- guarda los resultados con un UPDATE en lote y, en la misma transacción,
+  el punto de control (ultimo_id) y los contadores de progreso
+
+Si el worker se cae, otro retoma el trabajo cuando vence tomada_hasta desde
+el último lote confirmado. Los análisis hechos en el lote perdido quedan en
+la caché de análisis, así que repetirlo no vuelve a llamar al modelo
+(salvo con forzar=True).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class EjecutorReanalisis:
+    """Hilo del sst-worker que ejecuta los trabajos de reanálisis"""
+
+    # Segundos de espera cuando no hay trabajos
+    INTERVALO = 10
+
+    # Tiempo que un trabajo queda reservado; se renueva en cada lote
+    RESERVA_SEGUNDOS = 300
+
+    # Pausa entre lotes para no competir con el tráfico interactivo por la cuota del modelo
+    PAUSA_ENTRE_LOTES = float(os.getenv('SST_REANALISIS_PAUSA_SEG', '0'))
+
+    # Con el circuito de la pasarela abierto se reintenta el lote cada
+    # REINTENTO_SEG; tras MAX_LOTES_FALLIDOS intentos el trabajo queda Fallido
+    # (se puede reanudar)
+    REINTENTO_SEG = 60
+    MAX_LOTES_FALLIDOS = 10
+
+    ACCIONES = {
+        'pausar': (('Pendiente', 'Ejecutando'), 'Pausado'),
+        'reanudar': (('Pausado', 'Fallido'), 'Pendiente'),
+        'cancelar': (('Pendiente', 'Ejecutando', 'Pausado', 'Fallido'), 'Cancelado'),
+    }
+
+    def __init__(self):
+        self._hilo = None
+        self._detener = threading.Event()
+        self.app = None
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def iniciar(self, app):
+        """Arranca el hilo (idempotente)"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self.app = app
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name='reanalisis-ia', daemon=True)
+        self._hilo.start()
+        logger.info("✅ Ejecutor de reanálisis IA iniciado")
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo:
+            self._hilo.join(timeout=30)
+        self._hilo = None
+
+    def _bucle(self):
+        from app import db
+
+        while not self._detener.is_set():
+            trabajo_id = None
+            try:
+                with self.app.app_context():
+                    trabajo_id = self.reclamar(self.propietario)
+                    if trabajo_id:
+                        self.ejecutar(trabajo_id, self.propietario, detener=self._detener)
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"❌ Error en el reanálisis IA: {str(e)}", exc_info=True)
+
+            if not trabajo_id:
+                self._detener.wait(self.INTERVALO)
+
+    # ============== TRABAJOS ==============
+
+    @staticmethod
+    def crear(concurrencia=2, tamano_lote=50, forzar=False, creado_por_id=None):
+        """Registra un trabajo sobre todos los reportes con imagen y hace commit"""
+        from app import db
+        from app.models import ReanalisisIA, CondicionInsegura
+
+        total = db.session.query(db.func.count(CondicionInsegura.id)).filter(
+            CondicionInsegura.imagen_url.isnot(None), CondicionInsegura.imagen_url != ''
+        ).scalar()
+        trabajo = ReanalisisIA(
+            concurrencia=max(1, min(int(concurrencia), 16)),
+            tamano_lote=max(1, min(int(tamano_lote), 500)),
+            forzar=bool(forzar), total=total, creado_por_id=creado_por_id
+        )
+        db.session.add(trabajo)
+        db.session.commit()
+        logger.info(f"🔁 Reanálisis IA {trabajo.id} creado: {total} reportes con imagen")
+        return trabajo
+
+    @staticmethod
+    def reclamar(propietario, ahora=None):
+        """Toma el trabajo pendiente (o abandonado) más antiguo; devuelve su id o None"""
+        from app import db
+        from app.models import ReanalisisIA
+
+        ahora = ahora or datetime.utcnow()
+        disponible = or_(
+            ReanalisisIA.estado == 'Pendiente',
+            and_(ReanalisisIA.estado == 'Ejecutando', ReanalisisIA.tomada_hasta < ahora)
+        )
+        trabajo_id = db.session.execute(
+            db.select(ReanalisisIA.id).where(disponible).order_by(ReanalisisIA.id).limit(1)
+        ).scalar()
+        if trabajo_id is None:
+            db.session.rollback()
+            return None
+
+        tomado = db.session.execute(
+            update(ReanalisisIA).where(ReanalisisIA.id == trabajo_id, disponible).values(
+                estado='Ejecutando', tomado_por=propietario,
+                tomada_hasta=ahora + timedelta(seconds=EjecutorReanalisis.RESERVA_SEGUNDOS),
+                fecha_inicio=db.func.coalesce(ReanalisisIA.fecha_inicio, ahora)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not tomado:
+            return None
+        logger.info(f"🔁 Reanálisis IA {trabajo_id} tomado por {propietario}")
+        return trabajo_id
+
+    @staticmethod
+    def _analizar(app, filas, config_ia, forzar, concurrencia):
+        """Analiza (id, imagen_url) en paralelo; devuelve [(id, resultado)]"""
+        from app import db
+        from app.services.gemini_service import GeminiService
+        from app.services.imagen_processor import ImagenProcessor
+
+        servicio = GeminiService()
+
+        def analizar(fila):
+            with app.app_context():
+                try:
+                    return fila.id, servicio.analizar_imagen_sst(
+                        fila.imagen_url, config_ia=config_ia,
+                        hash_imagen=ImagenProcessor.hash_desde_ruta(fila.imagen_url),
+                        usar_cache=not forzar,
+                        contexto={'operacion': 'reanalisis', 'reporte_id': fila.id}
+                    )
+                except Exception as e:
+                    return fila.id, {"error": str(e)}
+                finally:
+                    db.session.remove()
+
+        with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='reanalisis-ia') as ejecutor:
+            return list(ejecutor.map(analizar, filas))
+
+    @staticmethod
+    def procesar_lote(trabajo_id, propietario):
+        """
+        Analiza el siguiente lote y confirma resultados + punto de control juntos
+
+        Returns:
+            'continuar', 'terminado' (completado, pausado, cancelado o reserva
+            perdida) o 'reintentar' (circuito de la pasarela abierto, el lote
+            no se confirma)
+        """
+        from flask import current_app
+        from app import db
+        from app.models import ReanalisisIA, CondicionInsegura, ConfiguracionIA
+        from app.services.imagen_processor import ImagenProcessor
+        from app.services.pasarela_ia import pasarela_ia
+
+        trabajo = db.session.get(ReanalisisIA, trabajo_id)
+        if not trabajo or trabajo.estado != 'Ejecutando' or trabajo.tomado_por != propietario:
+            db.session.rollback()
+            return 'terminado'
+        es_nuestro = and_(
+            ReanalisisIA.id == trabajo_id, ReanalisisIA.estado == 'Ejecutando',
+            ReanalisisIA.tomado_por == propietario
+        )
+
+        filas = db.session.execute(
+            db.select(CondicionInsegura.id, CondicionInsegura.imagen_url).where(
+                CondicionInsegura.id > trabajo.ultimo_id,
+                CondicionInsegura.imagen_url.isnot(None), CondicionInsegura.imagen_url != ''
+            ).order_by(CondicionInsegura.id).limit(trabajo.tamano_lote)
+        ).all()
+        if not filas:
+            db.session.execute(update(ReanalisisIA).where(es_nuestro).values(
+                estado='Completado', fecha_fin=datetime.utcnow(), tomada_hasta=None,
+                total=ReanalisisIA.procesados
+            ).execution_options(synchronize_session=False))
+            db.session.commit()
+            logger.info(f"✅ Reanálisis IA {trabajo_id} completado: {trabajo.procesados} reportes")
+            return 'terminado'
+
+        config_ia = ConfiguracionIA.query.filter_by(activo=True).first()
+        if config_ia:
+            # Los hilos de análisis solo leen sus atributos: copia desligada de la sesión
+            db.session.expunge(config_ia)
+        forzar, concurrencia = trabajo.forzar, trabajo.concurrencia
+        # No retener una transacción abierta mientras se espera al modelo
+        db.session.commit()
+
+        inicio = time.perf_counter()
+        resultados = EjecutorReanalisis._analizar(
+            current_app._get_current_object(), filas, config_ia, forzar, concurrencia
+        )
+        duracion = time.perf_counter() - inicio
+
+        cambios = [
+            {'id': reporte_id, **ImagenProcessor.campos_analisis(resultado)}
+            for reporte_id, resultado in resultados if 'error' not in resultado
+        ]
+        errores = [resultado['error'] for _, resultado in resultados if 'error' in resultado]
+        renovada = datetime.utcnow() + timedelta(seconds=EjecutorReanalisis.RESERVA_SEGUNDOS)
+
+        if not cambios and pasarela_ia.circuito != 'cerrado':
+            # Modelo caído (circuito abierto): no se avanza el punto de control
+            db.session.execute(update(ReanalisisIA).where(es_nuestro).values(
+                tomada_hasta=renovada, ultimo_error=errores[0][:500]
+            ).execution_options(synchronize_session=False))
+            db.session.commit()
+            logger.warning(f"⚠️ Reanálisis IA {trabajo_id}: circuito de IA abierto, se reintenta el lote ({errores[0]})")
+            return 'reintentar'
+
+        if cambios:
+            db.session.execute(update(CondicionInsegura), cambios)
+            # El UPDATE por lote no pasa por los eventos del ORM: observaciones_ia al índice de
+            # búsqueda y riesgos_identificados a peligros_reporte
+            from app.services.busqueda_service import BusquedaService
+            from app.services.peligros_service import PeligrosService
+            BusquedaService.indexar_ids('reporte', [cambio['id'] for cambio in cambios])
+            PeligrosService.sincronizar_ids([cambio['id'] for cambio in cambios])
+        confirmado = db.session.execute(update(ReanalisisIA).where(es_nuestro).values(
+            ultimo_id=filas[-1].id,
+            procesados=ReanalisisIA.procesados + len(filas),
+            exitosos=ReanalisisIA.exitosos + len(cambios),
+            fallidos=ReanalisisIA.fallidos + len(errores),
+            segundos_ejecucion=ReanalisisIA.segundos_ejecucion + duracion,
+            ultimo_error=errores[-1][:500] if errores else ReanalisisIA.ultimo_error,
+            tomada_hasta=renovada
+        ).execution_options(synchronize_session=False)).rowcount
+
+        if not confirmado:
+            # Pausado, cancelado o reserva perdida mientras se analizaba
+            db.session.rollback()
+            return 'terminado'
+        db.session.commit()
+        return 'continuar'
+
+    @staticmethod
+    def ejecutar(trabajo_id, propietario, detener=None):
+        """Procesa lotes hasta terminar, perder el trabajo o recibir la señal de detener"""
+        from app import db
+        from app.models import ReanalisisIA
+
+        fallidos_seguidos = 0
+        while not (detener and detener.is_set()):
+            resultado = EjecutorReanalisis.procesar_lote(trabajo_id, propietario)
+            if resultado == 'terminado':
+                return
+            if resultado == 'continuar':
+                fallidos_seguidos = 0
+                espera = EjecutorReanalisis.PAUSA_ENTRE_LOTES
+            else:
+                fallidos_seguidos += 1
+                if fallidos_seguidos >= EjecutorReanalisis.MAX_LOTES_FALLIDOS:
+                    db.session.execute(update(ReanalisisIA).where(
+                        ReanalisisIA.id == trabajo_id, ReanalisisIA.tomado_por == propietario
+                    ).values(estado='Fallido', tomada_hasta=None).execution_options(synchronize_session=False))
+                    db.session.commit()
+                    logger.error(f"❌ Reanálisis IA {trabajo_id} marcado Fallido tras {fallidos_seguidos} lotes sin éxito")
+                    return
+                espera = EjecutorReanalisis.REINTENTO_SEG
+            if espera:
+                if detener:
+                    detener.wait(espera)
+                else:
+                    time.sleep(espera)
+
+    @staticmethod
+    def cambiar_estado(trabajo_id, accion):
+        """pausar, reanudar o cancelar; devuelve True si el trabajo cambió"""
+        from app import db
+        from app.models import ReanalisisIA
+
+        origenes, destino = EjecutorReanalisis.ACCIONES[accion]
+        valores = {'estado': destino}
+        if destino == 'Pendiente':
+            valores.update(tomado_por=None, tomada_hasta=None)
+        elif destino == 'Cancelado':
+            valores['fecha_fin'] = datetime.utcnow()
+        cambiados = db.session.execute(
+            update(ReanalisisIA).where(ReanalisisIA.id == trabajo_id, ReanalisisIA.estado.in_(origenes))
+            .values(**valores).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return bool(cambiados)
+
+    @staticmethod
+    def progreso(trabajo):
+        """Avance, velocidad y tiempo estimado restante de un trabajo"""
+        restantes = max(trabajo.total - trabajo.procesados, 0)
+        velocidad = trabajo.procesados / trabajo.segundos_ejecucion if trabajo.segundos_ejecucion else None
+        return {
+            'id': trabajo.id,
+            'estado': trabajo.estado,
+            'total': trabajo.total,
+            'procesados': trabajo.procesados,
+            'exitosos': trabajo.exitosos,
+            'fallidos': trabajo.fallidos,
+            'porcentaje': min(round(100 * trabajo.procesados / trabajo.total, 1), 100.0) if trabajo.total else 100.0,
+            'reportes_por_minuto': round(velocidad * 60, 1) if velocidad else None,
+            'eta_segundos': round(restantes / velocidad) if velocidad and trabajo.estado == 'Ejecutando' else None,
+            'ultimo_id': trabajo.ultimo_id,
+            'ultimo_error': trabajo.ultimo_error,
+            'forzar': trabajo.forzar,
+            'concurrencia': trabajo.concurrencia,
+            'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+            'fecha_inicio': trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+            'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+        }
+
+
+ejecutor_reanalisis = EjecutorReanalisis()
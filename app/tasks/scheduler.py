@@ -1,4 +1,5 @@
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_PAUSED
 from apscheduler.triggers.interval import IntervalTrigger
 import logging
 from datetime import datetime
@@ -7,18 +8,16 @@ logger = logging.getLogger(__name__)
 scheduler = BackgroundScheduler()
 
 def iniciar_scheduler(app):
-    """Inicia el scheduler con tareas periódicas"""
+    """
+    Inicia el scheduler con tareas periódicas
+    Solo lo llama el worker líder (app/tasks/worker.py), nunca create_app
+    """
     
     with app.app_context():
-        # Tarea 1: Verificar vencimientos cada 5 minutos
-        scheduler.add_job(
-            func=verificar_vencimientos_task,
-            trigger=IntervalTrigger(minutes=5),
-            id='verificar_vencimientos',
-            name='Verificar vencimientos de respuesta/resolución',
-            replace_existing=True,
-            args=[app]
-        )
+        # Tarea 1: Escalamientos. El temporizador despierta a la hora exacta de
+        # cada acción programada (acciones_programadas.next_action_at)
+        from app.tasks.temporizador import temporizador
+        temporizador.iniciar(app)
         
         # Tarea 2: Limpiar tareas completadas cada 1 hora
         scheduler.add_job(
@@ -33,13 +32,25 @@ def iniciar_scheduler(app):
         if not scheduler.running:
             scheduler.start()
             logger.info("✅ Scheduler iniciado correctamente")
+        elif scheduler.state == STATE_PAUSED:
+            scheduler.resume()
+            logger.info("✅ Scheduler reanudado")
         else:
             logger.info("ℹ️ Scheduler ya está corriendo")
 
+def detener_scheduler():
+    """Pausa las tareas periódicas y el temporizador (el worker perdió el liderazgo)"""
+    from app.tasks.temporizador import temporizador
+    temporizador.detener()
+    
+    if scheduler.running and scheduler.state != STATE_PAUSED:
+        scheduler.pause()
+        logger.info("⏸️ Scheduler pausado")
+
 def verificar_vencimientos_task(app):
     """
-    Tarea periódica que verifica qué reportes se vencieron
-    y ejecuta el escalonamiento automático
+    Ejecuta de una vez las acciones de escalamiento vencidas
+    (útil para recuperar atrasos o para debugging; el temporizador lo hace solo)
     """
     with app.app_context():
         try:
@@ -76,6 +87,14 @@ def limpiar_tareas_completadas_task(app):
             if tareas_eliminadas > 0:
                 logger.info(f"🧹 {tareas_eliminadas} tareas antiguas eliminadas")
             
+            # Trabajos en segundo plano terminados y sus archivos
+            from app.tasks.trabajos import EjecutorTrabajos
+            EjecutorTrabajos.purgar()
+
+            # Evidencias que ya no usa ningún reporte
+            from app.services.almacen_evidencias import AlmacenEvidencias
+            AlmacenEvidencias.purgar()
+
         except Exception as e:
             logger.error(f"❌ Error en limpiar_tareas_completadas_task: {str(e)}", exc_info=True)
 
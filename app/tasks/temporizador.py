@@ -0,0 +1,146 @@
+# app/tasks/temporizador.py
+"""
+Temporizador de escalamientos (cola de prioridad en memoria)
+
+Un hilo duerme hasta la hora exacta de la próxima acción programada.
+Las acciones nuevas del mismo proceso entran por programar(); las creadas
+por otros procesos se recogen en la sincronización periódica, que solo
+lee el índice (estado, next_action_at).
+"""
+
+from datetime import datetime, timedelta
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TemporizadorEscalonamiento:
+    """Cola de prioridad de acciones programadas con un hilo dormido hasta la próxima"""
+
+    # Cada cuánto se relee la base de datos buscando acciones de otros procesos
+    INTERVALO_SINCRONIZACION = 60  # segundos
+
+    # Máximo de acciones en memoria; el resto se carga en sincronizaciones posteriores
+    MAX_EN_MEMORIA = 5000
+
+    def __init__(self):
+        self._heap = []
+        self._ids = set()
+        self._condicion = threading.Condition()
+        self._hilo = None
+        self._detener = False
+        self._proxima_sincronizacion = datetime.min
+        self.app = None
+
+    @property
+    def corriendo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def iniciar(self, app):
+        """Arranca el hilo del temporizador (idempotente)"""
+        if self.corriendo:
+            return
+        self.app = app
+        self._detener = False
+        self._proxima_sincronizacion = datetime.min
+        self._hilo = threading.Thread(target=self._bucle, name='temporizador-escalonamiento', daemon=True)
+        self._hilo.start()
+        logger.info("✅ Temporizador de escalamientos iniciado")
+
+    def detener(self):
+        with self._condicion:
+            self._detener = True
+            self._condicion.notify_all()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+        self._hilo = None
+
+    def programar(self, accion_id, next_action_at):
+        """Agrega una acción a la cola y despierta el hilo si es la más próxima"""
+        if not self.corriendo:
+            return
+        with self._condicion:
+            if accion_id in self._ids:
+                return
+            if len(self._heap) >= self.MAX_EN_MEMORIA and next_action_at > self._heap[0][0]:
+                # Lejana: la recoge una sincronización posterior
+                return
+            heapq.heappush(self._heap, (next_action_at, accion_id))
+            self._ids.add(accion_id)
+            if self._heap[0][1] == accion_id:
+                self._condicion.notify()
+
+    def pendientes(self):
+        with self._condicion:
+            return len(self._heap)
+
+    # ============== HILO ==============
+
+    def _bucle(self):
+        while True:
+            sincronizar = False
+            vencidas = []
+            with self._condicion:
+                if self._detener:
+                    return
+
+                ahora = datetime.utcnow()
+                if ahora >= self._proxima_sincronizacion:
+                    sincronizar = True
+                else:
+                    while self._heap and self._heap[0][0] <= ahora:
+                        _, accion_id = heapq.heappop(self._heap)
+                        self._ids.discard(accion_id)
+                        vencidas.append(accion_id)
+
+                    if not vencidas:
+                        hasta = self._proxima_sincronizacion
+                        if self._heap:
+                            hasta = min(hasta, self._heap[0][0])
+                        self._condicion.wait(max((hasta - ahora).total_seconds(), 0.01))
+                        continue
+
+            if sincronizar:
+                self._sincronizar()
+            else:
+                self._ejecutar(vencidas)
+
+    def _sincronizar(self):
+        """Carga de la base las acciones pendientes dentro del próximo intervalo"""
+        horizonte = datetime.utcnow() + timedelta(seconds=self.INTERVALO_SINCRONIZACION * 2)
+        try:
+            with self.app.app_context():
+                from app.services.escalonamiento_service import EscalonamientoService
+                filas = EscalonamientoService.proximas_pendientes(horizonte, self.MAX_EN_MEMORIA)
+                from app import db
+                db.session.remove()
+        except Exception as e:
+            logger.error(f"❌ Error sincronizando temporizador: {str(e)}", exc_info=True)
+            filas = []
+
+        with self._condicion:
+            for accion_id, next_action_at in filas:
+                if accion_id not in self._ids:
+                    heapq.heappush(self._heap, (next_action_at, accion_id))
+                    self._ids.add(accion_id)
+            self._proxima_sincronizacion = datetime.utcnow() + timedelta(seconds=self.INTERVALO_SINCRONIZACION)
+
+    def _ejecutar(self, accion_ids):
+        with self.app.app_context():
+            from app import db
+            from app.services.escalonamiento_service import EscalonamientoService
+
+            ejecutadas = 0
+            try:
+                ejecutadas = EscalonamientoService.ejecutar_lote(accion_ids)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"❌ Error ejecutando {len(accion_ids)} acciones: {str(e)}", exc_info=True)
+            db.session.remove()
+
+        if ejecutadas:
+            logger.info(f"✅ {ejecutadas} acciones de escalamiento ejecutadas")
+
+temporizador = TemporizadorEscalonamiento()
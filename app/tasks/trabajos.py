@@ -0,0 +1,435 @@
+# app/tasks/trabajos.py
+"""
+Trabajos en segundo plano (tabla trabajos_fondo)
+
+Las peticiones que hacen trabajo pesado (generar un PDF, analizar una
+imagen con IA, extraer el texto de un documento) lo encolan con encolar()
+y responden de inmediato con el id; el estado y el resultado se consultan
+en /jobs/<id>. La asignación de reportes no pasa por aquí: la hace en lote
+PipelineIngesta (app/tasks/ingesta_reportes.py).
+
+Cada tipo de trabajo tiene un manejador registrado con @manejador
+(app/tasks/manejadores_trabajos.py). Un manejador recibe los parámetros y
+devuelve un diccionario (resultado JSON) o un ArchivoResultado (se guarda
+en SST_DIR_TRABAJOS/<id>/ y se descarga en /jobs/<id>/descargar).
+
+Corre en el sst-worker con SST_HILOS_TRABAJOS hilos:
+- se toma primero el de menor prioridad (1 = más urgente) y más antiguo,
+  con un UPDATE condicional (dos workers nunca ejecutan el mismo trabajo)
+- error: vuelve a Pendiente con backoff exponencial hasta max_intentos;
+  ErrorTrabajo(reintentar=False) lo marca Fallido de inmediato
+- mientras el manejador corre, un latido renueva tomada_hasta cada
+  LATIDO_SEGUNDOS; si un worker muere con un trabajo tomado, otro lo
+  retoma cuando vence (cuenta como intento)
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+from werkzeug.utils import secure_filename
+import logging
+import os
+import random
+import shutil
+import socket
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorTrabajo(Exception):
+    """Error de un manejador; reintentar=False lo marca Fallido sin más intentos"""
+
+    def __init__(self, mensaje, reintentar=True):
+        super().__init__(mensaje)
+        self.reintentar = reintentar
+
+
+class ArchivoResultado:
+    """Archivo producido por un manejador (más un resultado JSON opcional)"""
+
+    def __init__(self, contenido, nombre, tipo_contenido='application/octet-stream', resultado=None):
+        self.contenido = contenido
+        self.nombre = nombre
+        self.tipo_contenido = tipo_contenido
+        self.resultado = resultado
+
+
+class EjecutorTrabajos:
+    """Grupo de hilos del sst-worker que ejecuta los trabajos en segundo plano"""
+
+    HILOS = int(os.getenv('SST_HILOS_TRABAJOS', '4'))
+    DIRECTORIO = os.getenv('SST_DIR_TRABAJOS', os.path.join('uploads', 'trabajos'))
+
+    # Segundos de espera cuando no hay pendientes
+    INTERVALO = 2
+
+    PRIORIDADES = {'alta': 1, 'normal': 5, 'baja': 9}
+
+    # Reintentos: 30s, 1m, 2m, ... hasta MAX_BACKOFF
+    BACKOFF_BASE = 30  # segundos
+    MAX_BACKOFF = 3600
+
+    # Tiempo que un trabajo queda reservado para el hilo que lo tomó; se
+    # renueva cada LATIDO_SEGUNDOS mientras el manejador sigue corriendo
+    RESERVA_SEGUNDOS = 900
+    LATIDO_SEGUNDOS = 300
+
+    # Los trabajos terminados (y sus archivos) se purgan tras DIAS_RETENCION
+    DIAS_RETENCION = int(os.getenv('SST_TRABAJOS_DIAS_RETENCION', '7'))
+
+    # tipo -> (funcion, max_intentos, prioridad)
+    _manejadores = {}
+
+    def __init__(self):
+        self._hilos = []
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self.app = None
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # ============== REGISTRO ==============
+
+    @classmethod
+    def manejador(cls, tipo, max_intentos=3, prioridad=5):
+        """Decorador: registra la función que ejecuta los trabajos de `tipo`"""
+        def registrar(funcion):
+            cls._manejadores[tipo] = (funcion, max_intentos, prioridad)
+            return funcion
+        return registrar
+
+    @classmethod
+    def manejadores(cls):
+        """Tipos registrados (carga los manejadores de la aplicación la primera vez)"""
+        import app.tasks.manejadores_trabajos  # noqa: F401  (registra con @manejador)
+        return cls._manejadores
+
+    # ============== HILOS ==============
+
+    @property
+    def corriendo(self):
+        return any(hilo.is_alive() for hilo in self._hilos)
+
+    def iniciar(self, app, hilos=None):
+        """Arranca los hilos (idempotente)"""
+        with self._lock:
+            if self.corriendo:
+                return
+            hilos = hilos or self.HILOS
+            self.app = app
+            self.manejadores()
+            self._detener.clear()
+            self._hilos = [
+                threading.Thread(target=self._bucle, name=f'trabajos-{i}', daemon=True)
+                for i in range(hilos)
+            ]
+            for hilo in self._hilos:
+                hilo.start()
+        logger.info(f"✅ Ejecutor de trabajos iniciado ({hilos} hilos)")
+
+    def detener(self):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=30)
+        self._hilos = []
+
+    def _bucle(self):
+        from app import db
+
+        while not self._detener.is_set():
+            trabajo_id = None
+            try:
+                with self.app.app_context():
+                    trabajo_id = self.reclamar(self.propietario)
+                    if trabajo_id:
+                        self.ejecutar(trabajo_id, self.propietario)
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"❌ Error en el ejecutor de trabajos: {str(e)}", exc_info=True)
+
+            if not trabajo_id:
+                self._detener.wait(self.INTERVALO)
+
+    # ============== COLA ==============
+
+    @staticmethod
+    def encolar(tipo, parametros=None, prioridad=None, creado_por_id=None, commit=True):
+        """
+        Registra un trabajo Pendiente
+
+        Args:
+            tipo: manejador registrado
+            parametros: diccionario serializable a JSON
+            prioridad: 1-9 o 'alta'/'normal'/'baja' (por defecto, la del manejador)
+            commit: False para confirmarlo junto con la transacción del llamador
+        """
+        from app import db
+        from app.models import TrabajoFondo
+
+        registrado = EjecutorTrabajos.manejadores().get(tipo)
+        if not registrado:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+        _, max_intentos, prioridad_defecto = registrado
+        if prioridad is None:
+            prioridad = prioridad_defecto
+        prioridad = EjecutorTrabajos.PRIORIDADES.get(prioridad, prioridad)
+        if not isinstance(prioridad, int) or not 1 <= prioridad <= 9:
+            raise ValueError("La prioridad debe ser un entero de 1 a 9 o alta/normal/baja")
+
+        trabajo = TrabajoFondo(
+            tipo=tipo, parametros=parametros or {}, prioridad=prioridad,
+            max_intentos=max_intentos, creado_por_id=creado_por_id,
+            proximo_intento=datetime.utcnow()
+        )
+        db.session.add(trabajo)
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+        logger.info(f"📥 Trabajo {trabajo.id} ({tipo}) encolado con prioridad {prioridad}")
+        return trabajo
+
+    @staticmethod
+    def reclamar(propietario, ahora=None):
+        """Toma el trabajo listo más urgente (o uno abandonado); devuelve su id o None"""
+        from app import db
+        from app.models import TrabajoFondo
+
+        ahora = ahora or datetime.utcnow()
+        abandonado = and_(TrabajoFondo.estado == 'Ejecutando', TrabajoFondo.tomada_hasta < ahora)
+
+        # Abandonados sin intentos restantes: dead letter
+        db.session.execute(update(TrabajoFondo).where(
+            abandonado, TrabajoFondo.intentos >= TrabajoFondo.max_intentos
+        ).values(
+            estado='Fallido', tomada_hasta=None, fecha_fin=ahora,
+            ultimo_error='El worker que lo ejecutaba dejó de responder'
+        ).execution_options(synchronize_session=False))
+
+        disponible = or_(
+            and_(TrabajoFondo.estado == 'Pendiente', TrabajoFondo.proximo_intento <= ahora),
+            abandonado
+        )
+        trabajo_id = db.session.execute(
+            db.select(TrabajoFondo.id).where(disponible)
+            .order_by(TrabajoFondo.prioridad, TrabajoFondo.proximo_intento, TrabajoFondo.id).limit(1)
+        ).scalar()
+        if trabajo_id is None:
+            db.session.commit()
+            return None
+
+        tomado = db.session.execute(
+            update(TrabajoFondo).where(TrabajoFondo.id == trabajo_id, disponible).values(
+                estado='Ejecutando', tomado_por=propietario, intentos=TrabajoFondo.intentos + 1,
+                tomada_hasta=ahora + timedelta(seconds=EjecutorTrabajos.RESERVA_SEGUNDOS),
+                fecha_inicio=db.func.coalesce(TrabajoFondo.fecha_inicio, ahora)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return trabajo_id if tomado else None
+
+    @staticmethod
+    def backoff(intentos):
+        """Segundos hasta el siguiente intento (exponencial con jitter de ±10%)"""
+        base = min(EjecutorTrabajos.BACKOFF_BASE * 2 ** (intentos - 1), EjecutorTrabajos.MAX_BACKOFF)
+        return base * random.uniform(0.9, 1.1)
+
+    @staticmethod
+    def _guardar_archivo(trabajo_id, archivo):
+        directorio = os.path.abspath(os.path.join(EjecutorTrabajos.DIRECTORIO, str(trabajo_id)))
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, secure_filename(archivo.nombre) or 'resultado')
+        with open(ruta, 'wb') as salida:
+            salida.write(archivo.contenido)
+        return ruta
+
+    @staticmethod
+    def ejecutar(trabajo_id, propietario):
+        """
+        Ejecuta un trabajo ya reclamado y guarda su resultado
+
+        Returns:
+            Estado final: 'Completado', 'Pendiente' (reintento), 'Fallido' o
+            None si el trabajo se canceló o se perdió la reserva
+        """
+        from app import db
+        from app.models import TrabajoFondo
+
+        trabajo = db.session.get(TrabajoFondo, trabajo_id)
+        if not trabajo or trabajo.estado != 'Ejecutando' or trabajo.tomado_por != propietario:
+            db.session.rollback()
+            return None
+        tipo, parametros, intentos, max_intentos = (
+            trabajo.tipo, dict(trabajo.parametros or {}), trabajo.intentos, trabajo.max_intentos
+        )
+        # No retener una transacción abierta mientras corre el manejador
+        db.session.commit()
+
+        es_nuestro = and_(
+            TrabajoFondo.id == trabajo_id, TrabajoFondo.estado == 'Ejecutando',
+            TrabajoFondo.tomado_por == propietario
+        )
+        valores = {'tomada_hasta': None}
+        registrado = EjecutorTrabajos.manejadores().get(tipo)
+        try:
+            if not registrado:
+                raise ErrorTrabajo(f"Tipo de trabajo desconocido: {tipo}", reintentar=False)
+            latido = threading.Event()
+            hilo_latido = threading.Thread(
+                target=EjecutorTrabajos._latido, args=(db.engine, trabajo_id, propietario, latido),
+                name=f'latido-trabajo-{trabajo_id}', daemon=True
+            )
+            hilo_latido.start()
+            try:
+                salida = registrado[0](parametros)
+            finally:
+                latido.set()
+                hilo_latido.join()
+            # El manejador puede haber dejado cambios sin confirmar o una transacción fallida
+            db.session.rollback()
+
+            if isinstance(salida, ArchivoResultado):
+                valores.update(
+                    resultado=salida.resultado,
+                    archivo_resultado=EjecutorTrabajos._guardar_archivo(trabajo_id, salida),
+                    nombre_archivo=salida.nombre, tipo_contenido=salida.tipo_contenido
+                )
+            else:
+                valores['resultado'] = salida
+            valores.update(estado='Completado', fecha_fin=datetime.utcnow(), ultimo_error=None)
+        except Exception as e:
+            db.session.rollback()
+            error = str(e) if isinstance(e, ErrorTrabajo) else f'{type(e).__name__}: {str(e)}'
+            reintentar = getattr(e, 'reintentar', True) and intentos < max_intentos
+            if reintentar:
+                espera = EjecutorTrabajos.backoff(intentos)
+                logger.warning(f"⚠️ Trabajo {trabajo_id} ({tipo}) falló (intento {intentos}), reintento en {espera:.0f}s: {error}")
+                valores.update(estado='Pendiente', proximo_intento=datetime.utcnow() + timedelta(seconds=espera))
+            else:
+                logger.error(f"❌ Trabajo {trabajo_id} ({tipo}) Fallido tras {intentos} intentos: {error}")
+                valores.update(estado='Fallido', fecha_fin=datetime.utcnow())
+            valores['ultimo_error'] = error[:2000]
+
+        guardado = db.session.execute(
+            update(TrabajoFondo).where(es_nuestro).values(**valores)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if not guardado:
+            # Cancelado o retomado por otro worker mientras corría
+            if valores.get('archivo_resultado'):
+                os.remove(valores['archivo_resultado'])
+            return None
+        if valores['estado'] == 'Completado':
+            logger.info(f"✅ Trabajo {trabajo_id} ({tipo}) completado")
+        return valores['estado']
+
+    @staticmethod
+    def _latido(engine, trabajo_id, propietario, detener):
+        """
+        Renueva la reserva de un trabajo mientras su manejador corre
+
+        Usa su propia conexión (la sesión es del hilo del manejador). Termina
+        cuando se activa `detener` o cuando el trabajo dejó de ser nuestro
+        (cancelado o retomado por otro worker).
+        """
+        from app.models import TrabajoFondo
+
+        while not detener.wait(EjecutorTrabajos.LATIDO_SEGUNDOS):
+            try:
+                with engine.begin() as conexion:
+                    renovado = conexion.execute(update(TrabajoFondo).where(
+                        TrabajoFondo.id == trabajo_id, TrabajoFondo.estado == 'Ejecutando',
+                        TrabajoFondo.tomado_por == propietario
+                    ).values(
+                        tomada_hasta=datetime.utcnow() + timedelta(seconds=EjecutorTrabajos.RESERVA_SEGUNDOS)
+                    )).rowcount
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo renovar la reserva del trabajo {trabajo_id}: {str(e)}")
+                continue
+            if not renovado:
+                return
+
+    # ============== CONSULTA ==============
+
+    @staticmethod
+    def cancelar(trabajo_id):
+        """Cancela un trabajo Pendiente o Ejecutando; devuelve True si cambió"""
+        from app import db
+        from app.models import TrabajoFondo
+
+        cambiados = db.session.execute(
+            update(TrabajoFondo).where(
+                TrabajoFondo.id == trabajo_id, TrabajoFondo.estado.in_(['Pendiente', 'Ejecutando'])
+            ).values(estado='Cancelado', tomada_hasta=None, fecha_fin=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return bool(cambiados)
+
+    @staticmethod
+    def estado(trabajo):
+        """Representación JSON de un trabajo para /jobs/<id>"""
+        from flask import url_for
+
+        datos = {
+            'id': trabajo.id,
+            'tipo': trabajo.tipo,
+            'estado': trabajo.estado,
+            'prioridad': trabajo.prioridad,
+            'intentos': trabajo.intentos,
+            'max_intentos': trabajo.max_intentos,
+            'resultado': trabajo.resultado,
+            'ultimo_error': trabajo.ultimo_error,
+            'url_estado': url_for('trabajos.estado', id=trabajo.id),
+            'url_descarga': None,
+            'proximo_intento': trabajo.proximo_intento.isoformat() if trabajo.estado == 'Pendiente' else None,
+            'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+            'fecha_inicio': trabajo.fecha_inicio.isoformat() if trabajo.fecha_inicio else None,
+            'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+        }
+        if trabajo.estado == 'Completado' and trabajo.archivo_resultado:
+            datos['url_descarga'] = url_for('trabajos.descargar', id=trabajo.id)
+            datos['nombre_archivo'] = trabajo.nombre_archivo
+        return datos
+
+    @staticmethod
+    def resumen():
+        """Cantidad de trabajos por tipo y estado"""
+        from app import db
+        from app.models import TrabajoFondo
+
+        filas = db.session.query(TrabajoFondo.tipo, TrabajoFondo.estado, db.func.count(TrabajoFondo.id)) \
+            .group_by(TrabajoFondo.tipo, TrabajoFondo.estado).all()
+        resumen = {}
+        for tipo, estado, cantidad in filas:
+            resumen.setdefault(tipo, {})[estado] = cantidad
+        return resumen
+
+    @staticmethod
+    def purgar(dias=None):
+        """Elimina los trabajos terminados hace más de `dias` días y sus archivos"""
+        from app import db
+        from app.models import TrabajoFondo
+
+        limite = datetime.utcnow() - timedelta(days=dias or EjecutorTrabajos.DIAS_RETENCION)
+        terminados = and_(
+            TrabajoFondo.estado.in_(['Completado', 'Fallido', 'Cancelado']),
+            TrabajoFondo.fecha_fin < limite
+        )
+        viejos = db.session.execute(
+            db.select(TrabajoFondo.id, TrabajoFondo.archivo_resultado).where(terminados)
+        ).all()
+        if not viejos:
+            return 0
+        for fila in viejos:
+            if fila.archivo_resultado:
+                shutil.rmtree(os.path.dirname(fila.archivo_resultado), ignore_errors=True)
+        db.session.execute(db.delete(TrabajoFondo).where(TrabajoFondo.id.in_([f.id for f in viejos])))
+        db.session.commit()
+        logger.info(f"🧹 {len(viejos)} trabajos en segundo plano purgados")
+        return len(viejos)
+
+
+ejecutor_trabajos = EjecutorTrabajos()
+manejador = EjecutorTrabajos.manejador
@@ -0,0 +1,77 @@
+# app/tasks/worker.py
+"""
+Proceso sst-worker: dueño de todas las tareas periódicas
+
+Se pueden levantar varios (uno por nodo); solo el que tiene el bloqueo de
+líder (app/tasks/lider.py) ejecuta el scheduler y el temporizador. Los demás
+quedan en espera y toman el relevo si el líder cae.
+
+El despachador del outbox de notificaciones, la ingesta de reportes, el
+ejecutor de reanálisis IA y el de trabajos en segundo plano corren en todos
+los workers: cada fila o trabajo se reclama con un UPDATE condicional, así
+que no necesitan liderazgo.
+"""
+
+from app.tasks.lider import BloqueoLider
+import logging
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def ejecutar_worker(app, intervalo=BloqueoLider.RENOVACION_SEGUNDOS, detener=None):
+    """
+    Bucle principal del worker: adquiere/renueva el bloqueo y arranca o pausa
+    las tareas según se gane o pierda el liderazgo
+
+    Args:
+        app: aplicación Flask
+        intervalo: segundos entre renovaciones del bloqueo
+        detener: threading.Event para terminar el bucle (por defecto SIGTERM/SIGINT)
+    """
+    from app.tasks.scheduler import iniciar_scheduler, detener_scheduler
+    from app.tasks.despachador_notificaciones import despachador_notificaciones
+    from app.tasks.reanalisis_ia import ejecutor_reanalisis
+    from app.tasks.trabajos import ejecutor_trabajos
+    from app.tasks.ingesta_reportes import pipeline_ingesta
+    from app.tasks.extraccion_documentos import extraccion_documentos
+
+    if detener is None:
+        detener = threading.Event()
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(senal, lambda *_: detener.set())
+
+    bloqueo = BloqueoLider(app)
+    lider = False
+    logger.info(f"🛠️ sst-worker iniciado ({bloqueo.propietario})")
+
+    try:
+        despachador_notificaciones.iniciar(app)
+        ejecutor_reanalisis.iniciar(app)
+        ejecutor_trabajos.iniciar(app)
+        pipeline_ingesta.iniciar(app)
+
+        while not detener.is_set():
+            tiene_bloqueo = bloqueo.adquirir()
+
+            if tiene_bloqueo and not lider:
+                iniciar_scheduler(app)
+                lider = True
+                logger.info("👑 sst-worker es líder: tareas periódicas activas")
+            elif not tiene_bloqueo and lider:
+                detener_scheduler()
+                lider = False
+                logger.warning("⚠️ sst-worker perdió el liderazgo: tareas periódicas en pausa")
+
+            detener.wait(intervalo)
+    finally:
+        despachador_notificaciones.detener()
+        ejecutor_reanalisis.detener()
+        ejecutor_trabajos.detener()
+        pipeline_ingesta.detener()
+        extraccion_documentos.cerrar()
+        if lider:
+            detener_scheduler()
+        bloqueo.liberar()
+        logger.info("🛑 sst-worker detenido")
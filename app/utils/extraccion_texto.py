@@ -0,0 +1,147 @@
+# app/utils/extraccion_texto.py
+"""
+Extracción de texto plano de archivos PDF, DOCX y XLSX
+
+No importa la aplicación: corre en los procesos del pool de extracción
+(app/tasks/extraccion_documentos.py), que arrancan con 'spawn'.
+- DOCX: se lee word/document.xml del zip con iterparse (sin python-docx)
+- XLSX: openpyxl en modo solo lectura, celda por celda
+- PDF: pypdf si está instalado; si no, el documento queda con error
+
+El texto se corta en MAX_CARACTERES para no guardar volcados gigantes.
+"""
+
+import time
+import zipfile
+from xml.etree import ElementTree
+
+# Subirla invalida la caché de textos extraídos (TextoExtraido.version)
+VERSION = 1
+
+FORMATOS = ('pdf', 'docx', 'xlsx')
+MAX_CARACTERES = 2_000_000
+
+# Un document.xml más grande que esto se trata como archivo dañado (o bomba zip)
+MAX_XML_BYTES = 64 * 1024 * 1024
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class _Acumulador:
+    """Partes de texto hasta MAX_CARACTERES"""
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.partes = []
+        self.caracteres = 0
+        self.truncado = False
+
+    def agregar(self, texto):
+        """False cuando ya no cabe más texto"""
+        if self.truncado:
+            return False
+        if self.caracteres + len(texto) > self.maximo:
+            texto = texto[:self.maximo - self.caracteres]
+            self.truncado = True
+        self.partes.append(texto)
+        self.caracteres += len(texto)
+        return not self.truncado
+
+    def texto(self):
+        return '\n'.join(self.partes).strip()
+
+
+def detectar_formato(cabecera, nombre_archivo):
+    """'pdf', 'docx', 'xlsx' o None; la firma manda y la extensión separa DOCX de XLSX"""
+    extension = nombre_archivo.rsplit('.', 1)[-1].lower() if '.' in (nombre_archivo or '') else ''
+    if cabecera[:5] == b'%PDF-':
+        return 'pdf'
+    if cabecera[:4] == b'PK\x03\x04' and extension in ('docx', 'xlsx'):
+        return extension
+    return None
+
+
+def _texto_docx(ruta, acumulador):
+    with zipfile.ZipFile(ruta) as archivo:
+        info = archivo.getinfo('word/document.xml')
+        if info.file_size > MAX_XML_BYTES:
+            raise ValueError(f'document.xml demasiado grande ({info.file_size} bytes)')
+        with archivo.open(info) as xml:
+            parrafo = []
+            for evento, elemento in ElementTree.iterparse(xml, events=('end',)):
+                etiqueta = elemento.tag
+                if etiqueta == f'{_W}t':
+                    parrafo.append(elemento.text or '')
+                elif etiqueta == f'{_W}tab':
+                    parrafo.append('\t')
+                elif etiqueta in (f'{_W}br', f'{_W}cr'):
+                    parrafo.append('\n')
+                elif etiqueta == f'{_W}p':
+                    texto = ''.join(parrafo).strip()
+                    parrafo = []
+                    elemento.clear()
+                    if texto and not acumulador.agregar(texto):
+                        break
+    return None
+
+
+def _texto_xlsx(ruta, acumulador):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        for hoja in libro.worksheets:
+            if not acumulador.agregar(f'# {hoja.title}'):
+                break
+            for fila in hoja.iter_rows(values_only=True):
+                celdas = [str(valor).strip() for valor in fila if valor is not None and str(valor).strip()]
+                if celdas and not acumulador.agregar('\t'.join(celdas)):
+                    return len(libro.worksheets)
+        return len(libro.worksheets)
+    finally:
+        libro.close()
+
+
+def _texto_pdf(ruta, acumulador):
+    from pypdf import PdfReader
+
+    lector = PdfReader(ruta)
+    for pagina in lector.pages:
+        texto = (pagina.extract_text() or '').strip()
+        if texto and not acumulador.agregar(texto):
+            break
+    return len(lector.pages)
+
+
+_EXTRACTORES = {'pdf': _texto_pdf, 'docx': _texto_docx, 'xlsx': _texto_xlsx}
+
+
+def extraer(ruta, formato, max_caracteres=MAX_CARACTERES):
+    """
+    Texto de un archivo
+
+    Returns:
+        {'texto', 'paginas', 'caracteres', 'truncado', 'error', 'duracion_ms'};
+        con error, texto es None
+    """
+    inicio = time.perf_counter()
+    acumulador = _Acumulador(max_caracteres)
+    paginas, error = None, None
+    try:
+        paginas = _EXTRACTORES[formato](ruta, acumulador)
+    except ImportError as e:
+        error = f'Falta la librería para leer {formato.upper()}: {e.name or str(e)}'
+    except KeyError as e:
+        error = f'Formato no soportado o archivo incompleto: {str(e)}'
+    except Exception as e:
+        error = f'{type(e).__name__}: {str(e)}'[:1000]
+
+    texto = None if error else acumulador.texto()
+    return {
+        'texto': texto,
+        'paginas': paginas,
+        'caracteres': len(texto) if texto else 0,
+        'truncado': acumulador.truncado,
+        'error': error,
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 2),
+    }
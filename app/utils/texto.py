@@ -0,0 +1,27 @@
+# app/utils/texto.py
+"""Normalización de texto en español para claves de caché e índices de búsqueda"""
+
+import re
+import unicodedata
+
+# Sin "no", "sin", "ni": cambian el sentido de una pregunta
+PALABRAS_VACIAS = frozenset("""
+a al algo ante como con cual cuales cuando de del donde el ella ellas ellos en entre era es esa ese eso esta
+este esto estos estas fue ha hay la las le les lo los me mi mis muy nos o para pero por que quien se segun ser
+si sobre son su sus te tiene tu un una unas uno unos y ya yo dice dicen favor puedes podria explica explicame
+""".split())
+
+# Para la clave de caché del chat: "¿Cómo...?" y "¿Cuándo...?" piden cosas distintas
+INTERROGATIVOS = frozenset('como cual cuales cuando donde que quien'.split())
+PALABRAS_VACIAS_PREGUNTA = PALABRAS_VACIAS - INTERROGATIVOS
+
+
+def sin_tildes(texto):
+    """Minúsculas y sin tildes ni diéresis (la ñ pasa a n)"""
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto, vacias=PALABRAS_VACIAS):
+    """Palabras y números del texto, sin tildes ni palabras vacías (`vacias`)"""
+    return [p for p in re.findall(r'[a-z0-9]+', sin_tildes(texto)) if p not in vacias]
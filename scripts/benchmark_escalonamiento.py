@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del escalamiento masivo de gestiones vencidas
+Compara ejecutar_accion (una acción por transacción) con ejecutar_vencidas
+(lotes de EscalonamientoService.TAMANO_LOTE) sobre una base SQLite temporal.
+
+Las notificaciones quedan desactivadas en las acciones generadas: el
+benchmark mide el trabajo en base de datos, no a SendGrid.
+
+Uso: python scripts/benchmark_escalonamiento.py [--filas 10000 100000] [--por-fila-max 10000]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def preparar_datos(db, filas):
+    """Crea usuarios, reportes, gestiones y una acción vencida por gestión"""
+    from sqlalchemy import insert
+    from app.models import (
+        Usuario, CondicionInsegura, GestionReporte, GestorResponsabilidades,
+        AccionProgramada, TareaGestion
+    )
+
+    db.drop_all()
+    db.create_all()
+
+    for rol in ('Gestor_RRHH', 'Gerente', 'Admin'):
+        usuario = Usuario(email=f'{rol.lower()}@bench.local', nombre_completo=rol, rol=rol, activo=True)
+        usuario.set_password('bench')
+        db.session.add(usuario)
+    config = GestorResponsabilidades(rol_principal='Gestor_RRHH', rol_backup_1='Gerente', rol_backup_2='Admin')
+    db.session.add(config)
+    db.session.commit()
+
+    gestor_id = Usuario.query.filter_by(rol='Gestor_RRHH').first().id
+    vencida = datetime.utcnow() - timedelta(hours=1)
+
+    db.session.execute(insert(CondicionInsegura), [
+        {'id': i, 'numero_reporte': f'REP-BENCH-{i:06d}', 'titulo': f'Reporte {i}', 'descripcion': 'Benchmark'}
+        for i in range(1, filas + 1)
+    ])
+    db.session.execute(insert(GestionReporte), [
+        {'id': i, 'reporte_id': i, 'gestor_actual_id': gestor_id, 'rol_gestor': 'Gestor_RRHH',
+         'gestor_responsabilidad_id': config.id, 'estado': 'Asignado', 'numero_escalamiento': 0,
+         'activo': True, 'fecha_asignacion': vencida - timedelta(hours=1)}
+        for i in range(1, filas + 1)
+    ])
+    db.session.execute(insert(AccionProgramada), [
+        {'gestion_reporte_id': i, 'tipo': 'ESCALONAMIENTO', 'numero_paso': 1, 'estado': 'Pendiente',
+         'crear_tarea': True, 'enviar_notificacion': False, 'next_action_at': vencida}
+        for i in range(1, filas + 1)
+    ])
+    db.session.commit()
+    return TareaGestion
+
+
+def medir(app, db, filas, modo):
+    from app.services.escalonamiento_service import EscalonamientoService
+
+    with app.app_context():
+        TareaGestion = preparar_datos(db, filas)
+        db.session.remove()
+
+        inicio = time.perf_counter()
+        if modo == 'por_fila':
+            ids = [accion_id for accion_id, _ in EscalonamientoService.proximas_pendientes(datetime.utcnow(), filas)]
+            escaladas = sum(1 for accion_id in ids if EscalonamientoService.ejecutar_accion(accion_id))
+        else:
+            escaladas = EscalonamientoService.ejecutar_vencidas()
+        segundos = time.perf_counter() - inicio
+
+        tareas = TareaGestion.query.count()
+        db.session.remove()
+
+    print(f"  {modo:<9} {filas:>8} filas  {segundos:>8.2f} s  {filas / segundos:>9.0f} filas/s  "
+          f"(escaladas: {escaladas}, tareas: {tareas})", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escalamiento masivo')
+    parser.add_argument('--filas', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--por-fila-max', type=int, default=10000,
+                        help='Tamaño máximo para medir el modo por fila (es lento)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    directorio = tempfile.mkdtemp(prefix='sst-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+
+    from app import create_app, db
+    from app.tasks.temporizador import temporizador
+
+    app = create_app('production')
+    # El benchmark ejecuta las acciones a mano
+    temporizador.detener()
+
+    print("⏱️  Benchmark de escalamiento de gestiones vencidas")
+    print("=" * 70)
+    for filas in args.filas:
+        if filas <= args.por_fila_max:
+            medir(app, db, filas, 'por_fila')
+        medir(app, db, filas, 'lote')
+    print("=" * 70)
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de la extracción de texto de documentos legales
+Genera un corpus sintético de DOCX y XLSX (y PDF si pypdf y reportlab
+están instalados), con una parte de archivos repetidos como cuando se carga
+la misma norma en varias consultas, y mide ExtraccionDocumentos.procesar_pendientes:
+  - en frío con 1 proceso y con --procesos procesos
+  - en caliente: los documentos vuelven a quedar Pendientes y el texto sale
+    de textos_extraidos por hash_documento, sin abrir los archivos
+
+Uso: python scripts/benchmark_extraccion_documentos.py [--documentos 2000] [--procesos 4] [--repetidos 0.2]
+"""
+
+import sys
+import os
+import argparse
+import io
+import logging
+import random
+import shutil
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PALABRAS = ('empleador trabajador riesgo alturas resolución decreto sistema gestión seguridad salud '
+            'trabajo comité capacitación inspección elementos protección personal accidente incidente '
+            'investigación reporte vigilancia epidemiológica matriz peligros controles auditoría').split()
+
+
+def parrafo(azar, palabras=40):
+    return ' '.join(azar.choice(PALABRAS) for _ in range(palabras)).capitalize() + '.'
+
+
+def docx_sintetico(azar, parrafos):
+    """DOCX mínimo válido (solo document.xml) con `parrafos` párrafos"""
+    cuerpo = ''.join(f'<w:p><w:r><w:t>Artículo {i}. {parrafo(azar)}</w:t></w:r></w:p>' for i in range(parrafos))
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED) as archivo:
+        archivo.writestr('[Content_Types].xml', '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+        archivo.writestr('word/document.xml', '<?xml version="1.0" encoding="UTF-8"?>'
+                         '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                         f'<w:body>{cuerpo}</w:body></w:document>')
+    return salida.getvalue()
+
+
+def xlsx_sintetico(azar, filas):
+    """Matriz de peligros de `filas` filas"""
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Matriz')
+    hoja.append(['Proceso', 'Peligro', 'Control', 'Responsable', 'Nivel'])
+    for i in range(filas):
+        hoja.append([f'Proceso {i}', parrafo(azar, 6), parrafo(azar, 10), azar.choice(PALABRAS), azar.randint(1, 5)])
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+
+def pdf_sintetico(azar, paginas):
+    from reportlab.pdfgen import canvas
+
+    salida = io.BytesIO()
+    lienzo = canvas.Canvas(salida)
+    for _ in range(paginas):
+        for linea in range(40):
+            lienzo.drawString(40, 800 - linea * 18, parrafo(azar, 12))
+        lienzo.showPage()
+    lienzo.save()
+    return salida.getvalue()
+
+
+def generar_corpus(db, documentos, repetidos, semilla=7):
+    """Carga los documentos como lo hace juridico.cargar_documento; devuelve (bytes únicos, formatos)"""
+    from werkzeug.datastructures import FileStorage
+    from app.models import ConsultaJuridica, DocumentoLegal
+    from app.tasks.extraccion_documentos import ExtraccionDocumentos
+
+    azar = random.Random(semilla)
+    generadores = [('docx', lambda: docx_sintetico(azar, azar.randint(50, 400)))] * 7
+    generadores += [('xlsx', lambda: xlsx_sintetico(azar, azar.randint(50, 300)))] * 3
+    try:
+        import pypdf  # noqa: F401
+        import reportlab  # noqa: F401
+        generadores += [('pdf', lambda: pdf_sintetico(azar, azar.randint(2, 10)))] * 2
+    except ImportError:
+        pass
+
+    consulta = ConsultaJuridica(numero_consulta='CONS-BENCH', titulo='Benchmark', descripcion='Corpus sintético')
+    db.session.add(consulta)
+    db.session.flush()
+
+    guardados, formatos, total_bytes = [], {}, 0
+    for i in range(documentos):
+        if guardados and azar.random() < repetidos:
+            guardado = azar.choice(guardados)
+        else:
+            formato, generar = azar.choice(generadores)
+            guardado = ExtraccionDocumentos.guardar_archivo(
+                FileStorage(io.BytesIO(generar()), filename=f'documento_{i}.{formato}'))
+            guardados.append(guardado)
+            formatos[formato] = formatos.get(formato, 0) + 1
+            total_bytes += guardado.tamano
+        db.session.add(DocumentoLegal(
+            consulta_id=consulta.id, nombre=f'Documento {i}', tipo='Otro', ruta_archivo=guardado.ruta,
+            hash_documento=guardado.hash_documento, tamano_bytes=guardado.tamano, estado_extraccion='Pendiente'))
+    db.session.commit()
+    return total_bytes, formatos
+
+
+def reiniciar(db, vaciar_cache):
+    from app.models import DocumentoLegal, TextoExtraido
+
+    db.session.query(DocumentoLegal).update(
+        {'estado_extraccion': 'Pendiente', 'texto_extraido': None, 'fecha_extraccion': None},
+        synchronize_session=False)
+    if vaciar_cache:
+        db.session.query(TextoExtraido).delete()
+    db.session.commit()
+
+
+def medir(db, nombre, procesos, documentos, total_bytes, vaciar_cache=True):
+    from app.tasks.extraccion_documentos import ExtraccionDocumentos
+
+    reiniciar(db, vaciar_cache)
+    extractor = ExtraccionDocumentos(procesos=procesos)
+    inicio = time.perf_counter()
+    try:
+        resumen = extractor.procesar_pendientes()
+    finally:
+        extractor.cerrar()
+    duracion = time.perf_counter() - inicio
+    print(f"  {nombre:<28} {duracion:>7.2f} s  {documentos / duracion:>8.0f} docs/s  "
+          f"{total_bytes / 1e6 / duracion:>7.1f} MB/s  (archivos leídos: {resumen['archivos']}, "
+          f"de caché: {resumen['desde_cache']}, fallidos: {resumen['fallidos']})", flush=True)
+    return duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de extracción de texto de documentos legales')
+    parser.add_argument('--documentos', type=int, default=2000)
+    parser.add_argument('--procesos', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--repetidos', type=float, default=0.2, help='Fracción de cargas de un archivo ya cargado')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    directorio = tempfile.mkdtemp(prefix='sst-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+    os.environ['SST_DIR_JURIDICO'] = os.path.join(directorio, 'juridico')
+
+    from app import create_app, db
+    from app.tasks.temporizador import temporizador
+
+    app = create_app('production')
+    temporizador.detener()
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        total_bytes, formatos = generar_corpus(db, args.documentos, args.repetidos)
+        print(f"⏱️  Benchmark de extracción de texto ({args.documentos} documentos, "
+              f"{sum(formatos.values())} archivos distintos: "
+              f"{', '.join(f'{n} {f.upper()}' for f, n in sorted(formatos.items()))}; "
+              f"{total_bytes / 1e6:.1f} MB; corpus generado en {time.perf_counter() - inicio:.1f} s)")
+        if 'pdf' not in formatos:
+            print("  (sin PDF: pypdf o reportlab no están instalados)")
+        print("=" * 70)
+        secuencial = medir(db, 'frío, 1 proceso', 1, args.documentos, total_bytes)
+        if args.procesos > 1:
+            paralelo = medir(db, f'frío, {args.procesos} procesos', args.procesos, args.documentos, total_bytes)
+            print(f"  {'aceleración':<28} {secuencial / paralelo:>7.2f} x")
+        medir(db, 'caliente (caché por hash)', args.procesos, args.documentos, total_bytes, vaciar_cache=False)
+        print("=" * 70)
+
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del índice BM25 de normativa (app/services/indice_normativa.py)
+Construye el índice con --documentos documentos sintéticos de --palabras
+palabras (vocabulario SST con números de norma) y mide:
+  - construcción completa
+  - búsqueda: latencia p50 / p95 de --consultas preguntas
+  - actualización incremental de un documento (lo que hace after_commit)
+No necesita base de datos: los documentos se pasan a construir().
+
+Uso: python scripts/benchmark_indice_normativa.py [--documentos 5000] [--palabras 300] [--consultas 2000]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import random
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VOCABULARIO = (
+    'trabajo seguro alturas espacios confinados riesgo químico eléctrico locativo biomecánico psicosocial '
+    'empleador trabajador contratista copasst vigía brigada emergencia evacuación investigación incidente '
+    'accidente enfermedad laboral arl reporte furat estándares mínimos autoevaluación plan mejoramiento '
+    'matriz peligros controles ingeniería administrativos epp capacitación inducción reinducción auditoría '
+    'revisión dirección indicadores frecuencia severidad ausentismo exámenes médicos ocupacionales sanción '
+    'multa inspección ministerio artículo parágrafo numeral obligación responsabilidad vigilancia'
+).split()
+
+
+def documentos_sinteticos(cantidad, palabras, aleatorio):
+    normas = [f'Resolución {n:04d} de {2000 + n % 25}' for n in range(1, 400)]
+    for i in range(cantidad):
+        norma = aleatorio.choice(normas)
+        cuerpo = ' '.join(aleatorio.choice(VOCABULARIO) for _ in range(palabras))
+        yield ('documento', i), f'{norma} - documento {i}', f'{norma}. Artículo {i % 90 + 1}.\n{cuerpo}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del índice de normativa')
+    parser.add_argument('--documentos', type=int, default=5000)
+    parser.add_argument('--palabras', type=int, default=300)
+    parser.add_argument('--consultas', type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    from app.services.indice_normativa import IndiceNormativa
+
+    aleatorio = random.Random(42)
+    documentos = list(documentos_sinteticos(args.documentos, args.palabras, aleatorio))
+    indice = IndiceNormativa()
+
+    inicio = time.perf_counter()
+    indice.construir(documentos)
+    construccion = time.perf_counter() - inicio
+    estadisticas = indice.estadisticas()
+
+    preguntas = [
+        f'¿Qué dice la Resolución {aleatorio.randint(1, 399):04d} sobre '
+        f'{aleatorio.choice(VOCABULARIO)} y {aleatorio.choice(VOCABULARIO)}?'
+        for _ in range(args.consultas)
+    ]
+    latencias = []
+    for pregunta in preguntas:
+        inicio = time.perf_counter()
+        indice.buscar(pregunta, k=4)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+
+    actualizaciones = []
+    for clave, titulo, texto in documentos[:200]:
+        inicio = time.perf_counter()
+        indice.actualizar(clave, titulo, texto + ' modificado')
+        actualizaciones.append(time.perf_counter() - inicio)
+
+    print("⏱️  Índice BM25 de normativa")
+    print("=" * 70)
+    print(f"  Documentos / palabras:    {args.documentos:>10} / {args.palabras}")
+    print(f"  Pasajes / términos:       {estadisticas['pasajes']:>10} / {estadisticas['terminos']}")
+    print(f"  Construcción:             {construccion:>10.2f} s "
+          f"({args.documentos / construccion:.0f} documentos/s)")
+    print(f"  Búsqueda p50 / p95:       {statistics.median(latencias) * 1000:>10.2f} / "
+          f"{latencias[int(len(latencias) * 0.95) - 1] * 1000:.2f} ms")
+    print(f"  Actualización (1 doc):    {statistics.median(actualizaciones) * 1000:>10.2f} ms")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
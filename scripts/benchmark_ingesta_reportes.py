@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de una ráfaga de reportes (incidente en planta)
+Compara lo que hace la petición de reportes.nuevo:
+- en_linea: guarda el reporte y asigna en la misma petición (asignar_reporte)
+- cola: guarda el reporte y su fila de ingesta; la etapa de ingesta asigna
+  después en lotes de PipelineIngesta.TAMANO_LOTE
+
+Mide la latencia de la petición (p50/p95/máx) con --hilos usuarios
+simultáneos y, en modo cola, el tiempo hasta que todos quedan asignados.
+Usa una base SQLite temporal; los correos quedan en el outbox sin enviarse.
+
+Uso: python scripts/benchmark_ingesta_reportes.py [--reportes 200 1000] [--hilos 8]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def preparar_datos(db):
+    """Gestores, regla de responsabilidad y regla de escalamiento con un paso"""
+    from app.models import Usuario, GestorResponsabilidades, ReglasEscalonamiento, PasoEscalonamiento
+    from app.services.asignacion_service import indice_gestores
+    from app.services.responsabilidades_service import tabla_responsabilidades
+
+    db.drop_all()
+    db.create_all()
+
+    for i, rol in enumerate(['Gestor_RRHH'] * 5 + ['Gerente', 'Admin', 'Empleado']):
+        usuario = Usuario(email=f'usuario{i}@bench.local', nombre_completo=f'{rol} {i}', rol=rol, activo=True)
+        usuario.set_password('bench')
+        db.session.add(usuario)
+    db.session.add(GestorResponsabilidades(rol_principal='Gestor_RRHH', rol_backup_1='Gerente',
+                                           notificar_roles=['Gerente'], activo=True))
+    regla = ReglasEscalonamiento(nombre='General', activo=True)
+    db.session.add(regla)
+    db.session.flush()
+    db.session.add(PasoEscalonamiento(regla_id=regla.id, numero_paso=1, rol_destino='Gerente', minutos_delay=30))
+    db.session.commit()
+    tabla_responsabilidades.invalidar()
+    indice_gestores.invalidar()
+    return Usuario.query.filter_by(rol='Empleado').first().id
+
+
+def peticion(db, modo, numero, empleado_id):
+    """Lo que hace reportes.nuevo con el reporte ya armado"""
+    from app.models import CondicionInsegura
+    from app.services.gestion_reportes_service import GestionReportesService
+    from app.tasks.ingesta_reportes import PipelineIngesta
+
+    reporte = CondicionInsegura(numero_reporte=f'REP-BURST-{numero:06d}', titulo=f'Reporte {numero}',
+                                descripcion='Fuga en la línea 3', empleado_reportador_id=empleado_id,
+                                estado='Reportado')
+    db.session.add(reporte)
+    if modo == 'en_linea':
+        db.session.commit()
+        GestionReportesService.asignar_reporte(reporte.id)
+    else:
+        db.session.flush()
+        PipelineIngesta.encolar(reporte.id)
+        db.session.commit()
+
+
+def medir(app, db, reportes, hilos, modo):
+    from app.models import GestionReporte
+    from app.tasks.ingesta_reportes import PipelineIngesta
+
+    with app.app_context():
+        empleado_id = preparar_datos(db)
+        db.session.remove()
+
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+    siguiente = iter(range(reportes))
+
+    def usuario():
+        with app.app_context():
+            while True:
+                with lock:
+                    numero = next(siguiente, None)
+                if numero is None:
+                    break
+                inicio = time.perf_counter()
+                try:
+                    peticion(db, modo, numero, empleado_id)
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errores.append(str(e))
+                    continue
+                with lock:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+            db.session.remove()
+
+    inicio = time.perf_counter()
+    usuarios = [threading.Thread(target=usuario) for _ in range(hilos)]
+    for hilo in usuarios:
+        hilo.start()
+    for hilo in usuarios:
+        hilo.join()
+    rafaga = time.perf_counter() - inicio
+
+    vaciado = 0.0
+    with app.app_context():
+        if modo == 'cola':
+            inicio_cola = time.perf_counter()
+            while PipelineIngesta.procesar_lote():
+                pass
+            vaciado = time.perf_counter() - inicio_cola
+        asignados = GestionReporte.query.count()
+        db.session.remove()
+
+    latencias.sort()
+    p95 = latencias[int(len(latencias) * 0.95) - 1] if latencias else 0.0
+    print(f"  {modo:<8} {reportes:>6} reportes  petición p50 {statistics.median(latencias):>7.1f} ms  "
+          f"p95 {p95:>7.1f} ms  máx {latencias[-1]:>7.1f} ms", flush=True)
+    print(f"  {'':<8} ráfaga {rafaga:>6.2f} s  asignación en cola {vaciado:>6.2f} s  "
+          f"total {rafaga + vaciado:>6.2f} s  (asignados: {asignados}, errores: {len(errores)})", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de ingesta de reportes en ráfaga')
+    parser.add_argument('--reportes', type=int, nargs='+', default=[200, 1000])
+    parser.add_argument('--hilos', type=int, default=8, help='Usuarios reportando a la vez')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    directorio = tempfile.mkdtemp(prefix='sst-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+
+    from app import create_app, db
+    from app.tasks.temporizador import temporizador
+
+    app = create_app('production')
+    temporizador.detener()
+
+    print(f"⏱️  Benchmark de ingesta de reportes en ráfaga ({args.hilos} usuarios simultáneos)")
+    print("=" * 70)
+    for reportes in args.reportes:
+        medir(app, db, reportes, args.hilos, 'en_linea')
+        medir(app, db, reportes, args.hilos, 'cola')
+    print("=" * 70)
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Prueba de carga de la pasarela de IA sin red (backend falso)
+Lanza --peticiones consultas de chat desde --hilos hilos (como workers web)
+a través de GeminiService y la pasarela, con la latencia y la tasa de
+fallos del backend falso, y muestra throughput, latencias y rechazos.
+
+Con --stream usa el chat en streaming y mide además el tiempo hasta el
+primer fragmento (lo que el usuario espera antes de ver texto).
+
+Uso: python scripts/benchmark_pasarela_ia.py [--peticiones 500] [--hilos 32]
+     [--latencia-ms 200] [--token-ms 20] [--fallos 0.0] [--concurrentes 8]
+     [--timeout 2] [--stream]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de la pasarela de IA')
+    parser.add_argument('--peticiones', type=int, default=500)
+    parser.add_argument('--hilos', type=int, default=32)
+    parser.add_argument('--latencia-ms', type=float, default=200, help='Hasta el primer fragmento')
+    parser.add_argument('--token-ms', type=float, default=20, help='Entre fragmentos (streaming)')
+    parser.add_argument('--fallos', type=float, default=0.0, help='Proporción de llamadas que fallan')
+    parser.add_argument('--concurrentes', type=int, default=8, help='SST_IA_MAX_CONCURRENTES')
+    parser.add_argument('--timeout', type=float, default=2, help='Plazo por llamada (s)')
+    parser.add_argument('--stream', action='store_true', help='Chat en streaming')
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+
+    from app.services.gemini_service import GeminiService
+    from app.services.pasarela_ia import PasarelaIA, BackendFalso, ErrorIA
+
+    pasarela = PasarelaIA(
+        backend=BackendFalso(latencia_ms=args.latencia_ms, tasa_fallos=args.fallos, token_ms=args.token_ms),
+        max_concurrentes=args.concurrentes
+    )
+    pasarela.TIMEOUT_SEG = args.timeout
+    servicio = GeminiService(pasarela=pasarela)
+
+    primeros = []
+
+    def consultar(i):
+        inicio = time.perf_counter()
+        try:
+            if args.stream:
+                for n, _ in enumerate(servicio.chat_experto_sst_stream(f'Pregunta {i}')):
+                    if n == 0:
+                        primeros.append(time.perf_counter() - inicio)
+            else:
+                servicio.chat_experto_sst(f'Pregunta {i}')
+            codigo = 'ok'
+        except ErrorIA as e:
+            codigo = e.codigo
+        return codigo, time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as ejecutor:
+        resultados = list(ejecutor.map(consultar, range(args.peticiones)))
+    total = time.perf_counter() - inicio
+
+    latencias = sorted(duracion for codigo, duracion in resultados if codigo == 'ok') or [0]
+    codigos = {}
+    for codigo, _ in resultados:
+        codigos[codigo] = codigos.get(codigo, 0) + 1
+
+    print(f"⏱️  Prueba de carga de la pasarela de IA (backend falso{', streaming' if args.stream else ''})")
+    print("=" * 70)
+    print(f"  Peticiones / hilos:       {args.peticiones:>10} / {args.hilos}")
+    print(f"  Latencia del backend:     {args.latencia_ms:>10.0f} ms  (fallos {args.fallos:.0%})")
+    print(f"  Máx. concurrentes:        {args.concurrentes:>10}")
+    print(f"  Throughput:               {len(resultados) / total:>10.1f} peticiones/s")
+    print(f"  Latencia p50 / p95:       {statistics.median(latencias) * 1000:>10.0f} / "
+          f"{latencias[int(len(latencias) * 0.95) - 1] * 1000:.0f} ms")
+    if args.stream:
+        primeros.sort()
+        primeros = primeros or [0]
+        print(f"  Primer fragmento p50/p95: {statistics.median(primeros) * 1000:>10.0f} / "
+              f"{primeros[int(len(primeros) * 0.95) - 1] * 1000:.0f} ms")
+    for codigo, cantidad in sorted(codigos.items()):
+        print(f"  {codigo + ':':<26}{cantidad:>10}")
+    print(f"  Circuito al final:        {pasarela.circuito:>10}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
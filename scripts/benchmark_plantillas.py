@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de las plantillas de correo (app/templates/emails)
+Arma N avisos de escalamiento con datos sintéticos y compara:
+  - sin caché: entorno Jinja2 sin caché de plantillas (lee y compila la
+    plantilla en cada correo, como un render_template_string por notificación)
+  - compilada: plantillas_correo.renderizar (plantilla en caché)
+  - lote: NotificacionService.contenidos_escalonamiento (renderizar_lote)
+No necesita base de datos: gestiones y reportes son objetos en memoria.
+
+Uso: python scripts/benchmark_plantillas.py [--correos 20000]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def gestiones_sinteticas(cantidad):
+    """Gestiones con su reporte y tipo, con los atributos que usan las plantillas"""
+    vencimiento = datetime.utcnow() + timedelta(hours=4)
+    return [
+        SimpleNamespace(
+            id=i,
+            numero_escalamiento=i % 4 + 1,
+            fecha_vencimiento_respuesta=vencimiento,
+            reporte=SimpleNamespace(
+                id=i,
+                numero_reporte=f'RPT-{i:06d}',
+                titulo=f'Condición insegura <zona {i % 50}>',
+                tipo_reporte_obj=SimpleNamespace(nombre='Condición Insegura')
+            )
+        )
+        for i in range(1, cantidad + 1)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de plantillas de correo')
+    parser.add_argument('--correos', type=int, default=20000)
+    parser.add_argument('--sin-cache', type=int, default=2000,
+                        help='Correos del modo sin caché (es lento)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    from app.services.notificaciones import NotificacionService
+    from app.services.plantillas_correo import PlantillasCorreo, plantillas_correo
+
+    gestiones = gestiones_sinteticas(args.correos)
+    contextos = [NotificacionService.contexto_gestion(gestion) for gestion in gestiones]
+
+    inicio = time.perf_counter()
+    compiladas = plantillas_correo.precompilar()
+    compilacion = time.perf_counter() - inicio
+
+    sin_cache = PlantillasCorreo()
+    sin_cache.entorno.cache = None  # Cada get_template lee y recompila
+    inicio = time.perf_counter()
+    for contexto in contextos[:args.sin_cache]:
+        sin_cache.renderizar('reporte_escalado.html', **contexto)
+    por_sin_cache = (time.perf_counter() - inicio) / args.sin_cache
+
+    inicio = time.perf_counter()
+    for contexto in contextos:
+        plantillas_correo.renderizar('reporte_escalado.html', **contexto)
+    por_compilada = (time.perf_counter() - inicio) / len(contextos)
+
+    inicio = time.perf_counter()
+    NotificacionService.contenidos_escalonamiento(gestiones)
+    lote = time.perf_counter() - inicio
+
+    print("⏱️  Benchmark de plantillas de correo")
+    print("=" * 70)
+    print(f"  Plantillas compiladas:    {compiladas:>10}  ({compilacion * 1000:.1f} ms)")
+    print(f"  sin caché:                {por_sin_cache * 1e6:>10.1f} µs/correo  ({args.sin_cache} correos)")
+    print(f"  compilada:                {por_compilada * 1e6:>10.1f} µs/correo  ({len(contextos)} correos)")
+    print(f"  lote (escalamientos):     {len(gestiones) / lote:>10.0f} correos/s")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del preproceso de imágenes antes del análisis con IA
+Genera fotos sintéticas como las que sube un celular (JPEG 12 MP con EXIF,
+PNG de captura de pantalla, WebP) y compara lo que se enviaba al modelo
+(la imagen original) con lo que se envía ahora (ImagenProcessor.preparar_para_ia):
+  - bytes enviados
+  - tiempo de preproceso
+  - tiempo de subida estimado con el ancho de banda dado (--mbps)
+
+Uso: python scripts/benchmark_preproceso_imagen.py [--repeticiones 5] [--mbps 10]
+"""
+
+import sys
+import os
+import argparse
+import io
+import logging
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def foto_sintetica(tamano, formato, **opciones):
+    """Degradado con ruido: se comprime como una foto, no como un color plano"""
+    from PIL import Image
+
+    degradado = Image.linear_gradient('L').resize(tamano)
+    ruido = Image.effect_noise(tamano, 30)
+    imagen = Image.merge('RGB', (degradado, ruido, degradado.rotate(90).resize(tamano)))
+    salida = io.BytesIO()
+    imagen.save(salida, formato, **opciones)
+    return salida.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del preproceso de imágenes para IA')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--mbps', type=float, default=10, help='Ancho de banda de subida hacia el modelo')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    from PIL import Image
+    from app.services.imagen_processor import ImagenProcessor
+
+    exif = Image.Exif()
+    exif[0x0110] = 'Telefono de prueba'
+    exif[0x0112] = 1
+    casos = [
+        ('JPEG 4032x3024 (celular)', foto_sintetica((4032, 3024), 'JPEG', quality=95, exif=exif)),
+        ('PNG 1920x1080 (captura)', foto_sintetica((1920, 1080), 'PNG')),
+        ('WebP 3000x2000', foto_sintetica((3000, 2000), 'WEBP', quality=90)),
+    ]
+
+    def subida_ms(cantidad):
+        return cantidad * 8 / (args.mbps * 1e6) * 1000
+
+    print("⏱️  Benchmark del preproceso de imágenes para IA")
+    print("=" * 70)
+    print(f"  Lado máximo / calidad:    {ImagenProcessor.MAX_LADO_IA} px / {ImagenProcessor.CALIDAD_JPEG_IA}")
+    print(f"  Ancho de banda:           {args.mbps:.0f} Mbps")
+    for nombre, original in casos:
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            datos, mime_type = ImagenProcessor.preparar_para_ia(original)
+            tiempos.append(time.perf_counter() - inicio)
+        preproceso = statistics.median(tiempos) * 1000
+
+        print("-" * 70)
+        print(f"  {nombre}")
+        print(f"    bytes antes / después:  {len(original) / 1024:>10.0f} KB / {len(datos) / 1024:.0f} KB"
+              f"  ({1 - len(datos) / len(original):.0%} menos, {mime_type})")
+        print(f"    preproceso:             {preproceso:>10.1f} ms")
+        print(f"    subida antes:           {subida_ms(len(original)):>10.0f} ms")
+        print(f"    preproceso + subida:    {preproceso + subida_ms(len(datos)):>10.0f} ms")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark del motor de reglas de GestorResponsabilidades
+Genera miles de reglas sintéticas (tipo de reporte x nivel de riesgo x
+departamento) en una base SQLite temporal y compara:
+  - consultas: las dos consultas que hacía asignar_reporte (solo tipo_reporte_id)
+  - compilada: ResponsabilidadesService.resolver sobre la tabla en memoria
+
+Uso: python scripts/benchmark_responsabilidades.py [--tipos 200] [--busquedas 100000]
+"""
+
+import sys
+import os
+import argparse
+import logging
+import random
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEPARTAMENTOS = ['Producción', 'Logística', 'Mantenimiento', 'Administración', 'Calidad', 'Bodega']
+
+
+def preparar_reglas(db, tipos):
+    """Una regla por tipo, por tipo x nivel y por tipo x nivel x departamento"""
+    from sqlalchemy import insert
+    from app.models import TipoReporte, NivelRiesgo, GestorResponsabilidades
+
+    db.drop_all()
+    db.create_all()
+
+    db.session.execute(insert(TipoReporte), [
+        {'id': i, 'nombre': f'Tipo {i}'} for i in range(1, tipos + 1)
+    ])
+    db.session.execute(insert(NivelRiesgo), [
+        {'id': n, 'nombre': f'Nivel {n}', 'rango_minimo': (n - 1) * 5 + 1, 'rango_maximo': n * 5, 'activo': True}
+        for n in range(1, 6)
+    ])
+
+    reglas = [{'rol_principal': 'General', 'activo': True}]
+    for tipo_id in range(1, tipos + 1):
+        reglas.append({'tipo_reporte_id': tipo_id, 'rol_principal': f'Gestor_{tipo_id}', 'activo': True})
+        for nivel_id in range(1, 6):
+            reglas.append({'tipo_reporte_id': tipo_id, 'nivel_riesgo_id': nivel_id,
+                           'rol_principal': f'Gestor_{tipo_id}_{nivel_id}', 'activo': True})
+            for departamento in DEPARTAMENTOS[:3]:
+                reglas.append({'tipo_reporte_id': tipo_id, 'nivel_riesgo_id': nivel_id,
+                               'departamento': departamento, 'activo': True,
+                               'rol_principal': f'Gestor_{tipo_id}_{nivel_id}_{departamento}'})
+    db.session.execute(insert(GestorResponsabilidades), reglas)
+    db.session.commit()
+    return len(reglas)
+
+
+def consulta_anterior(tipo_reporte_id):
+    """Resolución previa de asignar_reporte: dos consultas, solo tipo_reporte_id"""
+    from app.models import GestorResponsabilidades
+
+    gestor_config = GestorResponsabilidades.query.filter_by(
+        tipo_reporte_id=tipo_reporte_id,
+        activo=True
+    ).first()
+    if not gestor_config:
+        gestor_config = GestorResponsabilidades.query.filter(
+            GestorResponsabilidades.tipo_reporte_id == None,
+            GestorResponsabilidades.activo == True
+        ).first()
+    return gestor_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de reglas de responsabilidad')
+    parser.add_argument('--tipos', type=int, default=200)
+    parser.add_argument('--busquedas', type=int, default=100000)
+    parser.add_argument('--consultas', type=int, default=2000,
+                        help='Búsquedas del modo por consultas (es lento)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    directorio = tempfile.mkdtemp(prefix='sst-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+
+    from app import create_app, db
+    from app.services.responsabilidades_service import ResponsabilidadesService, tabla_responsabilidades
+    from app.tasks.temporizador import temporizador
+
+    app = create_app('production')
+    temporizador.detener()
+    rnd = random.Random(42)
+
+    with app.app_context():
+        total = preparar_reglas(db, args.tipos)
+
+        inicio = time.perf_counter()
+        tabla_responsabilidades.compilar()
+        compilacion = time.perf_counter() - inicio
+
+        casos = [
+            (rnd.randint(1, args.tipos + 10), rnd.randint(1, 5), rnd.choice(DEPARTAMENTOS + [None]))
+            for _ in range(args.busquedas)
+        ]
+
+        inicio = time.perf_counter()
+        for tipo_id, _, _ in casos[:args.consultas]:
+            consulta_anterior(tipo_id)
+        por_consulta = (time.perf_counter() - inicio) / args.consultas
+
+        inicio = time.perf_counter()
+        for tipo_id, nivel_id, departamento in casos:
+            ResponsabilidadesService.resolver(tipo_id, nivel_id, departamento)
+        compilada = (time.perf_counter() - inicio) / len(casos)
+
+        db.session.remove()
+
+    print("⏱️  Benchmark de reglas de responsabilidad")
+    print("=" * 70)
+    print(f"  Reglas activas:           {total:>10}")
+    print(f"  Compilación:              {compilacion * 1000:>10.1f} ms")
+    print(f"  consultas (solo tipo):    {por_consulta * 1e6:>10.1f} µs/reporte  ({args.consultas} reportes)")
+    print(f"  compilada (3 dimensiones):{compilada * 1e6:>10.2f} µs/reporte  ({len(casos)} reportes)")
+    print("=" * 70)
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
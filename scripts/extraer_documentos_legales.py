@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para extraer el texto de los documentos legales Pendientes en primer
+plano (lo mismo que el trabajo 'extraer_texto_documentos' del sst-worker).
+Con --reintentar-fallidos devuelve antes los Fallidos a Pendiente, p. ej.
+después de instalar pypdf o de reemplazar un archivo dañado.
+Uso: python scripts/extraer_documentos_legales.py [--reintentar-fallidos] [--procesos 2]
+"""
+
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.tasks.extraccion_documentos import ExtraccionDocumentos
+
+def extraer_documentos():
+    parser = argparse.ArgumentParser(description='Extrae el texto de los documentos legales Pendientes')
+    parser.add_argument('--reintentar-fallidos', action='store_true', help='Vuelve a intentar los Fallidos')
+    parser.add_argument('--procesos', type=int, default=None, help='Procesos de extracción')
+    parser.add_argument('--config', default='development', choices=['development', 'production'])
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    extractor = ExtraccionDocumentos(procesos=args.procesos)
+
+    with app.app_context():
+        print("📄 Extrayendo texto de documentos legales...")
+        print("=" * 60)
+
+        inicio = time.perf_counter()
+        try:
+            if args.reintentar_fallidos:
+                print(f"  🔁 {ExtraccionDocumentos.reintentar_fallidos()} Fallidos vuelven a Pendiente")
+            resumen = extractor.procesar_pendientes()
+        except Exception as e:
+            print(f"❌ Error extrayendo texto: {str(e)}")
+            sys.exit(1)
+        finally:
+            extractor.cerrar()
+
+        print(f"  ✅ {resumen['extraidos']} extraídos, {resumen['desde_cache']} desde caché")
+        if resumen['fallidos']:
+            print(f"  ⚠️  {resumen['fallidos']} fallidos (ver textos_extraidos.error)")
+        print("=" * 60)
+        print(f"✓ {resumen['documentos']} documentos en {time.perf_counter() - inicio:.1f} s")
+
+if __name__ == '__main__':
+    extraer_documentos()
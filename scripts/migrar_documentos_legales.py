@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para agregar a documentos_legales las columnas de la extracción de texto
+(hash_documento, tamano_bytes, texto_extraido, estado_extraccion,
+fecha_extraccion) y crear textos_extraidos. db.create_all no altera tablas
+existentes; este script solo agrega lo que falta, así que se puede volver a
+ejecutar.
+Uso: python scripts/migrar_documentos_legales.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from app import create_app, db
+from app.models import DocumentoLegal, TextoExtraido
+
+COLUMNAS = ('hash_documento', 'tamano_bytes', 'texto_extraido', 'estado_extraccion', 'fecha_extraccion')
+
+
+def migrar():
+    app = create_app()
+
+    with app.app_context():
+        print("🗂️  Migrando documentos_legales (extracción de texto)...")
+        print("=" * 60)
+
+        tabla = DocumentoLegal.__table__
+        inspector = inspect(db.engine)
+        existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+        indices = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+
+        try:
+            with db.engine.begin() as conexion:
+                for nombre in COLUMNAS:
+                    if nombre in existentes:
+                        print(f"  ✓ {nombre} ya existe")
+                        continue
+                    tipo = tabla.c[nombre].type.compile(dialect=db.engine.dialect)
+                    conexion.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN {nombre} {tipo}'))
+                    print(f"  ✅ {nombre} {tipo}")
+                for indice in tabla.indexes:
+                    if indice.name not in indices:
+                        conexion.execute(CreateIndex(indice))
+                        print(f"  ✅ Índice {indice.name}")
+            TextoExtraido.__table__.create(db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"❌ Error migrando documentos_legales: {str(e)}")
+            sys.exit(1)
+
+        print("=" * 60)
+        print("✅ Tabla textos_extraidos lista")
+
+
+if __name__ == '__main__':
+    migrar()
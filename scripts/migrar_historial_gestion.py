@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para migrar GestionReporte.historial_cambios (JSON) a historial_gestion
+Cada elemento del JSON pasa a ser una fila; en la misma transacción el JSON
+de la gestión queda en NULL, así que el script se puede volver a ejecutar.
+Uso: python scripts/migrar_historial_gestion.py [--lote 500]
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, update
+from app import create_app, db
+from app.models import GestionReporte, HistorialGestion
+
+
+def _fecha_evento(valor, por_defecto):
+    if isinstance(valor, str):
+        try:
+            return datetime.fromisoformat(valor)
+        except ValueError:
+            pass
+    return por_defecto or datetime.utcnow()
+
+
+def migrar_lote(desde_id, lote):
+    """Migra hasta `lote` gestiones con historial JSON; devuelve (gestiones, eventos, último id)"""
+    filas = db.session.query(
+        GestionReporte.id, GestionReporte.fecha_asignacion, GestionReporte.historial_cambios
+    ).filter(
+        GestionReporte.id > desde_id,
+        GestionReporte.historial_cambios != None
+    ).order_by(GestionReporte.id).limit(lote).all()
+
+    if not filas:
+        return 0, 0, desde_id
+
+    eventos = []
+    for gestion_id, fecha_asignacion, historial in filas:
+        for cambio in historial or []:
+            if not isinstance(cambio, dict):
+                continue
+            eventos.append({
+                'gestion_reporte_id': gestion_id,
+                'fecha': _fecha_evento(cambio.get('fecha'), fecha_asignacion),
+                'usuario_id': cambio.get('usuario_id', cambio.get('usuario')),
+                'accion': (cambio.get('accion') or 'CAMBIO')[:40],
+                'descripcion': cambio.get('descripcion')
+            })
+
+    if eventos:
+        db.session.execute(insert(HistorialGestion), eventos)
+    db.session.execute(
+        update(GestionReporte).where(GestionReporte.id.in_([f[0] for f in filas]))
+        .values(historial_cambios=db.null()).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    return len(filas), len(eventos), filas[-1][0]
+
+
+def migrar_historial(lote):
+    app = create_app()
+
+    with app.app_context():
+        print("🗂️  Migrando historial_cambios a historial_gestion...")
+        print("=" * 60)
+
+        # Crea la tabla si la base aún no la tiene
+        HistorialGestion.__table__.create(db.engine, checkfirst=True)
+
+        total_gestiones = 0
+        total_eventos = 0
+        ultimo_id = 0
+        try:
+            while True:
+                gestiones, eventos, ultimo_id = migrar_lote(ultimo_id, lote)
+                if not gestiones:
+                    break
+                total_gestiones += gestiones
+                total_eventos += eventos
+                print(f"  ✅ {total_gestiones} gestiones, {total_eventos} eventos")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error migrando historial: {str(e)}")
+            sys.exit(1)
+
+        print("=" * 60)
+        print(f"✅ Gestiones migradas: {total_gestiones}")
+        print(f"✓ Eventos insertados: {total_eventos}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migra historial_cambios a historial_gestion')
+    parser.add_argument('--lote', type=int, default=500)
+    args = parser.parse_args()
+    migrar_historial(args.lote)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para preparar los listados con paginación keyset en bases existentes:
+rellena las fechas NULL, las deja NOT NULL (PostgreSQL) y crea los índices
+compuestos (fecha, id). db.create_all no altera tablas existentes; este script
+solo agrega lo que falta, así que se puede volver a ejecutar.
+Uso: python scripts/migrar_indices_listados.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from app import create_app, db
+from app.models import CondicionInsegura, ConsultaJuridica, Control
+
+# (modelo, columna de fecha del listado)
+LISTADOS = (
+    (CondicionInsegura, 'fecha_creacion'),
+    (ConsultaJuridica, 'fecha_creacion'),
+    (Control, 'creado_en'),
+)
+
+
+def migrar():
+    app = create_app()
+
+    with app.app_context():
+        print("🗂️  Migrando índices de los listados (keyset)...")
+        print("=" * 60)
+
+        inspector = inspect(db.engine)
+        postgres = db.engine.dialect.name == 'postgresql'
+
+        try:
+            with db.engine.begin() as conexion:
+                for modelo, columna in LISTADOS:
+                    tabla = modelo.__table__
+                    # Las fechas NULL iban al final del listado: quedan como las más antiguas
+                    rellenadas = conexion.execute(text(
+                        f'UPDATE {tabla.name} SET {columna} = '
+                        f'(SELECT COALESCE(MIN({columna}), CURRENT_TIMESTAMP) FROM {tabla.name}) '
+                        f'WHERE {columna} IS NULL'
+                    )).rowcount
+                    print(f"  ✓ {tabla.name}.{columna}: {rellenadas} fechas NULL rellenadas")
+
+                    # SQLite no altera columnas; ahí basta con el relleno y el default del modelo
+                    if postgres:
+                        conexion.execute(text(f'ALTER TABLE {tabla.name} ALTER COLUMN {columna} SET NOT NULL'))
+                        print(f"  ✅ {tabla.name}.{columna} NOT NULL")
+
+                    indices = {indice['name'] for indice in inspector.get_indexes(tabla.name)}
+                    for indice in tabla.indexes:
+                        if indice.name in indices:
+                            print(f"  ✓ Índice {indice.name} ya existe")
+                            continue
+                        conexion.execute(CreateIndex(indice))
+                        print(f"  ✅ Índice {indice.name}")
+        except Exception as e:
+            print(f"❌ Error migrando índices de los listados: {str(e)}")
+            sys.exit(1)
+
+        print("=" * 60)
+        print("✅ Listados listos para paginación keyset")
+
+
+if __name__ == '__main__':
+    migrar()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para revisar el outbox de notificaciones y reintentar las fallidas
+Las notificaciones en estado Fallida (dead letter) no se reintentan solas;
+después de corregir la causa (API key, destinatario) se devuelven a Pendiente.
+Uso: python scripts/notificaciones_fallidas.py [--reintentar] [--ids 1 2 3]
+"""
+
+import sys
+import os
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import Notificacion
+from app.tasks.despachador_notificaciones import DespachadorNotificaciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Outbox de notificaciones: fallidas y reintentos')
+    parser.add_argument('--reintentar', action='store_true', help='Devuelve las fallidas a Pendiente')
+    parser.add_argument('--ids', type=int, nargs='*', help='Solo estas notificaciones')
+    parser.add_argument('--limite', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        print("📬 Outbox de notificaciones")
+        print("=" * 60)
+        for estado, cantidad in sorted(DespachadorNotificaciones.resumen().items()):
+            print(f"  {estado:<12} {cantidad:>8}")
+        print("=" * 60)
+
+        query = Notificacion.query.filter_by(estado='Fallida')
+        if args.ids:
+            query = query.filter(Notificacion.id.in_(args.ids))
+        for notificacion in query.order_by(Notificacion.id.desc()).limit(args.limite):
+            print(f"  ❌ #{notificacion.id} {notificacion.tipo or '-'} → {notificacion.destinatario} "
+                  f"({notificacion.intentos} intentos): {(notificacion.ultimo_error or '')[:80]}")
+
+        if args.reintentar:
+            reintentadas = DespachadorNotificaciones.reintentar_fallidas(args.ids)
+            print(f"✅ {reintentadas} notificaciones devueltas a Pendiente")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para programar la línea de tiempo de escalamiento de gestiones existentes
+(gestiones creadas antes de acciones_programadas)
+Uso: python scripts/programar_escalonamientos.py
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import AccionProgramada
+from app.services.escalonamiento_service import EscalonamientoService
+
+def programar_escalonamientos():
+    """Programa acciones para todas las gestiones activas sin línea de tiempo"""
+    app = create_app()
+
+    with app.app_context():
+        print("⏱️  Programando líneas de tiempo de escalamiento...")
+        print("=" * 60)
+
+        total = 0
+        ultimo_id = 0
+        try:
+            while True:
+                revisadas, ultimo_id = EscalonamientoService.programar_gestiones_sin_linea_tiempo(
+                    desde_id=ultimo_id, limite=1000
+                )
+                if not revisadas:
+                    break
+                total += revisadas
+                print(f"  ✅ {total} gestiones programadas")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error programando escalamientos: {str(e)}")
+            sys.exit(1)
+
+        print("=" * 60)
+        print(f"✅ Gestiones programadas: {total}")
+        print(f"✓ Acciones pendientes: {AccionProgramada.query.filter_by(estado='Pendiente').count()}")
+
+if __name__ == '__main__':
+    programar_escalonamientos()
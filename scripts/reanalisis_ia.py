@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para reanalizar con IA todos los reportes con imagen
+Crea un trabajo de reanálisis (lo ejecuta el sst-worker) o, con --ejecutar,
+lo corre en este proceso mostrando el avance. Se puede interrumpir: el
+trabajo retoma desde el último lote confirmado.
+Uso: python scripts/reanalisis_ia.py [--concurrencia 2] [--lote 50] [--forzar] [--ejecutar]
+     python scripts/reanalisis_ia.py --estado ID
+"""
+
+import sys
+import os
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import ReanalisisIA
+from app.tasks.reanalisis_ia import EjecutorReanalisis
+
+
+def imprimir(progreso):
+    eta = f"{progreso['eta_segundos'] // 60} min" if progreso['eta_segundos'] is not None else '-'
+    print(f"  #{progreso['id']} {progreso['estado']:<11} {progreso['procesados']}/{progreso['total']} "
+          f"({progreso['porcentaje']}%)  ✅ {progreso['exitosos']}  ❌ {progreso['fallidos']}  "
+          f"{progreso['reportes_por_minuto'] or '-'} rep/min  ETA {eta}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reanálisis masivo con IA')
+    parser.add_argument('--concurrencia', type=int, default=2)
+    parser.add_argument('--lote', type=int, default=50)
+    parser.add_argument('--forzar', action='store_true', help='Ignora la caché de análisis')
+    parser.add_argument('--ejecutar', action='store_true', help='Ejecuta en este proceso (no espera al sst-worker)')
+    parser.add_argument('--estado', type=int, help='Solo muestra el avance de este trabajo')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        if args.estado:
+            imprimir(EjecutorReanalisis.progreso(ReanalisisIA.query.get_or_404(args.estado)))
+            return
+
+        trabajo = EjecutorReanalisis.crear(args.concurrencia, args.lote, args.forzar)
+        print(f"🔁 Reanálisis #{trabajo.id} creado ({trabajo.total} reportes con imagen)")
+        if not args.ejecutar:
+            print("   El sst-worker lo tomará; avance: python scripts/reanalisis_ia.py --estado", trabajo.id)
+            return
+
+        ejecutor = EjecutorReanalisis()
+        if EjecutorReanalisis.reclamar(ejecutor.propietario) != trabajo.id:
+            print("⚠️ Otro worker tomó el trabajo")
+            return
+
+        detener = threading.Event()
+        try:
+            while not detener.is_set():
+                resultado = EjecutorReanalisis.procesar_lote(trabajo.id, ejecutor.propietario)
+                imprimir(EjecutorReanalisis.progreso(ReanalisisIA.query.get(trabajo.id)))
+                if resultado == 'terminado':
+                    break
+                if resultado == 'reintentar':
+                    detener.wait(EjecutorReanalisis.REINTENTO_SEG)
+        except KeyboardInterrupt:
+            print("⏸️ Interrumpido: el trabajo se retomará desde el último lote confirmado")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para llenar peligros_reporte desde CondicionInsegura.riesgos_identificados
+(reportes anteriores a la tabla, restauraciones o cambios de la taxonomía).
+Es lo mismo que el trabajo 'reconstruir_peligros' (POST /dashboard/api/peligros/reconstruir),
+pero en primer plano; se puede volver a ejecutar.
+Uso: python scripts/reconstruir_peligros.py [--lote 500]
+"""
+
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import PeligroReporte
+from app.services.peligros_service import PeligrosService
+
+def reconstruir_peligros():
+    parser = argparse.ArgumentParser(description='Llena peligros_reporte desde riesgos_identificados')
+    parser.add_argument('--lote', type=int, default=PeligrosService.TAMANO_LOTE, help='Reportes por lote')
+    parser.add_argument('--config', default='development', choices=['development', 'production'])
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+
+    with app.app_context():
+        print("🧭 Reconstruyendo peligros de los reportes...")
+        print("=" * 60)
+
+        # Crea la tabla si la base aún no la tiene
+        PeligroReporte.__table__.create(db.engine, checkfirst=True)
+
+        inicio = time.perf_counter()
+        try:
+            resultado = PeligrosService.reconstruir(tamano_lote=args.lote)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error reconstruyendo peligros: {str(e)}")
+            sys.exit(1)
+
+        print(f"  ✅ {resultado['reportes']} reportes, {resultado['peligros']} peligros")
+        for grupo in PeligrosService.resumen(agrupar=['peligro'], limite=20):
+            print(f"     {grupo['peligro']:<7} {grupo['peligro_nombre']:<24} {grupo['peligros']:>7}")
+        print("=" * 60)
+        print(f"✓ Peligros reconstruidos en {time.perf_counter() - inicio:.1f} s")
+
+if __name__ == '__main__':
+    reconstruir_peligros()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Script para reconstruir el índice de búsqueda de texto completo
+(datos anteriores al índice, restauraciones o cambios hechos fuera de la app)
+Uso: python scripts/reindexar_busqueda.py [--tipos reporte consulta documento] [--lote 500]
+"""
+
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.services.busqueda_service import BusquedaService
+
+def reindexar_busqueda():
+    parser = argparse.ArgumentParser(description='Reconstruye el índice de búsqueda de texto completo')
+    parser.add_argument('--tipos', nargs='+', choices=list(BusquedaService.FUENTES),
+                        help='Tipos a reindexar (por defecto todos)')
+    parser.add_argument('--lote', type=int, default=BusquedaService.TAMANO_LOTE, help='Filas por lote')
+    parser.add_argument('--config', default='development', choices=['development', 'production'])
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+
+    with app.app_context():
+        print(f"🔎 Reindexando búsqueda ({db.engine.dialect.name})...")
+        print("=" * 60)
+
+        inicio = time.perf_counter()
+        try:
+            resultado = BusquedaService.reindexar(tipos=args.tipos, tamano_lote=args.lote)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error reindexando: {str(e)}")
+            sys.exit(1)
+
+        for tipo, total in resultado.items():
+            print(f"  ✅ {tipo}: {total} indexados")
+        print("=" * 60)
+        print(f"✓ Índice reconstruido en {time.perf_counter() - inicio:.1f} s")
+
+if __name__ == '__main__':
+    reindexar_busqueda()
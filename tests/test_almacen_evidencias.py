@@ -0,0 +1,171 @@
+"""
+TEST SUITE - Almacén de evidencias
+Pruebas para AlmacenEvidencias: firma, límite de tamaño, deduplicación, referencias y purga
+Comando: python tests/test_almacen_evidencias.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+from PIL import Image
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura, ArchivoEvidencia
+from app.services.almacen_evidencias import AlmacenEvidencias, ErrorEvidencia
+from app.tasks.temporizador import temporizador
+
+def imagen(color=(10, 120, 200), formato='JPEG'):
+    salida = io.BytesIO()
+    Image.new('RGB', (64, 48), color).save(salida, formato)
+    return salida.getvalue()
+
+class FlujoGenerado(io.RawIOBase):
+    """Flujo de `tamano` bytes con cabecera JPEG que no existe entero en memoria"""
+
+    def __init__(self, tamano):
+        self.tamano = tamano
+        self.leidos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        n = min(n if n >= 0 else self.tamano, self.tamano - self.leidos)
+        if self.leidos == 0:
+            bloque = b'\xff\xd8\xff\xe0' + b'\x00' * (n - 4)
+        else:
+            bloque = b'\x00' * n
+        self.leidos += n
+        return bloque
+
+class TestAlmacenEvidencias(unittest.TestCase):
+    """Cada foto se guarda una vez por contenido y se borra cuando ningún reporte la usa"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        temporizador.detener()
+
+        self.directorio = tempfile.mkdtemp(prefix='sst-evidencias-')
+        self.parche = mock.patch.object(AlmacenEvidencias, 'DIRECTORIO', self.directorio)
+        self.parche.start()
+
+        with self.app.app_context():
+            db.create_all()
+            usuario = Usuario(email='empleado@test.com', nombre_completo='Empleado', rol='Empleado', activo=True)
+            usuario.set_password('pass')
+            db.session.add(usuario)
+            db.session.commit()
+            self.usuario_id = usuario.id
+
+    def tearDown(self):
+        self.parche.stop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def iniciar_sesion(self):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.usuario_id)
+            sess['_fresh'] = True
+
+    def archivos(self):
+        return sorted(
+            os.path.relpath(os.path.join(raiz, nombre), self.directorio)
+            for raiz, _, nombres in os.walk(self.directorio) for nombre in nombres
+        )
+
+    def _reportar(self, titulo, contenido):
+        return self.client.post('/reportes/nuevo', data={
+            'titulo': titulo, 'descripcion': 'Cable pelado',
+            'imagen': (io.BytesIO(contenido), 'foto.jpg'),
+        }, content_type='multipart/form-data')
+
+    def test_misma_foto_se_guarda_una_vez(self):
+        """Prueba: la misma foto en dos reportes queda una vez en disco con dos referencias"""
+        self.iniciar_sesion()
+        foto = imagen()
+        for titulo in ('Reporte A', 'Reporte B'):
+            self.assertEqual(self._reportar(titulo, foto).status_code, 302)
+        self._reportar('Reporte C', imagen(color=(200, 10, 10)))
+
+        with self.app.app_context():
+            reportes = {r.titulo: r.imagen_url for r in CondicionInsegura.query.all()}
+            self.assertEqual(reportes['Reporte A'], reportes['Reporte B'])
+            self.assertNotEqual(reportes['Reporte A'], reportes['Reporte C'])
+
+            fila = ArchivoEvidencia.query.filter_by(ruta=reportes['Reporte A']).one()
+            self.assertEqual((fila.referencias, fila.formato, fila.tamano), (2, 'jpeg', len(foto)))
+            self.assertEqual(os.path.basename(fila.ruta), f'{fila.hash_sha256}.jpg')
+            self.assertEqual(AlmacenEvidencias.resumen()['bytes_sin_deduplicar'],
+                             2 * len(foto) + ArchivoEvidencia.query.filter_by(ruta=reportes['Reporte C']).one().tamano)
+
+        self.assertEqual(len([a for a in self.archivos() if not a.startswith('tmp')]), 2)
+
+    def test_firma_falsa_no_se_guarda(self):
+        """Prueba: un archivo que no es imagen se rechaza por su contenido y no deja nada en disco"""
+        self.iniciar_sesion()
+        self._reportar('Falso', b'<?php echo 1; ?>' * 10)
+
+        with self.app.app_context():
+            self.assertEqual(CondicionInsegura.query.count(), 0)
+            self.assertEqual(ArchivoEvidencia.query.count(), 0)
+        self.assertEqual(self.archivos(), [])
+
+    def test_limite_de_tamano_corta_la_lectura(self):
+        """Prueba: un archivo grande se corta al pasar el límite, sin leer el resto ni dejar temporales"""
+        flujo = FlujoGenerado(50 * 1024 * 1024)
+        with self.app.app_context(), self.assertRaises(ErrorEvidencia):
+            AlmacenEvidencias.guardar(flujo, max_bytes=1024 * 1024)
+
+        self.assertLessEqual(flujo.leidos, 1024 * 1024 + AlmacenEvidencias.TAMANO_BLOQUE)
+        self.assertEqual(self.archivos(), [])
+
+    def test_memoria_constante(self):
+        """Prueba: guardar 9MB usa del orden de un bloque de memoria, no el tamaño del archivo"""
+        with self.app.app_context():
+            tracemalloc.start()
+            try:
+                guardada = AlmacenEvidencias.guardar(FlujoGenerado(9 * 1024 * 1024))
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        self.assertEqual(os.path.getsize(guardada.ruta), 9 * 1024 * 1024)
+        self.assertLess(pico, 1024 * 1024)
+
+    def test_referencias_y_purga(self):
+        """Prueba: al quitar la foto de todos los reportes el archivo se purga tras la gracia"""
+        with self.app.app_context():
+            ruta = AlmacenEvidencias.guardar(io.BytesIO(imagen())).ruta
+            reportes = [CondicionInsegura(numero_reporte=f'REP-EV-{i}', titulo=f'R{i}', descripcion='x', imagen_url=ruta)
+                        for i in range(2)]
+            db.session.add_all(reportes)
+            db.session.commit()
+            fila = ArchivoEvidencia.query.one()
+            self.assertEqual(fila.referencias, 2)
+
+            db.session.delete(reportes[0])
+            reportes[1].imagen_url = None
+            db.session.commit()
+            db.session.refresh(fila)
+            self.assertEqual(fila.referencias, 0)
+
+            # Dentro de la gracia se conserva (el reporte puede estar guardándose)
+            self.assertEqual(AlmacenEvidencias.purgar(), 0)
+            self.assertTrue(os.path.exists(ruta))
+
+            self.assertEqual(AlmacenEvidencias.purgar(gracia_segundos=0), 1)
+            self.assertFalse(os.path.exists(ruta))
+            self.assertEqual(ArchivoEvidencia.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
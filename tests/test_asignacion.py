@@ -0,0 +1,99 @@
+"""
+TEST SUITE - Asignación de gestores
+Pruebas para AsignacionService e IndiceGestores
+Comando: python tests/test_asignacion.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura, GestionReporte, TareaGestion
+from app.services.asignacion_service import AsignacionService, indice_gestores
+
+class TestAsignacionGestores(unittest.TestCase):
+    """Índice por rol, estrategias e invalidación"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+        with self.app.app_context():
+            db.create_all()
+            self._crear_datos_prueba()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        indice_gestores.invalidar()
+
+    def _crear_datos_prueba(self):
+        self.gestores = []
+        for i in range(3):
+            usuario = Usuario(email=f'gestor{i}@test.com', nombre_completo=f'Gestor {i}',
+                              rol='Gestor_RRHH', activo=True)
+            usuario.set_password('pass')
+            db.session.add(usuario)
+            self.gestores.append(usuario)
+        db.session.commit()
+        self.gestor_ids = [g.id for g in self.gestores]
+
+        # El primer gestor ya tiene dos tareas abiertas
+        reporte = CondicionInsegura(numero_reporte='REP-ASIG-001', titulo='Carga', descripcion='x')
+        db.session.add(reporte)
+        db.session.flush()
+        gestion = GestionReporte(reporte_id=reporte.id, gestor_actual_id=self.gestor_ids[0])
+        db.session.add(gestion)
+        db.session.flush()
+        for _ in range(2):
+            db.session.add(TareaGestion(gestion_reporte_id=gestion.id, asignado_a_id=self.gestor_ids[0],
+                                        titulo='Pendiente', estado='Abierta'))
+        db.session.commit()
+        indice_gestores.invalidar()
+
+    def test_round_robin_reparte(self):
+        """Prueba: round-robin rota entre los usuarios activos del rol"""
+        with self.app.app_context():
+            elegidos = [AsignacionService.seleccionar_gestor('Gestor_RRHH', AsignacionService.ROUND_ROBIN)[0]
+                        for _ in range(6)]
+            self.assertEqual(elegidos, self.gestor_ids * 2)
+
+    def test_menor_carga(self):
+        """Prueba: menor carga evita al gestor con tareas abiertas y reparte el resto"""
+        with self.app.app_context():
+            elegidos = [AsignacionService.seleccionar_gestor('Gestor_RRHH', AsignacionService.MENOR_CARGA)[0]
+                        for _ in range(4)]
+            self.assertEqual(elegidos.count(self.gestor_ids[0]), 0)
+            self.assertEqual(elegidos.count(self.gestor_ids[1]), 2)
+            self.assertEqual(elegidos.count(self.gestor_ids[2]), 2)
+
+    def test_tarea_completada_descuenta_carga(self):
+        """Prueba: completar tareas baja la carga del gestor"""
+        with self.app.app_context():
+            indice_gestores.asegurar()
+            self.assertEqual(indice_gestores.carga(self.gestor_ids[0]), 2)
+
+            for tarea in TareaGestion.query.all():
+                tarea.estado = 'Completada'
+            db.session.commit()
+
+            self.assertEqual(indice_gestores.carga(self.gestor_ids[0]), 0)
+
+    def test_invalidacion_por_cambio_de_usuario(self):
+        """Prueba: desactivar un usuario lo saca del índice sin esperar el TTL"""
+        with self.app.app_context():
+            self.assertEqual(len(indice_gestores.usuarios('Gestor_RRHH')), 3)
+
+            usuario = db.session.get(Usuario, self.gestor_ids[1])
+            usuario.activo = False
+            db.session.commit()
+
+            ids = [usuario_id for usuario_id, _ in indice_gestores.usuarios('Gestor_RRHH')]
+            self.assertNotIn(self.gestor_ids[1], ids)
+            self.assertIsNone(AsignacionService.seleccionar_gestor('Rol_Inexistente'))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
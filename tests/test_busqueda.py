@@ -0,0 +1,159 @@
+"""
+TEST SUITE - Búsqueda de texto completo
+Pruebas para BusquedaService (FTS5 en SQLite): índice incremental, puntaje, resaltado, permisos y reindexación
+Comando: python tests/test_busqueda.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura, ConsultaJuridica, DocumentoLegal, DocumentoBusqueda
+from app.services.busqueda_service import BusquedaService
+from app.tasks.temporizador import temporizador
+
+class TestBusqueda(unittest.TestCase):
+    """El índice sigue a las entidades en su transacción y respeta lo que cada rol puede ver"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        temporizador.detener()
+
+        with self.app.app_context():
+            db.create_all()
+            usuarios = {}
+            for rol in ('Empleado', 'Abogado', 'Admin'):
+                usuario = Usuario(email=f'{rol.lower()}@test.com', nombre_completo=rol, rol=rol, activo=True)
+                usuario.set_password('pass')
+                usuarios[rol] = usuario
+            otro = Usuario(email='otro@test.com', nombre_completo='Otro', rol='Empleado', activo=True)
+            otro.set_password('pass')
+            db.session.add_all(list(usuarios.values()) + [otro])
+            db.session.flush()
+
+            db.session.add_all([
+                CondicionInsegura(numero_reporte='REP-B-1', titulo='Escalera sin baranda',
+                                  descripcion='La escalera del bodega 2 no tiene pasamanos',
+                                  empleado_reportador_id=usuarios['Empleado'].id),
+                CondicionInsegura(numero_reporte='REP-B-2', titulo='Cable pelado',
+                                  descripcion='Cerca de la escalera de emergencia hay un cable expuesto',
+                                  empleado_reportador_id=otro.id),
+            ])
+            consulta = ConsultaJuridica(numero_consulta='CONS-B-1', titulo='Inspección de alturas',
+                                        descripcion='Alcance de la Resolución 4272 para trabajo en alturas',
+                                        resolucion='Aplica a toda labor sobre 1,50 m')
+            db.session.add(consulta)
+            db.session.flush()
+            db.session.add(DocumentoLegal(consulta_id=consulta.id, nombre='Concepto firmado',
+                                          contenido='El empleador debe certificar al personal en alturas'))
+            db.session.commit()
+            self.ids = {rol: u.id for rol, u in usuarios.items()}
+            self.consulta_id = consulta.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def iniciar_sesion(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def buscar(self, texto, rol='Admin', **kwargs):
+        with self.app.test_request_context():
+            return BusquedaService.buscar(texto, db.session.get(Usuario, self.ids[rol]), **kwargs)
+
+    def test_puntaje_resaltado_y_tildes(self):
+        """Prueba: el título pesa más, se resalta la coincidencia y las tildes no importan"""
+        with self.app.app_context():
+            resultados = self.buscar('escalera')
+            self.assertEqual([r['id'] for r in resultados][:1],
+                             [CondicionInsegura.query.filter_by(numero_reporte='REP-B-1').one().id])
+            self.assertEqual(len(resultados), 2)
+            self.assertIn('<mark>Escalera</mark>', resultados[0]['titulo'])
+            self.assertGreater(resultados[0]['puntaje'], resultados[1]['puntaje'])
+
+            inspeccion = self.buscar('inspeccion alturas', tipos=['consulta'])
+            self.assertEqual([(r['tipo'], r['id']) for r in inspeccion], [('consulta', self.consulta_id)])
+            self.assertIn('<mark>Inspección</mark>', inspeccion[0]['titulo'])
+
+            # La última palabra vale como prefijo (búsqueda mientras se escribe)
+            self.assertEqual(len(self.buscar('escal')), 2)
+            self.assertEqual(self.buscar('de la'), [])
+
+    def test_indice_sigue_cambios_y_rollback(self):
+        """Prueba: editar, borrar o deshacer una entidad se refleja en el índice"""
+        with self.app.app_context():
+            reporte = CondicionInsegura.query.filter_by(numero_reporte='REP-B-2').one()
+            reporte.descripcion = 'Tablero eléctrico abierto'
+            db.session.commit()
+            self.assertEqual([r['id'] for r in self.buscar('tablero')], [reporte.id])
+            self.assertNotIn(reporte.id, [r['id'] for r in self.buscar('cable expuesto')])
+
+            reporte.estado = 'Cerrado'
+            db.session.commit()
+            self.assertEqual(DocumentoBusqueda.query.filter_by(tipo='reporte', entidad_id=reporte.id).count(), 1)
+
+            db.session.add(CondicionInsegura(numero_reporte='REP-B-3', titulo='Derrame de aceite', descripcion='x'))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(self.buscar('derrame'), [])
+
+            db.session.delete(reporte)
+            db.session.commit()
+            self.assertEqual(self.buscar('tablero'), [])
+
+    def test_visibilidad_por_rol(self):
+        """Prueba: el empleado solo encuentra sus reportes; el abogado ve consultas y documentos"""
+        with self.app.app_context():
+            propios = self.buscar('escalera', rol='Empleado')
+            self.assertEqual([r['tipo'] for r in propios], ['reporte'])
+            self.assertEqual(self.buscar('alturas', rol='Empleado'), [])
+
+            juridicos = {r['tipo']: r for r in self.buscar('alturas', rol='Abogado')}
+            self.assertEqual(set(juridicos), {'consulta', 'documento'})
+            self.assertEqual(juridicos['documento']['url'], f'/juridico/{self.consulta_id}')
+
+    def test_reindexar_y_update_masivo(self):
+        """Prueba: la reindexación reconstruye el índice y indexar_ids cubre los UPDATE por lote"""
+        with self.app.app_context():
+            db.session.query(DocumentoBusqueda).delete()
+            db.session.commit()
+            self.assertEqual(self.buscar('escalera'), [])
+
+            self.assertEqual(BusquedaService.reindexar(tamano_lote=1), {'reporte': 2, 'consulta': 1, 'documento': 1})
+            self.assertEqual(len(self.buscar('escalera')), 2)
+
+            reporte_id = CondicionInsegura.query.filter_by(numero_reporte='REP-B-1').one().id
+            db.session.execute(db.update(CondicionInsegura), [{'id': reporte_id, 'observaciones_ia': 'Riesgo de caída'}])
+            BusquedaService.indexar_ids('reporte', [reporte_id])
+            db.session.commit()
+            self.assertEqual([r['id'] for r in self.buscar('caida')], [reporte_id])
+
+    def test_api_escapa_html(self):
+        """Prueba: la API exige q y devuelve el resaltado con el texto del usuario escapado"""
+        with self.app.app_context():
+            db.session.add(CondicionInsegura(numero_reporte='REP-B-4', titulo='<script>alert(1)</script> fuga',
+                                             descripcion='Fuga de gas'))
+            db.session.commit()
+
+        self.iniciar_sesion(self.ids['Admin'])
+        self.assertEqual(self.client.get('/buscar/api').status_code, 400)
+
+        respuesta = self.client.get('/buscar/api?q=fuga&tipo=reporte')
+        self.assertEqual(respuesta.status_code, 200)
+        titulo = respuesta.get_json()['resultados'][0]['titulo']
+        self.assertIn('&lt;script&gt;', titulo)
+        self.assertIn('<mark>fuga</mark>', titulo)
+
+        pagina = self.client.get('/buscar/?q=fuga')
+        self.assertEqual(pagina.status_code, 200)
+        self.assertIn('<mark>Fuga</mark>', pagina.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,176 @@
+"""
+TEST SUITE - Caché de análisis IA
+Pruebas para CacheAnalisisIA, su uso en GeminiService.analizar_imagen_sst y ?forzar=true
+Comando: python tests/test_cache_analisis_ia.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import threading
+import time
+import unittest
+from PIL import Image
+from app import create_app, db
+from app.models import AnalisisIACache, Usuario, CondicionInsegura, TrabajoFondo
+from app.services.cache_analisis_ia import CacheAnalisisIA, cache_analisis_ia
+from app.services.gemini_service import GeminiService
+from app.services.pasarela_ia import PasarelaIA, BackendFalso
+
+ANALISIS = {"peligros": ["Piso mojado"], "severidad": 3, "probabilidad": 2, "nivel_riesgo": 6}
+
+class TestCacheAnalisisIA(unittest.TestCase):
+    """La misma imagen con el mismo prompt y modelo no se vuelve a analizar"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.llamadas = 0
+
+        with self.app.app_context():
+            db.create_all()
+        cache_analisis_ia.limpiar_memoria()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _calcular(self):
+        self.llamadas += 1
+        return dict(ANALISIS)
+
+    def test_acierto_en_memoria(self):
+        """Prueba: la segunda consulta no llama al modelo"""
+        with self.app.app_context():
+            cache = CacheAnalisisIA()
+            for _ in range(3):
+                self.assertEqual(cache.resolver('h1', 'v1', 'modelo', self._calcular), ANALISIS)
+            self.assertEqual(self.llamadas, 1)
+            metricas = cache.metricas()
+            self.assertEqual((metricas['fallos'], metricas['aciertos_memoria']), (1, 2))
+
+    def test_acierto_en_bd_entre_procesos(self):
+        """Prueba: otra instancia (otro proceso) encuentra el análisis en la base de datos"""
+        with self.app.app_context():
+            CacheAnalisisIA().resolver('h1', 'v1', 'modelo', self._calcular)
+            otra = CacheAnalisisIA()
+            self.assertEqual(otra.resolver('h1', 'v1', 'modelo', self._calcular), ANALISIS)
+            self.assertEqual(self.llamadas, 1)
+            self.assertEqual(otra.metricas()['aciertos_bd'], 1)
+            self.assertEqual(AnalisisIACache.query.count(), 1)
+
+    def test_otra_version_u_omitir_llama_al_modelo(self):
+        """Prueba: cambiar prompt/modelo o usar_cache=False vuelve a analizar"""
+        with self.app.app_context():
+            cache = CacheAnalisisIA()
+            cache.resolver('h1', 'v1', 'modelo', self._calcular)
+            cache.resolver('h1', 'v2', 'modelo', self._calcular)
+            cache.resolver('h1', 'v1', 'otro-modelo', self._calcular)
+            cache.resolver('h1', 'v1', 'modelo', self._calcular, usar_cache=False)
+            self.assertEqual(self.llamadas, 4)
+            self.assertEqual(cache.metricas()['omitidas'], 1)
+            self.assertEqual(AnalisisIACache.query.count(), 3)
+
+    def test_errores_no_se_guardan(self):
+        """Prueba: un análisis fallido se reintenta la próxima vez"""
+        with self.app.app_context():
+            cache = CacheAnalisisIA()
+            cache.resolver('h1', 'v1', 'modelo', lambda: {"error": "cuota agotada"})
+            self.assertEqual(cache.resolver('h1', 'v1', 'modelo', self._calcular), ANALISIS)
+            self.assertEqual(self.llamadas, 1)
+
+    def test_lru_desaloja_la_menos_usada(self):
+        """Prueba: la memoria no pasa de max_memoria entradas"""
+        with self.app.app_context():
+            cache = CacheAnalisisIA(max_memoria=2)
+            cache.guardar('h1', 'v', 'm', ANALISIS)
+            cache.guardar('h2', 'v', 'm', ANALISIS)
+            cache.obtener('h1', 'v', 'm')
+            cache.guardar('h3', 'v', 'm', ANALISIS)
+            self.assertEqual(list(cache._memoria), [('h1', 'v', 'm'), ('h3', 'v', 'm')])
+            self.assertEqual(cache.metricas()['desalojos'], 1)
+
+    def test_duplicados_concurrentes_una_sola_llamada(self):
+        """Prueba: dos hilos con la misma imagen pagan una sola llamada al modelo"""
+        cache = CacheAnalisisIA()
+
+        def lento():
+            time.sleep(0.2)
+            return self._calcular()
+
+        def analizar():
+            with self.app.app_context():
+                cache.resolver('h1', 'v1', 'modelo', lento)
+                db.session.remove()
+
+        hilos = [threading.Thread(target=analizar) for _ in range(3)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(self.llamadas, 1)
+
+    def test_gemini_reutiliza_analisis_de_imagen_repetida(self):
+        """Prueba: la misma foto subida dos veces se analiza una sola vez"""
+        with self.app.app_context():
+            backend = BackendFalso(latencia_ms=0)
+            servicio = GeminiService(pasarela=PasarelaIA(backend=backend))
+            salida = io.BytesIO()
+            Image.new('RGB', (64, 48), (200, 30, 30)).save(salida, 'JPEG')
+            imagen = salida.getvalue()
+
+            primero = servicio.analizar_imagen_sst(imagen)
+            segundo = servicio.analizar_imagen_sst(bytes(imagen))
+            self.assertEqual(primero, segundo)
+            self.assertEqual(backend.llamadas, 1)
+
+            servicio.analizar_imagen_sst(imagen, usar_cache=False)
+            self.assertEqual(backend.llamadas, 2)
+
+class TestForzarAnalisisIA(unittest.TestCase):
+    """Solo Admin y Responsable_SST pueden saltarse la caché del análisis"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            usuarios = {}
+            for rol in ('Empleado', 'Responsable_SST'):
+                usuario = Usuario(email=f'{rol.lower()}@test.com', nombre_completo=rol, rol=rol, activo=True)
+                usuario.set_password('pass')
+                usuarios[rol] = usuario
+            db.session.add_all(usuarios.values())
+            db.session.flush()
+            reporte = CondicionInsegura(numero_reporte='REP-IA-1', titulo='Piso mojado', imagen_url='uploads/x.jpg',
+                                        empleado_reportador_id=usuarios['Empleado'].id)
+            db.session.add(reporte)
+            db.session.commit()
+            self.ids = {rol: u.id for rol, u in usuarios.items()}
+            self.reporte_id = reporte.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_forzar_solo_para_roles_sst(self):
+        """Prueba: ?forzar=true del reportador se ignora; el Responsable SST sí lo usa"""
+        for rol, esperado in (('Empleado', True), ('Responsable_SST', False)):
+            with self.client.session_transaction() as sess:
+                sess['_user_id'] = str(self.ids[rol])
+                sess['_fresh'] = True
+            respuesta = self.client.post(f'/reportes/{self.reporte_id}/analisis-ia?forzar=true')
+            self.assertEqual(respuesta.status_code, 202)
+            with self.app.app_context():
+                trabajo = db.session.get(TrabajoFondo, respuesta.get_json()['id'])
+                self.assertEqual(trabajo.parametros['usar_cache'], esperado, rol)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
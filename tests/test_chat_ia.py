@@ -0,0 +1,162 @@
+"""
+TEST SUITE - Chat IA
+Pruebas para /ia/chat: respuesta JSON y streaming por Server-Sent Events
+Comando: python tests/test_chat_ia.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import time
+import unittest
+from app import create_app, db
+from app.models import Usuario, ConfiguracionIA
+from app.services.cache_chat_ia import cache_chat_ia, CacheChatIA
+from app.services.pasarela_ia import pasarela_ia, BackendFalso
+
+def eventos_sse(cuerpo):
+    """[(evento, datos)] de un cuerpo text/event-stream"""
+    eventos = []
+    for bloque in cuerpo.strip().split('\n\n'):
+        lineas = dict(linea.split(': ', 1) for linea in bloque.split('\n'))
+        eventos.append((lineas['event'], json.loads(lineas['data'])))
+    return eventos
+
+class TestChatIA(unittest.TestCase):
+    """El chat responde en JSON o por fragmentos a medida que llegan"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        self.backend = BackendFalso(latencia_ms=0, token_ms=0)
+        pasarela_ia.usar_backend(self.backend)
+        cache_chat_ia.invalidar()
+
+        with self.app.app_context():
+            db.create_all()
+            usuario = Usuario(email='empleado@test.com', nombre_completo='Empleado', rol='Empleado', activo=True)
+            usuario.set_password('pass')
+            admin = Usuario(email='admin@test.com', nombre_completo='Admin', rol='Admin', activo=True)
+            admin.set_password('pass')
+            db.session.add_all([usuario, admin, ConfiguracionIA(activo=True)])
+            db.session.commit()
+            usuario_id, self.admin_id = usuario.id, admin.id
+
+        self.iniciar_sesion(usuario_id)
+
+    def iniciar_sesion(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def tearDown(self):
+        pasarela_ia.usar_backend(None)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_json_sin_cambios(self):
+        """Prueba: sin pedir streaming la respuesta sigue siendo JSON completo"""
+        respuesta = self.client.post('/ia/chat', json={'pregunta': '¿Qué es el SG-SST?'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('Decreto 1072', respuesta.get_json()['respuesta'])
+
+    def test_streaming_por_fragmentos(self):
+        """Prueba: con Accept: text/event-stream llegan fragmentos y un evento fin con tiempos"""
+        respuesta = self.client.post('/ia/chat', json={'pregunta': 'Hola'},
+                                     headers={'Accept': 'text/event-stream'})
+        self.assertEqual(respuesta.mimetype, 'text/event-stream')
+        eventos = eventos_sse(respuesta.get_data(as_text=True))
+
+        fragmentos = [datos['texto'] for evento, datos in eventos if evento == 'fragmento']
+        self.assertGreater(len(fragmentos), 1)
+        self.assertEqual(''.join(fragmentos), self.backend._responder('Hola'))
+        self.assertEqual(eventos[-1][0], 'fin')
+        self.assertIn('primer_fragmento_ms', eventos[-1][1])
+
+    def test_error_como_evento(self):
+        """Prueba: un fallo del modelo llega como evento error, no como conexión cortada"""
+        self.backend.tasa_fallos = 1
+        respuesta = self.client.post('/ia/chat?stream=1', json={'pregunta': 'Hola'})
+        eventos = eventos_sse(respuesta.get_data(as_text=True))
+        self.assertEqual(eventos, [('error', {'error': eventos[0][1]['error'], 'codigo': 'modelo'})])
+
+    def test_desconexion_cancela_y_libera_el_turno(self):
+        """Prueba: si el cliente cierra la conexión se deja de leer del modelo"""
+        self.backend.token_ms = 50
+        canceladas = pasarela_ia.estado()['canceladas']
+        respuesta = self.client.post('/ia/chat', json={'pregunta': 'Hola', 'stream': True}, buffered=False)
+        primero = next(respuesta.response)
+        self.assertIn(b'event: fragmento', primero)
+        respuesta.close()
+
+        time.sleep(0.2)
+        estado = pasarela_ia.estado()
+        self.assertEqual(estado['canceladas'], canceladas + 1)
+        self.assertEqual(estado['en_curso'], 0)
+
+    def test_preguntas_equivalentes_usan_la_cache(self):
+        """Prueba: mayúsculas, tildes, signos y palabras vacías no generan otra llamada al modelo"""
+        primera = self.client.post('/ia/chat', json={'pregunta': '¿Qué dice la Resolución 0312 sobre estándares mínimos?'})
+        segunda = self.client.post('/ia/chat', json={'pregunta': 'que dice   resolucion 0312 sobre los ESTANDARES minimos'})
+        self.assertEqual(primera.get_json(), segunda.get_json())
+        self.assertEqual(self.backend.llamadas, 1)
+
+        # En streaming también: la respuesta en caché llega en un solo fragmento
+        respuesta = self.client.post('/ia/chat?stream=1', json={'pregunta': 'Qué dice la Resolución 0312: estándares mínimos'})
+        eventos = eventos_sse(respuesta.get_data(as_text=True))
+        self.assertEqual(eventos[0], ('fragmento', {'texto': primera.get_json()['respuesta']}))
+        self.assertEqual(self.backend.llamadas, 1)
+
+    def test_invalidacion_y_metricas_para_admin(self):
+        """Prueba: el admin ve los aciertos e invalida la caché cuando cambia la normativa"""
+        antes = cache_chat_ia.metricas()
+        for _ in range(3):
+            self.client.post('/ia/chat', json={'pregunta': 'Hola'})
+        self.assertEqual(self.client.get('/ia/chat/cache').status_code, 403)
+
+        self.iniciar_sesion(self.admin_id)
+        metricas = self.client.get('/ia/chat/cache').get_json()
+        self.assertEqual(metricas['aciertos'] - antes['aciertos'], 2)
+        self.assertEqual(metricas['fallos'] - antes['fallos'], 1)
+        self.assertEqual(metricas['entradas'], 1)
+        self.assertGreater(metricas['tasa_aciertos'], 0)
+
+        self.assertEqual(self.client.post('/ia/chat/cache/invalidar').get_json()['descartadas'], 1)
+        self.client.post('/ia/chat', json={'pregunta': 'Hola'})
+        self.assertEqual(self.backend.llamadas, 2)
+
+class TestCacheChatIA(unittest.TestCase):
+    """Normalización, caducidad y límite de tamaño de la caché del chat"""
+
+    def test_normalizar(self):
+        """Prueba: se conservan números, negaciones y palabras interrogativas"""
+        self.assertEqual(CacheChatIA.normalizar('¿Qué es el COPASST?'), 'que copasst')
+        self.assertEqual(CacheChatIA.normalizar('  que es   el copasst'), 'que copasst')
+        self.assertNotEqual(CacheChatIA.normalizar('¿Cuál es el COPASST?'), CacheChatIA.normalizar('¿Qué es el COPASST?'))
+        claves = {CacheChatIA.normalizar(f'¿{palabra} se reporta un accidente de trabajo?')
+                  for palabra in ('Cómo', 'Cuándo', 'Dónde', 'Quién')}
+        self.assertEqual(len(claves), 4)
+        self.assertIn('como reporta accidente trabajo', claves)
+        self.assertEqual(CacheChatIA.normalizar('¿NO aplica el Decreto 1072/2015?'), 'no aplica decreto 1072 2015')
+
+    def test_caducidad_y_desalojo(self):
+        """Prueba: las entradas vencen con el TTL y las menos usadas salen al llenarse"""
+        cache = CacheChatIA(max_entradas=2, ttl_seg=0.05)
+        cache.guardar('brigada', 'v1', 'r1')
+        cache.guardar('copasst', 'v1', 'r2')
+        self.assertEqual(cache.obtener('BRIGADA', 'v1'), 'r1')
+        self.assertIsNone(cache.obtener('brigada', 'v2'))
+        cache.guardar('arl', 'v1', 'r3')
+        self.assertIsNone(cache.obtener('copasst', 'v1'))
+
+        time.sleep(0.06)
+        self.assertIsNone(cache.obtener('brigada', 'v1'))
+        metricas = cache.metricas()
+        self.assertEqual((metricas['desalojos'], metricas['expiradas']), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,153 @@
+"""
+TEST SUITE - Derivados de evidencias
+Pruebas para CacheDerivados y la ruta /reportes/<id>/evidencia (WebP, ETag, rangos, desalojo)
+Comando: python tests/test_derivados_imagen.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from PIL import Image
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura
+from app.services.almacen_evidencias import AlmacenEvidencias
+from app.services.derivados_imagen import CacheDerivados
+from app.tasks.temporizador import temporizador
+
+def foto(color=(10, 120, 200), tamano=(2000, 1500)):
+    salida = io.BytesIO()
+    # Ruido para que el JPEG pese como una foto real
+    Image.effect_noise(tamano, 60).convert('RGB').save(salida, 'JPEG', quality=92)
+    return salida.getvalue()
+
+class TestDerivadosImagen(unittest.TestCase):
+    """Las páginas cargan una WebP reducida; el original se sirve con ETag y rangos"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        temporizador.detener()
+
+        self.directorio = tempfile.mkdtemp(prefix='sst-derivados-')
+        self.cache = CacheDerivados(directorio=os.path.join(self.directorio, 'derivados'))
+        self.parches = [
+            mock.patch.object(AlmacenEvidencias, 'DIRECTORIO', os.path.join(self.directorio, 'objetos')),
+            mock.patch('app.routes.reportes.cache_derivados', self.cache),
+        ]
+        for parche in self.parches:
+            parche.start()
+
+        with self.app.app_context():
+            db.create_all()
+            usuarios = []
+            for i in range(2):
+                usuario = Usuario(email=f'empleado{i}@test.com', nombre_completo=f'Empleado {i}', rol='Empleado', activo=True)
+                usuario.set_password('pass')
+                usuarios.append(usuario)
+            db.session.add_all(usuarios)
+            db.session.commit()
+
+            self.original = foto()
+            reporte = CondicionInsegura(numero_reporte='REP-DER-1', titulo='Andamio', descripcion='Sin baranda',
+                                        empleado_reportador_id=usuarios[0].id,
+                                        imagen_url=AlmacenEvidencias.guardar(io.BytesIO(self.original)).ruta)
+            db.session.add(reporte)
+            db.session.commit()
+            self.reporte_id = reporte.id
+            self.usuario_ids = [u.id for u in usuarios]
+
+    def tearDown(self):
+        for parche in self.parches:
+            parche.stop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def iniciar_sesion(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def test_miniatura_se_genera_una_vez(self):
+        """Prueba: la miniatura es una WebP de pocos KB generada solo en el primer pedido"""
+        self.iniciar_sesion(self.usuario_ids[0])
+        url = f'/reportes/{self.reporte_id}/evidencia/miniatura'
+
+        primera = self.client.get(url)
+        self.assertEqual((primera.status_code, primera.mimetype), (200, 'image/webp'))
+        with Image.open(io.BytesIO(primera.data)) as imagen:
+            self.assertEqual((imagen.format, max(imagen.size)), ('WEBP', 320))
+        self.assertLess(len(primera.data) * 10, len(self.original))
+        self.assertIn('private', primera.headers['Cache-Control'])
+
+        segunda = self.client.get(url)
+        self.assertEqual(segunda.data, primera.data)
+        metricas = self.cache.metricas()
+        self.assertEqual((metricas['generados'], metricas['aciertos']), (1, 1))
+
+        media = self.client.get(f'/reportes/{self.reporte_id}/evidencia/media')
+        with Image.open(io.BytesIO(media.data)) as imagen:
+            self.assertEqual(max(imagen.size), 1280)
+        self.assertNotEqual(media.headers['ETag'], primera.headers['ETag'])
+
+    def test_original_con_etag_y_rangos(self):
+        """Prueba: el original responde 304 con If-None-Match y 206 con Range"""
+        self.iniciar_sesion(self.usuario_ids[0])
+        url = f'/reportes/{self.reporte_id}/evidencia'
+
+        completa = self.client.get(url)
+        self.assertEqual((completa.status_code, completa.mimetype), (200, 'image/jpeg'))
+        self.assertEqual(completa.data, self.original)
+        etag = completa.headers['ETag']
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        parcial = self.client.get(url, headers={'Range': 'bytes=100-1123'})
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(parcial.data, self.original[100:1124])
+        self.assertEqual(parcial.headers['Content-Range'], f'bytes 100-1123/{len(self.original)}')
+
+    def test_permisos_y_variante_desconocida(self):
+        """Prueba: otro empleado no ve la evidencia y una variante inventada da 404"""
+        self.iniciar_sesion(self.usuario_ids[1])
+        self.assertEqual(self.client.get(f'/reportes/{self.reporte_id}/evidencia/miniatura').status_code, 403)
+
+        self.iniciar_sesion(self.usuario_ids[0])
+        self.assertEqual(self.client.get(f'/reportes/{self.reporte_id}/evidencia/gigante').status_code, 404)
+        self.assertEqual(self.cache.metricas()['generados'], 0)
+
+    def test_desalojo_por_tamano(self):
+        """Prueba: al pasarse del máximo se borran los derivados usados hace más tiempo"""
+        originales = []
+        for i in range(4):
+            ruta = os.path.join(self.directorio, f'foto{i}.jpg')
+            with open(ruta, 'wb') as f:
+                f.write(foto(tamano=(900, 700)))
+            originales.append(ruta)
+
+        tamano = os.path.getsize(self.cache.obtener(originales[0], 'miniatura'))
+        cache = CacheDerivados(directorio=self.cache.directorio, max_bytes=int(tamano * 2.5))
+        derivados = [cache.obtener(ruta, 'miniatura') for ruta in originales[:2]]
+
+        # La primera se usó hace una hora: es la que sale
+        hace_una_hora = time.time() - 3600
+        os.utime(derivados[0], (hace_una_hora, hace_una_hora))
+        derivados.append(cache.obtener(originales[2], 'miniatura'))
+
+        self.assertFalse(os.path.exists(derivados[0]))
+        self.assertTrue(all(os.path.exists(ruta) for ruta in derivados[1:]))
+        metricas = cache.metricas()
+        self.assertLessEqual(metricas['bytes'], cache.max_bytes)
+        self.assertEqual(metricas['desalojos'], 1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,161 @@
+"""
+TEST SUITE - Línea de tiempo de escalamiento
+Pruebas para EscalonamientoService y AccionProgramada
+Comando: python tests/test_escalonamiento.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import (
+    Usuario, CondicionInsegura, GestionReporte, GestorResponsabilidades,
+    ReglasEscalonamiento, PasoEscalonamiento, AccionProgramada, TareaGestion,
+    HistorialGestion, Notificacion
+)
+from app.services.escalonamiento_service import EscalonamientoService
+from app.tasks.temporizador import temporizador
+
+class TestLineaTiempoEscalonamiento(unittest.TestCase):
+    """Cálculo y ejecución de acciones programadas"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        # Las acciones se ejecutan a mano en las pruebas
+        temporizador.detener()
+
+        with self.app.app_context():
+            db.create_all()
+            self._crear_datos_prueba()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _crear_datos_prueba(self):
+        gestor = Usuario(email='gestor@test.com', nombre_completo='Gestor', rol='Gestor_RRHH', activo=True)
+        gerente = Usuario(email='gerente@test.com', nombre_completo='Gerente', rol='Gerente', activo=True)
+        for usuario in (gestor, gerente):
+            usuario.set_password('pass')
+        db.session.add_all([gestor, gerente])
+
+        regla = ReglasEscalonamiento(nombre='Crítico', nivel_riesgo_minimo=3, nivel_riesgo_maximo=5, activo=True)
+        db.session.add(regla)
+        db.session.flush()
+        db.session.add_all([
+            PasoEscalonamiento(regla_id=regla.id, numero_paso=1, rol_destino='Gerente', minutos_delay=5),
+            PasoEscalonamiento(regla_id=regla.id, numero_paso=2, rol_destino='Admin', minutos_delay=30),
+        ])
+
+        config = GestorResponsabilidades(rol_principal='Gestor_RRHH', rol_backup_1='Gerente')
+        reporte = CondicionInsegura(numero_reporte='REP-ESC-001', titulo='Cable suelto',
+                                    descripcion='Cable', severidad_calculada=4)
+        db.session.add_all([config, reporte])
+        db.session.flush()
+
+        self.fecha_asignacion = datetime(2025, 1, 1, 8, 0)
+        gestion = GestionReporte(
+            reporte_id=reporte.id,
+            gestor_actual_id=gestor.id,
+            rol_gestor='Gestor_RRHH',
+            gestor_responsabilidad_id=config.id,
+            fecha_asignacion=self.fecha_asignacion,
+            fecha_vencimiento_respuesta=self.fecha_asignacion + timedelta(minutes=30),
+            fecha_vencimiento_resolucion=self.fecha_asignacion + timedelta(minutes=1440)
+        )
+        db.session.add(gestion)
+        db.session.commit()
+
+        self.gestion_id = gestion.id
+        self.gerente_id = gerente.id
+
+    def test_linea_tiempo_acumula_delays(self):
+        """Prueba: los minutos_delay se acumulan desde la asignación"""
+        with self.app.app_context():
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            acciones = EscalonamientoService.programar_linea_tiempo(gestion)
+
+            pasos = [a for a in acciones if a.tipo == EscalonamientoService.TIPO_ESCALONAMIENTO]
+            self.assertEqual([a.rol_destino for a in pasos], ['Gerente', 'Admin'])
+            self.assertEqual(pasos[0].next_action_at, self.fecha_asignacion + timedelta(minutes=5))
+            self.assertEqual(pasos[1].next_action_at, self.fecha_asignacion + timedelta(minutes=35))
+
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            self.assertEqual(gestion.fecha_proximo_escalamiento, self.fecha_asignacion + timedelta(minutes=5))
+
+    def test_ejecutar_vencidas_escala_una_vez(self):
+        """Prueba: la acción vencida escala al rol del paso y no se repite"""
+        with self.app.app_context():
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            EscalonamientoService.programar_linea_tiempo(gestion)
+
+            paso_1 = AccionProgramada.query.filter_by(numero_paso=1).first()
+            # Evitar SendGrid / crear_tarea en la prueba
+            paso_1.enviar_notificacion = False
+            paso_1.crear_tarea = False
+            paso_2 = AccionProgramada.query.filter_by(numero_paso=2).first()
+            paso_2.next_action_at = datetime.utcnow() + timedelta(days=1)
+            AccionProgramada.query.filter(AccionProgramada.tipo != 'ESCALONAMIENTO').update(
+                {'next_action_at': datetime.utcnow() + timedelta(days=1)}
+            )
+            db.session.commit()
+
+            self.assertEqual(EscalonamientoService.ejecutar_vencidas(), 1)
+            self.assertEqual(EscalonamientoService.ejecutar_vencidas(), 0)
+
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            self.assertEqual(gestion.gestor_actual_id, self.gerente_id)
+            self.assertEqual(gestion.estado, 'Escalado')
+
+    def test_escalamiento_masivo(self):
+        """Prueba: un lote escala varias gestiones e inserta tareas y correos en una transacción"""
+        with self.app.app_context():
+            base = db.session.get(GestionReporte, self.gestion_id)
+            vencida = datetime.utcnow() - timedelta(minutes=1)
+            for i in range(5):
+                reporte = CondicionInsegura(numero_reporte=f'REP-LOTE-{i}', titulo=f'Lote {i}', descripcion='x')
+                db.session.add(reporte)
+                db.session.flush()
+                gestion = GestionReporte(reporte_id=reporte.id, gestor_actual_id=base.gestor_actual_id,
+                                         rol_gestor='Gestor_RRHH', gestor_responsabilidad_id=base.gestor_responsabilidad_id,
+                                         fecha_vencimiento_respuesta=vencida)
+                db.session.add(gestion)
+                db.session.flush()
+                db.session.add(AccionProgramada(gestion_reporte_id=gestion.id, tipo='ESCALONAMIENTO', numero_paso=1,
+                                                enviar_notificacion=(i % 2 == 0), next_action_at=vencida))
+            db.session.commit()
+
+            self.assertEqual(EscalonamientoService.ejecutar_vencidas(), 5)
+            correos = Notificacion.query.filter_by(tipo='ESCALONAMIENTO').all()
+            self.assertEqual(len(correos), 3)
+            self.assertTrue(all(c.destinatario == 'gerente@test.com' for c in correos))
+
+            escaladas = GestionReporte.query.filter_by(estado='Escalado').all()
+            self.assertEqual(len(escaladas), 5)
+            self.assertTrue(all(g.gestor_actual_id == self.gerente_id for g in escaladas))
+            self.assertEqual(HistorialGestion.query.filter_by(accion='ESCALONAMIENTO').count(), 5)
+            self.assertEqual(TareaGestion.query.filter_by(asignado_a_id=self.gerente_id).count(), 5)
+            self.assertEqual(AccionProgramada.query.filter_by(estado='Pendiente').count(), 0)
+
+    def test_respuesta_cancela_pasos(self):
+        """Prueba: si el gestor responde, los pasos pendientes se cancelan"""
+        with self.app.app_context():
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            EscalonamientoService.programar_linea_tiempo(gestion)
+
+            EscalonamientoService.cancelar_pendientes(
+                self.gestion_id, tipos=[EscalonamientoService.TIPO_ESCALONAMIENTO]
+            )
+
+            pendientes = AccionProgramada.query.filter_by(estado='Pendiente').all()
+            self.assertEqual({a.tipo for a in pendientes},
+                             {EscalonamientoService.TIPO_AVISO_CRITICO,
+                              EscalonamientoService.TIPO_VENCIMIENTO_RESOLUCION})
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
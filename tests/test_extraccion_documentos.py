@@ -0,0 +1,232 @@
+"""
+TEST SUITE - Extracción de texto de documentos legales
+Pruebas para extraccion_texto y ExtraccionDocumentos: PDF/DOCX/XLSX, caché por hash_documento, carga y búsqueda
+Comando: python tests/test_extraccion_documentos.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import importlib.util
+import io
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+from openpyxl import Workbook
+from werkzeug.datastructures import FileStorage
+from app import create_app, db
+from app.models import Usuario, ConsultaJuridica, DocumentoLegal, TextoExtraido, TrabajoFondo
+from app.services.busqueda_service import BusquedaService
+from app.services.indice_normativa import IndiceNormativa
+from app.tasks.extraccion_documentos import ExtraccionDocumentos
+from app.tasks.temporizador import temporizador
+from app.utils import extraccion_texto
+
+def docx(*parrafos):
+    cuerpo = ''.join(f'<w:p><w:r><w:t>{p}</w:t></w:r></w:p>' for p in parrafos)
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, 'w') as archivo:
+        archivo.writestr('word/document.xml',
+                         '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                         f'<w:body>{cuerpo}</w:body></w:document>')
+    return salida.getvalue()
+
+def xlsx(filas):
+    libro = Workbook()
+    libro.active.title = 'Matriz'
+    for fila in filas:
+        libro.active.append(fila)
+    salida = io.BytesIO()
+    libro.save(salida)
+    return salida.getvalue()
+
+def pdf(*lineas):
+    """PDF mínimo de una página con una línea de texto por argumento (ASCII)"""
+    contenido = 'BT /F1 12 Tf 72 720 Td ' + ' '.join(f'({linea}) Tj 0 -16 Td' for linea in lineas) + ' ET'
+    objetos = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R '
+        '/Resources << /Font << /F1 5 0 R >> >> >>',
+        f'<< /Length {len(contenido)} >>\nstream\n{contenido}\nendstream',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    salida = b'%PDF-1.4\n'
+    posiciones = []
+    for numero, objeto in enumerate(objetos, 1):
+        posiciones.append(len(salida))
+        salida += f'{numero} 0 obj\n{objeto}\nendobj\n'.encode('ascii')
+    xref = len(salida)
+    salida += f'xref\n0 {len(objetos) + 1}\n0000000000 65535 f \n'.encode('ascii')
+    salida += ''.join(f'{posicion:010d} 00000 n \n' for posicion in posiciones).encode('ascii')
+    salida += f'trailer\n<< /Size {len(objetos) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('ascii')
+    return salida
+
+class TestExtraccionDocumentos(unittest.TestCase):
+    """Cada archivo se lee una vez por contenido y su texto queda en la búsqueda"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        temporizador.detener()
+
+        self.directorio = tempfile.mkdtemp(prefix='sst-juridico-')
+        self.parche = mock.patch.object(ExtraccionDocumentos, 'DIRECTORIO', self.directorio)
+        self.parche.start()
+        self.extractor = ExtraccionDocumentos(procesos=1)
+
+        with self.app.app_context():
+            db.create_all()
+            abogado = Usuario(email='abogado@test.com', nombre_completo='Abogado', rol='Abogado', activo=True)
+            abogado.set_password('pass')
+            consulta = ConsultaJuridica(numero_consulta='CONS-X-1', titulo='Trabajo en alturas',
+                                        descripcion='Consulta de prueba')
+            db.session.add_all([abogado, consulta])
+            db.session.commit()
+            self.abogado_id = abogado.id
+            self.consulta_id = consulta.id
+
+    def tearDown(self):
+        self.extractor.cerrar()
+        self.parche.stop()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def iniciar_sesion(self):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.abogado_id)
+            sess['_fresh'] = True
+
+    def cargar(self, contenido, nombre_archivo, nombre='Concepto'):
+        return self.client.post(f'/juridico/{self.consulta_id}/documento/cargar', data={
+            'nombre': nombre, 'tipo': 'Concepto Jurídico', 'contenido': '',
+            'archivo': (io.BytesIO(contenido), nombre_archivo),
+        }, content_type='multipart/form-data')
+
+    def test_extraer_docx_y_xlsx(self):
+        """Prueba: texto por párrafos del DOCX, celdas por hoja del XLSX y corte en max_caracteres"""
+        ruta_docx = os.path.join(self.directorio, 'a.docx')
+        ruta_xlsx = os.path.join(self.directorio, 'b.xlsx')
+        with open(ruta_docx, 'wb') as archivo:
+            archivo.write(docx('Artículo 1. Arnés certificado', 'Artículo 2. Línea de vida'))
+        with open(ruta_xlsx, 'wb') as archivo:
+            archivo.write(xlsx([['Peligro', 'Control'], ['Caída', 'Baranda'], [None, 3]]))
+
+        resultado = extraccion_texto.extraer(ruta_docx, 'docx')
+        self.assertIsNone(resultado['error'])
+        self.assertEqual(resultado['texto'], 'Artículo 1. Arnés certificado\nArtículo 2. Línea de vida')
+
+        resultado = extraccion_texto.extraer(ruta_xlsx, 'xlsx')
+        self.assertEqual(resultado['texto'], '# Matriz\nPeligro\tControl\nCaída\tBaranda\n3')
+        self.assertEqual(resultado['paginas'], 1)
+
+        corto = extraccion_texto.extraer(ruta_docx, 'docx', max_caracteres=12)
+        self.assertTrue(corto['truncado'])
+        self.assertEqual(corto['texto'], 'Artículo 1.')
+
+        self.assertEqual(extraccion_texto.detectar_formato(b'PK\x03\x04', 'x.zip'), None)
+        self.assertEqual(extraccion_texto.detectar_formato(b'%PDF-1.7', 'x.docx'), 'pdf')
+
+    @unittest.skipUnless(importlib.util.find_spec('pypdf'), 'pypdf no está instalado')
+    def test_extraer_pdf(self):
+        """Prueba: texto de las páginas del PDF y el documento cargado queda Extraido"""
+        contenido = pdf('Articulo 3. Uso obligatorio de arnes', 'Articulo 4. Linea de vida certificada')
+        ruta = os.path.join(self.directorio, 'c.pdf')
+        with open(ruta, 'wb') as archivo:
+            archivo.write(contenido)
+
+        resultado = extraccion_texto.extraer(ruta, 'pdf')
+        self.assertIsNone(resultado['error'])
+        self.assertEqual(resultado['paginas'], 1)
+        self.assertIn('Uso obligatorio de arnes', resultado['texto'])
+        self.assertIn('Linea de vida certificada', resultado['texto'])
+
+        self.iniciar_sesion()
+        self.assertEqual(self.cargar(contenido, 'resolucion.pdf').status_code, 302)
+        with self.app.app_context():
+            self.assertEqual(self.extractor.procesar()['extraidos'], 1)
+            documento = DocumentoLegal.query.one()
+            self.assertEqual(documento.estado_extraccion, 'Extraido')
+            self.assertIn('arnes', documento.texto_extraido)
+
+    def test_carga_extraccion_y_cache_por_hash(self):
+        """Prueba: la carga encola la extracción; el mismo archivo otra vez sale de la caché sin trabajo"""
+        self.iniciar_sesion()
+        contenido = docx('El empleador certificará al personal en andamios colgantes')
+        self.assertEqual(self.cargar(contenido, 'concepto.docx').status_code, 302)
+
+        with self.app.app_context():
+            documento = DocumentoLegal.query.one()
+            self.assertEqual(documento.estado_extraccion, 'Pendiente')
+            self.assertTrue(os.path.exists(documento.ruta_archivo))
+            trabajo = TrabajoFondo.query.one()
+            self.assertEqual((trabajo.tipo, trabajo.parametros), ('extraer_texto_documentos',
+                                                                  {'documento_ids': [documento.id]}))
+
+            resumen = self.extractor.procesar()
+            self.assertEqual((resumen['archivos'], resumen['extraidos']), (1, 1))
+            documento = db.session.get(DocumentoLegal, documento.id)
+            self.assertEqual(documento.estado_extraccion, 'Extraido')
+            self.assertIn('andamios colgantes', documento.texto_extraido)
+
+            with self.app.test_request_context():
+                abogado = db.session.get(Usuario, self.abogado_id)
+                self.assertEqual([r['id'] for r in BusquedaService.buscar('andamios', abogado)], [documento.id])
+            self.assertIn('andamios', IndiceNormativa.texto_documento(documento)[2])
+
+        # Mismo contenido con otro nombre: sin trabajo nuevo y sin volver a leer el archivo
+        self.assertEqual(self.cargar(contenido, 'copia.docx', nombre='Copia').status_code, 302)
+        with self.app.app_context():
+            copia = DocumentoLegal.query.filter_by(nombre='Copia').one()
+            self.assertEqual(copia.estado_extraccion, 'Extraido')
+            self.assertEqual(TrabajoFondo.query.count(), 1)
+            self.assertEqual(TextoExtraido.query.count(), 1)
+            self.assertEqual(len(os.listdir(os.path.dirname(copia.ruta_archivo))), 1)
+
+    def test_cache_y_fallidos_en_lote(self):
+        """Prueba: en un lote cada hash se lee una vez; un PDF ilegible queda Fallido hasta que se reintenta"""
+        with self.app.app_context():
+            matriz = xlsx([['Extintor', 'Vencido']])
+            documentos = []
+            for nombre, contenido, archivo in (('A', matriz, 'a.xlsx'), ('B', matriz, 'b.xlsx'),
+                                              ('C', b'%PDF-1.4\nno es un pdf', 'c.pdf')):
+                guardado = ExtraccionDocumentos.guardar_archivo(FileStorage(io.BytesIO(contenido), filename=archivo))
+                documentos.append(DocumentoLegal(
+                    consulta_id=self.consulta_id, nombre=nombre, ruta_archivo=guardado.ruta,
+                    hash_documento=guardado.hash_documento, estado_extraccion='Pendiente'))
+            db.session.add_all(documentos)
+            db.session.commit()
+
+            resumen = self.extractor.procesar()
+            self.assertEqual(resumen, {'documentos': 3, 'archivos': 2, 'desde_cache': 0,
+                                       'extraidos': 2, 'fallidos': 1})
+            estados = {d.nombre: d.estado_extraccion for d in DocumentoLegal.query}
+            self.assertEqual(estados, {'A': 'Extraido', 'B': 'Extraido', 'C': 'Fallido'})
+            fallido = TextoExtraido.query.filter(TextoExtraido.error.isnot(None)).one()
+            self.assertEqual(fallido.formato, 'pdf')
+
+            # Los fallidos no vuelven solos; reintentar_fallidos los devuelve a
+            # Pendiente y el error en caché no se reutiliza: el archivo se lee otra vez
+            self.assertEqual(self.extractor.procesar()['documentos'], 0)
+            self.assertEqual(ExtraccionDocumentos.reintentar_fallidos(), 1)
+            resumen = self.extractor.procesar()
+            self.assertEqual(resumen, {'documentos': 1, 'archivos': 1, 'desde_cache': 0,
+                                       'extraidos': 0, 'fallidos': 1})
+
+    def test_archivo_no_soportado(self):
+        """Prueba: un archivo que no es PDF, DOCX ni XLSX no crea el documento"""
+        self.iniciar_sesion()
+        respuesta = self.cargar(b'texto plano', 'notas.txt')
+        self.assertEqual(respuesta.status_code, 302)
+        with self.app.app_context():
+            self.assertEqual(DocumentoLegal.query.count(), 0)
+            self.assertEqual(TrabajoFondo.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,95 @@
+"""
+TEST SUITE - Historial de gestión
+Pruebas para HistorialGestion, la API de línea de tiempo y la migración del JSON
+Comando: python tests/test_historial.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura, GestionReporte, HistorialGestion
+from scripts.migrar_historial_gestion import migrar_lote
+
+class TestHistorialGestion(unittest.TestCase):
+    """Eventos en tabla propia en lugar de JSON"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            admin = Usuario(email='admin@test.com', nombre_completo='Admin', rol='Admin', activo=True)
+            admin.set_password('admin123')
+            reporte = CondicionInsegura(numero_reporte='REP-HIST-001', titulo='Derrame')
+            db.session.add_all([admin, reporte])
+            db.session.commit()
+
+            gestion = GestionReporte(reporte_id=reporte.id, gestor_actual_id=admin.id)
+            for i in range(12):
+                gestion.agregar_cambio(admin.id, 'CAMBIO', f'Evento {i}')
+            db.session.add(gestion)
+            db.session.commit()
+
+            self.admin_id = admin.id
+            self.reporte_id = reporte.id
+            self.gestion_id = gestion.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_agregar_cambio_inserta_filas(self):
+        """Prueba: cada cambio es una fila y el JSON no se toca"""
+        with self.app.app_context():
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            self.assertEqual(gestion.eventos.count(), 12)
+            self.assertIsNone(gestion.historial_cambios)
+
+    def test_api_historial_paginada(self):
+        """Prueba: la línea de tiempo se recorre por cursor sin repetir eventos"""
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.admin_id)
+            sess['_fresh'] = True
+
+        primera = self.client.get(f'/reportes/{self.reporte_id}/historial?limite=10').get_json()
+        self.assertEqual(len(primera['items']), 10)
+        self.assertEqual(primera['items'][0]['descripcion'], 'Evento 11')
+
+        segunda = self.client.get(
+            f"/reportes/{self.reporte_id}/historial?limite=10&cursor={primera['next_cursor']}"
+        ).get_json()
+        self.assertEqual([e['descripcion'] for e in segunda['items']], ['Evento 1', 'Evento 0'])
+        self.assertIsNone(segunda['next_cursor'])
+
+    def test_migracion_json(self):
+        """Prueba: la migración convierte el JSON en filas y deja la columna en NULL"""
+        with self.app.app_context():
+            reporte = CondicionInsegura(numero_reporte='REP-HIST-002', titulo='Heredado')
+            db.session.add(reporte)
+            db.session.flush()
+            heredada = GestionReporte(reporte_id=reporte.id, historial_cambios=[
+                {'fecha': '2024-05-01T10:00:00', 'usuario_id': self.admin_id,
+                 'accion': 'ASIGNACION_AUTOMATICA', 'descripcion': 'Asignado'},
+                {'fecha': '2024-05-01T11:00:00', 'usuario_id': self.admin_id,
+                 'accion': 'RESPUESTA', 'descripcion': 'Gestor respondió'},
+            ])
+            db.session.add(heredada)
+            db.session.commit()
+            heredada_id = heredada.id
+
+            gestiones, eventos, _ = migrar_lote(0, 100)
+            self.assertEqual((gestiones, eventos), (1, 2))
+            self.assertEqual(migrar_lote(0, 100)[0], 0)
+
+            acciones = [e.accion for e in HistorialGestion.query.filter_by(gestion_reporte_id=heredada_id)
+                        .order_by(HistorialGestion.fecha)]
+            self.assertEqual(acciones, ['ASIGNACION_AUTOMATICA', 'RESPUESTA'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,81 @@
+"""
+TEST SUITE - Preproceso de imágenes para IA
+Pruebas para ImagenProcessor: formato real, EXIF, reducción y recodificación
+Comando: python tests/test_imagen_processor.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import unittest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app.services.imagen_processor import ImagenProcessor
+
+def imagen(formato, tamano=(800, 600), modo='RGB', exif=None):
+    salida = io.BytesIO()
+    opciones = {'exif': exif} if exif is not None else {}
+    Image.new(modo, tamano, (10, 120, 200) if modo == 'RGB' else (10, 120, 200, 0)).save(salida, formato, **opciones)
+    return salida.getvalue()
+
+def exif_con_gps():
+    exif = Image.Exif()
+    exif[0x0110] = 'Camara de prueba'  # Model
+    exif[0x0112] = 6                   # Orientation: rotada 90°
+    exif[0x8825] = {1: 'N', 2: (4.0, 36.0, 0.0)}  # GPSInfo
+    return exif
+
+class TestPreprocesoImagen(unittest.TestCase):
+    """El modelo recibe una imagen pequeña, sin metadatos y con el mime type correcto"""
+
+    def test_detectar_formato_por_contenido(self):
+        """Prueba: el formato sale de la firma, no de la extensión"""
+        self.assertEqual(ImagenProcessor.detectar_formato(imagen('JPEG')), 'jpeg')
+        self.assertEqual(ImagenProcessor.detectar_formato(imagen('PNG')), 'png')
+        self.assertEqual(ImagenProcessor.detectar_formato(imagen('WEBP')), 'webp')
+        self.assertIsNone(ImagenProcessor.detectar_formato(b'<?php echo 1; ?>'))
+
+    def test_archivo_con_extension_falsa_no_es_valido(self):
+        """Prueba: un .jpg que no es imagen se rechaza al subirlo"""
+        valido, _ = ImagenProcessor.es_imagen_valida(FileStorage(io.BytesIO(b'no soy imagen'), filename='foto.jpg'))
+        self.assertFalse(valido)
+        valido, _ = ImagenProcessor.es_imagen_valida(FileStorage(io.BytesIO(imagen('PNG')), filename='foto.jpg'))
+        self.assertTrue(valido)
+
+    def test_reduce_y_quita_exif(self):
+        """Prueba: lado mayor <= MAX_LADO_IA, orientación aplicada y sin EXIF"""
+        original = imagen('JPEG', (4000, 3000), exif=exif_con_gps())
+        datos, mime_type = ImagenProcessor.preparar_para_ia(original)
+
+        self.assertEqual(mime_type, 'image/jpeg')
+        with Image.open(io.BytesIO(datos)) as resultado:
+            self.assertLessEqual(max(resultado.size), ImagenProcessor.MAX_LADO_IA)
+            self.assertGreater(resultado.height, resultado.width)  # Orientación 6 aplicada
+            self.assertEqual(len(resultado.getexif()), 0)
+        self.assertLess(len(datos), len(original))
+
+    def test_png_con_transparencia_a_jpeg(self):
+        """Prueba: PNG/WebP se recodifican a JPEG sobre fondo blanco"""
+        datos, mime_type = ImagenProcessor.preparar_para_ia(imagen('PNG', (300, 200), modo='RGBA'))
+        self.assertEqual(mime_type, 'image/jpeg')
+        self.assertEqual(ImagenProcessor.detectar_formato(datos), 'jpeg')
+        with Image.open(io.BytesIO(datos)) as resultado:
+            self.assertEqual(resultado.size, (300, 200))
+
+    def test_quitar_exif_sin_pillow(self):
+        """Prueba: sin decodificar, el JPEG pierde el segmento APP1 y sigue siendo válido"""
+        original = imagen('JPEG', (120, 80), exif=exif_con_gps())
+        limpio = ImagenProcessor._quitar_exif_jpeg(original)
+        self.assertIn(b'Exif\x00\x00', original)
+        self.assertNotIn(b'Exif\x00\x00', limpio)
+        with Image.open(io.BytesIO(limpio)) as resultado:
+            self.assertEqual(resultado.size, (120, 80))
+
+    def test_contenido_invalido(self):
+        """Prueba: lo que no es imagen no llega al modelo"""
+        with self.assertRaises(ValueError):
+            ImagenProcessor.preparar_para_ia(b'GIF89a...')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,134 @@
+"""
+TEST SUITE - Índice de normativa
+Pruebas para IndiceNormativa (BM25 en memoria) y los pasajes en el prompt del chat
+Comando: python tests/test_indice_normativa.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from app import create_app, db
+from app.models import Usuario, ConsultaJuridica, DocumentoLegal
+from app.services.cache_chat_ia import cache_chat_ia
+from app.services.gemini_service import GeminiService
+from app.services.indice_normativa import indice_normativa, IndiceNormativa
+
+class PasarelaRegistro:
+    """Guarda los prompts que recibiría el modelo"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generar(self, contenido, modelo, timeout=None, contexto=None):
+        self.prompts.append(contenido)
+        return 'Respuesta'
+
+class TestIndiceNormativa(unittest.TestCase):
+    """La normativa relevante llega al prompt y el índice sigue los cambios confirmados"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        indice_normativa.reiniciar()
+        cache_chat_ia.invalidar()
+
+        with self.app.app_context():
+            db.create_all()
+            abogado = Usuario(email='abogado@test.com', nombre_completo='Abogado', rol='Abogado', activo=True)
+            abogado.set_password('pass')
+            db.session.add(abogado)
+            db.session.flush()
+            self.abogado_id = abogado.id
+
+            normas = [
+                ('RES-0312-2019', 'Resolución 0312 de 2019', 'Estándares mínimos del SG-SST según número de trabajadores'),
+                ('DEC-1072-2015', 'Decreto 1072 de 2015', 'Decreto Único Reglamentario del Sector Trabajo'),
+                ('RES-1401-2007', 'Resolución 1401 de 2007', 'Investigación de incidentes y accidentes de trabajo'),
+            ]
+            for codigo, nombre, descripcion in normas:
+                consulta = ConsultaJuridica(
+                    numero_consulta=f'NORM-{codigo}', titulo=f'Normativa: {nombre}', descripcion=descripcion,
+                    tipo_consulta='Laboral', responsable_creador_id=abogado.id,
+                    normativa_aplicable={'codigo': codigo, 'nombre': nombre, 'url': 'https://www.mintrabajo.gov.co'}
+                )
+                db.session.add(consulta)
+                db.session.flush()
+                db.session.add(DocumentoLegal(consulta_id=consulta.id, nombre=f'Documento: {nombre}', tipo='Normativa',
+                                              contenido=f'{nombre}\n{descripcion}', creado_por_id=abogado.id))
+            db.session.commit()
+
+    def tearDown(self):
+        indice_normativa.reiniciar()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_pasaje_mas_relevante_primero(self):
+        """Prueba: los términos de la pregunta (sin tildes ni mayúsculas) ordenan por BM25"""
+        with self.app.app_context():
+            pasajes = indice_normativa.buscar('¿Qué estándares mínimos exige la resolucion 0312?', k=2)
+            self.assertEqual(pasajes[0]['titulo'], 'Documento: Resolución 0312 de 2019')
+            self.assertNotIn('Decreto 1072', ' '.join(p['titulo'] for p in pasajes))
+            self.assertEqual(indice_normativa.buscar('xyz inexistente'), [])
+
+    def test_actualizacion_incremental(self):
+        """Prueba: un documento confirmado entra al índice, uno revertido no, y al editarlo se reindexa"""
+        with self.app.app_context():
+            self.assertTrue(indice_normativa.buscar('decreto 1072'))
+            documentos = indice_normativa.estadisticas()['documentos']
+            consulta_id = ConsultaJuridica.query.first().id
+
+            documento = DocumentoLegal(consulta_id=consulta_id, nombre='Circular alturas', tipo='Normativa',
+                                       contenido='Trabajo seguro en alturas: reentrenamiento anual', creado_por_id=self.abogado_id)
+            db.session.add(documento)
+            db.session.commit()
+            self.assertEqual(indice_normativa.buscar('alturas')[0]['titulo'], 'Circular alturas')
+            self.assertEqual(indice_normativa.estadisticas()['documentos'], documentos + 1)
+
+            documento.contenido = 'Espacios confinados: permiso de trabajo'
+            db.session.commit()
+            self.assertEqual(indice_normativa.buscar('reentrenamiento'), [])
+            self.assertEqual(indice_normativa.buscar('confinados')[0]['titulo'], 'Circular alturas')
+
+            db.session.add(DocumentoLegal(consulta_id=consulta_id, nombre='Borrador', tipo='Normativa',
+                                          contenido='Radiaciones ionizantes', creado_por_id=self.abogado_id))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(indice_normativa.buscar('ionizantes'), [])
+
+            db.session.delete(db.session.get(DocumentoLegal, documento.id))
+            db.session.commit()
+            self.assertEqual(indice_normativa.buscar('confinados'), [])
+
+    def test_prompt_del_chat_con_pasajes(self):
+        """Prueba: el chat envía las fuentes encontradas y la caché cambia si cambia la normativa"""
+        with self.app.app_context():
+            pasarela = PasarelaRegistro()
+            servicio = GeminiService(pasarela=pasarela)
+            servicio.chat_experto_sst('¿Qué dice la Resolución 0312 sobre estándares mínimos?')
+            self.assertIn('[1] Documento: Resolución 0312 de 2019', pasarela.prompts[0])
+            self.assertIn('Pregunta: ¿Qué dice la Resolución 0312', pasarela.prompts[0])
+
+            servicio.chat_experto_sst('que dice resolucion 0312 sobre estandares minimos')
+            self.assertEqual(len(pasarela.prompts), 1)
+
+            documento = DocumentoLegal.query.filter_by(nombre='Documento: Resolución 0312 de 2019').first()
+            documento.contenido += '\nModificada: aplica a contratantes'
+            db.session.commit()
+            servicio.chat_experto_sst('que dice resolucion 0312 sobre estandares minimos')
+            self.assertEqual(len(pasarela.prompts), 2)
+            self.assertIn('aplica a contratantes', pasarela.prompts[1])
+
+    def test_partir_en_pasajes(self):
+        """Prueba: los documentos largos se parten sin perder palabras"""
+        indice = IndiceNormativa()
+        indice.PALABRAS_PASAJE = 10
+        texto = '\n'.join(' '.join(f'p{i}_{j}' for j in range(7)) for i in range(4))
+        pasajes = indice._partir(texto)
+        self.assertEqual([len(p.split()) for p in pasajes], [10, 10, 8])
+        self.assertEqual(' '.join(pasajes).split(), texto.split())
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
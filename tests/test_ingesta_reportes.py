@@ -0,0 +1,199 @@
+"""
+TEST SUITE - Ingesta de reportes
+Pruebas para PipelineIngesta y GestionReportesService.asignar_lote
+Comando: python tests/test_ingesta_reportes.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from app import create_app, db
+from app.models import (
+    Usuario, CondicionInsegura, GestionReporte, GestorResponsabilidades, ReglasEscalonamiento,
+    PasoEscalonamiento, AccionProgramada, TareaGestion, HistorialGestion, Notificacion, IngestaReporte, TipoReporte
+)
+from app.services.asignacion_service import indice_gestores
+from app.services.gestion_reportes_service import GestionReportesService
+from app.services.responsabilidades_service import tabla_responsabilidades
+from app.tasks.ingesta_reportes import PipelineIngesta
+from app.tasks.temporizador import temporizador
+
+class TestIngestaReportes(unittest.TestCase):
+    """El formulario solo encola; la etapa asigna, crea tareas y encola correos en lote"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        temporizador.detener()
+        tabla_responsabilidades.invalidar()
+        indice_gestores.invalidar()
+
+        with self.app.app_context():
+            db.create_all()
+            usuarios = []
+            for i, rol in enumerate(['Gestor_RRHH', 'Gestor_RRHH', 'Gerente', 'Empleado']):
+                usuario = Usuario(email=f'usuario{i}@test.com', nombre_completo=f'Usuario {i}', rol=rol, activo=True)
+                usuario.set_password('pass')
+                usuarios.append(usuario)
+            db.session.add_all(usuarios)
+
+            regla = ReglasEscalonamiento(nombre='General', activo=True)
+            db.session.add(regla)
+            db.session.flush()
+            db.session.add(PasoEscalonamiento(regla_id=regla.id, numero_paso=1, rol_destino='Gerente', minutos_delay=30))
+            db.session.commit()
+            self.gestor_ids = [u.id for u in usuarios[:2]]
+            self.empleado_id = usuarios[3].id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        tabla_responsabilidades.invalidar()
+        indice_gestores.invalidar()
+
+    def iniciar_sesion(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def _configurar_gestores(self):
+        db.session.add(GestorResponsabilidades(rol_principal='Gestor_RRHH', rol_backup_1='Gerente',
+                                               notificar_roles=['Gerente'], activo=True))
+        db.session.commit()
+        tabla_responsabilidades.invalidar()
+
+    def _encolar_reportes(self, cantidad):
+        ids = []
+        for i in range(cantidad):
+            reporte = CondicionInsegura(numero_reporte=f'REP-ING-{i:03d}', titulo=f'Reporte {i}', descripcion='Piso mojado')
+            db.session.add(reporte)
+            db.session.flush()
+            PipelineIngesta.encolar(reporte.id)
+            ids.append(reporte.id)
+        db.session.commit()
+        return ids
+
+    def test_formulario_solo_encola(self):
+        """Prueba: crear un reporte deja su fila de ingesta y no asigna en la petición"""
+        self.iniciar_sesion(self.empleado_id)
+        respuesta = self.client.post('/reportes/nuevo', data={'titulo': 'Escalera rota', 'descripcion': 'Peldaño suelto'})
+        self.assertEqual(respuesta.status_code, 302)
+
+        with self.app.app_context():
+            reporte = CondicionInsegura.query.filter_by(titulo='Escalera rota').one()
+            fila = IngestaReporte.query.one()
+            self.assertEqual((fila.reporte_id, fila.estado), (reporte.id, 'Pendiente'))
+            self.assertEqual(GestionReporte.query.count(), 0)
+
+    def test_regla_por_tipo_de_reporte(self):
+        """Prueba: el tipo elegido en el formulario llega a la ingesta y aplica su regla específica"""
+        with self.app.app_context():
+            self._configurar_gestores()
+            tipo = TipoReporte(nombre='Acto inseguro')
+            db.session.add(tipo)
+            db.session.flush()
+            db.session.add(GestorResponsabilidades(tipo_reporte_id=tipo.id, rol_principal='Gerente', activo=True))
+            db.session.commit()
+            tabla_responsabilidades.invalidar()
+            tipo_id = tipo.id
+
+        self.iniciar_sesion(self.empleado_id)
+        for titulo, tipo_reporte_id in (('Sin casco', str(tipo_id)), ('Piso mojado', '')):
+            respuesta = self.client.post('/reportes/nuevo', data={
+                'titulo': titulo, 'descripcion': titulo, 'tipo_reporte_id': tipo_reporte_id, 'ubicacion_id': '7'})
+            self.assertEqual(respuesta.status_code, 302)
+
+        with self.app.app_context():
+            reporte = CondicionInsegura.query.filter_by(titulo='Sin casco').one()
+            self.assertEqual((reporte.metadata_adicional['tipo_reporte_id'], reporte.metadata_adicional['ubicacion_id']),
+                             (tipo_id, 7))
+            self.assertEqual(PipelineIngesta.procesar_lote(), 2)
+            roles = dict(db.session.query(CondicionInsegura.titulo, GestionReporte.rol_gestor)
+                         .join(GestionReporte, GestionReporte.reporte_id == CondicionInsegura.id))
+            self.assertEqual(roles, {'Sin casco': 'Gerente', 'Piso mojado': 'Gestor_RRHH'})
+
+    def test_lote_asigna_tareas_y_correos(self):
+        """Prueba: un lote deja gestión, línea de tiempo, tarea, historial y correos por reporte"""
+        with self.app.app_context():
+            self._configurar_gestores()
+            ids = self._encolar_reportes(6)
+
+            self.assertEqual(PipelineIngesta.procesar_lote(), 6)
+            self.assertEqual(PipelineIngesta.procesar_lote(), 0)
+
+            gestiones = GestionReporte.query.order_by(GestionReporte.reporte_id).all()
+            self.assertEqual([g.reporte_id for g in gestiones], ids)
+            # Menor carga: se reparte entre los dos gestores del rol
+            self.assertEqual(sorted(g.gestor_actual_id for g in gestiones), sorted(self.gestor_ids * 3))
+            self.assertTrue(all(g.fecha_proximo_escalamiento for g in gestiones))
+
+            self.assertEqual(TareaGestion.query.count(), 6)
+            self.assertEqual(HistorialGestion.query.filter_by(accion='ASIGNACION_AUTOMATICA').count(), 6)
+            # Paso configurado + aviso crítico + vencimiento de resolución
+            self.assertEqual(AccionProgramada.query.count(), 6 * 3)
+            tipos = dict(db.session.query(Notificacion.tipo, db.func.count()).group_by(Notificacion.tipo).all())
+            self.assertEqual(tipos, {'ASIGNACION': 6, 'CC': 6})
+
+            filas = IngestaReporte.query.all()
+            self.assertEqual({f.estado for f in filas}, {'Asignado'})
+            self.assertEqual({f.gestion_reporte_id for f in filas}, {g.id for g in gestiones})
+
+            # Idempotente: un reporte ya asignado devuelve su gestión
+            resultados, acciones = GestionReportesService.asignar_lote(ids[:2])
+            self.assertEqual(resultados, {ids[0]: gestiones[0].id, ids[1]: gestiones[1].id})
+            self.assertEqual((acciones, GestionReporte.query.count()), ([], 6))
+
+    def test_sin_gestor_se_reintenta(self):
+        """Prueba: sin reglas el reporte vuelve a la cola con backoff y al final queda Sin_asignar"""
+        with self.app.app_context():
+            self._encolar_reportes(1)
+            self.assertEqual(PipelineIngesta.procesar_lote(), 1)
+
+            fila = IngestaReporte.query.one()
+            self.assertEqual((fila.estado, fila.intentos), ('Pendiente', 1))
+            self.assertGreater(fila.proximo_intento, datetime.utcnow() + timedelta(seconds=30))
+            self.assertEqual(PipelineIngesta.procesar_lote(), 0)
+
+            db.session.execute(db.update(IngestaReporte).values(intentos=PipelineIngesta.MAX_INTENTOS - 1,
+                                                                proximo_intento=datetime.utcnow()))
+            db.session.commit()
+            PipelineIngesta.procesar_lote()
+            db.session.refresh(fila)
+            self.assertEqual(fila.estado, 'Sin_asignar')
+
+            self._configurar_gestores()
+            self.assertEqual(PipelineIngesta.reintentar_sin_asignar(), 1)
+            PipelineIngesta.procesar_lote()
+            db.session.refresh(fila)
+            self.assertEqual(fila.estado, 'Asignado')
+            self.assertEqual(PipelineIngesta.resumen()['estados'], {'Asignado': 1})
+
+    def test_reporte_roto_no_bloquea_el_lote(self):
+        """Prueba: si el lote falla se asigna reporte por reporte y solo el roto se reintenta"""
+        with self.app.app_context():
+            self._configurar_gestores()
+            ids = self._encolar_reportes(4)
+            roto = ids[2]
+            original = GestionReportesService.asignar_lote
+
+            def asignar_lote(reporte_ids):
+                if roto in reporte_ids:
+                    raise RuntimeError('Datos inválidos')
+                return original(reporte_ids)
+
+            with mock.patch.object(GestionReportesService, 'asignar_lote', side_effect=asignar_lote):
+                self.assertEqual(PipelineIngesta.procesar_lote(), 4)
+
+            estados = {f.reporte_id: (f.estado, f.ultimo_error) for f in IngestaReporte.query.all()}
+            self.assertEqual(estados[roto], ('Pendiente', 'RuntimeError: Datos inválidos'))
+            self.assertEqual([estados[i][0] for i in ids if i != roto], ['Asignado'] * 3)
+            self.assertEqual(GestionReporte.query.count(), 3)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -12,7 +12,7 @@ from datetime import datetime, timedelta
 from app import create_app, db
 from app.models import (
     ConsultaJuridica, DocumentoLegal, Usuario, 
-    RolSST, CondicionInsegura
+    RolSST, CondicionInsegura, Notificacion
 )
 
 class TestModuloJuridico(unittest.TestCase):
@@ -188,6 +188,36 @@ class TestModuloJuridico(unittest.TestCase):
             
             print(f"✅ Consulta resuelta")
     
+    def test_resolver_dos_veces_un_correo_al_creador(self):
+        """Prueba: reenviar el formulario de resolución no repite el correo al creador"""
+        with self.app.app_context():
+            consulta = ConsultaJuridica(
+                titulo='Consulta Laboral',
+                descripcion='Incapacidad prolongada',
+                tipo_consulta='Laboral',
+                responsable_creador_id=self.responsable_sst_id,
+                abogado_asignado_id=self.abogado_id
+            )
+            consulta.generar_numero_consulta()
+            db.session.add(consulta)
+            db.session.commit()
+            consulta_id = consulta.id
+        
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.abogado_id)
+            sess['_fresh'] = True
+        for _ in range(2):
+            self.client.post(f'/juridico/{consulta_id}', data={
+                'accion': 'resolver', 'resolucion': 'Procede el reintegro', 'recomendaciones': 'Documentar'
+            })
+        
+        with self.app.app_context():
+            self.assertEqual(db.session.get(ConsultaJuridica, consulta_id).estado, 'Resuelta')
+            correos = Notificacion.query.filter_by(tipo='JURIDICO_RESUELTA').all()
+            self.assertEqual(len(correos), 1)
+            self.assertEqual(correos[0].destinatario, 'responsable@test.com')
+            self.assertEqual(correos[0].clave_dedup, f'JURIDICO_RESUELTA:consulta:{consulta_id}:responsable@test.com')
+    
     def test_crear_documento_legal(self):
         """Prueba: Crear documento legal asociado"""
         with self.app.app_context():
@@ -0,0 +1,163 @@
+"""
+TEST SUITE - Listados paginados por cursor
+Pruebas para ListadoService (reportes, controles, jurídico)
+Comando: python tests/test_listado.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura, GestionReporte
+from app.services.listado_service import ListadoService
+
+class TestListadoKeyset(unittest.TestCase):
+    """Paginación keyset y visibilidad por rol"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            self._crear_datos_prueba()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _crear_datos_prueba(self):
+        self.admin = Usuario(email='admin@test.com', nombre_completo='Admin', rol='Admin', activo=True)
+        self.admin.set_password('admin123')
+        self.empleado = Usuario(email='empleado@test.com', nombre_completo='Empleado', rol='Empleado', activo=True)
+        self.empleado.set_password('empleado123')
+        db.session.add_all([self.admin, self.empleado])
+        db.session.commit()
+
+        self.admin_id = self.admin.id
+        self.empleado_id = self.empleado.id
+
+        # 25 reportes; varios comparten fecha para probar el desempate por id
+        base = datetime(2025, 1, 1)
+        for i in range(25):
+            reporte = CondicionInsegura(
+                numero_reporte=f'REP-TEST-{i:03d}',
+                titulo=f'Reporte {i}',
+                empleado_reportador_id=self.empleado_id if i % 5 == 0 else self.admin_id,
+                fecha_creacion=base + timedelta(hours=i // 3)
+            )
+            db.session.add(reporte)
+        db.session.commit()
+
+    def _login(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def test_cursor_ida_y_vuelta(self):
+        """Prueba: codificar/decodificar cursor"""
+        fecha = datetime(2025, 3, 4, 5, 6, 7)
+        cursor = ListadoService.codificar_cursor(fecha, 42)
+        self.assertEqual(ListadoService.decodificar_cursor(cursor), (fecha, 42))
+
+        with self.assertRaises(ValueError):
+            ListadoService.decodificar_cursor('no-es-un-cursor')
+
+    def test_paginas_sin_duplicados_ni_huecos(self):
+        """Prueba: recorrer todas las páginas devuelve cada fila una vez en orden"""
+        with self.app.app_context():
+            vistos = []
+            cursor = None
+            while True:
+                pagina = ListadoService.paginar(
+                    CondicionInsegura.query,
+                    CondicionInsegura.fecha_creacion,
+                    CondicionInsegura.id,
+                    cursor=cursor,
+                    limite=7
+                )
+                vistos.extend((r.fecha_creacion, r.id) for r in pagina.items)
+                self.assertEqual(pagina.total_aproximado, 25)
+                self.assertTrue(pagina.total_exacto)
+                if not pagina.has_next:
+                    break
+                cursor = pagina.next_cursor
+
+            self.assertEqual(len(vistos), 25)
+            self.assertEqual(len(set(vistos)), 25)
+            self.assertEqual(vistos, sorted(vistos, reverse=True))
+
+    def test_pagina_siguiente_usa_indice(self):
+        """Prueba: la página con cursor es un rango sobre el índice de fecha_creacion, sin ordenar aparte"""
+        with self.app.app_context():
+            consultas = []
+
+            def capturar(conexion, cursor_db, sql, parametros, contexto, varias):
+                consultas.append((sql, parametros))
+
+            cursor = ListadoService.codificar_cursor(datetime(2025, 1, 1, 4), 13)
+            event.listen(db.engine, 'before_cursor_execute', capturar)
+            try:
+                pagina = ListadoService.paginar(CondicionInsegura.query, CondicionInsegura.fecha_creacion,
+                                                CondicionInsegura.id, cursor=cursor, limite=5, contar=False)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', capturar)
+            self.assertEqual([r.numero_reporte for r in pagina.items],
+                             ['REP-TEST-011', 'REP-TEST-010', 'REP-TEST-009', 'REP-TEST-008', 'REP-TEST-007'])
+
+            sql, parametros = consultas[-1]
+            plan = ' '.join(str(fila[-1]) for fila in
+                            db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', parametros))
+            # SQLite puede elegir ix_condiciones_fecha_id o el de fecha_creacion (incluye el rowid = id)
+            self.assertIn('USING INDEX', plan)
+            self.assertIn('fecha_creacion<?', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_total_aproximado_con_tope(self):
+        """Prueba: el conteo se detiene en el tope"""
+        with self.app.app_context():
+            total, exacto = ListadoService.contar_aproximado(CondicionInsegura.query, tope=10)
+            self.assertEqual(total, 10)
+            self.assertFalse(exacto)
+
+    def test_visibilidad_empleado(self):
+        """Prueba: el empleado solo ve sus reportes y los que gestiona"""
+        with self.app.app_context():
+            gestionado = CondicionInsegura.query.filter_by(numero_reporte='REP-TEST-001').first()
+            db.session.add(GestionReporte(reporte_id=gestionado.id, gestor_actual_id=self.empleado_id))
+            db.session.commit()
+
+            empleado = db.session.get(Usuario, self.empleado_id)
+            query = ListadoService.visibilidad_reportes(CondicionInsegura.query, empleado)
+            numeros = {r.numero_reporte for r in query.all()}
+
+            self.assertEqual(len(numeros), 6)
+            self.assertIn('REP-TEST-001', numeros)
+            self.assertIn('REP-TEST-005', numeros)
+
+    def test_api_listado_reportes(self):
+        """Prueba: la API devuelve next_cursor estable"""
+        self._login(self.admin_id)
+
+        respuesta = self.client.get('/reportes/api/listado?limite=10')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.get_json()
+        self.assertEqual(len(datos['items']), 10)
+        self.assertIsNotNone(datos['next_cursor'])
+
+        segunda = self.client.get(f"/reportes/api/listado?limite=10&cursor={datos['next_cursor']}").get_json()
+        ids_primera = {r['id'] for r in datos['items']}
+        ids_segunda = {r['id'] for r in segunda['items']}
+        self.assertFalse(ids_primera & ids_segunda)
+
+        invalido = self.client.get('/reportes/api/listado?cursor=xxx')
+        self.assertEqual(invalido.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,332 @@
+"""
+TEST SUITE - Outbox de notificaciones
+Pruebas para NotificacionService (outbox transaccional) y DespachadorNotificaciones
+Comando: python tests/test_notificaciones.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+from app import create_app, db
+from app.models import Usuario, CondicionInsegura, GestionReporte, GestorResponsabilidades, Notificacion, TareaGestion
+from app.services.gestion_reportes_service import GestionReportesService
+from app.services.notificaciones import NotificacionService
+from app.services.plantillas_correo import plantillas_correo
+from app.services.transporte_correo import TransporteArchivo, ErrorTransporte
+from app.tasks.despachador_notificaciones import DespachadorNotificaciones
+
+class TransporteFallido:
+    """Transporte que siempre falla (transitorio o permanente)"""
+
+    def __init__(self, permanente=False):
+        self.permanente = permanente
+        self.llamadas = 0
+
+    def enviar(self, destinatarios, asunto, contenido_html):
+        self.llamadas += 1
+        raise ErrorTransporte('Servicio no disponible', permanente=self.permanente)
+
+    def cerrar(self):
+        pass
+
+class TransporteMemoria:
+    """Guarda cada llamada al proveedor; rechaza los destinatarios inválidos"""
+
+    def __init__(self):
+        self.llamadas = []
+
+    def enviar(self, destinatarios, asunto, contenido_html):
+        self.llamadas.append((list(destinatarios), asunto, contenido_html))
+        if any(d.startswith('invalido') for d in destinatarios):
+            raise ErrorTransporte('Destinatario inválido', permanente=True)
+
+    def cerrar(self):
+        pass
+
+class TestOutboxNotificaciones(unittest.TestCase):
+    """Las notificaciones se guardan con el cambio de negocio y se envían aparte"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.directorio = tempfile.mkdtemp(prefix='sst-correos-')
+
+        with self.app.app_context():
+            db.create_all()
+            gestor = Usuario(email='gestor@test.com', nombre_completo='Gestor', rol='Gestor_RRHH', activo=True)
+            gestor.set_password('pass')
+            config = GestorResponsabilidades(rol_principal='Gestor_RRHH', activo=True)
+            reporte = CondicionInsegura(numero_reporte='REP-NOT-001', titulo='Piso mojado', descripcion='Piso')
+            db.session.add_all([gestor, config, reporte])
+            db.session.commit()
+            self.reporte_id = reporte.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_asignacion_escribe_outbox(self):
+        """Prueba: asignar un reporte deja el correo en el outbox sin enviarlo"""
+        with self.app.app_context():
+            gestion = GestionReportesService.asignar_reporte(self.reporte_id)
+            self.assertIsNotNone(gestion)
+
+            notificacion = Notificacion.query.one()
+            self.assertEqual(notificacion.tipo, 'ASIGNACION')
+            self.assertEqual(notificacion.destinatario, 'gestor@test.com')
+            self.assertEqual(notificacion.estado, 'Pendiente')
+            self.assertIn('REP-NOT-001', notificacion.asunto)
+            self.assertEqual(TareaGestion.query.filter_by(gestion_reporte_id=gestion.id).count(), 1)
+
+    def test_asignacion_atomica(self):
+        """Prueba: si falla la tarea no quedan ni la gestión ni el correo (un solo commit)"""
+        with self.app.app_context():
+            with mock.patch.object(GestionReportesService, 'datos_tarea', side_effect=RuntimeError('sin tarea')):
+                with self.assertRaises(RuntimeError):
+                    GestionReportesService.asignar_reporte(self.reporte_id)
+            db.session.rollback()
+            self.assertEqual(GestionReporte.query.count(), 0)
+            self.assertEqual(Notificacion.query.count(), 0)
+
+    def test_rollback_descarta_notificacion(self):
+        """Prueba: si el cambio de negocio hace rollback, el correo tampoco queda"""
+        with self.app.app_context():
+            NotificacionService.enviar_email('gestor@test.com', 'Asunto', '<p>Hola</p>')
+            db.session.rollback()
+            self.assertEqual(Notificacion.query.count(), 0)
+
+    def test_despachador_envia_a_archivo(self):
+        """Prueba: el despachador entrega con el transporte de archivo y marca Enviada"""
+        with self.app.app_context():
+            for i in range(3):
+                NotificacionService.enviar_email(f'usuario{i}@test.com', f'Aviso {i}', '<p>Hola</p>')
+            db.session.commit()
+
+            transporte = TransporteArchivo(self.directorio, 'noreply@test.com')
+            self.assertEqual(DespachadorNotificaciones.procesar_lote(transporte), 3)
+            self.assertEqual(DespachadorNotificaciones.procesar_lote(transporte), 0)
+
+            self.assertEqual(DespachadorNotificaciones.resumen(), {'Enviada': 3})
+            archivos = sorted(os.listdir(self.directorio))
+            self.assertEqual(len(archivos), 3)
+            with open(os.path.join(self.directorio, archivos[0]), 'rb') as archivo:
+                mensaje = email.message_from_bytes(archivo.read())
+            self.assertTrue(mensaje['To'].startswith('usuario'))
+
+    def test_reintentos_y_dead_letter(self):
+        """Prueba: los errores transitorios se reintentan con backoff hasta Fallida"""
+        with self.app.app_context():
+            NotificacionService.enviar_email('gestor@test.com', 'Aviso', '<p>Hola</p>')
+            db.session.commit()
+            transporte = TransporteFallido()
+
+            self.assertEqual(DespachadorNotificaciones.procesar_lote(transporte), 1)
+            notificacion = Notificacion.query.one()
+            self.assertEqual((notificacion.estado, notificacion.intentos), ('Pendiente', 1))
+            self.assertGreater(notificacion.proximo_intento, datetime.utcnow() + timedelta(seconds=20))
+
+            # Aún no toca: el backoff la deja fuera del siguiente lote
+            self.assertEqual(DespachadorNotificaciones.procesar_lote(transporte), 0)
+
+            for _ in range(DespachadorNotificaciones.MAX_INTENTOS - 1):
+                Notificacion.query.update({'proximo_intento': datetime.utcnow() - timedelta(seconds=1)})
+                db.session.commit()
+                DespachadorNotificaciones.procesar_lote(transporte)
+
+            db.session.expire_all()
+            notificacion = Notificacion.query.one()
+            self.assertEqual(notificacion.estado, 'Fallida')
+            self.assertEqual(notificacion.intentos, DespachadorNotificaciones.MAX_INTENTOS)
+            self.assertEqual(transporte.llamadas, DespachadorNotificaciones.MAX_INTENTOS)
+
+            self.assertEqual(DespachadorNotificaciones.reintentar_fallidas(), 1)
+            self.assertEqual(Notificacion.query.one().estado, 'Pendiente')
+
+    def test_error_permanente_no_reintenta(self):
+        """Prueba: un rechazo permanente va directo a Fallida"""
+        with self.app.app_context():
+            NotificacionService.enviar_email('invalido', 'Aviso', '<p>Hola</p>')
+            db.session.commit()
+
+            DespachadorNotificaciones.procesar_lote(TransporteFallido(permanente=True))
+            notificacion = Notificacion.query.one()
+            self.assertEqual((notificacion.estado, notificacion.intentos), ('Fallida', 1))
+
+    def test_reserva_vencida_se_recupera(self):
+        """Prueba: una fila tomada por un worker caído se vuelve a reclamar"""
+        with self.app.app_context():
+            NotificacionService.enviar_email('gestor@test.com', 'Aviso', '<p>Hola</p>')
+            db.session.commit()
+
+            self.assertEqual(len(DespachadorNotificaciones.reclamar(10)), 1)
+            self.assertEqual(DespachadorNotificaciones.reclamar(10), [])
+
+            futuro = datetime.utcnow() + timedelta(seconds=DespachadorNotificaciones.RESERVA_SEGUNDOS + 1)
+            self.assertEqual(len(DespachadorNotificaciones.reclamar(10, ahora=futuro)), 1)
+
+class TestAgrupacionNotificaciones(unittest.TestCase):
+    """Deduplicación por ventana, resúmenes y envío a varios destinatarios"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+        with self.app.app_context():
+            db.create_all()
+            gestor = Usuario(email='gestor@test.com', nombre_completo='Gestor', rol='Gestor_RRHH', activo=True)
+            gestor.set_password('pass')
+            reporte = CondicionInsegura(numero_reporte='REP-AGR-001', titulo='Escalera rota', descripcion='x')
+            db.session.add_all([gestor, reporte])
+            db.session.flush()
+            gestion = GestionReporte(
+                reporte_id=reporte.id, gestor_actual_id=gestor.id, estado='Asignado',
+                fecha_vencimiento_respuesta=datetime.utcnow() + timedelta(minutes=30),
+                fecha_vencimiento_resolucion=datetime.utcnow() + timedelta(minutes=20)
+            )
+            db.session.add(gestion)
+            db.session.commit()
+            self.gestion_id = gestion.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _vencer_esperas(self):
+        Notificacion.query.update({'proximo_intento': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+    def test_vencimiento_critico_deduplicado(self):
+        """Prueba: el mismo aviso al mismo gestor no se repite dentro de la ventana"""
+        with self.app.app_context():
+            gestion = db.session.get(GestionReporte, self.gestion_id)
+            for _ in range(5):
+                NotificacionService.enviar_vencimiento_critico(gestion)
+                db.session.commit()
+            self.assertEqual(Notificacion.query.count(), 1)
+
+            # Pasada la ventana, el aviso vuelve a salir
+            Notificacion.query.update({'fecha_creacion': datetime.utcnow() - timedelta(
+                minutes=NotificacionService.VENTANA_DEDUP_MINUTOS + 1)})
+            db.session.commit()
+            NotificacionService.enviar_vencimiento_critico(gestion)
+            db.session.commit()
+            self.assertEqual(Notificacion.query.count(), 2)
+
+    def test_rafaga_sale_en_un_resumen(self):
+        """Prueba: varias agrupables del mismo destinatario salen en un solo correo"""
+        with self.app.app_context():
+            for i in range(3):
+                NotificacionService.enviar_email('gestor@test.com', f'Escalado {i}', f'<p>Reporte {i}</p>',
+                                                 'ESCALONAMIENTO', f'gestion:{i}')
+            NotificacionService.enviar_email('otro@test.com', 'Escalado 9', '<p>Reporte 9</p>',
+                                             'ESCALONAMIENTO', 'gestion:9')
+            db.session.commit()
+
+            # Siguen en espera para acumular la ráfaga
+            transporte = TransporteMemoria()
+            self.assertEqual(DespachadorNotificaciones.procesar_lote(transporte), 0)
+
+            # Vence solo una del gestor: las otras dos se suman al resumen
+            primera = Notificacion.query.filter_by(destinatario='gestor@test.com').order_by(Notificacion.id).first()
+            primera.proximo_intento = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+
+            self.assertEqual(DespachadorNotificaciones.procesar_lote(transporte), 3)
+            self.assertEqual(len(transporte.llamadas), 1)
+            destinatarios, asunto, html = transporte.llamadas[0]
+            self.assertEqual(destinatarios, ['gestor@test.com'])
+            self.assertIn('[SST-RESUMEN] 3', asunto)
+            self.assertTrue(all(f'Reporte {i}' in html for i in range(3)))
+            self.assertEqual(Notificacion.query.filter_by(estado='Pendiente').count(), 1)
+
+    def test_varios_destinatarios_una_llamada(self):
+        """Prueba: el mismo correo a varios destinatarios es una sola llamada al proveedor"""
+        with self.app.app_context():
+            destinatarios = ['a@test.com', 'b@test.com', 'c@test.com', 'a@test.com']
+            self.assertEqual(NotificacionService.enviar_email_varios(destinatarios, 'CC', '<p>Copia</p>', 'CC', 'gestion:1:Asignado'), 3)
+            self.assertEqual(NotificacionService.enviar_email_varios(destinatarios, 'CC', '<p>Copia</p>', 'CC', 'gestion:1:Asignado'), 0)
+            db.session.commit()
+            self._vencer_esperas()
+
+            transporte = TransporteMemoria()
+            DespachadorNotificaciones.procesar_lote(transporte)
+            self.assertEqual(len(transporte.llamadas), 1)
+            self.assertEqual(sorted(transporte.llamadas[0][0]), ['a@test.com', 'b@test.com', 'c@test.com'])
+            self.assertEqual(DespachadorNotificaciones.resumen(), {'Enviada': 3})
+
+    def test_destinatario_invalido_no_descarta_el_grupo(self):
+        """Prueba: si el proveedor rechaza el grupo, cada fila se reintenta por separado"""
+        with self.app.app_context():
+            NotificacionService.enviar_email_varios(['a@test.com', 'invalido', 'b@test.com'], 'Aviso', '<p>x</p>')
+            db.session.commit()
+
+            transporte = TransporteMemoria()
+            DespachadorNotificaciones.procesar_lote(transporte)
+            self.assertEqual(len(transporte.llamadas), 4)
+            self.assertEqual(DespachadorNotificaciones.resumen(), {'Enviada': 2, 'Fallida': 1})
+
+    def test_agrupar_respeta_limite_del_proveedor(self):
+        """Prueba: un grupo grande se parte según MAX_DESTINATARIOS"""
+        filas = [SimpleNamespace(id=i, destinatario=f'u{i}@test.com', asunto='A', contenido_html='<p>x</p>',
+                                 intentos=0, agrupable=False) for i in range(5)]
+        envios = DespachadorNotificaciones.agrupar(filas, max_destinatarios=2)
+        self.assertEqual([len(destinatarios) for _, destinatarios, _, _ in envios], [2, 2, 1])
+
+class TestPlantillasCorreo(unittest.TestCase):
+    """Plantillas compiladas de app/templates/emails"""
+
+    def _gestion(self, i, titulo='Piso mojado'):
+        return SimpleNamespace(
+            id=i, numero_escalamiento=2, fecha_vencimiento_respuesta=datetime(2025, 1, 31, 8, 30),
+            reporte=SimpleNamespace(id=i, numero_reporte=f'RPT-{i:03d}', titulo=titulo,
+                                    tipo_reporte_obj=SimpleNamespace(nombre='Condición'))
+        )
+
+    def test_precompilar_todas_sin_layouts(self):
+        """Prueba: se compilan todas las plantillas de correo, no los layouts ni macros"""
+        nombres = plantillas_correo.nombres()
+        self.assertEqual(plantillas_correo.precompilar(), len(nombres))
+        self.assertIn('reporte_escalado.html', nombres)
+        self.assertIn('juridico/concepto_listo.html', nombres)
+        self.assertFalse(any(os.path.basename(nombre).startswith('_') for nombre in nombres))
+
+    def test_datos_escapados(self):
+        """Prueba: los datos del reporte no se inyectan como HTML"""
+        asunto, html = NotificacionService.contenido_escalonamiento(self._gestion(1, '<script>x</script>'))
+        self.assertIn('&lt;script&gt;', html)
+        self.assertNotIn('<script>', html)
+        self.assertIn('31/01/2025 08:30', html)
+        self.assertTrue(asunto.startswith('[SST-ESCALADO] RPT-001'))
+
+    def test_lote_personalizado(self):
+        """Prueba: renderizar en lote da un cuerpo propio por gestión, igual al render individual"""
+        gestiones = [self._gestion(i) for i in range(1, 4)]
+        contenidos = NotificacionService.contenidos_escalonamiento(gestiones)
+        self.assertEqual(len(contenidos), 3)
+        for gestion, (asunto, html) in zip(gestiones, contenidos):
+            self.assertIn(gestion.reporte.numero_reporte, asunto)
+            self.assertIn(f'/reportes/{gestion.id}', html)
+            self.assertEqual((asunto, html), NotificacionService.contenido_escalonamiento(gestion))
+
+    def test_resumen_incluye_cuerpos(self):
+        """Prueba: el resumen escapa los asuntos y conserva el HTML ya renderizado"""
+        asunto, html = NotificacionService.contenido_resumen([('A <1>', '<p>uno</p>'), ('B', '<p>dos</p>')])
+        self.assertIn('2 notificaciones', asunto)
+        self.assertIn('A &lt;1&gt;', html)
+        self.assertIn('<p>uno</p>', html)
+        self.assertIn('<p>dos</p>', html)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,145 @@
+"""
+TEST SUITE - Pasarela de IA
+Pruebas para PasarelaIA: concurrencia, plazos, circuito y backend falso
+Comando: python tests/test_pasarela_ia.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+from PIL import Image
+from app.services.gemini_service import GeminiService
+from app.services.pasarela_ia import PasarelaIA, BackendFalso, ErrorIA
+
+class BackendBloqueado:
+    """No responde hasta que se libera el evento"""
+
+    def __init__(self):
+        self.liberar = threading.Event()
+
+    def generar(self, modelo, contenido):
+        self.liberar.wait(5)
+        return 'tarde'
+
+class TestPasarelaIA(unittest.TestCase):
+    """Una respuesta lenta o un modelo caído no retienen las peticiones web"""
+
+    def test_backend_falso_analisis_y_chat(self):
+        """Prueba: el flujo completo de GeminiService funciona sin red"""
+        servicio = GeminiService(pasarela=PasarelaIA(backend=BackendFalso(latencia_ms=0)))
+        salida = io.BytesIO()
+        Image.new('RGB', (64, 48)).save(salida, 'PNG')
+        resultado = servicio._analizar(salida.getvalue(), 'prompt')
+        self.assertEqual(resultado['nivel_riesgo'], 6)
+        self.assertIn('Resolución 0312', servicio.chat_experto_sst('¿Qué es el SG-SST?'))
+
+    def test_plazo_vencido(self):
+        """Prueba: la llamada vence al plazo y el turno sigue ocupado hasta que el modelo termina"""
+        backend = BackendBloqueado()
+        pasarela = PasarelaIA(backend=backend, max_concurrentes=2)
+        inicio = time.monotonic()
+        with self.assertRaises(ErrorIA) as contexto:
+            pasarela.generar('hola', 'modelo', timeout=0.1)
+        self.assertEqual(contexto.exception.codigo, 'timeout')
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(pasarela.estado()['en_curso'], 1)
+
+        backend.liberar.set()
+        time.sleep(0.1)
+        self.assertEqual(pasarela.estado()['en_curso'], 0)
+
+    def test_saturada_rechaza_sin_esperar_indefinidamente(self):
+        """Prueba: sin turnos libres se rechaza tras ESPERA_SEG"""
+        backend = BackendBloqueado()
+        pasarela = PasarelaIA(backend=backend, max_concurrentes=1)
+        pasarela.ESPERA_SEG = 0.05
+        hilo = threading.Thread(target=lambda: pasarela.generar('uno', 'modelo', timeout=5))
+        hilo.start()
+        time.sleep(0.05)
+
+        with self.assertRaises(ErrorIA) as contexto:
+            pasarela.generar('dos', 'modelo')
+        self.assertEqual(contexto.exception.codigo, 'saturada')
+
+        backend.liberar.set()
+        hilo.join()
+        self.assertEqual(pasarela.generar('tres', 'modelo'), 'tarde')
+
+    def test_circuito_abre_y_se_recupera(self):
+        """Prueba: tras UMBRAL_FALLOS fallos no se llama al modelo; una prueba exitosa lo cierra"""
+        backend = BackendFalso(latencia_ms=0, tasa_fallos=1)
+        pasarela = PasarelaIA(backend=backend)
+        pasarela.ENFRIAMIENTO_SEG = 0.1
+
+        for _ in range(pasarela.UMBRAL_FALLOS):
+            with self.assertRaises(ErrorIA):
+                pasarela.generar('hola', 'modelo')
+        self.assertEqual(pasarela.circuito, 'abierto')
+
+        with self.assertRaises(ErrorIA) as contexto:
+            pasarela.generar('hola', 'modelo')
+        self.assertEqual(contexto.exception.codigo, 'circuito_abierto')
+        self.assertEqual(backend.llamadas, pasarela.UMBRAL_FALLOS)
+
+        time.sleep(0.15)
+        self.assertEqual(pasarela.circuito, 'semiabierto')
+        backend.tasa_fallos = 0
+        pasarela.generar('hola', 'modelo')
+        self.assertEqual(pasarela.circuito, 'cerrado')
+        self.assertEqual(pasarela.estado()['rechazadas_circuito'], 1)
+
+    def test_prueba_fallida_reabre_el_circuito(self):
+        """Prueba: en semiabierto un solo fallo vuelve a abrir el circuito"""
+        pasarela = PasarelaIA(backend=BackendFalso(latencia_ms=0, tasa_fallos=1))
+        pasarela.ENFRIAMIENTO_SEG = 0.05
+        for _ in range(pasarela.UMBRAL_FALLOS):
+            with self.assertRaises(ErrorIA):
+                pasarela.generar('hola', 'modelo')
+        time.sleep(0.1)
+        with self.assertRaises(ErrorIA) as contexto:
+            pasarela.generar('hola', 'modelo')
+        self.assertEqual(contexto.exception.codigo, 'modelo')
+        self.assertEqual(pasarela.circuito, 'abierto')
+
+    def test_prueba_en_streaming_cancelada_no_bloquea_el_circuito(self):
+        """Prueba: si se cierra el streaming de la llamada de prueba, el circuito admite otra"""
+        backend = BackendFalso(latencia_ms=0, tasa_fallos=1, token_ms=0)
+        pasarela = PasarelaIA(backend=backend)
+        pasarela.ENFRIAMIENTO_SEG = 0.05
+        for _ in range(pasarela.UMBRAL_FALLOS):
+            with self.assertRaises(ErrorIA):
+                pasarela.generar('hola', 'modelo')
+        time.sleep(0.1)
+
+        backend.tasa_fallos = 0
+        fragmentos = pasarela.generar_stream('hola', 'modelo')
+        next(fragmentos)
+        fragmentos.close()
+        self.assertEqual(pasarela.circuito, 'semiabierto')
+
+        self.assertTrue(''.join(pasarela.generar_stream('hola', 'modelo')).startswith('Respuesta simulada'))
+        self.assertEqual(pasarela.circuito, 'cerrado')
+        self.assertEqual(pasarela.estado()['canceladas'], 1)
+
+    def test_sin_api_key(self):
+        """Prueba: sin GEMINI_API_KEY se responde ErrorIA de configuración sin abrir el circuito"""
+        entorno = {clave: valor for clave, valor in os.environ.items() if clave != 'GEMINI_API_KEY'}
+        entorno['SST_IA_BACKEND'] = 'gemini'
+        with mock.patch.dict(os.environ, entorno, clear=True):
+            pasarela = PasarelaIA()
+            for _ in range(pasarela.UMBRAL_FALLOS + 1):
+                with self.assertRaises(ErrorIA) as contexto:
+                    pasarela.generar('hola', 'modelo')
+                self.assertEqual(contexto.exception.codigo, 'configuracion')
+            with self.assertRaises(ErrorIA) as contexto:
+                next(pasarela.generar_stream('hola', 'modelo'))
+            self.assertEqual(contexto.exception.codigo, 'configuracion')
+        self.assertEqual((pasarela.circuito, pasarela.estado()['llamadas']), ('cerrado', 0))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,214 @@
+"""
+TEST SUITE - Peligros normalizados
+Pruebas para PeligrosService: taxonomía, tabla peligros_reporte al día, reconstrucción y analítica agrupada
+Comando: python tests/test_peligros.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from datetime import datetime
+from sqlalchemy import text
+from app import create_app, db
+from app.models import (Usuario, Empleado, CondicionInsegura, CategoriaArea, Dependencia, PeligroReporte,
+                        TrabajoFondo)
+from app.services.peligros_service import PeligrosService
+from app.tasks.temporizador import temporizador
+
+class TestPeligros(unittest.TestCase):
+    """Los peligros del JSON quedan en filas indexadas que se agrupan en SQL"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        temporizador.detener()
+
+        with self.app.app_context():
+            db.create_all()
+            usuarios = {}
+            for rol in ('Empleado', 'Responsable_SST', 'Admin'):
+                usuario = Usuario(email=f'{rol.lower()}@test.com', nombre_completo=rol, rol=rol, activo=True)
+                usuario.set_password('pass')
+                usuarios[rol] = usuario
+            categoria = CategoriaArea(nombre='Industrial')
+            db.session.add_all(list(usuarios.values()) + [categoria])
+            db.session.flush()
+            bodega = Dependencia(nombre='Bodega', categoria_id=categoria.id)
+            planta = Dependencia(nombre='Planta', categoria_id=categoria.id)
+            db.session.add_all([bodega, planta,
+                                Empleado(usuario_id=usuarios['Empleado'].id, departamento='Logística')])
+            db.session.commit()
+            self.ids = {rol: u.id for rol, u in usuarios.items()}
+            self.bodega_id, self.planta_id = bodega.id, planta.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def iniciar_sesion(self, rol):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(self.ids[rol])
+            sess['_fresh'] = True
+
+    def reporte(self, numero, peligros, dependencia_id=None, fecha=datetime(2026, 8, 10), severidad=3):
+        reporte = CondicionInsegura(
+            numero_reporte=numero, titulo=numero, empleado_reportador_id=self.ids['Empleado'],
+            fecha_creacion=fecha, riesgos_identificados=peligros, severidad_calculada=severidad,
+            imagen_procesada_json={'peligros': peligros, 'severidad': severidad, 'probabilidad': 2},
+            metadata_adicional={'dependencia_id': dependencia_id} if dependencia_id else None)
+        db.session.add(reporte)
+        return reporte
+
+    def test_taxonomia(self):
+        """Prueba: palabras clave sin tildes, el orden de la taxonomía y la clasificación declarada"""
+        casos = {
+            'Cables eléctricos expuestos': 'CS-ELE',
+            'Riesgo de caída de altura sin arnés': 'CS-ALT',
+            'Superficie resbaladiza': 'CS-LOC',
+            'Obstáculo en zona de tránsito': 'CS-LOC',
+            'Montacargas sin señalización': 'CS-TRA',
+            'Postura prolongada en escritorio': 'BIOM',
+            'Exposición a ruido de compresor': 'FIS',
+            'Algo que no encaja': 'OTR',
+        }
+        for texto, codigo in casos.items():
+            self.assertEqual(PeligrosService.clasificar(texto)[0], codigo, texto)
+
+        class Reporte:
+            id = 1
+            riesgos_identificados = [{'descripcion': 'Tablero sin tapa', 'severidad': 4, 'probabilidad': 3},
+                                     {'descripcion': 'Bulto en el paso', 'clasificacion': 'Biomecánico'},
+                                     {'descripcion': 'Otro', 'codigo': 'QUI'}, '  ']
+            imagen_procesada_json = {'probabilidad': 2}
+            severidad_calculada = 2
+            metadata_adicional = {'dependencia_id': '7'}
+            fecha_creacion = datetime(2026, 9, 30)
+            empleado_reportador_id = None
+
+        filas = PeligrosService.filas(Reporte, departamento='Planta')
+        self.assertEqual([(f['codigo'], f['nivel_riesgo']) for f in filas], [('CS-ELE', 12), ('BIOM', 4), ('QUI', 4)])
+        self.assertEqual({(f['dependencia_id'], f['departamento'], f['mes']) for f in filas}, {(7, 'Planta', '2026-09')})
+
+    def test_tabla_sigue_al_reporte(self):
+        """Prueba: crear, reanalizar o borrar el reporte se refleja en peligros_reporte; otros cambios no"""
+        with self.app.app_context():
+            reporte = self.reporte('REP-P-1', ['Cable pelado', 'Piso mojado'], self.bodega_id)
+            db.session.commit()
+            peligros = PeligroReporte.query.filter_by(reporte_id=reporte.id).order_by(PeligroReporte.orden).all()
+            self.assertEqual([p.codigo for p in peligros], ['CS-ELE', 'CS-LOC'])
+            self.assertEqual({(p.dependencia_id, p.departamento, p.mes, p.nivel_riesgo) for p in peligros},
+                             {(self.bodega_id, 'Logística', '2026-08', 6)})
+            ids = [p.id for p in peligros]
+
+            reporte.estado = 'Cerrado'
+            db.session.commit()
+            self.assertEqual([p.id for p in PeligroReporte.query.order_by(PeligroReporte.orden)], ids)
+
+            reporte.riesgos_identificados = ['Ruido excesivo']
+            db.session.commit()
+            self.assertEqual([p.codigo for p in PeligroReporte.query], ['FIS'])
+
+            db.session.add(self.reporte('REP-P-2', ['Cable suelto']))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(PeligroReporte.query.count(), 1)
+
+            db.session.delete(db.session.get(CondicionInsegura, reporte.id))
+            db.session.commit()
+            self.assertEqual(PeligroReporte.query.count(), 0)
+
+    def test_dependencia_desde_el_formulario(self):
+        """Prueba: crear y editar el reporte por formulario deja la dependencia sin perder el tipo"""
+        self.iniciar_sesion('Empleado')
+        respuesta = self.client.post('/reportes/nuevo', data={
+            'titulo': 'Tablero abierto', 'descripcion': 'Sin tapa', 'tipo_reporte_id': '3',
+            'ubicacion_id': str(self.bodega_id)})
+        self.assertEqual(respuesta.status_code, 302)
+
+        with self.app.app_context():
+            reporte = CondicionInsegura.query.filter_by(titulo='Tablero abierto').one()
+            self.assertEqual(reporte.metadata_adicional, {'tipo_reporte_id': 3, 'ubicacion_id': self.bodega_id,
+                                                          'dependencia_id': self.bodega_id})
+            reporte.riesgos_identificados = ['Cable pelado']
+            db.session.commit()
+            self.assertEqual([p.dependencia_id for p in PeligroReporte.query], [self.bodega_id])
+            reporte_id = reporte.id
+
+        respuesta = self.client.post(f'/reportes/{reporte_id}/editar', data={
+            'titulo': 'Tablero abierto', 'descripcion': 'Sin tapa', 'ubicacion_id': str(self.planta_id)})
+        self.assertEqual(respuesta.status_code, 302)
+        with self.app.app_context():
+            reporte = db.session.get(CondicionInsegura, reporte_id)
+            self.assertEqual((reporte.metadata_adicional['dependencia_id'], reporte.metadata_adicional['tipo_reporte_id']),
+                             (self.planta_id, 3))
+            self.assertEqual([p.dependencia_id for p in PeligroReporte.query], [self.planta_id])
+
+    def test_reconstruir_y_update_masivo(self):
+        """Prueba: la reconstrucción llena la tabla por lotes y sincronizar_ids cubre los UPDATE por lote"""
+        with self.app.app_context():
+            for i in range(5):
+                self.reporte(f'REP-P-{i}', ['Cable pelado', 'Escalera rota'], self.planta_id)
+            db.session.commit()
+            db.session.query(PeligroReporte).delete()
+            db.session.commit()
+
+            resultado = PeligrosService.reconstruir(tamano_lote=2)
+            self.assertEqual((resultado['reportes'], resultado['peligros']), (5, 10))
+            self.assertEqual(PeligrosService.reconstruir()['peligros'], 10)
+            self.assertEqual(PeligroReporte.query.count(), 10)
+
+            reporte_id = CondicionInsegura.query.filter_by(numero_reporte='REP-P-0').one().id
+            db.session.execute(db.update(CondicionInsegura), [{'id': reporte_id, 'riesgos_identificados': []}])
+            PeligrosService.sincronizar_ids([reporte_id])
+            db.session.commit()
+            self.assertEqual(PeligroReporte.query.filter_by(reporte_id=reporte_id).count(), 0)
+
+    def test_api_agrupada(self):
+        """Prueba: peligro × dependencia × mes en una consulta, con filtros, permisos y errores"""
+        with self.app.app_context():
+            self.reporte('REP-A-1', ['Cable pelado', 'Tablero abierto'], self.bodega_id, datetime(2026, 7, 5))
+            self.reporte('REP-A-2', ['Cable suelto'], self.bodega_id, datetime(2026, 8, 1))
+            self.reporte('REP-A-3', ['Tomacorriente roto', 'Piso mojado'], self.planta_id, datetime(2026, 9, 20))
+            self.reporte('REP-A-4', ['Cable expuesto'], self.planta_id, datetime(2026, 10, 2))
+            db.session.commit()
+
+            consulta = PeligrosService.consulta_resumen(['dependencia'], desde='2026-07', hasta='2026-09',
+                                                        codigos=['CS-ELE'])
+            sql = str(consulta.compile(db.engine, compile_kwargs={'literal_binds': True}))
+            plan = ' '.join(str(fila[-1]) for fila in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+            self.assertIn('ix_peligros_codigo_mes_dependencia', plan)
+
+        self.iniciar_sesion('Empleado')
+        self.assertEqual(self.client.get('/dashboard/api/peligros').status_code, 403)
+
+        self.iniciar_sesion('Responsable_SST')
+        respuesta = self.client.get('/dashboard/api/peligros?agrupar=dependencia&codigo=cs-ele'
+                                    '&desde=2026-07&hasta=2026-09')
+        self.assertEqual(respuesta.status_code, 200)
+        grupos = respuesta.get_json()['grupos']
+        self.assertEqual([(g['dependencia_nombre'], g['peligros'], g['reportes']) for g in grupos],
+                         [('Bodega', 3, 2), ('Planta', 1, 1)])
+
+        grupos = self.client.get('/dashboard/api/peligros').get_json()['grupos']
+        self.assertEqual(sum(g['peligros'] for g in grupos), 6)
+        self.assertEqual(grupos[0], {'peligro': 'CS-ELE', 'peligro_nombre': 'Eléctrico', 'dependencia': self.bodega_id,
+                                     'dependencia_nombre': 'Bodega', 'mes': '2026-07', 'peligros': 2, 'reportes': 1,
+                                     'nivel_riesgo_promedio': 6.0, 'nivel_riesgo_max': 6})
+
+        for consulta in ('agrupar=color', 'desde=2026-13', 'codigo=XYZ'):
+            self.assertEqual(self.client.get(f'/dashboard/api/peligros?{consulta}').status_code, 400, consulta)
+
+        self.assertEqual(self.client.post('/dashboard/api/peligros/reconstruir').status_code, 403)
+        self.iniciar_sesion('Admin')
+        respuesta = self.client.post('/dashboard/api/peligros/reconstruir', json={'tamano_lote': 100})
+        self.assertEqual(respuesta.status_code, 202)
+        with self.app.app_context():
+            trabajo = TrabajoFondo.query.one()
+            self.assertEqual((trabajo.tipo, trabajo.parametros), ('reconstruir_peligros', {'tamano_lote': 100}))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
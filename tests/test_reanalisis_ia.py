@@ -0,0 +1,128 @@
+"""
+TEST SUITE - Reanálisis masivo con IA
+Pruebas para EjecutorReanalisis: lotes keyset, punto de control, reanudación y progreso
+Comando: python tests/test_reanalisis_ia.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from PIL import Image
+from app import create_app, db
+from app.models import CondicionInsegura, ReanalisisIA
+from app.services.cache_analisis_ia import cache_analisis_ia
+from app.services.pasarela_ia import pasarela_ia, BackendFalso
+from app.tasks.reanalisis_ia import EjecutorReanalisis
+
+class TestReanalisisIA(unittest.TestCase):
+    """Un reanálisis recorre todos los reportes con imagen una sola vez, aunque se interrumpa"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.directorio = tempfile.mkdtemp(prefix='sst-reanalisis-')
+        self.backend = BackendFalso(latencia_ms=0)
+        pasarela_ia.usar_backend(self.backend)
+        cache_analisis_ia.limpiar_memoria()
+
+        with self.app.app_context():
+            db.create_all()
+            for i in range(1, 8):
+                salida = io.BytesIO()
+                Image.new('RGB', (32, 24), (i * 30, 0, 0)).save(salida, 'JPEG')
+                contenido = salida.getvalue()
+                ruta = os.path.join(self.directorio, f'{i}_{hashlib.md5(contenido).hexdigest()}.jpg')
+                with open(ruta, 'wb') as archivo:
+                    archivo.write(contenido)
+                db.session.add(CondicionInsegura(numero_reporte=f'REP-RE-{i}', titulo=f'Reporte {i}', imagen_url=ruta))
+            db.session.add(CondicionInsegura(numero_reporte='REP-RE-SIN', titulo='Sin imagen'))
+            db.session.commit()
+
+    def tearDown(self):
+        pasarela_ia.usar_backend(None)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def test_completa_todos_los_reportes_en_lotes(self):
+        """Prueba: cada reporte con imagen se analiza una vez y el trabajo termina Completado"""
+        with self.app.app_context():
+            trabajo = EjecutorReanalisis.crear(concurrencia=2, tamano_lote=3)
+            self.assertEqual(trabajo.total, 7)
+            self.assertEqual(EjecutorReanalisis.reclamar('worker-a'), trabajo.id)
+            EjecutorReanalisis.ejecutar(trabajo.id, 'worker-a')
+
+            trabajo = db.session.get(ReanalisisIA, trabajo.id)
+            self.assertEqual((trabajo.estado, trabajo.procesados, trabajo.exitosos), ('Completado', 7, 7))
+            self.assertEqual(self.backend.llamadas, 7)
+            analizados = CondicionInsegura.query.filter(CondicionInsegura.severidad_calculada == 2).count()
+            self.assertEqual(analizados, 7)
+            self.assertEqual(EjecutorReanalisis.progreso(trabajo)['porcentaje'], 100.0)
+
+    def test_reanuda_desde_el_punto_de_control(self):
+        """Prueba: si el worker cae, otro sigue desde el último lote confirmado"""
+        with self.app.app_context():
+            trabajo = EjecutorReanalisis.crear(tamano_lote=3)
+            EjecutorReanalisis.reclamar('worker-a')
+            self.assertEqual(EjecutorReanalisis.procesar_lote(trabajo.id, 'worker-a'), 'continuar')
+
+            # worker-a muere: nadie más lo toma hasta que vence la reserva
+            self.assertIsNone(EjecutorReanalisis.reclamar('worker-b'))
+            ReanalisisIA.query.filter_by(id=trabajo.id).update({'tomada_hasta': datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+
+            self.assertEqual(EjecutorReanalisis.reclamar('worker-b'), trabajo.id)
+            self.assertEqual(EjecutorReanalisis.procesar_lote(trabajo.id, 'worker-a'), 'terminado')
+            EjecutorReanalisis.ejecutar(trabajo.id, 'worker-b')
+
+            trabajo = db.session.get(ReanalisisIA, trabajo.id)
+            self.assertEqual((trabajo.estado, trabajo.procesados), ('Completado', 7))
+            self.assertEqual(self.backend.llamadas, 7)
+
+    def test_pausar_y_reanudar(self):
+        """Prueba: pausado no avanza; al reanudar vuelve a Pendiente y se retoma"""
+        with self.app.app_context():
+            trabajo = EjecutorReanalisis.crear(tamano_lote=2)
+            EjecutorReanalisis.reclamar('worker-a')
+            EjecutorReanalisis.procesar_lote(trabajo.id, 'worker-a')
+            self.assertTrue(EjecutorReanalisis.cambiar_estado(trabajo.id, 'pausar'))
+            self.assertEqual(EjecutorReanalisis.procesar_lote(trabajo.id, 'worker-a'), 'terminado')
+            self.assertEqual(db.session.get(ReanalisisIA, trabajo.id).procesados, 2)
+
+            self.assertFalse(EjecutorReanalisis.cambiar_estado(trabajo.id, 'pausar'))
+            self.assertTrue(EjecutorReanalisis.cambiar_estado(trabajo.id, 'reanudar'))
+            self.assertEqual(EjecutorReanalisis.reclamar('worker-b'), trabajo.id)
+            EjecutorReanalisis.ejecutar(trabajo.id, 'worker-b')
+            self.assertEqual(db.session.get(ReanalisisIA, trabajo.id).procesados, 7)
+
+    def test_circuito_abierto_no_avanza_el_punto_de_control(self):
+        """Prueba: con el modelo caído el lote no se confirma ni cuenta como fallido"""
+        with self.app.app_context():
+            self.backend.tasa_fallos = 1
+            trabajo = EjecutorReanalisis.crear(tamano_lote=7, concurrencia=1)
+            EjecutorReanalisis.reclamar('worker-a')
+            self.assertEqual(EjecutorReanalisis.procesar_lote(trabajo.id, 'worker-a'), 'reintentar')
+
+            trabajo = db.session.get(ReanalisisIA, trabajo.id)
+            self.assertEqual((trabajo.ultimo_id, trabajo.procesados, trabajo.fallidos), (0, 0, 0))
+            self.assertIn('Error del modelo', trabajo.ultimo_error)
+
+    def test_progreso_con_eta(self):
+        """Prueba: la ETA sale de la velocidad medida"""
+        trabajo = ReanalisisIA(id=1, estado='Ejecutando', total=1000, procesados=250, exitosos=250,
+                               fallidos=0, segundos_ejecucion=50.0, ultimo_id=250, forzar=False, concurrencia=2)
+        progreso = EjecutorReanalisis.progreso(trabajo)
+        self.assertEqual(progreso['porcentaje'], 25.0)
+        self.assertEqual(progreso['reportes_por_minuto'], 300.0)
+        self.assertEqual(progreso['eta_segundos'], 150)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
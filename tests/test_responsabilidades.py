@@ -0,0 +1,104 @@
+"""
+TEST SUITE - Reglas de GestorResponsabilidades
+Pruebas para ResponsabilidadesService (regla más específica)
+Comando: python tests/test_responsabilidades.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unittest
+from app import create_app, db
+from app.models import (
+    TipoReporte, NivelRiesgo, MatrizRiesgos, GestorResponsabilidades, CondicionInsegura
+)
+from app.services.responsabilidades_service import ResponsabilidadesService, tabla_responsabilidades
+
+class TestReglasResponsabilidad(unittest.TestCase):
+    """Compilación y búsqueda por tipo, nivel y departamento"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+        with self.app.app_context():
+            db.create_all()
+            self._crear_datos_prueba()
+            ResponsabilidadesService.reconstruir()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        tabla_responsabilidades.invalidar()
+
+    def _crear_datos_prueba(self):
+        tipo = TipoReporte(nombre='Eléctrico Test')
+        bajo = NivelRiesgo(nombre='Tolerable Test', rango_minimo=1, rango_maximo=6)
+        alto = NivelRiesgo(nombre='Inaceptable Test', rango_minimo=15, rango_maximo=25)
+        db.session.add_all([tipo, bajo, alto])
+        db.session.flush()
+        db.session.add(MatrizRiesgos(probabilidad=4, severidad=5, valor_riesgo=20, nivel_riesgo_id=alto.id))
+
+        db.session.add_all([
+            GestorResponsabilidades(rol_principal='General'),
+            GestorResponsabilidades(tipo_reporte_id=tipo.id, rol_principal='Electricista'),
+            GestorResponsabilidades(tipo_reporte_id=tipo.id, nivel_riesgo_id=alto.id, rol_principal='Gerente'),
+            GestorResponsabilidades(tipo_reporte_id=tipo.id, nivel_riesgo_id=alto.id,
+                                    departamento='Producción', rol_principal='Jefe_Produccion'),
+            GestorResponsabilidades(departamento='Logística', rol_principal='Jefe_Logistica'),
+            GestorResponsabilidades(rol_principal='Inactivo', departamento='Producción', activo=False),
+        ])
+        db.session.commit()
+
+        self.tipo_id = tipo.id
+        self.bajo_id = bajo.id
+        self.alto_id = alto.id
+
+    def test_regla_mas_especifica(self):
+        """Prueba: gana la regla con más dimensiones que coinciden"""
+        with self.app.app_context():
+            casos = [
+                ((self.tipo_id, self.alto_id, 'producción '), 'Jefe_Produccion'),
+                ((self.tipo_id, self.alto_id, 'Logística'), 'Gerente'),
+                ((self.tipo_id, self.bajo_id, None), 'Electricista'),
+                ((None, self.bajo_id, 'Logística'), 'Jefe_Logistica'),
+                ((None, None, 'Producción'), 'General'),
+            ]
+            for dimensiones, rol in casos:
+                self.assertEqual(ResponsabilidadesService.resolver(*dimensiones).rol_principal, rol, dimensiones)
+
+    def test_nivel_desde_matriz_y_rango(self):
+        """Prueba: el nivel sale de la celda de la matriz o del rango del valor"""
+        with self.app.app_context():
+            self.assertEqual(tabla_responsabilidades.nivel_riesgo(4, 5), self.alto_id)
+            self.assertEqual(tabla_responsabilidades.nivel_riesgo(1, 5), self.bajo_id)
+            self.assertEqual(tabla_responsabilidades.nivel_riesgo(None, 3), self.bajo_id)
+            self.assertIsNone(tabla_responsabilidades.nivel_riesgo(None, None))
+
+    def test_resolver_reporte(self):
+        """Prueba: el reporte aporta tipo, probabilidad y departamento desde metadata_adicional"""
+        with self.app.app_context():
+            reporte = CondicionInsegura(
+                numero_reporte='REP-RESP-001', titulo='Tablero abierto', severidad_calculada=5,
+                metadata_adicional={'tipo_reporte_id': self.tipo_id, 'probabilidad': 4,
+                                    'departamento': 'Producción'}
+            )
+            self.assertEqual(ResponsabilidadesService.resolver_reporte(reporte).rol_principal, 'Jefe_Produccion')
+
+    def test_reconstruir_tras_editar(self):
+        """Prueba: reconstruir refleja reglas nuevas de inmediato"""
+        with self.app.app_context():
+            db.session.add(GestorResponsabilidades(tipo_reporte_id=self.tipo_id, nivel_riesgo_id=self.bajo_id,
+                                                   rol_principal='Supervisor'))
+            db.session.commit()
+            self.assertEqual(ResponsabilidadesService.resolver(self.tipo_id, self.bajo_id).rol_principal,
+                             'Electricista')
+
+            ResponsabilidadesService.reconstruir()
+            self.assertEqual(ResponsabilidadesService.resolver(self.tipo_id, self.bajo_id).rol_principal,
+                             'Supervisor')
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,124 @@
+"""
+TEST SUITE - Telemetría de IA
+Pruebas para TelemetriaIA: registro por llamada, agregados por departamento y exportación Prometheus
+Comando: python tests/test_telemetria_ia.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import unittest
+from unittest import mock
+from PIL import Image
+from app import create_app, db
+from app.models import Usuario, Empleado, ConfiguracionIA, LlamadaIA
+from app.services.cache_chat_ia import cache_chat_ia
+from app.services.gemini_service import GeminiService
+from app.services.pasarela_ia import pasarela_ia, BackendFalso, ErrorIA
+from app.services.telemetria_ia import TelemetriaIA
+
+class TestTelemetriaIA(unittest.TestCase):
+    """Cada llamada al modelo deja latencia, tamaños, tokens, costo y quién la hizo"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        self.backend = BackendFalso(latencia_ms=0, token_ms=0)
+        pasarela_ia.usar_backend(self.backend)
+        cache_chat_ia.invalidar()
+
+        with self.app.app_context():
+            db.create_all()
+            usuario = Usuario(email='empleado@test.com', nombre_completo='Empleado', rol='Empleado', activo=True)
+            usuario.set_password('pass')
+            admin = Usuario(email='admin@test.com', nombre_completo='Admin', rol='Admin', activo=True)
+            admin.set_password('pass')
+            db.session.add_all([usuario, admin, ConfiguracionIA(activo=True)])
+            db.session.flush()
+            db.session.add(Empleado(usuario_id=usuario.id, departamento='Mantenimiento'))
+            db.session.commit()
+            self.usuario_id, self.admin_id = usuario.id, admin.id
+
+        self.iniciar_sesion(self.usuario_id)
+
+    def tearDown(self):
+        pasarela_ia.usar_backend(None)
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def iniciar_sesion(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def test_chat_registrado_con_quien_llama(self):
+        """Prueba: el chat deja una fila con usuario, departamento, tamaños y costo"""
+        self.client.post('/ia/chat', json={'pregunta': '¿Qué es el COPASST?'})
+        with self.app.app_context():
+            llamada = LlamadaIA.query.one()
+            self.assertEqual((llamada.operacion, llamada.estado), ('chat', 'ok'))
+            self.assertEqual((llamada.usuario_id, llamada.departamento), (self.usuario_id, 'Mantenimiento'))
+            self.assertGreater(llamada.bytes_enviados, len('¿Qué es el COPASST?'))
+            self.assertEqual(llamada.bytes_recibidos, len(self.backend._responder('').encode('utf-8')))
+            self.assertGreater(llamada.tokens_entrada, 0)
+            self.assertEqual(llamada.costo_usd, TelemetriaIA.costo(llamada.tokens_entrada, llamada.tokens_salida))
+
+    def test_errores_y_rechazos_con_su_clase(self):
+        """Prueba: fallos del modelo y rechazos del circuito también quedan registrados"""
+        self.backend.tasa_fallos = 1
+        with self.app.app_context():
+            for _ in range(pasarela_ia.UMBRAL_FALLOS + 1):
+                with self.assertRaises(ErrorIA):
+                    GeminiService().chat_experto_sst('Hola', usar_cache=False)
+
+            estados = dict(db.session.query(LlamadaIA.estado, db.func.count()).group_by(LlamadaIA.estado).all())
+            self.assertEqual(estados, {'modelo': pasarela_ia.UMBRAL_FALLOS, 'circuito_abierto': 1})
+            self.assertEqual(LlamadaIA.query.filter_by(estado='modelo').first().error_clase, 'RuntimeError')
+
+    def test_analisis_de_imagen_cuenta_la_imagen(self):
+        """Prueba: los bytes enviados incluyen la imagen ya reducida y los tokens de imagen"""
+        salida = io.BytesIO()
+        Image.new('RGB', (64, 48), (200, 10, 10)).save(salida, 'JPEG')
+        with self.app.app_context():
+            GeminiService().analizar_imagen_sst(salida.getvalue(), usar_cache=False, contexto={'reporte_id': None})
+            llamada = LlamadaIA.query.one()
+            self.assertEqual(llamada.operacion, 'analisis_imagen')
+            self.assertGreater(llamada.tokens_entrada, TelemetriaIA.TOKENS_IMAGEN)
+            self.assertGreater(llamada.bytes_recibidos, 0)
+
+    def test_resumen_para_admin(self):
+        """Prueba: el admin agrupa por departamento; un empleado no puede consultar"""
+        for pregunta in ('Uno', 'Dos', 'Tres'):
+            self.client.post('/ia/chat', json={'pregunta': f'Pregunta {pregunta} sobre alturas'})
+        self.assertEqual(self.client.get('/ia/telemetria').status_code, 403)
+
+        self.iniciar_sesion(self.admin_id)
+        datos = self.client.get('/ia/telemetria?agrupar=departamento').get_json()
+        self.assertEqual(len(datos['grupos']), 1)
+        grupo = datos['grupos'][0]
+        self.assertEqual((grupo['departamento'], grupo['llamadas'], grupo['errores']), ('Mantenimiento', 3, 0))
+        self.assertGreater(grupo['costo_usd'], 0)
+        self.assertTrue(any(h['operacion'] == 'chat' for h in datos['latencia_proceso']))
+
+        self.assertEqual(self.client.get('/ia/telemetria?agrupar=color').status_code, 400)
+
+    def test_exportacion_prometheus(self):
+        """Prueba: /ia/metricas entrega histograma y contadores con el token configurado"""
+        self.client.post('/ia/chat', json={'pregunta': 'Hola'})
+        self.assertEqual(self.client.get('/ia/metricas').status_code, 403)
+
+        with mock.patch.dict(os.environ, {'SST_METRICAS_TOKEN': 'secreto'}):
+            cliente = self.app.test_client()
+            self.assertEqual(cliente.get('/ia/metricas', headers={'Authorization': 'Bearer otro'}).status_code, 403)
+            respuesta = cliente.get('/ia/metricas', headers={'Authorization': 'Bearer secreto'})
+        texto = respuesta.get_data(as_text=True)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('sst_ia_latencia_segundos_bucket{operacion="chat",modelo="gemini-1.5-pro-vision",le="+Inf"}', texto)
+        self.assertIn('sst_ia_llamadas_total{operacion="chat",modelo="gemini-1.5-pro-vision",estado="ok"}', texto)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
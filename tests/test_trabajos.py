@@ -0,0 +1,239 @@
+"""
+TEST SUITE - Trabajos en segundo plano
+Pruebas para EjecutorTrabajos: prioridades, reintentos, resultados descargables y /jobs
+Comando: python tests/test_trabajos.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Usuario, ConsultaJuridica, TrabajoFondo
+from app.tasks.trabajos import EjecutorTrabajos, ArchivoResultado, ErrorTrabajo
+
+class TestTrabajos(unittest.TestCase):
+    """Los trabajos se ejecutan por prioridad, una sola vez, y dejan su resultado consultable"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = self.app.test_client()
+        self.directorio = tempfile.mkdtemp(prefix='sst-trabajos-')
+        self.directorio_original = EjecutorTrabajos.DIRECTORIO
+        EjecutorTrabajos.DIRECTORIO = self.directorio
+        self.llamadas = []
+
+        @EjecutorTrabajos.manejador('prueba_eco', max_intentos=3)
+        def eco(parametros):
+            self.llamadas.append(parametros)
+            if parametros.get('fallar_hasta', 0) >= len(self.llamadas):
+                raise RuntimeError('Fallo transitorio')
+            if parametros.get('permanente'):
+                raise ErrorTrabajo('Parámetros inválidos', reintentar=False)
+            return {'eco': parametros.get('valor')}
+
+        @EjecutorTrabajos.manejador('prueba_archivo')
+        def archivo(parametros):
+            return ArchivoResultado(b'%PDF-1.4 prueba', 'informe final.pdf', 'application/pdf', {'paginas': 1})
+
+        with self.app.app_context():
+            db.create_all()
+            usuarios = []
+            for email, rol in (('abogado@test.com', 'Abogado'), ('otro@test.com', 'Abogado')):
+                usuario = Usuario(email=email, nombre_completo=email, rol=rol, activo=True)
+                usuario.set_password('pass')
+                usuarios.append(usuario)
+            db.session.add_all(usuarios)
+            db.session.commit()
+            self.abogado_id, self.otro_id = [u.id for u in usuarios]
+
+    def tearDown(self):
+        EjecutorTrabajos._manejadores.pop('prueba_eco', None)
+        EjecutorTrabajos._manejadores.pop('prueba_archivo', None)
+        EjecutorTrabajos.DIRECTORIO = self.directorio_original
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def iniciar_sesion(self, usuario_id):
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = str(usuario_id)
+            sess['_fresh'] = True
+
+    def test_orden_por_prioridad(self):
+        """Prueba: se toma primero el más urgente y, a igual prioridad, el más antiguo"""
+        with self.app.app_context():
+            baja = EjecutorTrabajos.encolar('prueba_eco', {'valor': 'baja'}, prioridad='baja')
+            normal_1 = EjecutorTrabajos.encolar('prueba_eco', {'valor': 'n1'})
+            normal_2 = EjecutorTrabajos.encolar('prueba_eco', {'valor': 'n2'})
+            alta = EjecutorTrabajos.encolar('prueba_eco', {'valor': 'alta'}, prioridad=1)
+
+            orden = [EjecutorTrabajos.reclamar('worker-a') for _ in range(4)]
+            self.assertEqual(orden, [alta.id, normal_1.id, normal_2.id, baja.id])
+            self.assertIsNone(EjecutorTrabajos.reclamar('worker-a'))
+
+            with self.assertRaises(ValueError):
+                EjecutorTrabajos.encolar('no_existe')
+            with self.assertRaises(ValueError):
+                EjecutorTrabajos.encolar('prueba_eco', prioridad=0)
+
+    def test_reintentos_con_backoff(self):
+        """Prueba: un error transitorio reprograma el trabajo; al agotar intentos queda Fallido"""
+        with self.app.app_context():
+            trabajo = EjecutorTrabajos.encolar('prueba_eco', {'valor': 7, 'fallar_hasta': 1})
+            self.assertEqual(EjecutorTrabajos.reclamar('worker-a'), trabajo.id)
+            self.assertEqual(EjecutorTrabajos.ejecutar(trabajo.id, 'worker-a'), 'Pendiente')
+
+            db.session.refresh(trabajo)
+            self.assertEqual((trabajo.intentos, trabajo.ultimo_error), (1, 'RuntimeError: Fallo transitorio'))
+            self.assertGreater(trabajo.proximo_intento, datetime.utcnow() + timedelta(seconds=20))
+            self.assertIsNone(EjecutorTrabajos.reclamar('worker-a'))
+
+            despues = datetime.utcnow() + timedelta(minutes=2)
+            self.assertEqual(EjecutorTrabajos.reclamar('worker-a', ahora=despues), trabajo.id)
+            self.assertEqual(EjecutorTrabajos.ejecutar(trabajo.id, 'worker-a'), 'Completado')
+            db.session.refresh(trabajo)
+            self.assertEqual((trabajo.resultado, trabajo.intentos), ({'eco': 7}, 2))
+
+            self.llamadas.clear()
+            agotado = EjecutorTrabajos.encolar('prueba_eco', {'fallar_hasta': 99})
+            ahora = datetime.utcnow()
+            for _ in range(agotado.max_intentos):
+                ahora += timedelta(hours=2)
+                self.assertEqual(EjecutorTrabajos.reclamar('worker-a', ahora=ahora), agotado.id)
+                estado = EjecutorTrabajos.ejecutar(agotado.id, 'worker-a')
+            self.assertEqual(estado, 'Fallido')
+
+            permanente = EjecutorTrabajos.encolar('prueba_eco', {'permanente': True})
+            EjecutorTrabajos.reclamar('worker-a', ahora=ahora)
+            self.assertEqual(EjecutorTrabajos.ejecutar(permanente.id, 'worker-a'), 'Fallido')
+            db.session.refresh(permanente)
+            self.assertEqual((permanente.intentos, permanente.ultimo_error), (1, 'Parámetros inválidos'))
+
+    def test_trabajo_abandonado_lo_retoma_otro_worker(self):
+        """Prueba: vencida la reserva otro worker lo toma y el resultado del primero se descarta"""
+        with self.app.app_context():
+            trabajo = EjecutorTrabajos.encolar('prueba_eco', {'valor': 1})
+            self.assertEqual(EjecutorTrabajos.reclamar('worker-a'), trabajo.id)
+            self.assertIsNone(EjecutorTrabajos.reclamar('worker-b'))
+
+            vencida = datetime.utcnow() + timedelta(seconds=EjecutorTrabajos.RESERVA_SEGUNDOS + 1)
+            self.assertEqual(EjecutorTrabajos.reclamar('worker-b', ahora=vencida), trabajo.id)
+            self.assertIsNone(EjecutorTrabajos.ejecutar(trabajo.id, 'worker-a'))
+            self.assertEqual(EjecutorTrabajos.ejecutar(trabajo.id, 'worker-b'), 'Completado')
+            self.assertEqual(len(self.llamadas), 1)
+
+            db.session.refresh(trabajo)
+            self.assertEqual((trabajo.tomado_por, trabajo.intentos), ('worker-b', 2))
+
+    def test_estado_y_descarga(self):
+        """Prueba: /jobs/<id> muestra el avance y el creador descarga el archivo; otro usuario no"""
+        with self.app.app_context():
+            trabajo = EjecutorTrabajos.encolar('prueba_archivo', creado_por_id=self.abogado_id)
+            trabajo_id = trabajo.id
+
+        self.iniciar_sesion(self.abogado_id)
+        datos = self.client.get(f'/jobs/{trabajo_id}').get_json()
+        self.assertEqual((datos['estado'], datos['url_descarga']), ('Pendiente', None))
+        self.assertEqual(self.client.get(f'/jobs/{trabajo_id}/descargar').status_code, 409)
+
+        with self.app.app_context():
+            EjecutorTrabajos.reclamar('worker-a')
+            EjecutorTrabajos.ejecutar(trabajo_id, 'worker-a')
+
+        datos = self.client.get(f'/jobs/{trabajo_id}').get_json()
+        self.assertEqual((datos['estado'], datos['resultado']), ('Completado', {'paginas': 1}))
+        respuesta = self.client.get(datos['url_descarga'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data, b'%PDF-1.4 prueba')
+        self.assertEqual(respuesta.mimetype, 'application/pdf')
+        self.assertIn('informe final.pdf', respuesta.headers['Content-Disposition'])
+        respuesta.close()
+
+        self.iniciar_sesion(self.otro_id)
+        self.assertEqual(self.client.get(f'/jobs/{trabajo_id}').status_code, 403)
+        self.assertEqual(self.client.get(f'/jobs/{trabajo_id}/descargar').status_code, 403)
+
+        with self.app.app_context():
+            db.session.execute(db.update(TrabajoFondo).values(fecha_fin=datetime.utcnow() - timedelta(days=30)))
+            db.session.commit()
+            self.assertEqual(EjecutorTrabajos.purgar(), 1)
+            self.assertEqual(os.listdir(self.directorio), [])
+
+    def test_pdf_juridico_se_encola(self):
+        """Prueba: descargar el reporte de una consulta encola un solo trabajo y responde 202"""
+        with self.app.app_context():
+            consulta = ConsultaJuridica(numero_consulta='CJ-TRAB-1', titulo='Consulta', descripcion='Detalle',
+                                        tipo_consulta='Laboral', responsable_creador_id=self.abogado_id)
+            db.session.add(consulta)
+            db.session.commit()
+            consulta_id = consulta.id
+
+        self.iniciar_sesion(self.abogado_id)
+        respuesta = self.client.get(f'/juridico/{consulta_id}/descargar', headers={'Accept': 'application/json'})
+        self.assertEqual(respuesta.status_code, 202)
+        datos = respuesta.get_json()
+        self.assertEqual(respuesta.headers['Location'], f'/jobs/{datos["id"]}')
+        self.assertEqual(datos['tipo'], 'pdf_consulta_juridica')
+
+        repetida = self.client.get(f'/juridico/{consulta_id}/descargar?formato=json').get_json()
+        self.assertEqual(repetida['id'], datos['id'])
+
+        with self.app.app_context():
+            trabajo = db.session.get(TrabajoFondo, datos['id'])
+            self.assertEqual((trabajo.parametros, trabajo.creado_por_id), ({'consulta_id': consulta_id}, self.abogado_id))
+
+        # Navegador: redirige a la página de espera, que consulta /jobs/<id>
+        respuesta = self.client.get(f'/juridico/{consulta_id}/descargar')
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertTrue(respuesta.headers['Location'].startswith(f'/jobs/{datos["id"]}/ver?volver='))
+        pagina = self.client.get(respuesta.headers['Location'])
+        self.assertEqual(pagina.status_code, 200)
+        self.assertIn(f'data-url-estado="/jobs/{datos["id"]}"'.encode(), pagina.data)
+        self.assertIn(f'href="/juridico/{consulta_id}"'.encode(), pagina.data)
+        self.assertNotIn(b'evil.com', self.client.get(f'/jobs/{datos["id"]}/ver?volver=//evil.com').data)
+
+        self.iniciar_sesion(self.otro_id)
+        self.assertEqual(self.client.get(f'/jobs/{datos["id"]}/ver').status_code, 403)
+
+    def test_latido_renueva_la_reserva(self):
+        """Prueba: mientras el manejador corre se renueva tomada_hasta; al terminar se libera"""
+        vistos = []
+
+        @EjecutorTrabajos.manejador('prueba_lento')
+        def lento(parametros):
+            time.sleep(0.35)
+            vistos.append(db.session.get(TrabajoFondo, parametros['id']).tomada_hasta)
+            return {}
+
+        try:
+            with self.app.app_context():
+                trabajo = EjecutorTrabajos.encolar('prueba_lento')
+                trabajo.parametros = {'id': trabajo.id}
+                db.session.commit()
+                self.assertEqual(EjecutorTrabajos.reclamar('worker-a'), trabajo.id)
+                inicio = datetime.utcnow()
+                trabajo.tomada_hasta = inicio + timedelta(seconds=100)
+                db.session.commit()
+                with mock.patch.object(EjecutorTrabajos, 'LATIDO_SEGUNDOS', 0.1):
+                    self.assertEqual(EjecutorTrabajos.ejecutar(trabajo.id, 'worker-a'), 'Completado')
+
+                # Sin latido la reserva vencería en 100 s
+                self.assertGreater(vistos[0], inicio + timedelta(seconds=EjecutorTrabajos.RESERVA_SEGUNDOS - 5))
+                db.session.refresh(trabajo)
+                self.assertIsNone(trabajo.tomada_hasta)
+                self.assertFalse([h for h in threading.enumerate() if h.name.startswith('latido-trabajo-')])
+        finally:
+            EjecutorTrabajos._manejadores.pop('prueba_lento', None)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
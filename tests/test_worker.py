@@ -0,0 +1,85 @@
+"""
+TEST SUITE - Worker de tareas periódicas
+Pruebas para BloqueoLider (fila de bloqueo en SQLite) y ejecutar_worker
+Comando: python tests/test_worker.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import unittest
+from datetime import datetime, timedelta
+from apscheduler.schedulers.base import STATE_RUNNING
+from app import create_app, db
+from app.models import BloqueoWorker
+from app.tasks.lider import BloqueoLider
+from app.tasks.scheduler import scheduler
+from app.tasks.temporizador import temporizador
+from app.tasks.worker import ejecutar_worker
+
+class TestWorkerLider(unittest.TestCase):
+    """Un solo líder a la vez"""
+
+    def setUp(self):
+        self.app = create_app('development')
+        self.app.config['TESTING'] = True
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+        with self.app.app_context():
+            db.create_all()
+            BloqueoWorker.query.delete()
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_create_app_no_inicia_tareas(self):
+        """Prueba: la fábrica web no arranca scheduler ni temporizador"""
+        self.assertNotEqual(scheduler.state, STATE_RUNNING)
+        self.assertFalse(temporizador.corriendo)
+
+    def test_un_solo_lider(self):
+        """Prueba: el segundo proceso espera hasta que el bloqueo vence o se libera"""
+        primero = BloqueoLider(self.app)
+        segundo = BloqueoLider(self.app)
+
+        self.assertTrue(primero.adquirir())
+        self.assertTrue(primero.adquirir())  # renovación
+        self.assertFalse(segundo.adquirir())
+
+        # El líder deja de renovar: al vencer, el otro lo toma
+        with self.app.app_context():
+            BloqueoWorker.query.update({'expira_en': datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+        self.assertTrue(segundo.adquirir())
+        self.assertFalse(primero.adquirir())
+
+        segundo.liberar()
+        self.assertTrue(primero.adquirir())
+        primero.liberar()
+
+    def test_worker_arranca_y_detiene(self):
+        """Prueba: el worker líder inicia las tareas y las pausa al terminar"""
+        detener = threading.Event()
+        hilo = threading.Thread(target=ejecutar_worker, args=(self.app,),
+                                kwargs={'intervalo': 0.05, 'detener': detener})
+        hilo.start()
+        try:
+            for _ in range(100):
+                if temporizador.corriendo:
+                    break
+                detener.wait(0.05)
+            self.assertTrue(temporizador.corriendo)
+        finally:
+            detener.set()
+            hilo.join(timeout=10)
+
+        self.assertFalse(temporizador.corriendo)
+        with self.app.app_context():
+            self.assertEqual(BloqueoWorker.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,16 @@
+"""
+sst-worker: ejecuta las tareas periódicas (escalamientos, limpieza de tareas)
+Uso: python worker.py [development|production]
+
+La app web (run.py / gunicorn) ya no arranca el scheduler; este proceso sí.
+Se pueden levantar varios: solo uno a la vez toma el bloqueo de líder.
+"""
+import sys
+
+from app import create_app
+from app.tasks.worker import ejecutar_worker
+
+app = create_app(sys.argv[1] if len(sys.argv) > 1 else 'development')
+
+if __name__ == '__main__':
+    ejecutar_worker(app)